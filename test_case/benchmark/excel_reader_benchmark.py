@@ -0,0 +1,160 @@
+"""
+Excel读取基准测试
+对比单次打开工作簿、只解析列范围内的列的读取方式（各应用当前实现）与原先每个表格重新打开文件、
+读取全部列后再截取列范围的方式的耗时，并校验两者读取的数据是否一致
+
+用法：
+    python benchmark/excel_reader_benchmark.py test_case_flask_v1
+    python benchmark/excel_reader_benchmark.py test_case_cmd_v1 --rows 20000 --sheets 5 --column-range 2 6
+    python benchmark/excel_reader_benchmark.py test_case_flask_v2 --file /tmp/synthetic.xlsx
+    python benchmark/excel_reader_benchmark.py test_case_flask_v1 --workers 3
+
+--file 指定的工作簿不存在时生成到该路径，之后的运行直接复用；未指定时生成到临时目录。
+生成的工作簿每个表格第1行为表头，第2行起为数据，前两列有合并单元格式的空值需要向下填充。
+已安装python-calamine时当前实现使用calamine引擎，另外以openpyxl引擎计时一次作为对照。
+--workers 大于1时再以parse_workers进程并行解析各表格计时一次，多核机器上耗时应接近最大的表格的解析耗时。
+"""
+
+import argparse
+import importlib
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import openpyxl
+import pandas as pd
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 各应用读取Excel的(模块, 类, 读取方法, 引擎选择方法)
+READERS = {
+    "test_case_cmd_v1": ("src.util.excel_util", "ExcelProcessor", "read_excel_with_sheets", "get_reader_engine"),
+    "test_case_flask_v1": ("src.util.excel_helper", "ExcelHelper", "read_excel", "_reader_engine"),
+    "test_case_flask_v2": ("src.util.excel_util", "ExcelHelper", "read_excel", "_reader_engine"),
+}
+
+HEADERS = ["模块", "功能", "子功能", "需求描述", "优先级", "负责人", "备注", "版本", "状态", "日期"]
+
+
+def legacy_read_excel(file_path: str, sheet_names: List[str], data_start_row: int, column_range: List[int]) -> Dict[str, pd.DataFrame]:
+    """原读取方式：ExcelFile列出表名后逐表调用read_excel重新打开文件，读取全部列再截取列范围（表头为第1行）"""
+    excel_file = pd.ExcelFile(file_path, engine="openpyxl")
+    valid_sheets = [name for name in sheet_names if name in excel_file.sheet_names]
+    
+    all_data = {}
+    for sheet_name in valid_sheets:
+        df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=None, engine="openpyxl")
+        start_col = max(0, column_range[0] - 1)
+        end_col = min(df_raw.shape[1], column_range[1])
+        df_filled = df_raw.iloc[:, start_col:end_col].ffill(axis=0)
+        
+        headers = [
+            str(value).strip() if pd.notna(value) else f"列_{col+1}"
+            for col, value in enumerate(df_filled.iloc[0])
+        ]
+        data_df = df_filled.iloc[data_start_row-1:, :].copy()
+        data_df.columns = headers
+        all_data[sheet_name] = data_df.dropna(how="all").reset_index(drop=True)
+    return all_data
+
+
+def generate_workbook(path: Path, sheets: int, rows: int, columns: int, rng: random.Random) -> List[str]:
+    """以只写模式生成模拟需求表，返回表名列表"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet_names = [f"需求表{index + 1}" for index in range(sheets)]
+    headers = [HEADERS[col] if col < len(HEADERS) else f"扩展列{col + 1}" for col in range(columns)]
+    
+    for sheet_name in sheet_names:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(headers)
+        for index in range(rows):
+            row = [
+                f"模块{index // 50}" if index % 50 == 0 else None,
+                f"功能{index // 10}" if index % 10 == 0 else None,
+                f"子功能{index}",
+                f"需求描述{index}：" + "远程控制车辆解锁" * rng.randint(1, 20),
+                rng.choice(["高", "中", "低"]),
+                f"人员{rng.randint(1, 30)}",
+                "备注" * rng.randint(0, 3) or None,
+                rng.randint(1, 9),
+                rng.choice(["新增", "修改"]),
+                45000 + index % 365,
+            ]
+            worksheet.append((row + [f"值{index}"] * columns)[:columns])
+    
+    workbook.save(path)
+    return sheet_names
+
+
+def measure(read: Callable[[], Dict[str, pd.DataFrame]], repeat: int):
+    """返回最短耗时（秒）和最后一次读取的结果"""
+    best = float("inf")
+    result = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = read()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel读取基准测试")
+    parser.add_argument("app", choices=sorted(READERS), help="应用目录名")
+    parser.add_argument("--file", type=Path, help="模拟工作簿路径，不存在时生成到该路径")
+    parser.add_argument("--rows", type=int, default=100000, help="每个表格的数据行数")
+    parser.add_argument("--sheets", type=int, default=3, help="表格数量")
+    parser.add_argument("--columns", type=int, default=10, help="每个表格的列数")
+    parser.add_argument("--column-range", type=int, nargs=2, default=[1, 4], metavar=("开始", "结束"), help="读取的列范围")
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，取最短耗时")
+    parser.add_argument("--workers", type=int, default=1, help="并行解析表格的进程数，大于1时额外计时")
+    parser.add_argument("--seed", type=int, default=0, help="模拟数据的随机种子")
+    args = parser.parse_args()
+    
+    sys.path.insert(0, str(ROOT / args.app))
+    module_name, class_name, read_name, engine_name = READERS[args.app]
+    reader_class = getattr(importlib.import_module(module_name), class_name)
+    current = getattr(reader_class, read_name)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = args.file or Path(temp_dir) / "synthetic.xlsx"
+        if file_path.exists():
+            sheet_names = pd.ExcelFile(file_path, engine="openpyxl").sheet_names
+        else:
+            print(f"生成模拟工作簿: {args.sheets} 个表格，每个表格 {args.rows} 行 {args.columns} 列")
+            start = time.perf_counter()
+            sheet_names = generate_workbook(file_path, args.sheets, args.rows, args.columns, random.Random(args.seed))
+            print(f"  生成耗时 {time.perf_counter() - start:.1f}秒")
+        print(f"工作簿: {file_path}，{file_path.stat().st_size / 1024 / 1024:.1f}MB，读取列范围 {args.column_range}")
+        
+        legacy_seconds, expected = measure(
+            lambda: legacy_read_excel(str(file_path), sheet_names, 2, args.column_range), args.repeat
+        )
+        row_count = sum(len(df) for df in expected.values())
+        print(f"原逐表重新打开读取:       {legacy_seconds:.2f}秒，共 {row_count} 行")
+        
+        # 当前实现分别以自动选择的引擎和openpyxl引擎计时，指定--workers时再以自动选择的引擎并行解析计时
+        engine = getattr(reader_class, engine_name)()
+        runs = [(engine, 1), ("openpyxl", 1)] if engine == "calamine" else [(engine, 1)]
+        if args.workers > 1:
+            runs.append((engine, args.workers))
+        for name, workers in runs:
+            setattr(reader_class, engine_name, staticmethod(lambda name=name: name))
+            seconds, actual = measure(
+                lambda: current(str(file_path), sheet_names, 1, 2, args.column_range, workers), args.repeat
+            )
+            consistent = list(actual) == list(expected) and all(actual[sheet].equals(expected[sheet]) for sheet in expected)
+            label = name or "pandas默认"
+            if workers > 1:
+                label += f"，{workers} 个进程"
+            print(
+                f"单次打开按列读取({label}): {seconds:.2f}秒，"
+                f"加速比 {legacy_seconds / seconds:.2f}x，结果{'一致' if consistent else '不一致'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
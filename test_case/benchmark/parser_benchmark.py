@@ -0,0 +1,183 @@
+"""
+测试用例解析基准测试
+对比单遍扫描解析器（OutputParser当前实现）与原逐字段正则解析器的耗时，并校验两者结果是否一致
+
+用法：
+    python benchmark/parser_benchmark.py test_case_flask_v1
+    python benchmark/parser_benchmark.py test_case_cmd_v1 --corpus recorded_outputs/ --repeat 20
+
+--corpus 指定录制的AI输出（文件或目录，目录下每个 .txt/.md 文件为一次输出），
+未指定时按应用的输出格式生成一批模拟输出。
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 各应用测试用例解析的入口方法
+PARSE_METHODS = {
+    "test_case_cmd_v1": "parse_test_case_output",
+    "test_case_flask_v1": "parse_test_cases",
+    "test_case_flask_v2": "parse_test_cases",
+}
+
+
+def legacy_parse_flask(ai_output: str) -> List[Dict[str, str]]:
+    """Flask应用原逐字段正则解析器"""
+    def extract_field(block, pattern, flags=0):
+        match = re.search(pattern, block, flags)
+        return match.group(1).strip() if match else ""
+    
+    def clean_text(text):
+        if not text:
+            return ""
+        return '\n'.join(line.strip() for line in text.split('\n') if line.strip())
+    
+    def extract_numbered_items(text):
+        if not text:
+            return ""
+        items = []
+        for line in text.split('\n'):
+            match = re.match(r'^\s*(\d+)\.\s*(.+)$', line.strip())
+            if match:
+                items.append(f"{match.group(1)}. {match.group(2)}")
+        return '\n'.join(items) if items else text.strip()
+    
+    test_cases = []
+    for block in re.split(r'(?=测试点：)', ai_output.strip()):
+        if not block.strip():
+            continue
+        case = {
+            "测试点": extract_field(block, r'测试点：\s*(.+)'),
+            "测试点编号": extract_field(block, r'测试点编号：\s*(.+)'),
+            "测试点描述": extract_field(block, r'测试点描述：\s*(.+)'),
+            "前置条件": clean_text(extract_field(block, r'前置条件：\s*(.+?)(?=测试步骤：|$)', re.DOTALL)),
+            "测试步骤": extract_numbered_items(extract_field(block, r'测试步骤：\s*(.+?)(?=预期结果：|$)', re.DOTALL)),
+            "预期结果": extract_numbered_items(
+                extract_field(block, r'预期结果：\s*(.+?)(?=\n\n测试点：|\n\n$|\Z)', re.DOTALL)
+            ),
+        }
+        if any(case.values()):
+            test_cases.append(case)
+    return test_cases
+
+
+def legacy_parse_cmd(ai_output: str) -> List[Dict[str, str]]:
+    """命令行应用原逐字段正则解析器"""
+    def extract_field(block, pattern, flags=0):
+        match = re.search(pattern, block, flags)
+        return match.group(1).strip() if match else ""
+    
+    test_cases = []
+    for block in re.split(r'(?=需求名称：)', ai_output.strip()):
+        if not block.strip():
+            continue
+        case = {
+            "需求名称": extract_field(block, r'需求名称：\s*(.+)'),
+            "测试点编号": extract_field(block, r'测试点编号：\s*(.+)'),
+            "测试点": extract_field(block, r'测试点：\s*(.+)'),
+            "前置条件": extract_field(block, r'前置条件：\s*(.+?)(?=测试步骤：|$)', re.DOTALL),
+            "测试步骤": extract_field(block, r'测试步骤：\s*(.+?)(?=预期结果：|$)', re.DOTALL),
+            "预期结果": re.sub(r'---+\s*', '', extract_field(block, r'预期结果：\s*(.+)', re.DOTALL)),
+        }
+        if any(case.values()):
+            test_cases.append(case)
+    return test_cases
+
+
+def synthetic_output(app: str, rng: random.Random) -> str:
+    """按应用的输出格式生成一次模拟AI输出，包含缩进、空行和分隔线等常见变化"""
+    def items(prefix, count):
+        indent = rng.choice(["", "    ", "  "])
+        return '\n'.join(f"{indent}{i}. {prefix}{i}：{'操作内容' * rng.randint(1, 6)}" for i in range(1, count + 1))
+    
+    blocks = []
+    for index in range(rng.randint(1, 8)):
+        point_id = f"TP_{rng.randint(1, 999):03d}"
+        precondition = rng.choice(["车辆处于静止状态", "已登录账号\n网络连接正常", "1. 车辆上电\n2. 云服务可用"])
+        if app == "test_case_cmd_v1":
+            block = (
+                f"需求名称：远程控制功能{index}\n测试点编号：{point_id}\n测试点：远程解锁{index}\n"
+                f"前置条件：{precondition}\n测试步骤：\n{items('步骤', 5)}\n预期结果：\n{items('结果', 5)}"
+            )
+            if rng.random() < 0.3:
+                block += "\n---"
+        else:
+            block = (
+                f"测试点：远程解锁{index}\n测试点编号：{point_id}\n测试点描述：验证远程解锁{index}\n"
+                f"前置条件：{precondition}\n测试步骤：\n{items('步骤', 5)}\n预期结果：\n{items('结果', 5)}"
+            )
+        blocks.append(block)
+    
+    separator = rng.choice(["\n\n", "\n\n\n", "\n"])
+    return separator.join(blocks) + rng.choice(["", "\n", "\n\n"])
+
+
+def load_corpus(path: Path) -> List[str]:
+    """读取录制的AI输出"""
+    files = sorted(p for p in path.rglob("*") if p.suffix in (".txt", ".md")) if path.is_dir() else [path]
+    return [file.read_text(encoding="utf-8") for file in files]
+
+
+def measure(parse: Callable[[str], List[Dict[str, str]]], corpus: List[str], repeat: int) -> float:
+    """返回解析一遍语料的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for output in corpus:
+            parse(output)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试用例解析基准测试")
+    parser.add_argument("app", choices=sorted(PARSE_METHODS), help="应用目录名")
+    parser.add_argument("--corpus", type=Path, help="录制的AI输出文件或目录")
+    parser.add_argument("--size", type=int, default=2000, help="模拟输出的数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最短耗时")
+    parser.add_argument("--seed", type=int, default=0, help="模拟输出的随机种子")
+    args = parser.parse_args()
+    
+    sys.path.insert(0, str(ROOT / args.app))
+    from src.core.data_processor import OutputParser
+    
+    current = getattr(OutputParser, PARSE_METHODS[args.app])
+    legacy = legacy_parse_cmd if args.app == "test_case_cmd_v1" else legacy_parse_flask
+    
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(args.seed)
+        corpus = [synthetic_output(args.app, rng) for _ in range(args.size)]
+    if not corpus:
+        print("语料为空")
+        return
+    
+    mismatches = [output for output in corpus if current(output) != legacy(output)]
+    case_count = sum(len(current(output)) for output in corpus)
+    total_chars = sum(len(output) for output in corpus)
+    print(f"语料: {len(corpus)} 次输出，{total_chars} 个字符，{case_count} 个测试用例")
+    print(f"结果不一致: {len(mismatches)} 次输出")
+    if mismatches:
+        sample = mismatches[0]
+        print(f"  示例输出:\n{sample[:500]}")
+        print(f"  原解析器: {legacy(sample)[:2]}")
+        print(f"  新解析器: {current(sample)[:2]}")
+    
+    legacy_seconds = measure(legacy, corpus, args.repeat)
+    current_seconds = measure(current, corpus, args.repeat)
+    print(f"原逐字段正则解析器: {legacy_seconds * 1000:.1f}毫秒，每次输出 {legacy_seconds / len(corpus) * 1e6:.1f}微秒")
+    print(f"单遍扫描解析器:     {current_seconds * 1000:.1f}毫秒，每次输出 {current_seconds / len(corpus) * 1e6:.1f}微秒")
+    print(f"加速比: {legacy_seconds / current_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -80,13 +80,15 @@ class Settings:
             current_logger = logging.getLogger(__name__)
             current_logger.warning(f"创建输出目录时出现警告: {e}")
     
-    def get_config_value(self, key_path):
-        """获取配置值"""
+    def get_config_value(self, key_path, default=None):
+        """获取配置值，配置项不存在且未提供默认值时抛出KeyError"""
         keys = key_path.split('.')
         value = self.config
         for key in keys:
             if isinstance(value, dict) and key in value:
                 value = value[key]
             else:
+                if default is not None:
+                    return default
                 raise KeyError(f"配置项 '{key_path}' 不存在")
         return value
\ No newline at end of file
@@ -36,6 +36,7 @@ hiddenimports = [
     'langchain_openai', 
     'langchain_core',
     'tenacity',
+    'h2',
     'pandas',
     'config.settings'
 ]
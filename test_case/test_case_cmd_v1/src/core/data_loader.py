@@ -1,9 +1,12 @@
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import pandas as pd
 import warnings
 from src.util.logging_util import get_logger
 from src.util.excel_util import ExcelProcessor
+from src.util.cache_util import WorkbookCache
 
 # 使用模块级日志记录器
 logger = get_logger(__name__)
@@ -17,19 +20,27 @@ class ExcelDataLoader:
         self.data_start_row = settings.get_config_value("input_excel_processing.data_start_row")
         self.target_sheets = settings.get_config_value("input_excel_processing.target_sheets")
         self.column_range = settings.get_config_value("input_excel_processing.column_range")
+        self.parse_workers = settings.get_config_value("input_excel_processing.parse_workers", 1)
+        self.cache = self._initialize_cache()
     
     def load_data(self, file_path: Path) -> Dict[str, List[Dict[str, Any]]]:
-        """加载Excel数据"""
+        """加载Excel数据，启用工作簿缓存时内容和读取配置都相同的工作簿直接返回缓存的数据记录"""
         try:
             # 记录开始加载数据的日志 - 只在这里记录一次
             logger.info(f"开始加载数据: {file_path}")
+            
+            # 命中工作簿缓存时跳过Excel解析
+            cache_key, data_records = self._lookup_cache(file_path)
+            if data_records is not None:
+                return data_records
                 
             data_frames = ExcelProcessor.read_excel_with_sheets(
                 str(file_path), 
                 self.target_sheets,
                 self.header_rows, 
                 self.data_start_row,
-                self.column_range
+                self.column_range,
+                self.parse_workers
             )
             
             # 转换为字典记录
@@ -48,6 +59,8 @@ class ExcelDataLoader:
             
             if not data_records:
                 logger.warning("没有加载到任何有效数据")
+            elif cache_key:
+                self.cache.set(cache_key, data_records)
                 
             return data_records
                 
@@ -55,6 +68,85 @@ class ExcelDataLoader:
             logger.error(f"加载数据失败: {e}")
             raise
     
+    def iter_data(self, file_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        逐行加载Excel数据，按表格依次产出(表名, 数据记录)，调用方可以在工作簿读取完毕之前开始处理
+        命中工作簿缓存时直接产出缓存的数据记录；未命中时不写入缓存，以免为写入缓存保留整个工作簿的记录
+        与load_data一样跳过没有有效数据的表格：每个表格在出现第一条有效记录之前暂存读到的记录，表格读取完毕仍没有有效记录时丢弃
+        """
+        try:
+            logger.info(f"开始流式加载数据: {file_path}")
+            
+            _, data_records = self._lookup_cache(file_path)
+            if data_records is not None:
+                for sheet_name, records in data_records.items():
+                    for record in records:
+                        yield sheet_name, record
+                return
+            
+            rows = ExcelProcessor.iter_rows_with_sheets(
+                str(file_path), 
+                self.target_sheets,
+                self.header_rows, 
+                self.data_start_row,
+                self.column_range
+            )
+            
+            # 逐行产出，每个表格读取完毕时记录记录数
+            loaded_sheets = 0
+            for sheet_name, sheet_rows in groupby(rows, key=itemgetter(0)):
+                record_count = 0
+                pending = []
+                for _, record in sheet_rows:
+                    record_count += 1
+                    if pending is not None:
+                        pending.append(record)
+                        if not any(value is not None and str(value).strip() != '' for value in record.values()):
+                            continue
+                        for pending_record in pending:
+                            yield sheet_name, pending_record
+                        pending = None
+                    else:
+                        yield sheet_name, record
+                if pending is not None:
+                    logger.warning(f"表格 '{sheet_name}' 数据验证失败")
+                    continue
+                loaded_sheets += 1
+                logger.info(f"[表格 {sheet_name}] 数据加载完成，共 {record_count} 条记录")
+            
+            if not loaded_sheets:
+                logger.warning("没有加载到任何有效数据")
+        
+        except Exception as e:
+            logger.error(f"加载数据失败: {e}")
+            raise
+    
+    def _initialize_cache(self) -> Optional[WorkbookCache]:
+        """初始化工作簿缓存"""
+        cache_config = self.settings.get_config_value("input_excel_processing.workbook_cache", {})
+        if not cache_config.get('enabled', False):
+            return None
+        
+        return WorkbookCache(
+            Path(cache_config.get('path', 'cache/workbooks')),
+            max_entries=cache_config.get('max_entries', 0)
+        )
+    
+    def _lookup_cache(self, file_path: Path) -> Tuple[Optional[str], Optional[Dict[str, List[Dict[str, Any]]]]]:
+        """查找工作簿缓存，返回(缓存键, 缓存的数据记录)，未启用缓存时缓存键为None，未命中时数据记录为None"""
+        if not self.cache:
+            return None, None
+        
+        cache_key = WorkbookCache.make_key(
+            file_path, self.header_rows, self.data_start_row, self.target_sheets, self.column_range
+        )
+        data_records = self.cache.get(cache_key)
+        if data_records is not None:
+            logger.info(f"工作簿缓存命中，跳过Excel解析: {file_path}")
+            for sheet_name, records in data_records.items():
+                logger.info(f"[表格 {sheet_name}] 数据加载完成，共 {len(records)} 条记录")
+        return cache_key, data_records
+    
     def _validate_data(self, data: List[Dict[str, Any]]) -> bool:
         """验证数据完整性"""
         if not data:
@@ -1,9 +1,26 @@
 import re
+import json
 import time
-from typing import Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import hashlib
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Generator, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import groupby, islice
+from operator import itemgetter
+from src.core.case_parser import CaseParser, CompactCaseParser
+from src.core.repair_budget import RepairBudget
+from src.core.scheduler import MakespanEstimate, RowScheduler
+from src.core.sheet_collector import SheetCollector
+from src.core.streaming import CaseStreamRequest, PointStreamRequest, StreamRequest
+from src.llm.adaptive_limiter import AdaptiveLimiter, track_acquire_wait
 from src.llm.api_client import LLMClient
+from src.llm.chat_prompt import ChatPrompt
+from src.llm.llm_response import LLMResponse
+from src.llm.output_budget import OutputBudget, StagedPrompt
 from src.llm.prompt_manager import PromptManager
+from src.llm.rate_limiter import estimate_tokens
+from src.llm.structured_output import StructuredPrompt
+from src.util.async_util import run_coroutine
 from src.util.logging_util import get_logger
 
 logger = get_logger(__name__)
@@ -11,76 +28,369 @@ logger = get_logger(__name__)
 class OutputParser:
     """输出解析器"""
     
+    # 单次生成模式下测试点和测试用例两部分的起始标记
+    TEST_POINT_MARKER = "【测试点】"
+    TEST_CASE_MARKER = "【测试用例】"
+    
+    # 多行打包时每条输入及其输出的首尾标记，编号为原始行号
+    PACK_SECTION_PATTERN = re.compile(r'<<<BEGIN (\d+)>>>\s*(.*?)\s*<<<END \1>>>', re.DOTALL)
+    
+    # 测试点表格的分隔行，如 ----------|-------
+    TABLE_SEPARATOR_PATTERN = re.compile(r'^[\s|:\-]+$')
+    
+    # 测试用例的字段结构：(字段名, 取值方式)，每个测试用例以"需求名称："开始
+    CASE_FIELDS = (
+        ("需求名称", "line"),
+        ("测试点编号", "line"),
+        ("测试点", "line"),
+        ("前置条件", "text"),
+        ("测试步骤", "text"),
+        ("预期结果", "no_separator"),
+    )
+    CASE_PARSER = CaseParser(CASE_FIELDS, case_start="需求名称")
+    
+    # 紧凑输出格式中由模型生成的字段，需求名称、测试点编号、测试点按测试点序号从测试点表格中取得
+    COMPACT_COLUMNS = ("前置条件", "测试步骤", "预期结果")
+    COMPACT_PARSER = CompactCaseParser(CASE_FIELDS, COMPACT_COLUMNS)
+    
+    # 结构化输出被包裹在代码块中时的首尾标记
+    CODE_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$')
+    
+    @staticmethod
+    def split_fused_output(ai_output: str) -> Tuple[str, str]:
+        """拆分单次生成模式的输出，返回(测试点, 测试用例)，缺少测试用例标记时整个输出视为测试用例"""
+        if not ai_output:
+            return "", ""
+        
+        test_points, marker, test_cases = ai_output.partition(OutputParser.TEST_CASE_MARKER)
+        if not marker:
+            return "", ai_output.strip()
+        
+        test_points = test_points.replace(OutputParser.TEST_POINT_MARKER, "", 1)
+        return test_points.strip(), test_cases.strip()
+    
+    @staticmethod
+    def split_test_points(test_points_output: str) -> Tuple[str, List[str]]:
+        """拆分测试点输出，返回(表格之前的内容及表头, 每条测试点所在的表格行列表)"""
+        header_lines, points = [], []
+        for line in (test_points_output or "").strip().split('\n'):
+            stripped = line.strip()
+            if OutputParser.is_test_point_line(stripped):
+                points.append(stripped)
+            elif not points:
+                header_lines.append(line)
+        
+        return '\n'.join(header_lines).strip(), points
+    
+    @staticmethod
+    def is_test_point_line(line: str) -> bool:
+        """判断去除首尾空白的一行文本是否为测试点表格中的测试点行（非表头、非分隔行）"""
+        return (
+            '|' in line
+            and '测试点编号' not in line
+            and not OutputParser.TABLE_SEPARATOR_PATTERN.match(line)
+        )
+    
+    @staticmethod
+    def format_packed_input(sections: Dict[int, str]) -> str:
+        """将多行输入格式化为带首尾标记的批量输入段落，追加在提示词末尾"""
+        blocks = [f"<<<BEGIN {row_index}>>>\n{content}\n<<<END {row_index}>>>" for row_index, content in sections.items()]
+        return (
+            f"\n\n# 批量输入\n"
+            f"以下共 {len(sections)} 条相互独立的输入，上文中方括号标注的\"对应\"内容均指每条输入自身的内容。"
+            f"请对每条输入分别按上述要求完整输出，不要合并或遗漏任何一条。\n"
+            f"每条输入的输出以单独一行的\"<<<BEGIN 编号>>>\"开头、以单独一行的\"<<<END 编号>>>\"结尾，编号与输入中的编号一致。\n\n"
+            + "\n\n".join(blocks)
+        )
+    
+    @staticmethod
+    def split_packed_output(ai_output: str) -> Dict[int, str]:
+        """按首尾标记拆分多行打包请求的输出，缺少标记或内容为空的行不包含在内"""
+        if not ai_output:
+            return {}
+        
+        return {
+            int(match.group(1)): match.group(2).strip()
+            for match in OutputParser.PACK_SECTION_PATTERN.finditer(ai_output)
+            if match.group(2).strip()
+        }
+    
+    @staticmethod
+    def case_schema(with_test_points: bool = False) -> Dict[str, Any]:
+        """结构化输出的JSON Schema，测试用例位于test_cases数组中，单次生成模式在其之前输出测试点部分"""
+        properties = {}
+        if with_test_points:
+            properties["test_points"] = {"type": "string"}
+        properties["test_cases"] = {"type": "array", "items": OutputParser.CASE_PARSER.record_schema()}
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False
+        }
+    
+    @staticmethod
+    def format_structured_instruction(with_test_points: bool = False) -> str:
+        """结构化输出的格式说明，追加在提示词末尾，替代原提示词中对输出文本格式的要求"""
+        field_names = "、".join(name for name, _ in OutputParser.CASE_FIELDS)
+        list_names = "、".join(name for name, mode in OutputParser.CASE_FIELDS if mode == "numbered")
+        test_points = "test_points为测试点部分的内容，格式与上文要求一致；" if with_test_points else ""
+        list_fields = f"其中{list_names}为字符串数组，每个元素为一条内容，不带序号。" if list_names else "多条内容各占一行。"
+        return (
+            f"\n\n# 结构化输出\n"
+            f"忽略上文中对输出文本格式的要求，改为按约定的JSON结构输出：{test_points}"
+            f"test_cases数组中每个元素为一个测试用例，字段为{field_names}；{list_fields}"
+        )
+    
+    @staticmethod
+    def parse_structured_cases(ai_output: str) -> Tuple[List[Dict[str, str]], List[Tuple[Any, List[str]]]]:
+        """解析并校验结构化输出，返回(校验通过的测试用例, 未通过校验的(原始内容, 问题列表))，输出不是有效JSON时原始内容为输出本身"""
+        text = OutputParser.CODE_FENCE_PATTERN.sub('', (ai_output or "").strip())
+        try:
+            payload = json.loads(text, strict=False)
+        except ValueError:
+            return [], [(ai_output, ["输出不是有效的JSON"])]
+        
+        records = payload.get("test_cases") if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            return [], [(ai_output, ["输出中缺少test_cases数组"])]
+        
+        cases, invalid = [], []
+        for record in records:
+            case, problems = OutputParser.CASE_PARSER.parse_record(record)
+            if problems:
+                invalid.append((record, problems))
+            else:
+                cases.append(case)
+        
+        return cases, invalid
+    
+    @staticmethod
+    def format_repair_prompt(invalid: List[Tuple[Any, List[str]]]) -> str:
+        """生成定向修复提示词，只包含未通过校验的内容及其问题"""
+        fragments = []
+        for index, (record, problems) in enumerate(invalid, 1):
+            content = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False, indent=2)
+            fragments.append(f"第{index}条：\n{content}\n问题：{'；'.join(problems)}")
+        
+        return (
+            "# 任务\n"
+            "以下是按JSON结构输出的测试用例中未通过校验的部分，请根据列出的问题逐条修正，"
+            "补全缺失或为空的字段，已有的内容保持不变。\n\n"
+            "# 待修正内容\n"
+            + "\n\n".join(fragments)
+            + OutputParser.format_structured_instruction()
+            + "test_cases数组中只包含修正后的以上各条。"
+        )
+    
+    @staticmethod
+    def format_field_repair_prompt(case: Dict[str, str], missing: List[str]) -> str:
+        """生成补全字段的修复提示词，只包含不完整测试用例中已有的字段和需要补全的字段名"""
+        fragment = "\n".join(f"{name}：{case[name]}" for name, _ in OutputParser.CASE_FIELDS if case.get(name))
+        
+        return (
+            "# 任务\n"
+            f"以下测试用例缺少{'、'.join(missing)}，请根据已有内容补全这些字段。\n\n"
+            "# 待补全的测试用例\n"
+            f"{fragment}\n\n"
+            "# 输出格式\n"
+            "只输出补全的字段，每个字段以单独一行的“字段名：”开头，多条内容逐条编号，不要输出其他内容。"
+        )
+    
+    @staticmethod
+    def parse_repaired_fields(ai_output: str, missing: List[str]) -> Dict[str, str]:
+        """解析补全字段的修复响应，返回补全成功的字段"""
+        cases = OutputParser.parse_test_case_output(ai_output)
+        if not cases:
+            return {}
+        
+        return {name: cases[0][name] for name in missing if cases[0].get(name)}
+    
+    @staticmethod
+    def complete_prefix(ai_output: str) -> str:
+        """输出因长度限制被截断时，去除末尾不完整的测试用例或行"""
+        return OutputParser.CASE_PARSER.complete_prefix(ai_output)
+    
+    @staticmethod
+    def format_continuation_prompt(prompt: str, kept: str) -> str:
+        """生成续写提示词：在原提示词末尾追加已输出的完整内容（保留原提示词的系统消息），kept为空时要求模型精简后重新输出"""
+        if not kept:
+            return prompt + "\n\n# 注意\n上一次输出因长度限制中断，请精简表述，确保完整输出。"
+        
+        return prompt + (
+            "\n\n"
+            "# 已输出内容\n"
+            "以下是按上述要求已经输出的内容，输出因长度限制在此中断：\n"
+            f"{kept}\n\n"
+            "# 继续输出\n"
+            "请紧接着已输出内容继续输出剩余部分，格式保持一致，不要重复已输出的内容，也不要输出其他说明。"
+        )
+    
     @staticmethod
     def parse_test_case_output(ai_output: str) -> List[Dict[str, str]]:
         """解析测试用例输出，支持多个测试用例，去除预期结果中的---"""
         try:
-            test_cases = []
-            
-            # 分割多个测试用例
-            case_blocks = re.split(r'(?=需求名称：)', ai_output.strip())
-            
-            for block in case_blocks:
-                if not block.strip():
-                    continue
-                    
-                case = {}
-                
-                # 提取需求名称
-                requirement_match = re.search(r'需求名称：\s*(.+)', block)
-                if requirement_match:
-                    case["需求名称"] = requirement_match.group(1).strip()
-                else:
-                    case["需求名称"] = ""
-                
-                # 提取测试点编号
-                test_point_id_match = re.search(r'测试点编号：\s*(.+)', block)
-                if test_point_id_match:
-                    case["测试点编号"] = test_point_id_match.group(1).strip()
-                else:
-                    case["测试点编号"] = ""
-                
-                # 提取测试点
-                test_point_match = re.search(r'测试点：\s*(.+)', block)
-                if test_point_match:
-                    case["测试点"] = test_point_match.group(1).strip()
-                else:
-                    case["测试点"] = ""
-                
-                # 提取前置条件
-                precondition_match = re.search(r'前置条件：\s*(.+?)(?=测试步骤：|$)', block, re.DOTALL)
-                if precondition_match:
-                    case["前置条件"] = precondition_match.group(1).strip()
-                else:
-                    case["前置条件"] = ""
-                
-                # 提取测试步骤
-                test_steps_match = re.search(r'测试步骤：\s*(.+?)(?=预期结果：|$)', block, re.DOTALL)
-                if test_steps_match:
-                    case["测试步骤"] = test_steps_match.group(1).strip()
-                else:
-                    case["测试步骤"] = ""
-                
-                # 提取预期结果并去除---
-                expected_result_match = re.search(r'预期结果：\s*(.+)', block, re.DOTALL)
-                if expected_result_match:
-                    expected_result = expected_result_match.group(1).strip()
-                    # 去除---分隔符
-                    expected_result = re.sub(r'---+\s*', '', expected_result)
-                    case["预期结果"] = expected_result
-                else:
-                    case["预期结果"] = ""
-                
-                # 只有当有实际内容时才添加到结果中
-                if any(case.values()):
-                    test_cases.append(case)
-            
-            # 如果没有解析到任何测试用例，返回空列表
-            return test_cases
+            return OutputParser.CASE_PARSER.parse(ai_output)
             
         except Exception as e:
             logger.error(f"解析测试用例输出失败: {e}")
             return []
+    
+    @staticmethod
+    def split_point_rows(test_points_output: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """拆分测试点输出，返回(表格之前的内容（不含表头行）, 每条测试点的(测试点编号, 测试点)列表)"""
+        header, points = OutputParser.split_test_points(test_points_output)
+        header = '\n'.join(line for line in header.split('\n') if line.strip() and '|' not in line)
+        rows = []
+        for point in points:
+            point_id, _, description = point.strip('|').partition('|')
+            rows.append((point_id.strip(), description.strip()))
+        
+        return header, rows
+    
+    @staticmethod
+    def compact_test_points(test_points_output: str) -> str:
+        """将测试点表格压缩为注入测试用例提示词的紧凑格式：去掉表头和分隔行，每条测试点一行"序号\t测试点"，未找到表格时为原文"""
+        header, rows = OutputParser.split_point_rows(test_points_output)
+        if not rows:
+            return (test_points_output or "").strip()
+        
+        lines = [header] if header else []
+        lines.extend(f"{index}\t{description}" for index, (_, description) in enumerate(rows, 1))
+        return '\n'.join(lines)
+    
+    @staticmethod
+    def point_fields(test_points_output: str) -> Dict[str, Dict[str, str]]:
+        """紧凑输出格式中测试点序号（从1开始，与compact_test_points一致）到需求名称、测试点编号、测试点的映射"""
+        header, rows = OutputParser.split_point_rows(test_points_output)
+        parsed = OutputParser.parse_test_case_output(header)
+        name = parsed[0]["需求名称"] if parsed else ""
+        return {
+            str(index): {"需求名称": name, "测试点编号": point_id, "测试点": description}
+            for index, (point_id, description) in enumerate(rows, 1)
+        }
+    
+    @staticmethod
+    def format_compact_instruction(fused: bool = False) -> str:
+        """紧凑输出的格式说明，追加在系统消息末尾，替代原提示词中对测试用例输出格式的要求；单次生成模式的测试点部分仍按原要求输出"""
+        columns = "、".join(OutputParser.COMPACT_COLUMNS)
+        if fused:
+            source = "测试点部分的格式与上文要求一致；测试用例部分改为以下紧凑格式，测试点序号为测试点在测试点表格中的行序号（从1开始）。"
+        else:
+            source = "测试点文档中的测试点每行一条，依次为测试点序号和测试点，以制表符分隔。"
+        return (
+            f"\n\n# 紧凑输出\n"
+            f"忽略上文中对测试用例输出格式的要求，{source}"
+            f"每个测试用例单独输出一行，依次为测试点序号、{columns}，各列之间以制表符分隔；"
+            f"需求名称、测试点编号、测试点无需输出；{columns}有多条内容时以\"|\"分隔，不带序号；"
+            f"不要输出表头、空行或其他说明。"
+        )
+    
+    @staticmethod
+    def parse_compact_output(ai_output: str, test_points_output: str) -> List[Dict[str, str]]:
+        """解析紧凑格式的测试用例输出，需求名称、测试点编号、测试点按测试点序号取自测试点文档"""
+        try:
+            return OutputParser.COMPACT_PARSER.parse(ai_output, OutputParser.point_fields(test_points_output))
+        
+        except Exception as e:
+            logger.error(f"解析测试用例输出失败: {e}")
+            return []
+
+class IncrementalCaseParser:
+    """流式输出的增量测试用例解析器
+    
+    下一个"需求名称："出现时前一个测试用例块即已完整，立即解析返回，解析规则与parse_test_case_output一致。
+    start_marker之前的内容不解析；收到abort_after_chars个字符仍未出现"需求名称："时判定输出格式异常，0表示不检查。
+    """
+    
+    CASE_START_PATTERN = re.compile(r'需求名称：')
+    
+    def __init__(self, start_marker: Optional[str] = None, abort_after_chars: int = 0):
+        self.start_marker = start_marker
+        self.abort_after_chars = abort_after_chars
+        self.started = start_marker is None
+        self.buffer = ""
+        self.received = 0
+        self.case_seen = False
+        self.cases: List[Dict[str, str]] = []
+    
+    @property
+    def malformed(self) -> bool:
+        """输出是否已可判定为格式异常"""
+        return bool(self.abort_after_chars) and not self.case_seen and self.received >= self.abort_after_chars
+    
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """接收一个文本块，返回因本次输入而完整的测试用例"""
+        search_from = max(0, len(self.buffer) - 8)
+        self.buffer += chunk
+        self.received += len(chunk)
+        if not self.case_seen:
+            self.case_seen = self.CASE_START_PATTERN.search(self.buffer, search_from) is not None
+        
+        # 单次生成模式下跳过测试点部分
+        if not self.started:
+            marker_index = self.buffer.find(self.start_marker, max(0, search_from - len(self.start_marker)))
+            if marker_index < 0:
+                return []
+            self._start(self.buffer[:marker_index])
+            self.buffer = self.buffer[marker_index + len(self.start_marker):]
+            self.started = True
+        
+        return self._drain(final=False)
+    
+    def close(self) -> List[Dict[str, str]]:
+        """输出结束，解析剩余内容；未出现起始标记时与split_fused_output一致，整个输出按测试用例解析"""
+        self.started = True
+        return self._drain(final=True)
+    
+    def discard_partial(self) -> int:
+        """丢弃缓冲区中尚未完整的部分（缓冲区以测试用例块开始时为整个测试用例块，否则为最后一个不完整的行），返回丢弃的字符数"""
+        keep = 0 if self.CASE_START_PATTERN.match(self.buffer) else self.buffer.rfind('\n') + 1
+        dropped = len(self.buffer) - keep
+        self.buffer = self.buffer[:keep]
+        return dropped
+    
+    def _drain(self, final: bool) -> List[Dict[str, str]]:
+        """解析缓冲区中已完整的测试用例块，未完整的部分留在缓冲区"""
+        if final:
+            complete, self.buffer = self.buffer, ""
+        else:
+            starts = [match.start() for match in self.CASE_START_PATTERN.finditer(self.buffer)]
+            if not starts or starts[-1] == 0:
+                return []
+            complete, self.buffer = self.buffer[:starts[-1]], self.buffer[starts[-1]:]
+        
+        cases = self._parse(complete) if complete.strip() else []
+        self.cases.extend(cases)
+        return cases
+    
+    def _start(self, preamble: str):
+        """出现起始标记时调用，preamble为标记之前的内容"""
+    
+    def _parse(self, text: str) -> List[Dict[str, str]]:
+        """解析完整的测试用例块"""
+        return OutputParser.parse_test_case_output(text)
+
+class CompactCaseStreamParser(IncrementalCaseParser):
+    """紧凑输出格式的增量测试用例解析器
+    
+    紧凑格式每行一个测试用例，下一个包含制表符的行出现时前一行即已完整。
+    测试点的字段按测试点序号从test_points中取得，单次生成模式下为测试用例起始标记之前的输出。
+    """
+    
+    CASE_START_PATTERN = re.compile(r'^(?=[^\n]*\t)', re.MULTILINE)
+    
+    def __init__(self, test_points: str = "", start_marker: Optional[str] = None, abort_after_chars: int = 0):
+        super().__init__(start_marker, abort_after_chars)
+        self.points = OutputParser.point_fields(test_points)
+    
+    def _start(self, preamble: str):
+        """单次生成模式下从测试点部分取得测试点字段"""
+        self.points = OutputParser.point_fields(preamble.replace(OutputParser.TEST_POINT_MARKER, "", 1))
+    
+    def _parse(self, text: str) -> List[Dict[str, str]]:
+        """按紧凑格式解析完整的测试用例行"""
+        return OutputParser.COMPACT_PARSER.parse(text, self.points)
 
 class DataProcessor:
     """数据处理器"""
@@ -91,6 +401,67 @@ class DataProcessor:
         self.settings = settings
         self.output_parser = OutputParser()
         self.default_threads = settings.get_config_value("input_excel_processing.default_threads")
+        self.engine = settings.get_config_value("input_excel_processing.engine", "thread")
+        self.async_concurrency = settings.get_config_value("input_excel_processing.async_concurrency", 100)
+        self.submission_window = settings.get_config_value("input_excel_processing.submission_window", 0)
+        self.deduplicate_rows = settings.get_config_value("input_excel_processing.deduplicate_rows", False)
+        self.generation_mode = settings.get_config_value("generation.mode", "two_stage")
+        self.pack_config = settings.get_config_value("generation.pack_rows", {})
+        self.split_config = settings.get_config_value("generation.split_test_points", {})
+        self.streaming_config = settings.get_config_value("generation.streaming", {})
+        self.structured_config = settings.get_config_value("generation.structured_output", {})
+        self.compact_config = settings.get_config_value("generation.compact_output", {})
+        self.repair_config = settings.get_config_value("generation.repair", {})
+        self.continuation_config = settings.get_config_value("generation.continuation", {})
+        # 结构化输出的修复有单独的开关，未启用generation.repair时仍可修复未通过校验的输出
+        repair_enabled = self.repair_config.get('enabled', False) or self._structured_repair_enabled()
+        self.repair_budget = RepairBudget(self.repair_config.get('max_requests_per_job', 50) if repair_enabled else 0)
+        self.limiter = self._initialize_limiter()
+        self.output_budget = self._initialize_output_budget()
+        self.scheduler = self._initialize_scheduler()
+    
+    def _initialize_limiter(self):
+        """初始化自适应并发限制器，未启用时返回None"""
+        limiter_config = self.settings.get_config_value("input_excel_processing.adaptive_concurrency", {})
+        if not limiter_config.get('enabled', False):
+            return None
+        
+        limiter = AdaptiveLimiter(
+            initial_limit=limiter_config.get('initial_limit', self.default_threads),
+            min_limit=limiter_config.get('min_limit', 1),
+            max_limit=limiter_config.get('max_limit', 32),
+            increase_step=limiter_config.get('increase_step', 1),
+            decrease_factor=limiter_config.get('decrease_factor', 0.5),
+            latency_tolerance=limiter_config.get('latency_tolerance', 2.0),
+            max_error_rate=limiter_config.get('max_error_rate', 0.05),
+            window_size=limiter_config.get('window_size', 20),
+            cooldown_seconds=limiter_config.get('cooldown_seconds', 5)
+        )
+        snapshot = limiter.snapshot()
+        logger.info(f"已启用自适应并发: 初始上限 {snapshot['limit']}，范围 {snapshot['min_limit']}-{snapshot['max_limit']}")
+        return limiter
+    
+    def _initialize_output_budget(self):
+        """初始化输出长度预测器，未启用时返回None；未启用续写时不预测，避免预测偏小时输出被截断"""
+        budget_config = self.settings.get_config_value("generation.output_budget", {})
+        if not budget_config.get('enabled', False) or not self.continuation_config.get('enabled', False):
+            return None
+        
+        return OutputBudget(
+            max_tokens=self.settings.get_config_value("model.max_tokens") or 8192,
+            safety_margin=budget_config.get('safety_margin', 0.3),
+            min_samples=budget_config.get('min_samples', 3),
+            min_tokens=budget_config.get('min_tokens', 256)
+        )
+    
+    def _initialize_scheduler(self):
+        """初始化请求组调度器"""
+        schedule_config = self.settings.get_config_value("input_excel_processing.scheduling", {})
+        return RowScheduler(
+            policy=schedule_config.get('policy', 'sheet_order'),
+            history_path=schedule_config.get('history_path'),
+            history_size=schedule_config.get('history_size', 10000)
+        )
     
     def prepare_requirement_document(self, item: Dict[str, Any]) -> str:
         """准备需求文档内容"""
@@ -110,63 +481,317 @@ class DataProcessor:
             logger.error(f"构建需求文档失败: {e}")
             raise
     
-    def process_single_row(self, row_index: int, row_data: Dict[str, Any], sheet_name: str) -> List[Dict[str, Any]]:
+    def process_single_row(self, row_index: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
         """处理单行数据，生成测试点和测试用例，支持多个测试用例"""
         try:
-            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 开始处理")
-            
-            # 构建需求文档
-            requirement_document = self.prepare_requirement_document(row_data)
-            
-            if not requirement_document.strip():
-                logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 数据内容为空，跳过处理")
-                return []
-            
+            return self._run_steps(self._row_steps(row_index, row_data, sheet_name, on_case))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 处理数据失败: {e}")
+        
+        # 整行失败时在修复预算内重新生成一次
+        if self.repair_config.get('enabled', False) and self.repair_budget.acquire(self._calls_per_row()):
+            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 重新生成该行")
+            try:
+                return self._run_steps(self._row_steps(row_index, row_data, sheet_name, on_case))
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 重新生成失败: {e}")
+        
+        # 仍然失败时，返回一个空内容的测试用例
+        return [self._create_empty_case(row_index)]
+    
+    async def aprocess_single_row(self, row_index: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """异步处理单行数据"""
+        try:
+            return await self._arun_steps(self._row_steps(row_index, row_data, sheet_name, on_case))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 处理数据失败: {e}")
+        
+        if self.repair_config.get('enabled', False) and self.repair_budget.acquire(self._calls_per_row()):
+            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 重新生成该行")
+            try:
+                return await self._arun_steps(self._row_steps(row_index, row_data, sheet_name, on_case))
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 重新生成失败: {e}")
+        
+        return [self._create_empty_case(row_index)]
+    
+    def _row_steps(self, row_index: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None) -> Generator[str, str, List[Dict[str, Any]]]:
+        """单行处理流程
+        
+        每次yield一个提示词，由同步或异步引擎调用LLM后把响应send回来，
+        调用失败时异常被throw回生成器，两种引擎共用这一套流程。
+        yield提示词列表时，引擎并行调用并按顺序send回响应列表，失败的调用以异常对象占位；
+        yield StreamRequest时，引擎流式调用LLM并把该请求send回来。
+        """
+        logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 开始处理")
+        
+        # 构建需求文档
+        requirement_document = self.prepare_requirement_document(row_data)
+        
+        if not requirement_document.strip():
+            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 数据内容为空，跳过处理")
+            return []
+        
+        # 流式生成时完整的测试用例在解析出的同时即交给回调，其余（含修复后的）在行处理完成时补齐
+        emitted = set()
+        
+        def notify(case: Dict[str, str]):
+            emitted.add(id(case))
+            if on_case:
+                on_case({"原始行号": row_index, **case})
+        
+        def emit(case: Dict[str, str]):
+            if not self._missing_fields(case):
+                notify(case)
+        
+        if self.generation_mode == "fused":
+            # 单次请求同时生成测试点和测试用例
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 开始生成测试点和测试用例")
+            parsed_results = yield from self._generate_fused(requirement_document, row_index, sheet_name, emit)
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试点和测试用例完成")
+        elif self.split_config.get('enabled', False) and self.streaming_config.get('enabled', False):
+            # 流式生成测试点，每条测试点一完整即开始生成它的测试用例
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 开始流式生成测试点和测试用例")
+            parsed_results = yield from self._generate_streamed_points(requirement_document, row_index, sheet_name, emit)
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试用例完成")
+        else:
             # 生成测试点
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 开始生成测试点")
-            test_points = self._generate_test_points(requirement_document, row_index, sheet_name)
+            test_points = yield from self._generate_test_points(requirement_document, row_index, sheet_name)
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试点完成")
             
-            # 生成测试用例
+            # 生成测试用例，启用拆分时按测试点并行生成
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 开始生成测试用例")
-            test_case_outline = self._generate_test_cases(requirement_document, test_points, row_index, sheet_name)
+            if self.split_config.get('enabled', False):
+                parsed_results = yield from self._generate_test_cases_per_point(requirement_document, test_points, row_index, sheet_name, emit)
+            else:
+                parsed_results = yield from self._generate_test_cases(requirement_document, test_points, row_index, sheet_name, emit)
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试用例完成")
+        
+        # 过滤掉空结果，补全不完整的测试用例，未经流式回调的测试用例在此补齐
+        valid_results = [result for result in parsed_results if any(result.values())]
+        valid_results = yield from self._repair_incomplete(valid_results, f"[表格 {sheet_name}] [行 #{row_index}]")
+        for result in valid_results:
+            if id(result) not in emitted:
+                notify(result)
+        
+        if valid_results:
+            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 处理完成，生成 {len(valid_results)} 个测试用例")
+        else:
+            logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 未生成有效测试用例")
+        
+        # 为每个测试用例添加原始行号
+        results = []
+        for parsed_result in valid_results:
+            results.append({
+                "原始行号": row_index,
+                **parsed_result
+            })
+        
+        return results
+    
+    def _run_steps(self, steps):
+        """同步驱动处理流程"""
+        response, error = None, None
+        while True:
+            try:
+                prompt = steps.throw(error) if error else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
             
-            # 解析测试用例输出，可能包含多个测试用例
-            parsed_results = self.output_parser.parse_test_case_output(test_case_outline)
+            try:
+                if isinstance(prompt, StreamRequest):
+                    response, error = self._stream(prompt), None
+                elif isinstance(prompt, list):
+                    response, error = self._invoke_all(prompt), None
+                else:
+                    response, error = self._invoke(prompt), None
+            except Exception as e:
+                response, error = None, e
+    
+    async def _arun_steps(self, steps):
+        """异步驱动处理流程"""
+        response, error = None, None
+        while True:
+            try:
+                prompt = steps.throw(error) if error else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
             
-            # 过滤掉空结果
-            valid_results = [result for result in parsed_results if any(result.values())]
+            try:
+                if isinstance(prompt, StreamRequest):
+                    response, error = await self._astream(prompt), None
+                elif isinstance(prompt, list):
+                    response, error = await self._ainvoke_all(prompt), None
+                else:
+                    response, error = await self._ainvoke(prompt), None
+            except Exception as e:
+                response, error = None, e
+    
+    def _continuation_limit(self, prompt: str) -> int:
+        """输出被截断时最多续写的次数，结构化输出不续写，不完整的部分由修复流程补全"""
+        if isinstance(prompt, StructuredPrompt) or not self.continuation_config.get('enabled', False):
+            return 0
+        
+        return self.continuation_config.get('max_continuations', 2)
+    
+    def _invoke(self, prompt: str) -> str:
+        """调用LLM，输出因max_tokens被截断时从最后一个完整的测试用例处续写并拼接"""
+        max_tokens = self.output_budget.predict(prompt) if self.output_budget else None
+        response = self.llm_client.invoke_llm(prompt, limiter=self.limiter, max_tokens=max_tokens)
+        output_tokens = self._output_tokens(response)
+        for attempt in range(self._continuation_limit(prompt)):
+            if not getattr(response, 'truncated', False):
+                break
+            kept = self.output_parser.complete_prefix(response)
+            logger.warning(f"LLM输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+            continuation = self.llm_client.invoke_llm(self.output_parser.format_continuation_prompt(prompt, kept), limiter=self.limiter)
+            output_tokens += self._output_tokens(continuation)
+            response = self._stitch(kept, continuation)
+        
+        if self.output_budget:
+            self.output_budget.observe(prompt, output_tokens)
+        return response
+    
+    async def _ainvoke(self, prompt: str) -> str:
+        """异步调用LLM，输出因max_tokens被截断时从最后一个完整的测试用例处续写并拼接"""
+        max_tokens = self.output_budget.predict(prompt) if self.output_budget else None
+        response = await self.llm_client.ainvoke_llm(prompt, limiter=self.limiter, max_tokens=max_tokens)
+        output_tokens = self._output_tokens(response)
+        for attempt in range(self._continuation_limit(prompt)):
+            if not getattr(response, 'truncated', False):
+                break
+            kept = self.output_parser.complete_prefix(response)
+            logger.warning(f"LLM输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+            continuation = await self.llm_client.ainvoke_llm(self.output_parser.format_continuation_prompt(prompt, kept), limiter=self.limiter)
+            output_tokens += self._output_tokens(continuation)
+            response = self._stitch(kept, continuation)
+        
+        if self.output_budget:
+            self.output_budget.observe(prompt, output_tokens)
+        return response
+    
+    @staticmethod
+    def _output_tokens(response: str, text: Optional[str] = None) -> int:
+        """响应的输出token数，响应未携带用量时按文本估算"""
+        usage = getattr(response, 'usage', None) or {}
+        return usage.get('output_tokens') or estimate_tokens(response if text is None else text)
+    
+    @staticmethod
+    def _stitch(kept: str, continuation: str) -> LLMResponse:
+        """拼接已输出的完整部分和续写的输出，结束原因和用量取自续写的响应"""
+        text = f"{kept}\n{continuation}" if kept else continuation
+        return LLMResponse(text, getattr(continuation, 'finish_reason', None), getattr(continuation, 'usage', None))
+    
+    def _invoke_all(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """并行调用LLM，按提示词顺序返回响应，失败的调用返回异常对象"""
+        max_workers = max(1, min(len(prompts), self.split_config.get('max_parallel', 8)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._invoke, prompt) for prompt in prompts]
+            return [future.exception() or future.result() for future in futures]
+    
+    async def _ainvoke_all(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """并发调用LLM，按提示词顺序返回响应，失败的调用返回异常对象"""
+        semaphore = asyncio.Semaphore(max(1, self.split_config.get('max_parallel', 8)))
+        
+        async def invoke(prompt: str) -> str:
+            async with semaphore:
+                return await self._ainvoke(prompt)
+        
+        return await asyncio.gather(*(invoke(prompt) for prompt in prompts), return_exceptions=True)
+    
+    def _stream(self, request: StreamRequest) -> StreamRequest:
+        """流式调用LLM，逐块交给请求处理，请求登记的追加提示词立即并行发出，输出被截断时丢弃不完整的部分后续写"""
+        with ThreadPoolExecutor(max_workers=max(1, self.split_config.get('max_parallel', 8))) as executor:
+            futures, last = [], None
+            max_tokens = self.output_budget.predict(request.prompt) if self.output_budget else None
+            stream = self.llm_client.stream_llm(request.prompt, limiter=self.limiter, max_tokens=max_tokens)
+            try:
+                for last in stream:
+                    if not request.feed(last):
+                        last = None
+                        break
+                    futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
+            finally:
+                stream.close()
             
-            if valid_results:
-                logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 处理完成，生成 {len(valid_results)} 个测试用例")
-            else:
-                logger.info(f"[表格 {sheet_name}] [行 #{row_index}] 未生成有效测试用例")
+            output_tokens = self._output_tokens(last, request.text)
+            for attempt in range(self._continuation_limit(request.prompt)):
+                if not getattr(last, 'truncated', False):
+                    break
+                kept = request.discard_partial()
+                logger.warning(f"LLM流式输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+                last = self.llm_client.invoke_llm(self.output_parser.format_continuation_prompt(request.prompt, kept), limiter=self.limiter)
+                output_tokens += self._output_tokens(last)
+                if not request.feed(f"\n{last}"):
+                    break
+                futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
             
-            # 为每个测试用例添加原始行号
-            results = []
-            for parsed_result in valid_results:
-                results.append({
-                    "原始行号": row_index,
-                    **parsed_result
-                })
+            if self.output_budget and not request.aborted:
+                self.output_budget.observe(request.prompt, output_tokens)
+            request.finish()
+            futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
+            request.responses = [future.exception() or future.result() for future in futures]
+        
+        return request
+    
+    async def _astream(self, request: StreamRequest) -> StreamRequest:
+        """异步流式调用LLM，逐块交给请求处理，请求登记的追加提示词立即并发发出，输出被截断时丢弃不完整的部分后续写"""
+        semaphore = asyncio.Semaphore(max(1, self.split_config.get('max_parallel', 8)))
+        
+        async def invoke(prompt: str) -> str:
+            async with semaphore:
+                return await self._ainvoke(prompt)
+        
+        tasks, last = [], None
+        max_tokens = self.output_budget.predict(request.prompt) if self.output_budget else None
+        stream = self.llm_client.astream_llm(request.prompt, limiter=self.limiter, max_tokens=max_tokens)
+        try:
+            async for last in stream:
+                if not request.feed(last):
+                    last = None
+                    break
+                tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
             
-            return results
+            output_tokens = self._output_tokens(last, request.text)
+            for attempt in range(self._continuation_limit(request.prompt)):
+                if not getattr(last, 'truncated', False):
+                    break
+                kept = request.discard_partial()
+                logger.warning(f"LLM流式输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+                last = await self.llm_client.ainvoke_llm(self.output_parser.format_continuation_prompt(request.prompt, kept), limiter=self.limiter)
+                output_tokens += self._output_tokens(last)
+                if not request.feed(f"\n{last}"):
+                    break
+                tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
             
-        except Exception as e:
-            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 处理数据失败: {e}")
-            # 响应错误时，返回一个空内容的测试用例
-            return [{
-                "原始行号": row_index,
-                "需求名称": "",
-                "测试点编号": "",
-                "测试点": "",
-                "前置条件": "",
-                "测试步骤": "",
-                "预期结果": ""
-            }]
-    
-    def _generate_test_points(self, requirement_document: str, row_index: int, sheet_name: str) -> str:
+            if self.output_budget and not request.aborted:
+                self.output_budget.observe(request.prompt, output_tokens)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            await stream.aclose()
+        
+        request.finish()
+        tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
+        request.responses = list(await asyncio.gather(*tasks, return_exceptions=True))
+        return request
+    
+    def _create_empty_case(self, row_index: int) -> Dict[str, Any]:
+        """创建空内容的测试用例"""
+        return {
+            "原始行号": row_index,
+            "需求名称": "",
+            "测试点编号": "",
+            "测试点": "",
+            "前置条件": "",
+            "测试步骤": "",
+            "预期结果": ""
+        }
+    
+    def _generate_test_points(self, requirement_document: str, row_index: int, sheet_name: str) -> Generator[str, str, str]:
         """生成测试点"""
         try:
             test_point_prompt = self.prompt_manager.get_prompt(
@@ -175,7 +800,7 @@ class DataProcessor:
             )
             
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试点提示词: {test_point_prompt}")
-            response = self.llm_client.invoke_llm(test_point_prompt)
+            response = yield StagedPrompt(test_point_prompt, "test_point")
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试点AI输出: {response}")
             return response
             
@@ -184,64 +809,626 @@ class DataProcessor:
             # 响应错误时返回空字符串
             return ""
     
-    def _generate_test_cases(self, requirement_document: str, test_points: str, row_index: int, sheet_name: str) -> str:
-        """生成测试用例"""
+    def _generate_test_cases(self, requirement_document: str, test_points: str, row_index: int, sheet_name: str, emit: Optional[Callable] = None) -> Generator[str, str, List[Dict[str, str]]]:
+        """生成测试用例，返回解析后的测试用例"""
+        request = None
         try:
-            test_case_prompt = self.prompt_manager.get_prompt(
-                "test_case",
-                {
-                    "requirement_document": requirement_document,
-                    "test_points_document": test_points
-                }
-            )
+            test_case_prompt = self._case_prompt(requirement_document, test_points)
             
             logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试用例提示词: {test_case_prompt}")
-            response = self.llm_client.invoke_llm(test_case_prompt)
-            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试用例AI输出: {response}")
-            return response
+            points = len(self.output_parser.split_test_points(test_points)[1])
+            request = self._case_request(StagedPrompt(test_case_prompt, "test_case", points), emit, test_points=test_points)
+            response = yield request
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试用例AI输出: {self._response_text(request, response)}")
+            return (yield from self._case_results(request, response, row_index, sheet_name, test_points))
             
         except Exception as e:
             logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试用例失败: {e}")
-            # 响应错误时返回空字符串
-            return ""
+            # 响应错误时保留流式生成中已完整解析的测试用例
+            return self._streamed_cases(request)
     
-    def process_batch_data(self, items: List[Dict[str, Any]], sheet_name: str) -> List[Dict[str, Any]]:
-        """批量处理数据，支持一个测试点生成多个测试用例"""
-        start_time = time.time()
-        all_results = []
+    def _generate_test_cases_per_point(self, requirement_document: str, test_points: str, row_index: int, sheet_name: str, emit: Optional[Callable] = None) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """按测试点拆分测试点文档，为每个测试点并行生成测试用例并按原顺序合并"""
+        header, points = self.output_parser.split_test_points(test_points)
+        if len(points) < 2:
+            return (yield from self._generate_test_cases(requirement_document, test_points, row_index, sheet_name, emit))
         
-        logger.info(f"[表格 {sheet_name}] 开始批量处理 {len(items)} 条数据，使用 {self.default_threads} 个工作线程")
+        try:
+            test_case_prompts = [self._point_prompt(requirement_document, header, point) for point in points]
+            
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 按 {len(points)} 个测试点并行生成测试用例")
+            responses = yield test_case_prompts
         
-        with ThreadPoolExecutor(max_workers=self.default_threads) as executor:
-            # 提交任务 - 并行处理每一行数据
-            future_to_item = {
-                executor.submit(self.process_single_row, idx + 1, item, sheet_name): (item, idx + 1)
-                for idx, item in enumerate(items)
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试用例失败: {e}")
+            # 响应错误时返回空列表
+            return []
+        
+        return (yield from self._merge_point_results(header, points, responses, row_index, sheet_name))
+    
+    def _generate_streamed_points(self, requirement_document: str, row_index: int, sheet_name: str, emit: Optional[Callable] = None) -> Generator[PointStreamRequest, PointStreamRequest, List[Dict[str, str]]]:
+        """流式生成测试点，每条测试点所在的表格行一完整即并行生成它的测试用例"""
+        try:
+            test_point_prompt = self.prompt_manager.get_prompt(
+                "test_point",
+                {"requirement_document": requirement_document}
+            )
+            
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试点提示词: {test_point_prompt}")
+            request = yield PointStreamRequest(
+                StagedPrompt(test_point_prompt, "test_point"),
+                self.output_parser.is_test_point_line,
+                lambda header, point: self._point_prompt(requirement_document, header, point)
+            )
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试点AI输出: {request.text}")
+        
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试点失败: {e}")
+            request = None
+        
+        # 没有识别出测试点表格时按整个测试点文档生成测试用例
+        if request is None or not request.points:
+            test_points = request.text.strip() if request else ""
+            return (yield from self._generate_test_cases(requirement_document, test_points, row_index, sheet_name, emit))
+        
+        logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 已按 {len(request.points)} 个测试点并行生成测试用例")
+        return (yield from self._merge_point_results(request.header, request.points, request.responses, row_index, sheet_name))
+    
+    def _point_prompt(self, requirement_document: str, header: str, point: str) -> str:
+        """生成单个测试点的测试用例提示词"""
+        test_case_prompt = self._case_prompt(requirement_document, f"{header}\n{point}")
+        if self.structured_config.get('enabled', False):
+            return self._structured_prompt(test_case_prompt)
+        return StagedPrompt(test_case_prompt, "test_case", 1)
+    
+    def _merge_point_results(self, header: str, points: List[str], responses: List[Union[str, Exception]], row_index: int, sheet_name: str) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """按测试点顺序合并各测试点的测试用例，跳过生成失败的测试点"""
+        outputs = []
+        for point, response in zip(points, responses):
+            if isinstance(response, Exception):
+                logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 测试点 {point} 生成测试用例失败: {response}")
+            elif response:
+                logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 测试点 {point} 测试用例AI输出: {response}")
+                outputs.append((point, response))
+        
+        if self.structured_config.get('enabled', False):
+            return (yield from self._structured_results([response for _, response in outputs], row_index, sheet_name))
+        if self._compact():
+            return [case for point, response in outputs for case in self._parse_cases(response, f"{header}\n{point}")]
+        return self.output_parser.parse_test_case_output("\n\n".join(response for _, response in outputs))
+    
+    def _generate_fused(self, requirement_document: str, row_index: int, sheet_name: str, emit: Optional[Callable] = None) -> Generator[str, str, List[Dict[str, str]]]:
+        """在一次请求中生成测试点和测试用例，返回解析后的测试用例"""
+        request = None
+        try:
+            fused_prompt = self._compact_prompt(self.prompt_manager.get_prompt(
+                "fused",
+                {"requirement_document": requirement_document}
+            ), fused=True)
+            
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 单次生成提示词: {fused_prompt}")
+            request = self._case_request(StagedPrompt(fused_prompt, "fused"), emit, fused=True)
+            response = self._response_text(request, (yield request))
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 单次生成AI输出: {response}")
+            if isinstance(request, StructuredPrompt):
+                return (yield from self._case_results(request, response, row_index, sheet_name))
+            
+            test_points, test_cases = self.output_parser.split_fused_output(response)
+            if not test_points:
+                logger.warning(f"[表格 {sheet_name}] [行 #{row_index}] 输出中未找到测试点部分，按测试用例解析全部输出")
+            return (yield from self._case_results(request, test_cases, row_index, sheet_name, test_points))
+        
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 生成测试点和测试用例失败: {e}")
+            # 响应错误时保留流式生成中已完整解析的测试用例
+            return self._streamed_cases(request)
+    
+    def _case_request(self, prompt: str, emit: Optional[Callable], fused: bool = False, test_points: str = "") -> Union[str, StructuredPrompt, CaseStreamRequest]:
+        """启用结构化输出时包装为结构化提示词，否则启用流式生成时包装为流式请求，测试用例块一完整即交给emit
+        
+        紧凑输出格式的流式请求按test_points中的测试点取得测试点字段，单次生成模式下从输出中取得。
+        """
+        if self.structured_config.get('enabled', False):
+            return self._structured_prompt(prompt, with_test_points=fused)
+        if not self.streaming_config.get('enabled', False):
+            return prompt
+        
+        start_marker = self.output_parser.TEST_CASE_MARKER if fused else None
+        abort_after_chars = self.streaming_config.get('abort_after_chars', 3000)
+        if self._compact():
+            parser = CompactCaseStreamParser(test_points, start_marker, abort_after_chars)
+        else:
+            parser = IncrementalCaseParser(start_marker, abort_after_chars)
+        return CaseStreamRequest(prompt, parser, emit)
+    
+    def _compact(self) -> bool:
+        """是否使用紧凑输出格式，启用结构化输出时以结构化输出为准"""
+        return self.compact_config.get('enabled', False) and not self.structured_config.get('enabled', False)
+    
+    def _compact_prompt(self, prompt: ChatPrompt, fused: bool = False) -> ChatPrompt:
+        """启用紧凑输出时在系统消息末尾追加紧凑格式说明，说明不含变量，不影响提示词前缀缓存"""
+        if not self._compact():
+            return prompt
+        return prompt.extend_system(self.output_parser.format_compact_instruction(fused))
+    
+    def _case_input(self, test_points: str) -> str:
+        """注入测试用例提示词的测试点文档，启用紧凑输出时压缩为紧凑格式"""
+        return self.output_parser.compact_test_points(test_points) if self._compact() else test_points
+    
+    def _case_prompt(self, requirement_document: str, test_points: str) -> ChatPrompt:
+        """生成测试用例提示词"""
+        test_case_prompt = self.prompt_manager.get_prompt(
+            "test_case",
+            {
+                "requirement_document": requirement_document,
+                "test_points_document": self._case_input(test_points)
             }
+        )
+        return self._compact_prompt(test_case_prompt)
+    
+    def _parse_cases(self, ai_output: str, test_points: str) -> List[Dict[str, str]]:
+        """按输出格式解析测试用例，紧凑格式的测试点字段按测试点序号取自test_points"""
+        if self._compact():
+            return self.output_parser.parse_compact_output(ai_output, test_points)
+        return self.output_parser.parse_test_case_output(ai_output)
+    
+    def _structured_prompt(self, prompt: str, with_test_points: bool = False) -> StructuredPrompt:
+        """在提示词末尾追加结构化输出说明，并要求模型按测试用例的JSON Schema输出"""
+        return StructuredPrompt(
+            prompt + self.output_parser.format_structured_instruction(with_test_points),
+            self.output_parser.case_schema(with_test_points),
+            method=self.structured_config.get('method', 'json_schema')
+        )
+    
+    def _response_text(self, request: Union[str, CaseStreamRequest], response: Union[str, CaseStreamRequest]) -> str:
+        """取出响应文本，流式请求send回来的是请求本身"""
+        return request.text if isinstance(request, CaseStreamRequest) else response
+    
+    def _case_results(self, request: Union[str, StructuredPrompt, CaseStreamRequest], response: Union[str, CaseStreamRequest], row_index: int, sheet_name: str, test_points: str = "") -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """取出请求生成的测试用例，结构化输出经校验和修复，流式请求直接使用增量解析的结果"""
+        if isinstance(request, StructuredPrompt):
+            return (yield from self._structured_results([response], row_index, sheet_name))
+        if not isinstance(request, CaseStreamRequest):
+            return self._parse_cases(response, test_points)
+        
+        if request.aborted:
+            logger.warning(
+                f"[表格 {sheet_name}] [行 #{row_index}] 输出 {len(request.text)} 个字符后仍未出现测试用例，"
+                f"判定格式异常并已提前中止生成"
+            )
+        return request.cases
+    
+    def _structured_results(self, responses: List[str], row_index: int, sheet_name: str) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """解析结构化输出，未通过校验的内容不整行重新生成，而是并行发出定向修复请求，修复后仍不通过的丢弃"""
+        results, repairs = [], []
+        for response in responses:
+            cases, invalid = self.output_parser.parse_structured_cases(response)
+            results.extend(cases)
+            if invalid:
+                repairs.append(invalid)
+        
+        if not repairs:
+            return results
+        
+        invalid_count = sum(len(invalid) for invalid in repairs)
+        if not self._structured_repair_enabled():
+            logger.warning(f"[表格 {sheet_name}] [行 #{row_index}] {invalid_count} 处输出未通过校验，未启用结构化输出修复，已丢弃")
+            return results
+        
+        granted = [invalid for invalid in repairs if self.repair_budget.acquire()]
+        logger.warning(f"[表格 {sheet_name}] [行 #{row_index}] {invalid_count} 处输出未通过校验，发出 {len(granted)} 个修复请求")
+        if len(granted) < len(repairs):
+            logger.warning(f"[表格 {sheet_name}] [行 #{row_index}] 修复预算已用完，{len(repairs) - len(granted)} 个修复请求未发出")
+        
+        repairs = granted
+        if not repairs:
+            return results
+        
+        repair_prompts = [self._structured_prompt(self.output_parser.format_repair_prompt(invalid)) for invalid in repairs]
+        logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 修复提示词: {repair_prompts}")
+        repaired = yield repair_prompts
+        
+        for invalid, response in zip(repairs, repaired):
+            if isinstance(response, Exception):
+                logger.error(f"[表格 {sheet_name}] [行 #{row_index}] 修复请求失败: {response}")
+                continue
+            
+            logger.debug(f"[表格 {sheet_name}] [行 #{row_index}] 修复AI输出: {response}")
+            cases, still_invalid = self.output_parser.parse_structured_cases(response)
+            results.extend(cases)
+            for _, problems in still_invalid:
+                logger.warning(f"[表格 {sheet_name}] [行 #{row_index}] 修复后仍未通过校验，已丢弃: {'；'.join(problems)}")
+        
+        return results
+    
+    def _structured_repair_enabled(self) -> bool:
+        """是否为未通过校验的结构化输出发出修复请求"""
+        return self.structured_config.get('enabled', False) and self.structured_config.get('repair', True)
+    
+    def _missing_fields(self, case: Dict[str, str]) -> List[str]:
+        """测试用例中为空的必填字段，未启用修复时不做校验"""
+        if not self.repair_config.get('enabled', False):
+            return []
+        
+        required = self.repair_config.get('required_fields', ["测试步骤", "预期结果"])
+        return [name for name in required if not case.get(name)]
+    
+    def _repair_incomplete(self, cases: List[Dict[str, Any]], label: str) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, Any]]]:
+        """校验测试用例是否完整，缺少必填字段的在修复预算内并行发出只含已有字段和缺失字段名的修复请求，比整行重新生成便宜得多"""
+        incomplete = [(index, self._missing_fields(case)) for index, case in enumerate(cases)]
+        incomplete = [(index, missing) for index, missing in incomplete if missing]
+        if not incomplete:
+            return cases
+        
+        granted = [(index, missing) for index, missing in incomplete if self.repair_budget.acquire()]
+        logger.warning(f"{label} {len(incomplete)} 个测试用例不完整，发出 {len(granted)} 个修复请求")
+        if len(granted) < len(incomplete):
+            logger.warning(f"{label} 修复预算已用完，{len(incomplete) - len(granted)} 个测试用例保持原样")
+        if not granted:
+            return cases
+        
+        repair_prompts = [self.output_parser.format_field_repair_prompt(cases[index], missing) for index, missing in granted]
+        logger.debug(f"{label} 补全提示词: {repair_prompts}")
+        responses = yield repair_prompts
+        
+        results, repaired = list(cases), 0
+        for (index, missing), response in zip(granted, responses):
+            if isinstance(response, Exception):
+                logger.error(f"{label} 修复请求失败: {response}")
+                continue
             
-            # 收集结果
-            for future in as_completed(future_to_item):
+            logger.debug(f"{label} 补全AI输出: {response}")
+            fields = self.output_parser.parse_repaired_fields(response, missing)
+            results[index] = {**cases[index], **fields}
+            if len(fields) == len(missing):
+                repaired += 1
+            else:
+                logger.warning(f"{label} 修复后仍缺少字段: {'、'.join(name for name in missing if name not in fields)}")
+        
+        logger.info(f"{label} 修复了 {repaired}/{len(granted)} 个不完整的测试用例")
+        return results
+    
+    def _streamed_cases(self, request) -> List[Dict[str, str]]:
+        """流式请求中途失败时保留已完整解析的测试用例"""
+        return request.cases if isinstance(request, CaseStreamRequest) else []
+    
+    def process_batch_data(self, items: List[Dict[str, Any]], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """批量处理数据，支持一个测试点生成多个测试用例
+        
+        on_case在每产出一个测试用例时回调，参数为带原始行号的测试用例；
+        启用流式生成时测试用例块一完整即回调，否则在所在行处理完成时回调。
+        """
+        return self.process_sheets_data({sheet_name: items}, on_case=on_case)[sheet_name]
+    
+    def process_sheets_data(self, data_dict: Dict[str, List[Dict[str, Any]]], on_case: Optional[Callable] = None, on_sheet: Optional[Callable] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """将所有表格的行提交到同一个工作池批量处理，返回与data_dict顺序相同的表名到测试用例列表的映射
+        
+        各表格的请求组统一调度，一个表格末尾耗时长的行不会阻塞其余表格，总耗时接近总工作量除以并发数而不是各表格耗时之和；
+        去重、结果组装和排序仍按表格进行，一个表格的所有行完成时以表名和排序后的测试用例回调on_sheet。
+        调度策略为sheet_order时请求组边打包边提交，同时存在的请求组不超过提交窗口；longest_first需要先打包所有请求组才能排序。
+        keep_results为True时各表格的测试用例都保存在返回的映射中，内存占用随输出的测试用例数增长；
+        由on_sheet写出结果时传入False，一个表格完成后即释放其测试用例，返回的映射为空。
+        """
+        start_time = time.time()
+        collector = SheetCollector(on_case, on_sheet, start_time, keep_results)
+        for sheet_name in data_dict:
+            collector.open(sheet_name)
+        
+        rows = ((sheet_name, item) for sheet_name, items in data_dict.items() for item in items)
+        # 按调度策略安排提交顺序，结果仍按原始行号排序
+        tasks, estimate = self._schedule_units(self._iter_tasks(rows, collector))
+        for sheet_name in [name for name, items in data_dict.items() if not items]:
+            collector.close(sheet_name)
+        
+        row_count = sum(len(items) for items in data_dict.values())
+        if self.engine == "async":
+            logger.info(f"开始批量处理 {len(data_dict)} 个表格的 {row_count} 条数据，使用异步引擎，并发上限 {self._get_window_size()}")
+        else:
+            logger.info(f"开始批量处理 {len(data_dict)} 个表格的 {row_count} 条数据，使用 {self._get_worker_count()} 个工作线程，提交窗口 {self._get_window_size()}")
+        self._run_tasks(tasks, collector.add_results)
+        
+        elapsed_time = time.time() - start_time
+        if estimate.seconds is None:
+            logger.info(f"调度策略 {self.scheduler.policy}: 尚无耗时记录，未预计耗时，实际耗时: {elapsed_time:.2f}秒")
+        else:
+            logger.info(f"调度策略 {self.scheduler.policy}: 预计耗时: {estimate.seconds:.2f}秒，实际耗时: {elapsed_time:.2f}秒")
+        self._finish_run()
+        
+        return collector.results
+    
+    def process_rows_data(self, rows: Iterable[Tuple[str, Dict[str, Any]]], on_case: Optional[Callable] = None, on_sheet: Optional[Callable] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """边读取边处理按表格依次产出的(表名, 数据记录)，如ExcelDataLoader.iter_data，返回按表格出现顺序的表名到测试用例列表的映射
+        
+        读到的行去重、打包后立即提交，第一个请求不必等待整个工作簿读取完毕；提交窗口已满时暂停读取，读入内存的行数与表格大小无关。
+        请求组按读取顺序提交，不按调度策略排序；其余参数与process_sheets_data相同。
+        """
+        start_time = time.time()
+        collector = SheetCollector(on_case, on_sheet, start_time, keep_results)
+        if self.engine == "async":
+            logger.info(f"开始边读取边处理数据，使用异步引擎，并发上限 {self._get_window_size()}")
+        else:
+            logger.info(f"开始边读取边处理数据，使用 {self._get_worker_count()} 个工作线程，提交窗口 {self._get_window_size()}")
+        self._run_tasks(self._iter_tasks(rows, collector), collector.add_results)
+        
+        logger.info(f"共处理 {len(collector.case_counts)} 个表格，耗时: {time.time() - start_time:.2f}秒")
+        self._finish_run()
+        
+        return collector.results
+    
+    def _run_tasks(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable):
+        """按配置的引擎处理请求组"""
+        if self.engine == "async":
+            run_coroutine(self._process_batch_async(tasks, on_result))
+        else:
+            self._process_batch_threaded(tasks, on_result)
+    
+    def _finish_run(self):
+        """保存本次运行观测到的耗时并记录并发上限"""
+        self.scheduler.save()
+        if self.limiter:
+            logger.info(f"当前LLM并发上限: {self.limiter.limit}")
+    
+    def _iter_tasks(self, rows: Iterable[Tuple[str, Dict[str, Any]]], collector: SheetCollector) -> Iterator[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]]:
+        """按表格对行编号、去重和打包，产出(表名, 请求组, 测试用例回调)并登记到collector，一个表格的行取完后关闭该表格"""
+        for sheet_name, items in groupby(rows, key=itemgetter(0)):
+            on_case = collector.open(sheet_name)
+            sheet_rows = ((idx, item) for idx, (_, item) in enumerate(items, 1))
+            if self.deduplicate_rows:
+                sheet_rows = self._skip_duplicate_rows(sheet_rows, sheet_name, collector)
+            
+            # 按token预算将多行打包为一个请求
+            for unit in self._pack_rows(sheet_rows, sheet_name):
+                collector.add_unit(sheet_name)
+                yield sheet_name, unit, on_case
+            collector.close(sheet_name)
+    
+    def _skip_duplicate_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], sheet_name: str, collector: SheetCollector) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """按需求文档内容对行分组，只产出每组的第一行和需求文档为空的行，其余行作为重复行登记到collector"""
+        representatives = {}
+        groups = set()
+        merged_rows = 0
+        
+        for row_index, item in rows:
+            requirement_document = self.prepare_requirement_document(item).strip()
+            if not requirement_document:
+                yield row_index, item
+            elif requirement_document in representatives:
+                collector.add_duplicate(sheet_name, representatives[requirement_document], row_index)
+                groups.add(representatives[requirement_document])
+                merged_rows += 1
+            else:
+                representatives[requirement_document] = row_index
+                yield row_index, item
+        
+        if merged_rows:
+            logger.info(
+                f"[表格 {sheet_name}] 行去重: {merged_rows} 行与其他行内容相同，合并为 {len(groups)} 组，"
+                f"节省约 {merged_rows * self._calls_per_row()} 次LLM调用"
+            )
+    
+    def _calls_per_row(self) -> int:
+        """每行数据需要的LLM调用次数"""
+        return 1 if self.generation_mode == "fused" else 2
+    
+    def _get_worker_count(self) -> int:
+        """获取线程池大小，启用自适应并发时按上限的最大值创建，实际并发由限制器控制"""
+        if self.limiter:
+            return self.limiter.snapshot()["max_limit"]
+        return self.default_threads
+    
+    def _get_window_size(self) -> int:
+        """获取同时在执行或排队的请求组数上限，未配置时线程池引擎为线程数的两倍，异步引擎为并发上限"""
+        if self.engine == "async":
+            return max(1, min(self.submission_window or self.async_concurrency, self.async_concurrency))
+        return max(1, self.submission_window or 2 * self._get_worker_count())
+    
+    def _pack_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], sheet_name: str) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        """按输入token预算和max_tokens可容纳的行数将行依次打包为请求组产出，未启用打包时每行单独成组"""
+        if not self.pack_config.get('enabled', False):
+            for row in rows:
+                yield [row]
+            return
+        
+        max_tokens = self.settings.get_config_value("model.max_tokens") or 8192
+        output_tokens_per_row = self.pack_config.get('output_tokens_per_row', 1024)
+        row_limit = max(1, min(self.pack_config.get('max_rows', 8), max_tokens // output_tokens_per_row))
+        max_input_tokens = self.pack_config.get('max_input_tokens', 4000)
+        
+        current, current_tokens = [], 0
+        packed_units = packed_rows = 0
+        for row_index, item in rows:
+            requirement_document = self.prepare_requirement_document(item)
+            if not requirement_document.strip():
+                yield [(row_index, item)]
+                continue
+            
+            tokens = estimate_tokens(requirement_document)
+            if current and (len(current) >= row_limit or current_tokens + tokens > max_input_tokens):
+                if len(current) > 1:
+                    packed_units, packed_rows = packed_units + 1, packed_rows + len(current)
+                yield current
+                current, current_tokens = [], 0
+            current.append((row_index, item))
+            current_tokens += tokens
+        if len(current) > 1:
+            packed_units, packed_rows = packed_units + 1, packed_rows + len(current)
+        if current:
+            yield current
+        
+        if packed_units:
+            logger.info(
+                f"[表格 {sheet_name}] 多行打包: {packed_rows} 行打包为 "
+                f"{packed_units} 个请求组（每组最多 {row_limit} 行）"
+            )
+    
+    def _schedule_units(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]]) -> Tuple[Iterator[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], MakespanEstimate]:
+        """按调度策略安排(表名, 请求组, 测试用例回调)的提交顺序，返回按提交顺序产出的任务和预计总耗时；sheet_order边打包边提交，任务全部产出后预计总耗时才完整"""
+        if self.engine == "async":
+            workers = min(self._get_window_size(), self.limiter.limit) if self.limiter else self._get_window_size()
+        else:
+            workers = self.limiter.limit if self.limiter else self.default_threads
+        estimate = MakespanEstimate(workers)
+        return self.scheduler.schedule(((task, *self._unit_cost(task[1])) for task in tasks), estimate), estimate
+    
+    def _unit_cost(self, unit: List[Tuple[int, Dict[str, Any]]]) -> Tuple[str, int]:
+        """请求组的输入摘要和输入估算token数，摘要用于查找同一输入之前的耗时"""
+        documents = [self.prepare_requirement_document(item) for _, item in unit]
+        key = hashlib.sha256("\x00".join([self.generation_mode, *documents]).encode('utf-8')).hexdigest()
+        return key, sum(estimate_tokens(document) for document in documents)
+    
+    def _observe_unit(self, unit: List[Tuple[int, Dict[str, Any]]], elapsed: float, waited: float) -> None:
+        """记录请求组扣除等待并发名额时间后的耗时，避免排队时间计入该组的耗时"""
+        self.scheduler.observe(*self._unit_cost(unit), max(0.0, elapsed - waited))
+    
+    def _timed_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """处理一个请求组并记录耗时"""
+        unit_start, waited = time.time(), track_acquire_wait()
+        unit_results = self.process_unit(unit, sheet_name, on_case)
+        self._observe_unit(unit, time.time() - unit_start, waited[0])
+        return unit_results
+    
+    def _process_batch_threaded(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable):
+        """使用线程池批量处理数据，执行中和排队的请求组不超过提交窗口，一个完成后才从tasks中取下一个提交，完成的结果在当前线程交给on_result"""
+        tasks = iter(tasks)
+        with ThreadPoolExecutor(max_workers=self._get_worker_count()) as executor:
+            future_to_task = {}
+            
+            def submit(count: int):
+                for sheet_name, unit, on_case in islice(tasks, count):
+                    future_to_task[executor.submit(self._timed_unit, unit, sheet_name, on_case)] = (sheet_name, unit)
+            
+            # 先填满提交窗口，之后每完成一个请求组再提交一个
+            submit(self._get_window_size())
+            while future_to_task:
+                done, _ = wait(future_to_task, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sheet_name, unit = future_to_task.pop(future)
+                    try:
+                        unit_results = future.result()
+                    except Exception as e:
+                        logger.error(f"[表格 {sheet_name}] 处理任务失败: {e}")
+                        # 发生错误时为组内每一行添加一个空内容的测试用例
+                        unit_results = [self._create_empty_case(row_index) for row_index, _ in unit]
+                    on_result(sheet_name, unit_results)
+                submit(len(done))
+    
+    async def _process_batch_async(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable):
+        """在单个事件循环中按提交窗口启动固定数量的协程，每个协程处理完一个请求组再从tasks中取下一个，完成的结果交给on_result"""
+        tasks = iter(tasks)
+        
+        async def worker():
+            for sheet_name, unit, on_case in tasks:
+                unit_start, waited = time.time(), track_acquire_wait()
                 try:
-                    row_results = future.result()
-                    all_results.extend(row_results)
+                    unit_results = await self.aprocess_unit(unit, sheet_name, on_case)
+                    self._observe_unit(unit, time.time() - unit_start, waited[0])
                 except Exception as e:
-                    logger.error(f"处理任务失败: {e}")
-                    # 发生错误时添加一个空内容的测试用例
-                    item, row_index = future_to_item[future]
-                    all_results.append({
-                        "原始行号": row_index,
-                        "需求名称": "",
-                        "测试点编号": "",
-                        "测试点": "",
-                        "前置条件": "",
-                        "测试步骤": "",
-                        "预期结果": ""
-                    })
-        
-        # 按照原始输入顺序重新排序
-        sorted_results = sorted(all_results, key=lambda x: x.get("原始行号", 0))
+                    logger.error(f"[表格 {sheet_name}] 处理任务失败: {e}")
+                    unit_results = [self._create_empty_case(row_index) for row_index, _ in unit]
+                on_result(sheet_name, unit_results)
         
-        elapsed_time = time.time() - start_time
-        logger.info(f"[表格 {sheet_name}] 批量处理完成，共生成 {len(sorted_results)} 个测试用例，总耗时: {elapsed_time:.2f}秒")
+        await asyncio.gather(*(worker() for _ in range(self._get_window_size())))
+    
+    def process_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """处理一个请求组，打包请求中未成功解析的行逐行重试"""
+        if len(unit) == 1:
+            return self.process_single_row(unit[0][0], unit[0][1], sheet_name, on_case)
+        
+        try:
+            results, retry_rows = self._run_steps(self._pack_steps(unit, sheet_name, on_case))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}] 打包处理失败: {e}")
+            results, retry_rows = [], unit
+        
+        for row_index, item in retry_rows:
+            results.extend(self.process_single_row(row_index, item, sheet_name, on_case))
+        return results
+    
+    async def aprocess_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """异步处理一个请求组，打包请求中未成功解析的行逐行重试"""
+        if len(unit) == 1:
+            return await self.aprocess_single_row(unit[0][0], unit[0][1], sheet_name, on_case)
+        
+        try:
+            results, retry_rows = await self._arun_steps(self._pack_steps(unit, sheet_name, on_case))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}] 打包处理失败: {e}")
+            results, retry_rows = [], unit
+        
+        row_results = await asyncio.gather(
+            *(self.aprocess_single_row(row_index, item, sheet_name, on_case) for row_index, item in retry_rows)
+        )
+        for row_result in row_results:
+            results.extend(row_result)
+        return results
+    
+    def _pack_steps(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None) -> Generator[str, str, Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]]]]:
+        """多行打包处理流程，返回(测试用例列表, 需要逐行重试的行)"""
+        label = f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}]"
+        logger.info(f"{label} 开始打包处理 {len(unit)} 行")
+        documents = {row_index: self.prepare_requirement_document(item) for row_index, item in unit}
+        
+        # 每行的(测试点文档, 测试用例输出)
+        if self.generation_mode == "fused":
+            fused_outputs = yield from self._generate_packed(
+                "fused", {"requirement_document": "[对应需求文档]"}, documents, label
+            )
+            outputs = {row_index: self.output_parser.split_fused_output(output) for row_index, output in fused_outputs.items()}
+        else:
+            test_points = yield from self._generate_packed(
+                "test_point", {"requirement_document": "[对应需求文档]"}, documents, label
+            )
+            test_case_outputs = yield from self._generate_packed(
+                "test_case",
+                {"requirement_document": "[对应需求文档]", "test_points_document": "[对应测试点文档]"},
+                {
+                    row_index: f"需求文档：\n{documents[row_index]}\n\n测试点文档：\n{self._case_input(test_points[row_index])}"
+                    for row_index in documents if row_index in test_points
+                },
+                label
+            )
+            outputs = {row_index: (test_points[row_index], output) for row_index, output in test_case_outputs.items()}
         
-        return sorted_results
\ No newline at end of file
+        results, retry_rows = [], []
+        for row_index, item in unit:
+            row_test_points, test_case_output = outputs.get(row_index, ("", ""))
+            parsed_results = self._parse_cases(test_case_output, row_test_points)
+            valid_results = [result for result in parsed_results if any(result.values())]
+            if valid_results:
+                results.extend({"原始行号": row_index, **result} for result in valid_results)
+            else:
+                retry_rows.append((row_index, item))
+        
+        results = yield from self._repair_incomplete(results, label)
+        logger.info(f"{label} 打包处理完成，生成 {len(results)} 个测试用例")
+        if on_case:
+            for result in results:
+                on_case(result)
+        if retry_rows:
+            logger.warning(
+                f"{label} {len(retry_rows)} 行的输出缺失或格式错误，逐行重试: "
+                f"{', '.join(f'#{row_index}' for row_index, _ in retry_rows)}"
+            )
+        
+        return results, retry_rows
+    
+    def _generate_packed(self, prompt_name: str, placeholders: Dict[str, str], sections: Dict[int, str], label: str) -> Generator[str, str, Dict[int, str]]:
+        """发出一次多行打包请求，返回按行拆分后的输出"""
+        if not sections:
+            return {}
+        
+        try:
+            packed_prompt = self.prompt_manager.get_prompt(prompt_name, placeholders)
+            if prompt_name != "test_point":
+                packed_prompt = self._compact_prompt(packed_prompt, fused=prompt_name == "fused")
+            packed_prompt += self.output_parser.format_packed_input(sections)
+            logger.debug(f"{label} 打包提示词: {packed_prompt}")
+            response = yield StagedPrompt(packed_prompt, f"packed_{prompt_name}")
+            logger.debug(f"{label} 打包AI输出: {response}")
+            
+            outputs = self.output_parser.split_packed_output(response)
+            return {row_index: output for row_index, output in outputs.items() if row_index in sections}
+        
+        except Exception as e:
+            logger.error(f"{label} 打包请求失败: {e}")
+            return {}
\ No newline at end of file
@@ -1,8 +1,9 @@
 import threading
+from itertools import chain
 from pathlib import Path
-from typing import List, Dict, Any
-import pandas as pd
+from typing import List, Dict, Any, Iterator
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 from src.util.logging_util import get_logger
 
@@ -30,13 +31,8 @@ class ExcelWriter:
         # 获取数据起始行
         self.data_start_row = settings.get_config_value("input_excel_processing.data_start_row")
     
-    def _remap_output_data(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """直接对原始输出进行映射，每行一条测试用例"""
-        if not data:
-            return []
-        
-        remapped_data = []
-        
+    def _remap_output_data(self, data: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """直接对原始输出进行映射，每行一条测试用例，逐条产出"""
         for index, item in enumerate(data, 1):
             # 计算原始行号，从data_start_row开始
             original_row_num = item.get("原始行号", 0)
@@ -45,7 +41,7 @@ class ExcelWriter:
             else:
                 display_row_num = ""
                 
-            remapped_item = {
+            yield {
                 "序号": index,
                 "原始行号": display_row_num,
                 "需求名称": item.get("需求名称", ""),
@@ -55,72 +51,45 @@ class ExcelWriter:
                 "测试步骤": item.get("测试步骤", ""),
                 "预期结果": item.get("预期结果", "")
             }
-            remapped_data.append(remapped_item)
-        
-        return remapped_data
     
     def write_data(self, data_dict: Dict[str, List[Dict[str, Any]]], output_path: Path) -> bool:
         """写入Excel文件"""
-        try:
-            if not data_dict:
-                logger.warning("没有数据可写入")
-                return False
-            
-            # 确保输出目录存在
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            logger.debug(f"确保输出目录存在: {output_path.parent}")
-            
-            # 重映射数据
-            remapped_data_dict = {}
-            for sheet_name, data in data_dict.items():
-                remapped_data = self._remap_output_data(data)
-                remapped_data_dict[sheet_name] = remapped_data
-            
-            # 使用全局锁写入Excel文件
-            with write_lock:
-                self._write_formatted_excel(remapped_data_dict, str(output_path))
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"写入Excel文件失败: {e}")
+        if not data_dict:
+            logger.warning("没有数据可写入")
             return False
+        
+        sheet_stream = self.open_stream(output_path)
+        for sheet_name, data in data_dict.items():
+            sheet_stream.write_sheet(sheet_name, data)
+        return sheet_stream.close()
     
-    def _write_formatted_excel(self, remapped_data_dict: Dict[str, List[Dict[str, Any]]], output_path: str):
-        """写入格式化的Excel文件并应用样式"""
-        try:
-            logger.debug(f"开始写入Excel文件: {output_path}")
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                for sheet_name, data in remapped_data_dict.items():
-                    df = pd.DataFrame(data)
-                    df.to_excel(writer, index=False, sheet_name=sheet_name)
-                    
-                    workbook = writer.book
-                    worksheet = writer.sheets[sheet_name]
-                    
-                    # 应用Excel样式
-                    self._apply_excel_styling(worksheet, df)
-            
-            logger.info(f"已生成格式化的Excel文件: {output_path}")
-            
-        except Exception as e:
-            logger.error(f"写入Excel失败: {e}")
-            raise
+    def open_stream(self, output_path: Path, sheet_order: List[str] = None) -> "SheetStream":
+        """
+        开始逐表格写入Excel文件，每完成一个表格即可写入，写入后不必在内存中保留该表格的测试用例；
+        sheet_order为输出文件中各表格的顺序，未列出的表格按写入顺序排在其后
+        """
+        return SheetStream(self, output_path, sheet_order)
     
-    def _apply_excel_styling(self, worksheet, df):
-        """应用Excel样式"""
-        # 创建字体
-        font = Font(name=self.font_name, size=self.font_size)
-        bold_font = Font(name=self.font_name, size=self.font_size, bold=True)
+    def _write_formatted_sheet(self, workbook: openpyxl.Workbook, sheet_name: str, data: List[Dict[str, Any]]):
+        """在只写工作簿中逐行写入一个表格并应用样式"""
+        rows = self._remap_output_data(data)
+        first = next(rows, None)
+        worksheet = workbook.create_sheet(sheet_name)
+        if first is None:
+            return
         
-        # 设置列宽
-        for col_idx, col in enumerate(worksheet.columns, 1):
+        # 设置列宽，只写模式下须在写入行之前设置
+        for col_idx in range(1, len(first) + 1):
             col_letter = openpyxl.utils.get_column_letter(col_idx)
             if col_idx == 1:  # 第一列
                 worksheet.column_dimensions[col_letter].width = self.first_column_width
             else:  # 其他列
                 worksheet.column_dimensions[col_letter].width = self.other_columns_width
         
+        # 创建字体
+        font = Font(name=self.font_name, size=self.font_size)
+        bold_font = Font(name=self.font_name, size=self.font_size, bold=True)
+        
         # 创建对齐样式
         header_alignment = Alignment(
             horizontal=self.header_row_style.get("horizontal", "center"),
@@ -140,27 +109,87 @@ class ExcelWriter:
             wrap_text=True
         )
         
-        # 设置所有单元格的字体
-        for row in worksheet.iter_rows(min_row=1, max_row=len(df)+1, max_col=len(df.columns)):
-            for cell in row:
-                cell.font = font
-        
         # 设置表头样式（第一行）- 水平居中，垂直居中
-        for cell in worksheet[1]:
-            cell.font = bold_font
-            cell.alignment = header_alignment
+        worksheet.append([self._styled_cell(worksheet, name, bold_font, header_alignment) for name in first])
         
-        # 设置第一列样式 - 水平居中，垂直居中
-        for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=1, max_col=1):
-            for cell in row:
-                cell.alignment = first_column_alignment
+        # 第一列水平居中，其他列水平左对齐，均垂直居中
+        for row in chain([first], rows):
+            worksheet.append([
+                self._styled_cell(worksheet, value, font, first_column_alignment if col_idx == 0 else other_columns_alignment)
+                for col_idx, value in enumerate(row.values())
+            ])
         
-        # 设置其他列样式 - 水平左对齐，垂直居中，max_col=len(df.columns)+1
-        for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=2, max_col=len(df.columns)+1):
-            for cell in row:
-                cell.alignment = other_columns_alignment
+        logger.debug(f"已写入工作表 {sheet_name} 并应用Excel样式")
+    
+    @staticmethod
+    def _styled_cell(worksheet, value: Any, font: Font, alignment: Alignment) -> WriteOnlyCell:
+        """带样式的只写单元格，空字符串与DataFrame写出时一样留空"""
+        cell = WriteOnlyCell(worksheet, value=None if value == "" else value)
+        cell.font = font
+        cell.alignment = alignment
+        return cell
+
+class SheetStream:
+    """
+    逐表格写入的Excel文件（线程安全），由ExcelWriter.open_stream创建；
+    工作簿以只写模式创建，已写入的行暂存在临时文件中，write_sheet随各表格完成依次调用，close保存文件并返回是否成功
+    """
+    
+    def __init__(self, writer: ExcelWriter, output_path: Path, sheet_order: List[str] = None):
+        self.writer = writer
+        self.output_path = output_path
+        self.sheet_order = sheet_order or []
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.failed = False
+        self.lock = threading.Lock()
+    
+    def write_sheet(self, sheet_name: str, data: List[Dict[str, Any]]):
+        """写入一个表格的测试用例，写入失败时记录错误，close返回False"""
+        with self.lock:
+            if self.failed:
+                return
+            try:
+                self.writer._write_formatted_sheet(self.workbook, sheet_name, data)
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] 写入Excel失败: {e}")
+                self.failed = True
+    
+    def discard(self):
+        """
+        不保存文件，结束已写入的工作表，临时文件在进程退出时由openpyxl删除
+        """
+        for worksheet in self.workbook.worksheets:
+            worksheet.close()
+    
+    def close(self) -> bool:
+        """按sheet_order排列各表格并保存文件"""
+        with self.lock:
+            if self.failed:
+                self.discard()
+                return False
+            if not self.workbook.sheetnames:
+                logger.warning("没有数据可写入")
+                return False
+            
+            order = {name: index for index, name in enumerate(self.sheet_order)}
+            names = sorted(self.workbook.sheetnames, key=lambda name: order.get(name, len(order)))
+            for index, name in enumerate(names):
+                self.workbook.move_sheet(name, index - self.workbook.sheetnames.index(name))
+            
+            try:
+                # 确保输出目录存在
+                self.output_path.parent.mkdir(parents=True, exist_ok=True)
+                logger.debug(f"确保输出目录存在: {self.output_path.parent}")
+                
+                # 使用全局锁写入Excel文件
+                with write_lock:
+                    self.workbook.save(str(self.output_path))
+            except Exception as e:
+                logger.error(f"写入Excel文件失败: {e}")
+                return False
         
-        logger.debug(f"已应用Excel样式到工作表")
+        logger.info(f"已生成格式化的Excel文件: {self.output_path}")
+        return True
 
 class FileWriterFactory:
     """文件写入器工厂"""
@@ -1,10 +1,16 @@
 """
 AI接口模块
 """
+from .adaptive_limiter import AdaptiveLimiter
 from .api_client import LLMClient, LLMClientFactory
 from .prompt_manager import PromptManager
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
 __all__ = [
+    'AdaptiveLimiter',
     'LLMClient',
     'LLMClientFactory',
-    'PromptManager'
+    'PromptManager',
+    'ResponseCache',
+    'SingleFlight'
 ]
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from src.util.logging_util import get_logger
+
+logger = get_logger(__name__)
+
+# 当前线程或协程等待并发名额的累计秒数，由track_acquire_wait开启统计
+_acquire_wait: ContextVar[Optional[List[float]]] = ContextVar("limiter_acquire_wait", default=None)
+
+class AdaptiveLimiter:
+    """AIMD自适应并发限制器
+    
+    每完成一轮（当前上限个数）成功请求后，若窗口内p95延迟不超过基线的
+    latency_tolerance倍且错误率不超过max_error_rate，则上限加increase_step；
+    遇到429、5xx或超时时上限乘以decrease_factor，冷却期内只下调一次。
+    同时支持线程（acquire/release）和协程（aacquire/release）两种用法。
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        increase_step: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        max_error_rate: float = 0.05,
+        window_size: int = 20,
+        cooldown_seconds: float = 5.0
+    ):
+        self._min_limit = max(1, min_limit)
+        self._max_limit = max(self._min_limit, max_limit)
+        self._limit = min(max(initial_limit, self._min_limit), self._max_limit)
+        self._increase_step = increase_step
+        self._decrease_factor = decrease_factor
+        self._latency_tolerance = latency_tolerance
+        self._max_error_rate = max_error_rate
+        self._cooldown_seconds = cooldown_seconds
+        
+        self._latencies: deque = deque(maxlen=window_size)
+        self._errors: deque = deque(maxlen=window_size)
+        self._baseline_p95: Optional[float] = None
+        self._successes_in_round = 0
+        self._last_decrease = 0.0
+        self._adjustments = 0
+        self._in_flight = 0
+        
+        self._condition = threading.Condition(threading.RLock())
+        self._async_waiters: List[asyncio.Future] = []
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return self._limit
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """注册上限调整回调，回调参数为包含调整原因的状态快照"""
+        with self._condition:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """移除上限调整回调"""
+        with self._condition:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def acquire(self) -> None:
+        """阻塞直到获得一个并发名额"""
+        started = time.perf_counter()
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+        _record_wait(time.perf_counter() - started)
+    
+    async def aacquire(self) -> None:
+        """异步等待直到获得一个并发名额"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        while True:
+            with self._condition:
+                if self._in_flight < self._limit:
+                    self._in_flight += 1
+                    _record_wait(time.perf_counter() - started)
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append(waiter)
+            await waiter
+    
+    def release(self, latency: float, failed: bool = False) -> None:
+        """归还名额并记录本次请求结果，failed表示遇到限流、服务端错误或超时"""
+        with self._condition:
+            self._in_flight -= 1
+            self._errors.append(failed)
+            if failed:
+                self._decrease()
+            else:
+                self._latencies.append(latency)
+                self._successes_in_round += 1
+                if self._successes_in_round >= self._limit:
+                    self._successes_in_round = 0
+                    self._maybe_increase()
+            
+            self._condition.notify_all()
+            self._wake_async_waiters()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """获取当前状态快照"""
+        with self._condition:
+            p95 = self._p95()
+            return {
+                "limit": self._limit,
+                "in_flight": self._in_flight,
+                "min_limit": self._min_limit,
+                "max_limit": self._max_limit,
+                "p95_latency": round(p95, 3) if p95 is not None else None,
+                "error_rate": round(self._error_rate(), 3),
+                "adjustments": self._adjustments
+            }
+    
+    def _maybe_increase(self) -> None:
+        """延迟和错误率健康时加性增加上限"""
+        p95 = self._p95()
+        if p95 is None:
+            return
+        
+        if self._baseline_p95 is None or p95 < self._baseline_p95:
+            self._baseline_p95 = p95
+        
+        healthy = (
+            p95 <= self._baseline_p95 * self._latency_tolerance
+            and self._error_rate() <= self._max_error_rate
+        )
+        if healthy and self._limit < self._max_limit:
+            self._set_limit(min(self._limit + self._increase_step, self._max_limit), "延迟与错误率正常")
+    
+    def _decrease(self) -> None:
+        """遇到限流或错误时乘性减少上限"""
+        now = time.monotonic()
+        if now - self._last_decrease < self._cooldown_seconds:
+            return
+        
+        self._last_decrease = now
+        self._successes_in_round = 0
+        new_limit = max(int(self._limit * self._decrease_factor), self._min_limit)
+        if new_limit < self._limit:
+            self._set_limit(new_limit, "遇到限流或服务端错误")
+    
+    def _set_limit(self, new_limit: int, reason: str) -> None:
+        """更新上限并通知回调"""
+        old_limit = self._limit
+        self._limit = new_limit
+        self._adjustments += 1
+        logger.debug(f"并发上限调整: {old_limit} -> {new_limit}（{reason}）")
+        
+        event = {**self.snapshot(), "previous_limit": old_limit, "reason": reason}
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"并发调整回调执行失败: {e}")
+    
+    def _p95(self) -> Optional[float]:
+        """窗口内的p95延迟"""
+        if not self._latencies:
+            return None
+        
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    def _error_rate(self) -> float:
+        """窗口内的错误率"""
+        if not self._errors:
+            return 0.0
+        
+        return sum(self._errors) / len(self._errors)
+    
+    def _wake_async_waiters(self) -> None:
+        """唤醒所有等待名额的协程，由其重新竞争"""
+        waiters, self._async_waiters = self._async_waiters, []
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_resolve_waiter, waiter)
+
+def track_acquire_wait() -> List[float]:
+    """开始统计当前线程或协程后续等待并发名额的时间，返回单元素列表，其值为已等待的秒数"""
+    waited = [0.0]
+    _acquire_wait.set(waited)
+    return waited
+
+def _record_wait(seconds: float) -> None:
+    """累加当前上下文等待并发名额的时间"""
+    waited = _acquire_wait.get()
+    if waited is not None:
+        waited[0] += seconds
+
+def is_throttle_error(error: BaseException) -> bool:
+    """判断异常是否属于限流、服务端错误或超时"""
+    while error is not None:
+        status_code = getattr(error, 'status_code', None)
+        if status_code == 429 or (isinstance(status_code, int) and status_code >= 500):
+            return True
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or 'Timeout' in type(error).__name__:
+            return True
+        error = error.__cause__
+    return False
+
+def _resolve_waiter(waiter: asyncio.Future) -> None:
+    """在事件循环线程中完成等待中的future"""
+    if not waiter.done():
+        waiter.set_result(None)
@@ -1,16 +1,48 @@
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
+from src.llm.adaptive_limiter import is_throttle_error
+from src.llm.connection_pool import get_http_clients, get_shared_runnable, track_throttle_responses
+from src.llm.llm_response import LLMResponse
+from src.llm.rate_limiter import estimate_tokens, get_rate_limiter
+from src.llm.single_flight import SingleFlight
+from src.llm.response_cache import ResponseCache
+from src.llm.structured_output import StructuredPrompt
 from src.util.logging_util import get_logger
 
 logger = get_logger(__name__)
 
+# 进程内共享的在途请求表，相同请求同时在途时只发出一次调用
+_single_flight = SingleFlight()
+
 class LLMClient:
     """LLM客户端"""
     
     def __init__(self, settings):  # 添加settings参数
         self.settings = settings
         self.model_config = settings.get_config_value("model")
-        self.llm = self._initialize_llm()
+        self.llm = get_shared_runnable(self._llm_key(), self._initialize_llm)
+        self.output_parser = StrOutputParser()
+        self.rate_limiter = get_rate_limiter(
+            self.model_config.get('base_url'),
+            self.model_config.get('name'),
+            self.model_config.get('rate_limit', {})
+        )
+        self.cache = self._initialize_cache()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+    
+    def _llm_key(self):
+        """共享LLM实例的标识，模型参数相同时复用同一个实例"""
+        return tuple(
+            self.model_config.get(name)
+            for name in ('name', 'base_url', 'api_key', 'temperature', 'max_tokens', 'request_timeout', 'max_retries')
+        )
     
     def _initialize_llm(self):
         """初始化LLM"""
@@ -23,6 +55,10 @@ class LLMClient:
         if not base_url or base_url == "xxx":
             raise ValueError("请在配置文件中设置有效的base_url")
         
+        http_client, http_async_client = get_http_clients(
+            base_url, api_key, self.model_config.get('connection_pool', {})
+        )
+        
         return ChatOpenAI(
             model=self.model_config.get('name'),
             base_url=base_url,
@@ -30,18 +66,358 @@ class LLMClient:
             temperature=self.model_config.get('temperature'),
             max_tokens=self.model_config.get('max_tokens'),
             request_timeout=self.model_config.get('request_timeout'),
-            max_retries=self.model_config.get('max_retries')
+            max_retries=self.model_config.get('max_retries'),
+            stream_usage=True,
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
+    
+    def _initialize_cache(self):
+        """初始化响应缓存"""
+        cache_config = self.settings.get_config_value("llm_cache", {})
+        if not cache_config.get('enabled', False):
+            return None
+        
+        cache_path = cache_config.get('path', 'cache/llm_cache.db')
+        cache = ResponseCache(
+            Path(cache_path),
+            ttl_seconds=cache_config.get('ttl_seconds', 0),
+            max_entries=cache_config.get('max_entries', 0)
+        )
+        logger.info(f"LLM响应缓存已启用: {cache_path}")
+        return cache
+    
+    def _cache_key(self, prompt: str, max_tokens=None) -> str:
+        """生成缓存键，包含本次请求实际生效的max_tokens，输出长度限制不同的请求不共用缓存也不合并"""
+        if isinstance(prompt, StructuredPrompt) or not max_tokens:
+            max_tokens = self.model_config.get('max_tokens')
+        return ResponseCache.make_key(
+            self.model_config.get('name'),
+            self.model_config.get('base_url'),
+            self.model_config.get('temperature'),
+            max_tokens,
+            prompt.cache_text() if isinstance(prompt, StructuredPrompt) else prompt
         )
     
-    def invoke_llm(self, prompt: str) -> str:
-        """调用LLM"""
+    def _runnable(self, prompt: str, max_tokens=None):
+        """选择发出请求的LLM，结构化提示词按其输出方式约束输出，指定了max_tokens时按其限制输出长度"""
+        if not isinstance(prompt, StructuredPrompt):
+            return self.llm.bind(max_tokens=max_tokens) if max_tokens else self.llm
+        
+        if prompt.method == "function_calling":
+            tool = {
+                "type": "function",
+                "function": {"name": prompt.name, "description": "提交生成结果", "parameters": prompt.schema}
+            }
+            return self.llm.bind_tools([tool], tool_choice=prompt.name)
+        
+        return self.llm.bind(response_format={
+            "type": "json_schema",
+            "json_schema": {"name": prompt.name, "schema": prompt.schema, "strict": True}
+        })
+    
+    @staticmethod
+    def _messages(prompt: str):
+        """请求的消息：提示词带有系统消息时拆分为系统消息和用户消息，否则整体作为一条用户消息"""
+        if not getattr(prompt, 'system', ''):
+            return str(prompt)
+        
+        return [SystemMessage(prompt.system), HumanMessage(prompt.user)]
+    
+    def _count(self, name: str, amount: int = 1):
+        """累加调用统计"""
+        with self.stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + amount
+    
+    def get_stats(self):
+        """获取调用统计快照"""
+        with self.stats_lock:
+            return dict(self.stats)
+    
+    def close(self):
+        """关闭响应缓存的数据库连接，客户端不再使用时调用"""
+        if self.cache:
+            self.cache.close()
+    
+    def _lookup_cache(self, prompt: str, max_tokens=None):
+        """查询响应缓存，返回(缓存键, 缓存的响应)"""
+        if not self.cache:
+            return None, None
+        
+        cache_key = self._cache_key(prompt, max_tokens)
+        cached = self.cache.get(cache_key)
+        self._count("cache_hits" if cached is not None else "cache_misses")
+        return cache_key, cached
+    
+    def _store_cache(self, cache_key, response: str):
+        """将非空响应写入缓存，因长度限制被截断的响应不缓存"""
+        if cache_key and response and not getattr(response, 'truncated', False):
+            self.cache.set(cache_key, response)
+    
+    def _estimate_request_tokens(self, prompt: str, max_tokens=None) -> int:
+        """估算一次请求消耗的token数（提示词估算值加预计输出长度，指定了max_tokens时按max_tokens计）"""
+        rate_config = self.model_config.get('rate_limit', {})
+        return estimate_tokens(prompt) + (max_tokens or rate_config.get('estimated_completion_tokens', 1024))
+    
+    def _record_rate_wait(self, wait: float):
+        """记录限速排队情况"""
+        if wait > 0:
+            self._count("rate_limit_waits")
+            logger.debug(f"LLM限速排队 {wait:.2f}秒")
+    
+    def _finish_response(self, message, prompt: str, estimated_tokens: int) -> LLMResponse:
+        """提取响应文本及结束原因和用量，并用实际用量校正限速器，工具调用的响应文本为调用参数的JSON文本"""
+        tool_calls = getattr(message, 'tool_calls', None)
+        if tool_calls:
+            text = json.dumps(tool_calls[0]['args'], ensure_ascii=False)
+        else:
+            text = self.output_parser.invoke(message).strip()
+        usage = getattr(message, 'usage_metadata', None)
+        self._reconcile_usage(usage, prompt, text, estimated_tokens)
+        return self._make_response(text, message.response_metadata.get('finish_reason'), usage)
+    
+    def _make_response(self, text: str, finish_reason, usage) -> LLMResponse:
+        """创建携带结束原因和用量的响应，统计输入token中命中服务端前缀缓存的部分和因长度限制被截断的响应"""
+        if usage and usage.get('input_tokens'):
+            self._count("input_tokens", usage['input_tokens'])
+            self._count("cached_input_tokens", (usage.get('input_token_details') or {}).get('cache_read') or 0)
+        response = LLMResponse(text, finish_reason, usage)
+        if response.truncated:
+            self._count("truncated_responses")
+            logger.warning("LLM输出达到max_tokens上限被截断")
+        return response
+    
+    def _reconcile_usage(self, usage, prompt: str, response: str, estimated_tokens: int):
+        """用实际用量校正限速器，响应中没有用量时按文本估算"""
+        if self.rate_limiter:
+            actual_tokens = (usage or {}).get('total_tokens') or estimate_tokens(prompt) + estimate_tokens(response)
+            self.rate_limiter.reconcile(estimated_tokens, actual_tokens)
+    
+    def _release_limiter(self, limiter, started: float, throttle_responses, error):
+        """归还并发名额，并将本次请求的耗时和是否被限流反馈给限制器"""
+        if limiter is None:
+            return
+        
+        throttled = throttle_responses[0] > 0 or (error is not None and is_throttle_error(error))
+        limiter.release(time.perf_counter() - started, throttled)
+    
+    def invoke_llm(self, prompt: str, limiter=None, max_tokens=None) -> str:
+        """调用LLM，缓存未命中时与进行中的相同请求合并；limiter为可选的自适应并发限制器，StructuredPrompt按其输出结构返回JSON文本
+        
+        实际发出请求时返回LLMResponse，附带结束原因和用量；命中缓存时为普通字符串。
+        max_tokens为本次请求的最大输出token数，为None时使用模型配置的max_tokens。
+        """
+        cache_key, cached = self._lookup_cache(prompt, max_tokens)
+        if cached is not None:
+            return cached
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            return flight.result()
+        
+        try:
+            response = self._request(prompt, limiter, max_tokens)
+            self._store_cache(cache_key, response)
+        except BaseException as e:
+            _single_flight.resolve(flight_key, flight, error=e)
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+        return response
+    
+    async def ainvoke_llm(self, prompt: str, limiter=None, max_tokens=None) -> str:
+        """异步调用LLM"""
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, prompt, max_tokens)
+        if cached is not None:
+            return cached
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            return await asyncio.wrap_future(flight)
+        
+        try:
+            response = await self._arequest(prompt, limiter, max_tokens)
+            await asyncio.to_thread(self._store_cache, cache_key, response)
+        except BaseException as e:
+            _single_flight.resolve(flight_key, flight, error=e)
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+        return response
+    
+    def stream_llm(self, prompt: str, limiter=None, max_tokens=None):
+        """流式调用LLM，逐块返回响应文本
+        
+        命中缓存或合并到进行中的相同请求时，完整响应作为一个文本块返回；
+        实际发出请求时，最后一个文本块为携带结束原因和用量的LLMResponse（文本可能为空）；
+        调用方提前关闭迭代器时请求随之中止，不完整的响应不写入缓存。
+        """
+        cache_key, cached = self._lookup_cache(prompt, max_tokens)
+        if cached is not None:
+            yield cached
+            return
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            yield flight.result()
+            return
+        
+        chunks, stream = [], self._stream_request(prompt, limiter, max_tokens)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+            response = self._stream_response(chunks)
+            self._store_cache(cache_key, response)
+        except BaseException as e:
+            stream.close()
+            _single_flight.resolve(flight_key, flight, error=self._stream_error(e))
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+    
+    async def astream_llm(self, prompt: str, limiter=None, max_tokens=None):
+        """异步流式调用LLM，逐块返回响应文本"""
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, prompt, max_tokens)
+        if cached is not None:
+            yield cached
+            return
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            yield await asyncio.wrap_future(flight)
+            return
+        
+        chunks, stream = [], self._astream_request(prompt, limiter, max_tokens)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+            response = self._stream_response(chunks)
+            await asyncio.to_thread(self._store_cache, cache_key, response)
+        except BaseException as e:
+            await stream.aclose()
+            _single_flight.resolve(flight_key, flight, error=self._stream_error(e))
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+    
+    @staticmethod
+    def _stream_response(chunks) -> LLMResponse:
+        """拼接流式响应，结束原因和用量取自最后一个文本块"""
+        last = chunks[-1] if chunks else None
+        return LLMResponse("".join(chunks).strip(), getattr(last, 'finish_reason', None), getattr(last, 'usage', None))
+    
+    @staticmethod
+    def _stream_error(error):
+        """合并到流式请求的调用方收到的异常，调用方主动中止时不传递GeneratorExit"""
+        if isinstance(error, GeneratorExit):
+            return RuntimeError("相同请求的流式调用已被中止")
+        return error
+    
+    def _request(self, prompt: str, limiter, max_tokens=None) -> str:
+        """经过限速和并发控制后向模型发出请求"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self.rate_limiter:
+            self._record_rate_wait(self.rate_limiter.acquire(estimated_tokens))
+        
+        if limiter:
+            limiter.acquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
         try:
-            chain = self.llm | StrOutputParser()
-            response = chain.invoke(prompt)
-            return response.strip()
+            message = self._runnable(prompt, max_tokens).invoke(self._messages(prompt))
         except Exception as e:
+            error = e
             logger.error(f"API调用失败: {e}")
             raise
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        return self._finish_response(message, prompt, estimated_tokens)
+    
+    async def _arequest(self, prompt: str, limiter, max_tokens=None) -> str:
+        """经过限速和并发控制后向模型发出异步请求"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self.rate_limiter:
+            self._record_rate_wait(await self.rate_limiter.aacquire(estimated_tokens))
+        
+        if limiter:
+            await limiter.aacquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        try:
+            message = await self._runnable(prompt, max_tokens).ainvoke(self._messages(prompt))
+        except Exception as e:
+            error = e
+            logger.error(f"API调用失败: {e}")
+            raise
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        return self._finish_response(message, prompt, estimated_tokens)
+    
+    def _stream_request(self, prompt: str, limiter, max_tokens=None):
+        """经过限速和并发控制后向模型发出流式请求，中止时同样归还并发名额"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self.rate_limiter:
+            self._record_rate_wait(self.rate_limiter.acquire(estimated_tokens))
+        
+        if limiter:
+            limiter.acquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        chunks, usage, finish_reason = [], None, None
+        try:
+            for message in self._runnable(prompt, max_tokens).stream(self._messages(prompt)):
+                usage = message.usage_metadata or usage
+                finish_reason = message.response_metadata.get('finish_reason') or finish_reason
+                text = self.output_parser.invoke(message)
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            logger.error(f"API流式调用失败: {e}")
+            raise
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        self._reconcile_usage(usage, prompt, "".join(chunks), estimated_tokens)
+        yield self._make_response("", finish_reason, usage)
+    
+    async def _astream_request(self, prompt: str, limiter, max_tokens=None):
+        """经过限速和并发控制后向模型发出异步流式请求"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self.rate_limiter:
+            self._record_rate_wait(await self.rate_limiter.aacquire(estimated_tokens))
+        
+        if limiter:
+            await limiter.aacquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        chunks, usage, finish_reason = [], None, None
+        try:
+            async for message in self._runnable(prompt, max_tokens).astream(self._messages(prompt)):
+                usage = message.usage_metadata or usage
+                finish_reason = message.response_metadata.get('finish_reason') or finish_reason
+                text = self.output_parser.invoke(message)
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            logger.error(f"API流式调用失败: {e}")
+            raise
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        self._reconcile_usage(usage, prompt, "".join(chunks), estimated_tokens)
+        yield self._make_response("", finish_reason, usage)
 
 class LLMClientFactory:
     """LLM客户端工厂"""
@@ -0,0 +1,20 @@
+from typing import Any, Dict, Optional
+
+class LLMResponse(str):
+    """LLM响应文本
+    
+    作为普通响应使用时与字符串完全相同，另外携带模型返回的结束原因和用量，
+    供调用方判断输出是否因长度限制被截断。命中缓存的响应为普通字符串。
+    """
+    
+    def __new__(cls, text: str, finish_reason: Optional[str] = None, usage: Optional[Dict[str, Any]] = None):
+        """创建响应，finish_reason为结束原因（如stop、length），usage为用量元数据"""
+        instance = super().__new__(cls, text)
+        instance.finish_reason = finish_reason
+        instance.usage = usage or {}
+        return instance
+    
+    @property
+    def truncated(self) -> bool:
+        """输出是否因达到max_tokens而被截断"""
+        return self.finish_reason == "length"
\ No newline at end of file
@@ -1,18 +1,26 @@
 import re
 from pathlib import Path
 from typing import Dict
+from src.llm.chat_prompt import ChatPrompt, split_template
 from src.util.logging_util import get_logger
 
 logger = get_logger(__name__)
 
 class PromptManager:
-    """提示词管理器"""
+    """提示词管理器
+    
+    模板中有单独一行的分隔标记“<!-- user -->”时，标记之前的静态说明作为系统消息原样发出，不做变量替换，
+    标记之后为放置每行数据变量的用户消息模板，系统消息在各行之间逐字节相同，可以命中服务端的提示词前缀缓存；
+    没有分隔标记的模板整体作为一条用户消息。
+    """
     
     def __init__(self, settings):
         self.settings = settings
         # 从配置获取提示词文件路径
         self.test_point_prompt_file = Path(settings.get_config_value("file.test_point_prompt_file"))
         self.test_case_prompt_file = Path(settings.get_config_value("file.test_case_prompt_file"))
+        self.fused_prompt_file = Path(settings.get_config_value("file.fused_prompt_file", "prompt/fused.md"))
+        self.generation_mode = settings.get_config_value("generation.mode", "two_stage")
         self.prompts = self._load_prompts()
     
     def _load_prompts(self) -> Dict[str, str]:
@@ -50,6 +58,23 @@ class PromptManager:
                     logger.info(f"加载测试用例提示词: {fallback_path}")
                 else:
                     raise FileNotFoundError(f"测试用例提示词文件不存在: {self.test_case_prompt_file}")
+            
+            # 单次生成模式下加载同时生成测试点和测试用例的提示词
+            if self.generation_mode == "fused":
+                fused_prompt_file = self.fused_prompt_file
+                if not fused_prompt_file.exists():
+                    fused_prompt_file = Path(__file__).parent.parent.parent / self.fused_prompt_file
+                if not fused_prompt_file.exists():
+                    raise FileNotFoundError(f"单次生成提示词文件不存在: {self.fused_prompt_file}")
+                with open(fused_prompt_file, 'r', encoding='utf-8') as f:
+                    prompts["fused"] = f.read().strip()
+                logger.info(f"加载单次生成提示词: {fused_prompt_file}")
+            
+            # 系统消息原样发出，其中的变量不会被替换
+            for prompt_name, prompt in prompts.items():
+                system_variables = set(re.findall(r'\{(\w+)\}', split_template(prompt)[0]))
+                if system_variables:
+                    raise ValueError(f"提示词 '{prompt_name}' 的系统消息部分不能包含变量: {system_variables}")
                 
             logger.info(f"成功加载 {len(prompts)} 个提示词")
         except Exception as e:
@@ -69,22 +94,22 @@ class PromptManager:
         return True
     
     def _extract_variables(self, prompt_name: str):
-        """提取提示词中的变量"""
+        """提取提示词用户消息部分中的变量"""
         if prompt_name not in self.prompts:
             return []
         
-        prompt = self.prompts[prompt_name]
+        prompt = split_template(self.prompts[prompt_name])[1]
         # 使用正则表达式匹配 {variable} 格式的变量
         variables = re.findall(r'\{(\w+)\}', prompt)
         return list(set(variables))  # 去重
     
     def get_prompt(self, prompt_name: str, variables: Dict[str, str] = None) -> str:
-        """获取提示词"""
+        """获取提示词，返回ChatPrompt，模板有系统消息部分时携带系统消息"""
         if prompt_name not in self.prompts:
             logger.error(f"提示词不存在: {prompt_name}")
             raise ValueError(f"提示词不存在: {prompt_name}")
         
-        prompt = self.prompts[prompt_name]
+        system, prompt = split_template(self.prompts[prompt_name])
         
         if variables:
             # 验证变量
@@ -97,4 +122,4 @@ class PromptManager:
                 logger.error(f"提示词变量缺失: {e}")
                 raise ValueError(f"提示词变量 '{e}' 缺失")
         
-        return prompt
\ No newline at end of file
+        return ChatPrompt(f"{system}\n\n{prompt}", system) if system else ChatPrompt(prompt)
\ No newline at end of file
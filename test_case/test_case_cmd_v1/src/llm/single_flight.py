@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+class SingleFlight:
+    """按键合并并发请求
+    
+    第一个到达的调用方成为执行者，负责发起请求并通过resolve公布结果；
+    在此期间到达的相同请求直接等待执行者的Future。Future同时适用于线程
+    （future.result()）和协程（asyncio.wrap_future）。
+    """
+    
+    def __init__(self):
+        """初始化在途请求表"""
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """加入键对应的在途请求，返回(Future, 是否为执行者)"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+    
+    def resolve(self, key: str, future: Future, result: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        """执行者公布结果（或异常）并移除在途记录"""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,29 @@
+import json
+from typing import Any, Dict
+from src.llm.chat_prompt import ChatPrompt
+
+# 支持的结构化输出方式：json_schema 通过response_format约束输出；function_calling 通过强制调用工具约束输出
+STRUCTURED_OUTPUT_METHODS = ("json_schema", "function_calling")
+
+class StructuredPrompt(ChatPrompt):
+    """要求模型按JSON Schema结构化输出的提示词
+    
+    作为普通提示词使用时与字符串完全相同，并保留原提示词的系统消息；LLM客户端识别到该类型时按method约束输出，
+    并以JSON文本返回响应，缓存和请求合并同样按提示词加输出结构区分。
+    """
+    
+    def __new__(cls, prompt: str, schema: Dict[str, Any], name: str = "test_cases", method: str = "json_schema"):
+        """创建结构化提示词，schema为输出需满足的JSON Schema，name为输出结构（或工具）的名称"""
+        if method not in STRUCTURED_OUTPUT_METHODS:
+            raise ValueError(f"不支持的结构化输出方式: {method}")
+        
+        instance = super().__new__(cls, prompt, getattr(prompt, 'system', ''))
+        instance.schema = schema
+        instance.name = name
+        instance.method = method
+        return instance
+    
+    def cache_text(self) -> str:
+        """参与缓存键计算的文本，输出结构不同的相同提示词不共用缓存"""
+        signature = json.dumps([self.method, self.name, self.schema], ensure_ascii=False, sort_keys=True)
+        return f"{self}\n{signature}"
\ No newline at end of file
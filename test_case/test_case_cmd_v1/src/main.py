@@ -1,7 +1,9 @@
 import sys
 import argparse
+import multiprocessing
 from pathlib import Path
 import time
+import threading
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
@@ -30,8 +32,52 @@ class Application:
         self.llm_client = LLMClientFactory.create_llm_client(settings=self.settings)
         self.data_processor = DataProcessor(self.llm_client, self.prompt_manager, self.settings)
         
+        # 记录自适应并发的每次调整
+        if self.data_processor.limiter:
+            self.data_processor.limiter.add_listener(self._log_concurrency_change)
+        
         logger.info(f"应用程序初始化完成，使用配置文件: {config_path}")
     
+    @staticmethod
+    def _log_concurrency_change(event):
+        """记录一次并发上限调整"""
+        logger.info(
+            f"LLM并发上限调整: {event['previous_limit']} -> {event['limit']}（{event['reason']}），"
+            f"p95延迟 {event['p95_latency']}秒，错误率 {event['error_rate']:.1%}"
+        )
+    
+    def _log_job_stats(self):
+        """记录本次运行的LLM调用、并发调整、修复请求和输出长度预测统计"""
+        # 记录LLM响应缓存命中情况
+        llm_stats = self.llm_client.get_stats()
+        if 'cache_hits' in llm_stats or 'cache_misses' in llm_stats:
+            logger.info(f"LLM响应缓存: 命中 {llm_stats.get('cache_hits', 0)} 次, 未命中 {llm_stats.get('cache_misses', 0)} 次")
+        if 'coalesced_calls' in llm_stats:
+            logger.info(f"LLM请求合并: {llm_stats['coalesced_calls']} 次调用复用了进行中的相同请求")
+        if 'rate_limit_waits' in llm_stats:
+            logger.info(f"LLM限速: 排队等待 {llm_stats['rate_limit_waits']} 次")
+        if 'truncated_responses' in llm_stats:
+            logger.info(f"LLM输出截断: {llm_stats['truncated_responses']} 次达到max_tokens上限")
+        if llm_stats.get('input_tokens'):
+            cached_tokens = llm_stats.get('cached_input_tokens', 0)
+            logger.info(f"LLM提示词前缀缓存: 输入 {llm_stats['input_tokens']} 个token，命中 {cached_tokens} 个（{cached_tokens / llm_stats['input_tokens']:.1%}）")
+        
+        # 记录自适应并发调整情况
+        if self.data_processor.limiter:
+            concurrency = self.data_processor.limiter.snapshot()
+            logger.info(f"LLM并发上限: 最终 {concurrency['limit']}，共调整 {concurrency['adjustments']} 次")
+        
+        # 记录修复请求预算的使用情况
+        repairs = self.data_processor.repair_budget.snapshot()
+        if repairs['used'] or repairs['denied']:
+            logger.info(f"修复请求: 发出 {repairs['used']}/{repairs['limit']} 个，因预算不足放弃 {repairs['denied']} 个")
+        
+        # 记录按预测的max_tokens发出的请求
+        if self.data_processor.output_budget:
+            budget = self.data_processor.output_budget.snapshot()
+            if budget['predicted']:
+                logger.info(f"输出长度预测: {budget['predicted']} 个请求平均预留 {budget['reserved'] // budget['predicted']} 个token（上限 {budget['limit']}）")
+    
     def execute(self):
         """执行应用程序"""
         try:
@@ -57,32 +103,63 @@ class Application:
             # 创建数据加载器
             data_loader = DataLoaderFactory.create_data_loader("excel", settings=self.settings)
             
-            # 加载数据
-            raw_data_dict = data_loader.load_data(input_path)
-            
-            if not raw_data_dict:
-                logger.error("没有找到有效数据，程序结束")
-                return
+            # 开启stream_rows时边读取边处理，不预先加载整个工作簿
+            stream_rows = self.settings.get_config_value("input_excel_processing.stream_rows", False)
+            if not stream_rows:
+                # 加载数据
+                raw_data_dict = data_loader.load_data(input_path)
+                
+                if not raw_data_dict:
+                    logger.error("没有找到有效数据，程序结束")
+                    return
             
             # 处理数据
             logger.info("开始处理数据...")
-            processed_data_dict = {}
-            total_rows = 0
             
-            for sheet_name, raw_data in raw_data_dict.items():
-                logger.info(f"处理表格: {sheet_name}，共 {len(raw_data)} 行数据")
-                processed_data = self.data_processor.process_batch_data(raw_data, sheet_name)
-                processed_data_dict[sheet_name] = processed_data
-                total_rows += len(processed_data)
+            # 统计已生成的测试用例，记录首个测试用例的生成用时
+            case_counter = {"count": 0}
+            counter_lock = threading.Lock()
             
-            # 输出Excel文件
+            def on_case(case):
+                with counter_lock:
+                    case_counter["count"] += 1
+                    is_first = case_counter["count"] == 1
+                if is_first:
+                    logger.info(f"首个测试用例已生成（行 #{case['原始行号']}），用时 {time.time() - start_time:.2f}秒")
+            
+            # 完成一个表格即写入输出文件，不在内存中保留其测试用例
             excel_writer = FileWriterFactory.create_file_writer("excel", settings=self.settings)
-            excel_success = excel_writer.write_data(processed_data_dict, final_output_path)
+            # 流式读取按配置的表格顺序读取，输出文件中的表格顺序与读取顺序一致
+            sheet_names = self.settings.get_config_value("input_excel_processing.target_sheets") if stream_rows else list(raw_data_dict)
+            sheet_stream = excel_writer.open_stream(final_output_path, sheet_names)
+            finished_sheets = {}
+            
+            def on_sheet(sheet_name, processed_data):
+                sheet_stream.write_sheet(sheet_name, processed_data)
+                finished_sheets[sheet_name] = len(processed_data)
+            
+            # 所有表格的行提交到同一个工作池，按表格组装结果
+            if stream_rows:
+                self.data_processor.process_rows_data(data_loader.iter_data(input_path), on_case=on_case, on_sheet=on_sheet, keep_results=False)
+                if not finished_sheets:
+                    logger.error("没有找到有效数据，程序结束")
+                    return
+            else:
+                for sheet_name, raw_data in raw_data_dict.items():
+                    logger.info(f"处理表格: {sheet_name}，共 {len(raw_data)} 行数据")
+                self.data_processor.process_sheets_data(raw_data_dict, on_case=on_case, on_sheet=on_sheet, keep_results=False)
+            total_rows = sum(finished_sheets.values())
+            
+            self._log_job_stats()
+            
+            # 输出Excel文件
+            excel_success = sheet_stream.close()
             
             if excel_success:
                 elapsed_time = time.time() - start_time
                 logger.info(f"处理完成! 总耗时: {elapsed_time:.2f}秒")
                 logger.info(f"处理总行数: {total_rows}")
+                logger.info(f"生成测试用例数: {case_counter['count']}")
                 logger.info(f"输入文件: {input_path}")
                 logger.info(f"输出文件: {final_output_path}")
             else:
@@ -91,6 +168,8 @@ class Application:
         except Exception as e:
             logger.error(f"应用程序执行失败: {e}")
             raise
+        finally:
+            self.llm_client.close()
 
 def get_default_config_path():
     """获取默认配置文件路径"""
@@ -139,4 +218,5 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -3,8 +3,13 @@
 """
 from .logging_util import setup_logging, get_logger
 from .excel_util import ExcelProcessor
+from .async_util import get_event_loop, run_coroutine
+from .cache_util import WorkbookCache
 __all__ = [
     'setup_logging',
     'get_logger',
-    'ExcelProcessor'
+    'ExcelProcessor',
+    'get_event_loop',
+    'run_coroutine',
+    'WorkbookCache'
 ]
@@ -1,58 +1,188 @@
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+import openpyxl
 import pandas as pd
-from typing import List, Dict, Any
+from pandas.io.parsers.readers import STR_NA_VALUES
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from src.util.logging_util import get_logger
 logger = get_logger(__name__)
 class ExcelProcessor:
     """Excel文件处理器"""
     @staticmethod
-    def read_excel_with_sheets(file_path: str, sheet_names: List[str], header_rows: int, data_start_row: int, column_range: List[int] = None):
+    def read_excel_with_sheets(file_path: str, sheet_names: List[str], header_rows: int, data_start_row: int, column_range: List[int] = None, parse_workers: int = 1):
         """
         读取指定sheet的Excel文件
+        工作簿只打开一次，每个sheet只解析column_range内的列，已安装python-calamine时使用calamine引擎
+        parse_workers大于1且有多个sheet时，各sheet分发到进程池并行解析，每个工作进程自行打开工作簿，处理后的DataFrame按列返回
         """
         try:
             all_data = {}
-            # 读取整个Excel文件
-            excel_file = pd.ExcelFile(file_path)
-            available_sheets = excel_file.sheet_names
+            engine = ExcelProcessor.get_reader_engine()
+            # 打开Excel文件，各sheet共用
+            with pd.ExcelFile(file_path, engine=engine) as excel_file:
+                available_sheets = excel_file.sheet_names
+                # 检查请求的sheet是否存在
+                valid_sheets = []
+                for sheet_name in sheet_names:
+                    if sheet_name in available_sheets:
+                        valid_sheets.append(sheet_name)
+                    else:
+                        logger.warning(f"Sheet '{sheet_name}' 不存在，跳过")
+                if not valid_sheets:
+                    raise ValueError("没有找到有效的sheet")
+                workers = min(parse_workers or 1, len(valid_sheets))
+                if workers <= 1:
+                    # 按原始顺序处理每个sheet
+                    for sheet_name in valid_sheets:
+                        all_data[sheet_name] = ExcelProcessor.process_sheet(excel_file, sheet_name, data_start_row, column_range)
+            if workers > 1:
+                # 多个进程并行处理各sheet，结果仍按原始顺序
+                logger.info(f"使用 {workers} 个进程并行解析 {len(valid_sheets)} 个sheet")
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        pool.submit(ExcelProcessor.read_sheet, file_path, engine, sheet_name, data_start_row, column_range)
+                        for sheet_name in valid_sheets
+                    ]
+                    for sheet_name, future in zip(valid_sheets, futures):
+                        all_data[sheet_name] = future.result()
+            return all_data
+        except Exception as e:
+            logger.error(f"读取Excel失败: {e}")
+            raise
+    @staticmethod
+    def read_sheet(file_path: str, engine: Optional[str], sheet_name: str, data_start_row: int, column_range: List[int] = None) -> pd.DataFrame:
+        """
+        在工作进程中打开Excel文件并处理单个sheet
+        """
+        with pd.ExcelFile(file_path, engine=engine) as excel_file:
+            return ExcelProcessor.process_sheet(excel_file, sheet_name, data_start_row, column_range)
+    @staticmethod
+    def process_sheet(excel_file: pd.ExcelFile, sheet_name: str, data_start_row: int, column_range: List[int] = None) -> pd.DataFrame:
+        """
+        处理单个sheet：向下填充、以第1行作为列标题并截取数据部分
+        """
+        # 读取sheet，不设置列名，只解析列范围内的列
+        usecols = None
+        if column_range and len(column_range) == 2:
+            start_col = max(0, column_range[0] - 1)  # 转换为0-based索引
+            end_col = column_range[1]
+            usecols = lambda col: start_col <= col < end_col
+        df_raw = excel_file.parse(sheet_name, header=None, usecols=usecols)
+        # 对整个数据框进行垂直方向的向下填充
+        df_filled = df_raw.ffill(axis=0)
+        # 提取列标题（使用第1行，填充后的）
+        headers = []
+        for col in range(df_filled.shape[1]):
+            cell_value = df_filled.iloc[0, col]
+            header_name = cell_value if pd.notna(cell_value) else f"列_{col+1}"
+            headers.append(header_name)
+        # 提取数据部分（从data_start_row开始）
+        if df_filled.shape[0] >= data_start_row:
+            data_df = df_filled.iloc[data_start_row-1:, :].copy()
+            data_df.columns = headers
+            # 移除完全为空的行
+            data_df = data_df.dropna(how='all')
+            # 重置索引
+            data_df.reset_index(drop=True, inplace=True)
+            return data_df
+        logger.warning(f"Sheet '{sheet_name}' 数据行数不足")
+        return pd.DataFrame(columns=headers)
+    @staticmethod
+    def get_reader_engine() -> Optional[str]:
+        """
+        获取read_excel_with_sheets使用的解析引擎，未安装python-calamine时返回None，由pandas按文件类型选择
+        """
+        if importlib.util.find_spec("python_calamine") is None:
+            return None
+        return "calamine"
+    @staticmethod
+    def iter_rows_with_sheets(file_path: str, sheet_names: List[str], header_rows: int, data_start_row: int, column_range: List[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        按与read_excel_with_sheets相同的规则逐行读取指定sheet，依次产出(表名, 数据行)
+        以只读模式流式读取，不构建DataFrame，向下填充的状态在行之间延续，仍为空的单元格值为NaN
+        """
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
             # 检查请求的sheet是否存在
             valid_sheets = []
             for sheet_name in sheet_names:
-                if sheet_name in available_sheets:
+                if sheet_name in workbook.sheetnames:
                     valid_sheets.append(sheet_name)
                 else:
                     logger.warning(f"Sheet '{sheet_name}' 不存在，跳过")
             if not valid_sheets:
                 raise ValueError("没有找到有效的sheet")
-            # 按原始顺序处理每个sheet
+            # 按原始顺序逐行读取每个sheet
             for sheet_name in valid_sheets:
-                # 读取整个sheet，不设置列名
-                df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
-                # 应用列范围过滤
-                if column_range and len(column_range) == 2:
-                    start_col = max(0, column_range[0] - 1)  # 转换为0-based索引
-                    end_col = min(df_raw.shape[1], column_range[1])
-                    df_raw = df_raw.iloc[:, start_col:end_col]
-                # 对整个数据框进行垂直方向的向下填充
-                df_filled = df_raw.ffill(axis=0)
-                # 提取列标题（使用第1行，填充后的）
-                headers = []
-                for col in range(df_filled.shape[1]):
-                    cell_value = df_filled.iloc[0, col]
-                    header_name = cell_value if pd.notna(cell_value) else f"列_{col+1}"
-                    headers.append(header_name)
-                # 提取数据部分（从data_start_row开始）
-                if df_filled.shape[0] >= data_start_row:
-                    data_df = df_filled.iloc[data_start_row-1:, :].copy()
-                    data_df.columns = headers
-                    # 移除完全为空的行
-                    data_df = data_df.dropna(how='all')
-                    # 重置索引
-                    data_df.reset_index(drop=True, inplace=True)
-                    all_data[sheet_name] = data_df
-                else:
+                row_count = 0
+                for row in ExcelProcessor._iter_sheet_rows(workbook[sheet_name], data_start_row, column_range):
+                    row_count += 1
+                    yield sheet_name, row
+                if not row_count:
                     logger.warning(f"Sheet '{sheet_name}' 数据行数不足")
-                    all_data[sheet_name] = pd.DataFrame(columns=headers)
-            return all_data
         except Exception as e:
             logger.error(f"读取Excel失败: {e}")
             raise
+        finally:
+            workbook.close()
+    @staticmethod
+    def _iter_sheet_rows(worksheet, data_start_row: int, column_range: List[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐行产出单个sheet向下填充后的数据行，列标题使用第1行
+        只读一遍sheet，读到一行即产出一行；单元格保留openpyxl读出的类型，只按pandas的规则处理缺失值字符串和整数值的浮点数
+        列数随读到的最右侧有值的单元格增加，与read_excel一样不包含右侧全空的列
+        """
+        start_col, end_col = 0, None
+        if column_range and len(column_range) == 2:
+            start_col, end_col = max(0, column_range[0] - 1), column_range[1]
+        calamine = ExcelProcessor.get_reader_engine() == "calamine"
+        headers = []
+        filled = []
+        blank_rows = 0
+        for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            present = [col for col, value in enumerate(values) if not ExcelProcessor._is_empty(value, calamine)]
+            # 整行为空时暂不产出，位于sheet末尾时忽略
+            if not present:
+                blank_rows += 1
+                continue
+            # 夹在非空行之间的空行向下填充后与上一行相同
+            if any(value is not None for value in filled):
+                for _ in range(max(0, min(blank_rows, row_number - data_start_row))):
+                    yield ExcelProcessor._make_row(headers, filled)
+            blank_rows = 0
+            width = present[-1] + 1 if end_col is None else min(present[-1] + 1, end_col)
+            filled.extend([None] * (width - start_col - len(filled)))
+            for col, value in enumerate(values[start_col:start_col + len(filled)]):
+                value = ExcelProcessor._cell_value(value, calamine)
+                if value is not None:
+                    filled[col] = value
+            headers.extend(
+                filled[col] if row_number == 1 and filled[col] is not None else f"列_{col+1}"
+                for col in range(len(headers), len(filled))
+            )
+            # 移除完全为空的行
+            if row_number >= data_start_row and any(value is not None for value in filled):
+                yield ExcelProcessor._make_row(headers, filled)
+    @staticmethod
+    def _make_row(headers: List[Any], filled: List[Any]) -> Dict[str, Any]:
+        """
+        组装数据行，仍为空的单元格值为NaN
+        """
+        return {header: float("nan") if value is None else value for header, value in zip(headers, filled)}
+    @staticmethod
+    def _is_empty(value: Any, calamine: bool) -> bool:
+        """
+        单元格是否不计入read_excel读取的区域，calamine引擎计入空字符串单元格，openpyxl引擎不计入
+        """
+        return value is None or (value == "" and not calamine)
+    @staticmethod
+    def _cell_value(value: Any, calamine: bool) -> Any:
+        """
+        按pandas读取Excel的规则转换原始单元格值
+        缺失值字符串（calamine引擎下还有只含空白的字符串）为None，整数值的浮点数转为整数
+        """
+        if isinstance(value, str) and (value in STR_NA_VALUES or (calamine and not value.strip())):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
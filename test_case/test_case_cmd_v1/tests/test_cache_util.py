@@ -0,0 +1,63 @@
+import os
+import threading
+import pytest
+from src.util.cache_util import WorkbookCache
+RECORDS = {"功能": [{"模块": "车机", "功能点": "蓝牙", "编号": 1.0}]}
+READ_CONFIG = (2, 3, ["功能"], [1, 5])
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "input.xlsx"
+    path.write_bytes(b"workbook-content")
+    return path
+def test_key_follows_content_not_file_name(workbook, tmp_path):
+    renamed = tmp_path / "上传副本.xlsx"
+    renamed.write_bytes(workbook.read_bytes())
+    changed = tmp_path / "changed.xlsx"
+    changed.write_bytes(b"workbook-content-changed")
+    key = WorkbookCache.make_key(workbook, *READ_CONFIG)
+    assert WorkbookCache.make_key(renamed, *READ_CONFIG) == key
+    assert WorkbookCache.make_key(changed, *READ_CONFIG) != key
+@pytest.mark.parametrize("read_config", [
+    (1, 3, ["功能"], [1, 5]),
+    (2, 2, ["功能"], [1, 5]),
+    (2, 3, ["功能", "性能"], [1, 5]),
+    (2, 3, None, [1, 5]),
+    (2, 3, ["功能"], [1, 6]),
+])
+def test_key_changes_with_read_config(workbook, read_config):
+    assert WorkbookCache.make_key(workbook, *read_config) != WorkbookCache.make_key(workbook, *READ_CONFIG)
+def test_set_then_get_round_trips_records(tmp_path):
+    cache = WorkbookCache(tmp_path / "cache")
+    assert cache.get("key") is None
+    cache.set("key", RECORDS)
+    assert cache.get("key") == RECORDS
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["key.pkl"]
+def test_eviction_keeps_most_recently_used_entries(tmp_path):
+    cache = WorkbookCache(tmp_path, max_entries=2)
+    cache.set("old", RECORDS)
+    cache.set("used", RECORDS)
+    os.utime(tmp_path / "old.pkl", (1000, 1000))
+    os.utime(tmp_path / "used.pkl", (500, 500))
+    # 读取刷新访问时间，最久未访问的条目变为old
+    assert cache.get("used") == RECORDS
+    cache.set("new", RECORDS)
+    assert sorted(path.stem for path in tmp_path.glob("*.pkl")) == ["new", "used"]
+    assert cache.get("old") is None
+def test_unlimited_cache_keeps_every_entry(tmp_path):
+    cache = WorkbookCache(tmp_path, max_entries=0)
+    for index in range(5):
+        cache.set(f"key{index}", RECORDS)
+    assert len(list(tmp_path.glob("*.pkl"))) == 5
+@pytest.mark.parametrize("content", [b"", b"not a pickle", b"\x80\x05\x95\x10"])
+def test_corrupted_entry_is_a_miss_and_can_be_rewritten(tmp_path, content):
+    cache = WorkbookCache(tmp_path)
+    (tmp_path / "key.pkl").write_bytes(content)
+    assert cache.get("key") is None
+    cache.set("key", RECORDS)
+    assert cache.get("key") == RECORDS
+def test_failed_write_leaves_no_files(tmp_path):
+    cache = WorkbookCache(tmp_path)
+    cache.set("key", RECORDS)
+    cache.set("key", {"功能": [{"锁": threading.Lock()}]})
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["key.pkl"]
+    assert cache.get("key") == RECORDS
@@ -0,0 +1,72 @@
+import openpyxl
+import pytest
+from src.core.data_loader import ExcelDataLoader
+from src.util.excel_util import ExcelProcessor
+class DictSettings:
+    """
+    按点分路径读取字典的配置
+    """
+    def __init__(self, config):
+        self.config = config
+    def get_config_value(self, key_path, default=None):
+        value = self.config
+        for key in key_path.split("."):
+            if not isinstance(value, dict) or key not in value:
+                return default
+            value = value[key]
+        return value
+@pytest.fixture
+def workbook_path(tmp_path):
+    """
+    第一个表格有数据，第二个表格只有空白单元格，第三个表格有数据
+    """
+    workbook = openpyxl.Workbook()
+    first = workbook.active
+    first.title = "功能"
+    first.append(["模块", "功能点"])
+    first.append(["车机", "蓝牙"])
+    blank = workbook.create_sheet("空白")
+    blank.append(["模块", "功能点"])
+    blank.append([" ", "  "])
+    last = workbook.create_sheet("性能")
+    last.append(["模块", "功能点"])
+    last.append([" ", "  "])
+    last.append(["手机", "启动"])
+    path = tmp_path / "sheets.xlsx"
+    workbook.save(path)
+    return path
+def test_iter_data_skips_sheet_without_valid_rows(workbook_path, monkeypatch):
+    # 只有openpyxl引擎保留只含空白的单元格，calamine引擎将其视为缺失值并向下填充表头
+    monkeypatch.setattr("src.util.excel_util.ExcelProcessor.get_reader_engine", staticmethod(lambda: None))
+    loader = ExcelDataLoader(DictSettings({
+        "input_excel_processing": {"header_rows": 1, "data_start_row": 2, "target_sheets": ["功能", "空白", "性能"], "column_range": [1, 2]}
+    }))
+    records = list(loader.iter_data(workbook_path))
+    assert [(sheet_name, record["功能点"]) for sheet_name, record in records] == [("功能", "蓝牙"), ("性能", "  "), ("性能", "启动")]
+    loaded = loader.load_data(workbook_path)
+    assert [(sheet_name, record["功能点"]) for sheet_name, sheet_records in loaded.items() for record in sheet_records] == [("功能", "蓝牙"), ("性能", "  "), ("性能", "启动")]
+def test_load_data_reuses_cached_records_and_survives_corruption(workbook_path, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    loader = ExcelDataLoader(DictSettings({
+        "input_excel_processing": {
+            "header_rows": 1, "data_start_row": 2, "target_sheets": ["功能"], "column_range": [1, 2],
+            "workbook_cache": {"enabled": True, "path": str(cache_dir), "max_entries": 5}
+        }
+    }))
+    read_excel = ExcelProcessor.read_excel_with_sheets
+    reads = []
+    def counting_read_excel(*args, **kwargs):
+        reads.append(args[0])
+        return read_excel(*args, **kwargs)
+    monkeypatch.setattr(ExcelProcessor, "read_excel_with_sheets", staticmethod(counting_read_excel))
+    records = loader.load_data(workbook_path)
+    assert loader.load_data(workbook_path) == records
+    assert len(reads) == 1
+    # 损坏的条目视为未命中，重新解析后覆盖
+    entry_path, = cache_dir.glob("*.pkl")
+    entry_path.write_bytes(b"corrupted")
+    assert loader.load_data(workbook_path) == records
+    assert len(reads) == 2
+    assert loader.load_data(workbook_path) == records
+    assert len(reads) == 2
+
@@ -0,0 +1,34 @@
+import openpyxl
+from conftest import APP_ROOT
+from config.settings import Settings
+from src.core.file_writer import ExcelWriter
+CASES = [{"需求名称": "登录", "测试点编号": "TP_001", "测试点": "正确密码登录", "前置条件": "", "测试步骤": "输入密码", "预期结果": "登录成功", "原始行号": 1}]
+def cell_values(worksheet):
+    return [[cell.value for cell in row] for row in worksheet.iter_rows()]
+def test_sheet_stream_orders_sheets_and_matches_write(tmp_path):
+    writer = ExcelWriter(Settings(APP_ROOT / "config" / "config.json"))
+    # 各表格按完成的顺序写入
+    sheet_stream = writer.open_stream(tmp_path / "stream.xlsx", ["功能", "性能"])
+    sheet_stream.write_sheet("性能", [])
+    sheet_stream.write_sheet("功能", CASES)
+    assert sheet_stream.close()
+    assert writer.write_data({"功能": CASES, "性能": []}, tmp_path / "write.xlsx")
+    streamed = openpyxl.load_workbook(tmp_path / "stream.xlsx")
+    written = openpyxl.load_workbook(tmp_path / "write.xlsx")
+    assert streamed.sheetnames == written.sheetnames == ["功能", "性能"]
+    assert cell_values(streamed["功能"]) == cell_values(written["功能"]) == [
+        ["序号", "原始行号", "需求名称", "测试点编号", "测试点", "前置条件", "测试步骤", "预期结果"],
+        [1, writer.data_start_row, "登录", "TP_001", "正确密码登录", None, "输入密码", "登录成功"]
+    ]
+    assert cell_values(streamed["性能"]) == []
+    header, row = streamed["功能"][1], streamed["功能"][2]
+    assert header[0].font.b and not row[0].font.b
+    assert row[0].alignment.horizontal == writer.first_column_style.get("horizontal", "center")
+    assert row[1].alignment.horizontal == writer.other_columns_style.get("horizontal", "left")
+def test_sheet_stream_reports_a_failed_sheet(tmp_path):
+    writer = ExcelWriter(Settings(APP_ROOT / "config" / "config.json"))
+    sheet_stream = writer.open_stream(tmp_path / "stream.xlsx")
+    sheet_stream.write_sheet("功能", CASES)
+    sheet_stream.write_sheet("无效/表名", CASES)
+    assert not sheet_stream.close()
+    assert not (tmp_path / "stream.xlsx").exists()
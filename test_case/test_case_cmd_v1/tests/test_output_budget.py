@@ -0,0 +1,71 @@
+from src.llm.output_budget import OutputBudget, StagedPrompt
+from src.llm.rate_limiter import estimate_tokens
+from src.llm.structured_output import StructuredPrompt
+PROMPT = "STAGE:test_point\n# 输入\n功能ROW1"
+def test_prediction_starts_after_min_samples_and_follows_the_observed_ratio():
+    budget = OutputBudget(4096, safety_margin=0.5, min_samples=3)
+    prompt = StagedPrompt("提示词", "test_case", points=1)
+    for output_tokens in (100, 200):
+        budget.observe(prompt, output_tokens)
+        assert budget.predict(prompt) is None
+    budget.observe(prompt, 300)
+    # 每个测试点的比值均值200，标准差100，预测(200 + 2 * 100) * 2个测试点 * 1.5
+    assert budget.predict(StagedPrompt("提示词", "test_case", points=2)) == 1200
+    assert budget.snapshot() == {"limit": 4096, "predicted": 1, "reserved": 1200}
+def test_prompts_without_stage_or_output_are_not_counted():
+    budget = OutputBudget(4096, min_samples=2)
+    for _ in range(3):
+        budget.observe("普通提示词", 500)
+        budget.observe(StagedPrompt("提示词", "test_case", points=1), 0)
+    assert budget.predict("普通提示词") is None
+    assert budget.predict(StagedPrompt("提示词", "test_case", points=1)) is None
+    assert budget.snapshot() == {"limit": 4096, "predicted": 0, "reserved": 0}
+def test_stages_and_basis_types_keep_separate_statistics():
+    budget = OutputBudget(4096, safety_margin=0, min_samples=2)
+    for _ in range(2):
+        budget.observe(StagedPrompt("提示词", "test_case", points=1), 300)
+    assert budget.predict(StagedPrompt("提示词", "test_point", points=1)) is None
+    assert budget.predict(StagedPrompt("提示词", "test_case")) is None
+    assert budget.predict(StagedPrompt("提示词", "test_case", points=1)) == 300
+def test_prompt_length_is_the_basis_without_test_points():
+    budget = OutputBudget(4096, safety_margin=0.5, min_samples=2)
+    prompt = StagedPrompt("功能描述" * 50, "fused")
+    for _ in range(2):
+        budget.observe(prompt, 2 * estimate_tokens(prompt))
+    assert budget.predict(prompt) == 3 * estimate_tokens(prompt)
+def test_prediction_is_capped_by_max_and_min_tokens():
+    budget = OutputBudget(1000, safety_margin=0, min_samples=2, min_tokens=256)
+    for output_tokens in (400, 600):
+        budget.observe(StagedPrompt("提示词", "test_case", points=1), output_tokens)
+    for _ in range(2):
+        budget.observe(StagedPrompt("提示词", "test_point", points=1), 10)
+    # 每个测试点预测500 + 2 * 141.4，2个测试点超过上限
+    assert budget.predict(StagedPrompt("提示词", "test_case", points=1)) == 783
+    assert budget.predict(StagedPrompt("提示词", "test_case", points=2)) == 1000
+    assert budget.predict(StagedPrompt("提示词", "test_point", points=1)) == 256
+    # 下限不超过上限
+    small = OutputBudget(100, min_samples=2, min_tokens=256)
+    for _ in range(2):
+        small.observe(StagedPrompt("提示词", "test_point", points=1), 10)
+    assert small.predict(StagedPrompt("提示词", "test_point", points=1)) == 100
+def test_cache_key_uses_the_effective_max_tokens(make_processor):
+    client = make_processor().llm_client
+    # 未指定max_tokens时按模型配置的max_tokens生成
+    assert client._cache_key(PROMPT) == client._cache_key(PROMPT, 8192)
+    assert len({client._cache_key(PROMPT), client._cache_key(PROMPT, 1200), client._cache_key(PROMPT, 1500)}) == 3
+    # 结构化输出的请求不按预测值限制输出长度
+    structured = StructuredPrompt(PROMPT, {"type": "object"})
+    assert client._cache_key(structured, 1200) == client._cache_key(structured)
+def test_different_budgets_do_not_share_a_cache_entry(fake_llm, make_processor, tmp_path):
+    client = make_processor({"llm_cache": {"enabled": True, "path": str(tmp_path / "llm_cache.db")}}).llm_client
+    first = client.invoke_llm(PROMPT, max_tokens=4000)
+    second = client.invoke_llm(PROMPT, max_tokens=5000)
+    assert first == second and first.endswith("ROW1描述2")
+    assert [request["max_completion_tokens"] for request in fake_llm.requests] == [4000, 5000]
+    # 相同的max_tokens命中各自的缓存
+    assert client.invoke_llm(PROMPT, max_tokens=4000) == first
+    assert client.invoke_llm(PROMPT, max_tokens=5000) == second
+    assert len(fake_llm.requests) == 2
+    # 较小的max_tokens不使用较大限制下缓存的完整响应
+    assert len(client.invoke_llm(PROMPT, max_tokens=20)) == 20
+    assert len(fake_llm.requests) == 3
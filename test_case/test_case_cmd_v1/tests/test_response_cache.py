@@ -0,0 +1,70 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from src.llm import response_cache
+from src.llm.response_cache import ResponseCache
+PROMPT = "STAGE:test_point\n# 输入\n功能ROW1"
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    缓存模块使用的可控时钟
+    """
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+def test_expired_entries_miss_and_are_removed(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db", ttl_seconds=10)
+    cache.set("a", "响应a")
+    cache.set("b", "响应b")
+    clock.value += 5
+    assert cache.get("a") == "响应a"
+    clock.value += 6
+    assert cache.get("a") is None
+    # 读取时未发现的过期条目在清理时删除，时钟拨回后也不再命中
+    cache.evict()
+    clock.value -= 11
+    assert cache.get("b") is None
+def test_eviction_keeps_the_most_recently_accessed_entries(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, f"响应{key}")
+        clock.value += 1
+    assert cache.get("a") == "响应a"
+    cache.evict()
+    assert [cache.get(key) for key in ("a", "b", "c")] == ["响应a", None, "响应c"]
+def test_writes_keep_the_cache_within_max_entries(tmp_path, clock, monkeypatch):
+    # 每写入2次检查一次容量，第1、3、5次写入后清理
+    monkeypatch.setattr(ResponseCache, "_EVICT_INTERVAL", 2)
+    cache = ResponseCache(tmp_path / "cache.db", max_entries=2)
+    for key in ("a", "b", "c", "d", "e"):
+        cache.set(key, f"响应{key}")
+        clock.value += 1
+    assert [cache.get(key) for key in ("a", "b", "c", "d", "e")] == [None, None, None, "响应d", "响应e"]
+def test_entries_are_shared_between_threads_and_processes(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    threads = [threading.Thread(target=cache.set, args=(f"key{index}", f"响应{index}")) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 另一个缓存实例（如另一个进程）读取同一个文件
+    other = ResponseCache(tmp_path / "cache.db")
+    assert [other.get(f"key{index}") for index in range(8)] == [f"响应{index}" for index in range(8)]
+def test_closed_cache_misses_and_ignores_writes(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    cache.set("a", "响应a")
+    cache.close()
+    cache.close()
+    cache.set("b", "响应b")
+    cache.evict()
+    assert cache.get("a") is None
+    reopened = ResponseCache(tmp_path / "cache.db")
+    assert (reopened.get("a"), reopened.get("b")) == ("响应a", None)
+def test_closed_client_sends_requests_without_the_cache(fake_llm, make_processor, tmp_path):
+    client = make_processor({"llm_cache": {"enabled": True, "path": str(tmp_path / "llm_cache.db")}}).llm_client
+    client.invoke_llm(PROMPT)
+    client.invoke_llm(PROMPT)
+    assert len(fake_llm.requests) == 1
+    client.close()
+    assert "ROW1描述1" in client.invoke_llm(PROMPT)
+    assert len(fake_llm.requests) == 2
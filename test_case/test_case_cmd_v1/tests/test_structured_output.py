@@ -0,0 +1,69 @@
+import json
+import pytest
+from conftest import make_rows, merge_config
+from src.core.data_processor import OutputParser
+def structured_config(method="json_schema", max_repairs=50):
+    """
+    启用结构化输出的配置
+    """
+    return {"generation": {
+        "structured_output": {"enabled": True, "method": method},
+        "repair": {"max_requests_per_job": max_repairs}
+    }}
+def repair_prompts(fake_llm):
+    """
+    模拟接口收到的修复请求的提示词
+    """
+    return [prompt for prompt in fake_llm.prompts() if "# 待修正内容" in prompt]
+def test_parse_structured_cases_separates_invalid_records():
+    output = "```json\n" + json.dumps({"test_cases": [
+        {"需求名称": "登录", "测试点编号": "TP_001", "测试点": "正确密码登录", "前置条件": "已注册",
+         "测试步骤": "1. 输入密码\n2. 点击登录", "预期结果": "1. 登录成功"},
+        {"需求名称": "登录", "测试点编号": "TP_002", "测试点": "错误密码登录", "前置条件": "已注册",
+         "测试步骤": "", "预期结果": "1. 提示错误"}
+    ]}, ensure_ascii=False) + "\n```"
+    cases, invalid = OutputParser.parse_structured_cases(output)
+    assert cases == [{
+        "需求名称": "登录", "测试点编号": "TP_001", "测试点": "正确密码登录", "前置条件": "已注册",
+        "测试步骤": "1. 输入密码\n2. 点击登录", "预期结果": "1. 登录成功"
+    }]
+    assert [(record["测试点编号"], problems) for record, problems in invalid] == [("TP_002", ["字段“测试步骤”为空"])]
+def test_parse_structured_cases_reports_unusable_output():
+    assert OutputParser.parse_structured_cases("不是JSON") == ([], [("不是JSON", ["输出不是有效的JSON"])])
+    assert OutputParser.parse_structured_cases('{"cases": []}') == ([], [('{"cases": []}', ["输出中缺少test_cases数组"])])
+@pytest.mark.parametrize("method", ["json_schema", "function_calling"])
+def test_structured_request_constrains_output_and_parses_records(fake_llm, make_processor, method):
+    processor = make_processor(structured_config(method))
+    results = processor.process_sheets_data({"功能": make_rows(1)})
+    case_request = fake_llm.requests[-1]
+    if method == "json_schema":
+        assert case_request["response_format"]["type"] == "json_schema"
+        assert "test_cases" in case_request["response_format"]["json_schema"]["schema"]["properties"]
+        assert "tools" not in case_request
+    else:
+        assert case_request["tools"][0]["function"]["name"] == "test_cases"
+        assert case_request["tool_choice"]["function"]["name"] == "test_cases"
+        assert "response_format" not in case_request
+    # 测试点阶段仍按文本输出
+    assert "response_format" not in fake_llm.requests[0] and "tools" not in fake_llm.requests[0]
+    assert [(case["测试点编号"], case["测试步骤"]) for case in results["功能"]] == [("ROW1_TP_001", "1. 步骤1"), ("ROW1_TP_002", "1. 步骤2")]
+    assert not repair_prompts(fake_llm)
+def test_invalid_record_is_repaired_with_a_targeted_request(fake_llm, make_processor):
+    fake_llm.invalid_rows = {"ROW1"}
+    processor = make_processor(structured_config())
+    results = processor.process_sheets_data({"功能": make_rows(1)})
+    prompts = repair_prompts(fake_llm)
+    assert len(prompts) == 1
+    assert "ROW1_TP_002" in prompts[0] and "ROW1_TP_001" not in prompts[0]
+    assert "response_format" in fake_llm.requests[-1]
+    assert [(case["测试点编号"], case["测试步骤"]) for case in results["功能"]] == [("ROW1_TP_001", "1. 步骤1"), ("ROW1_TP_002", "1. 步骤2")]
+    assert processor.repair_budget.snapshot() == {"limit": 50, "used": 1, "denied": 0}
+def test_invalid_record_is_dropped_once_the_budget_is_spent(fake_llm, make_processor, caplog):
+    fake_llm.invalid_rows = {"ROW1", "ROW2"}
+    # 逐行处理，第1行先用完预算
+    processor = make_processor(merge_config(structured_config(max_repairs=1), {"input_excel_processing": {"default_threads": 1}}))
+    results = processor.process_sheets_data({"功能": make_rows(2)})
+    assert len(repair_prompts(fake_llm)) == 1
+    assert [case["测试点编号"] for case in results["功能"]] == ["ROW1_TP_001", "ROW1_TP_002", "ROW2_TP_001"]
+    assert processor.repair_budget.snapshot() == {"limit": 1, "used": 1, "denied": 1}
+    assert "修复预算已用完" in caplog.text
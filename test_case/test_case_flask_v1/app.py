@@ -2,7 +2,9 @@ import sys
 import os
 import json
 import threading
+import time
 import logging
+import multiprocessing
 import shutil
 from datetime import datetime
 from pathlib import Path
@@ -183,9 +185,68 @@ def save_prompt_files_sync(prompt_files, prompt_folder):
                 # 继续处理，使用默认提示词
     return saved_paths
 
+def watch_concurrency(job_id, limiter, logger):
+    """将自适应并发上限的调整同步到任务日志和处理状态"""
+    def on_change(event):
+        logger.info(f"LLM并发上限调整: {event['previous_limit']} -> {event['limit']}（{event['reason']}），"
+                    f"p95延迟 {event['p95_latency']}秒，错误率 {event['error_rate']:.1%}")
+        processing_status[job_id]['concurrency'] = limiter.snapshot()
+    
+    limiter.add_listener(on_change)
+    processing_status[job_id]['concurrency'] = limiter.snapshot()
+    logger.info(f"已启用自适应并发: 初始上限 {limiter.limit}，"
+                f"范围 {processing_status[job_id]['concurrency']['min_limit']}-"
+                f"{processing_status[job_id]['concurrency']['max_limit']}")
+
+def watch_cases(job_id, logger):
+    """创建测试用例回调，将逐个产出的测试用例计入处理状态，并记录首个测试用例的耗时"""
+    started, lock = time.time(), threading.Lock()
+    
+    def on_case(case):
+        with lock:
+            generated = processing_status[job_id].get('cases_generated', 0) + 1
+            processing_status[job_id]['cases_generated'] = generated
+        if generated == 1:
+            logger.info(f"首个测试用例已生成（行 #{case['原始行号']}），用时 {time.time() - started:.2f}秒")
+    
+    return on_case
+
+def log_job_stats(job_id, llm_client, data_processor, logger):
+    """将任务的LLM调用、并发调整、修复请求和输出长度预测统计写入任务日志，并同步最终并发状态"""
+    # 记录LLM响应缓存命中情况
+    llm_stats = llm_client.get_stats()
+    if 'cache_hits' in llm_stats or 'cache_misses' in llm_stats:
+        logger.info(f"LLM响应缓存: 命中 {llm_stats.get('cache_hits', 0)} 次, "
+                    f"未命中 {llm_stats.get('cache_misses', 0)} 次")
+    if 'coalesced_calls' in llm_stats:
+        logger.info(f"LLM请求合并: {llm_stats['coalesced_calls']} 次调用复用了进行中的相同请求")
+    if 'rate_limit_waits' in llm_stats:
+        logger.info(f"LLM限速: 排队等待 {llm_stats['rate_limit_waits']} 次")
+    if 'truncated_responses' in llm_stats:
+        logger.info(f"LLM输出截断: {llm_stats['truncated_responses']} 次达到max_tokens上限")
+    if llm_stats.get('input_tokens'):
+        cached_tokens = llm_stats.get('cached_input_tokens', 0)
+        logger.info(f"LLM提示词前缀缓存: 输入 {llm_stats['input_tokens']} 个token，命中 {cached_tokens} 个（{cached_tokens / llm_stats['input_tokens']:.1%}）")
+    
+    if data_processor.concurrency_limiter:
+        concurrency = data_processor.concurrency_limiter.snapshot()
+        processing_status[job_id]['concurrency'] = concurrency
+        logger.info(f"LLM并发上限: 最终 {concurrency['limit']}，共调整 {concurrency['adjustments']} 次")
+    
+    repairs = data_processor.repair_budget.snapshot()
+    if repairs['used'] or repairs['denied']:
+        logger.info(f"修复请求: 发出 {repairs['used']}/{repairs['limit']} 个，因预算不足放弃 {repairs['denied']} 个")
+    
+    if data_processor.output_budget:
+        budget = data_processor.output_budget.snapshot()
+        if budget['predicted']:
+            logger.info(f"输出长度预测: {budget['predicted']} 个请求平均预留 "
+                        f"{budget['reserved'] // budget['predicted']} 个token（上限 {budget['limit']}）")
+
 def process_excel_task(job_id, excel_path, prompt_files, config_data):
     """后台处理任务"""
     logger = WebLogger(job_id)
+    llm_client = None
     
     try:
         processing_status[job_id] = {'status': 'processing', 'message': '开始处理...', 'progress': 10}
@@ -209,6 +270,8 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
                 temp_config_data['file']['test_point_prompt_file'] = str(prompt_files['test_point'])
             if 'test_case' in prompt_files:
                 temp_config_data['file']['test_case_prompt_file'] = str(prompt_files['test_case'])
+            if 'fused' in prompt_files:
+                temp_config_data['file']['fused_prompt_file'] = str(prompt_files['fused'])
             
             # 保存临时配置
             with open(temp_config_path, 'w', encoding='utf-8') as f:
@@ -229,6 +292,8 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
         prompt_manager = PromptManager(settings)
         llm_client = LLMClientFactory.create(settings=settings)
         data_processor = DataProcessor(llm_client, prompt_manager, settings)
+        if data_processor.concurrency_limiter:
+            watch_concurrency(job_id, data_processor.concurrency_limiter, logger)
         
         processing_status[job_id].update({'message': '加载Excel数据...', 'progress': 30})
         logger.info(f"加载Excel数据: {excel_path}")
@@ -237,35 +302,20 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
         if not excel_path.exists():
             raise FileNotFoundError(f"Excel文件不存在: {excel_path}")
         
-        # 加载数据 - 使用用户上传的文件
+        # 加载数据 - 使用用户上传的文件；开启stream_rows时边读取边处理，不预先加载整个工作簿
         data_loader = DataLoaderFactory.create(settings=settings)
-        raw_data = data_loader.load(excel_path)
-        
-        if not raw_data:
-            raise ValueError("没有找到有效数据")
-        
-        logger.info(f"成功加载数据，共 {len(raw_data)} 个sheet")
+        stream_rows = settings.get("input_excel_processing.stream_rows", False)
+        if stream_rows:
+            sheet_names = data_loader.sheet_names(excel_path)
+        else:
+            raw_data = data_loader.load(excel_path)
+            if not raw_data:
+                raise ValueError("没有找到有效数据")
+            sheet_names = list(raw_data)
+            logger.info(f"成功加载数据，共 {len(raw_data)} 个sheet")
+        sheet_count = len(sheet_names)
         processing_status[job_id].update({'message': '生成测试用例...', 'progress': 50})
         
-        # 处理数据
-        processed_data = {}
-        total_cases = 0
-        
-        for sheet_name, sheet_data in raw_data.items():
-            logger.info(f"处理Sheet: {sheet_name}，共 {len(sheet_data)} 行数据")
-            processed_sheet = data_processor.process_batch(sheet_data, sheet_name)
-            processed_data[sheet_name] = processed_sheet
-            total_cases += len(processed_sheet)
-            
-            progress = 50 + (len(processed_data) / len(raw_data)) * 40
-            processing_status[job_id].update({
-                'message': f'已处理 {len(processed_data)}/{len(raw_data)} 个sheet',
-                'progress': min(90, progress)
-            })
-        
-        processing_status[job_id].update({'message': '生成输出文件...', 'progress': 90})
-        logger.info("生成输出Excel文件...")
-        
         # 生成输出文件 - 使用配置中的输出文件名模板
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_template = settings.get("file.output_file")
@@ -273,8 +323,36 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
         output_filename = f"{output_path_template.stem}_{timestamp}{output_path_template.suffix}"
         output_path = Path(app.config['OUTPUT_FOLDER']) / output_filename
         
+        # 处理数据 - 所有sheet的行提交到同一个工作池，完成一个sheet即写入输出文件并更新进度，不在内存中保留其测试用例
         excel_writer = FileWriterFactory.create(settings=settings)
-        success = excel_writer.write(processed_data, output_path)
+        output_stream = excel_writer.open(output_path, sheet_names)
+        finished_sheets = {}
+        on_case = watch_cases(job_id, logger)
+        
+        def on_sheet(sheet_name, processed_sheet):
+            output_stream.write_sheet(sheet_name, processed_sheet)
+            finished_sheets[sheet_name] = len(processed_sheet)
+            progress = 50 + (len(finished_sheets) / max(1, sheet_count)) * 40
+            processing_status[job_id].update({
+                'message': f'已处理 {len(finished_sheets)}/{sheet_count} 个sheet',
+                'progress': min(90, progress)
+            })
+        
+        if stream_rows:
+            data_processor.process_rows(data_loader.iter_records(excel_path), on_case=on_case, on_sheet=on_sheet, keep_results=False)
+            if not finished_sheets:
+                raise ValueError("没有找到有效数据")
+        else:
+            for sheet_name, sheet_data in raw_data.items():
+                logger.info(f"处理Sheet: {sheet_name}，共 {len(sheet_data)} 行数据")
+            data_processor.process_sheets(raw_data, on_case=on_case, on_sheet=on_sheet, keep_results=False)
+        
+        log_job_stats(job_id, llm_client, data_processor, logger)
+        
+        processing_status[job_id].update({'message': '生成输出文件...', 'progress': 90})
+        logger.info("生成输出Excel文件...")
+        success = output_stream.close()
+        total_cases = sum(finished_sheets.values())
         
         if success:
             logger.info(f"处理完成！生成 {total_cases} 个测试用例")
@@ -318,6 +396,10 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
             'status': 'error',
             'message': error_msg
         }
+    finally:
+        # 每个任务创建各自的客户端，任务结束即关闭其响应缓存的连接
+        if llm_client:
+            llm_client.close()
 
 @app.route('/')
 def index():
@@ -351,10 +433,12 @@ def config_management():
             # 设置提示词文件路径为内置的prompts文件夹
             config_data['file']['test_point_prompt_file'] = 'prompt/test_point.md'
             config_data['file']['test_case_prompt_file'] = 'prompt/test_case.md'
+            config_data['file']['fused_prompt_file'] = 'prompt/fused.md'
             
             # 更新处理配置
             config_data.setdefault('input_excel_processing', {})
             config_data['input_excel_processing']['default_threads'] = int(request.form.get('default_threads', 4))
+            config_data['input_excel_processing']['deduplicate_rows'] = request.form.get('deduplicate_rows', 'false') == 'true'
             config_data['input_excel_processing']['header_rows'] = int(request.form.get('header_rows', 2))
             config_data['input_excel_processing']['data_start_row'] = int(request.form.get('data_start_row', 3))
             
@@ -411,6 +495,7 @@ def upload_files():
         excel_file = request.files['excel_file']
         test_point_file = request.files.get('test_point_file')
         test_case_file = request.files.get('test_case_file')
+        fused_file = request.files.get('fused_file')
         
         # 验证Excel文件
         if not excel_file or not allowed_file(excel_file.filename, {'xlsx', 'xls'}):
@@ -431,6 +516,22 @@ def upload_files():
                 return redirect(request.url)
             prompt_files['test_case'] = test_case_file
         
+        if fused_file and fused_file.filename:
+            if not allowed_file(fused_file.filename, {'md', 'txt'}):
+                flash('单次生成提示词文件格式不正确 (.md, .txt)', 'error')
+                return redirect(request.url)
+            prompt_files['fused'] = fused_file
+        
+        # 当前生成模式不使用的提示词不会生效，拒绝上传以免误以为已使用
+        generation_mode = load_config().get('generation', {}).get('mode', 'two_stage')
+        if generation_mode == 'fused':
+            unused_prompts = [name for prompt_type, name in (('test_point', '测试点'), ('test_case', '测试用例')) if prompt_type in prompt_files]
+        else:
+            unused_prompts = ['单次生成'] if 'fused' in prompt_files else []
+        if unused_prompts:
+            flash(f"当前生成模式为 {generation_mode}，不使用上传的{'、'.join(unused_prompts)}提示词，请上传该模式使用的提示词或在配置中切换生成模式", 'error')
+            return redirect(request.url)
+        
         try:
             # 保存Excel文件到upload/input目录
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -487,6 +588,12 @@ def api_status(job_id):
         'progress': status.get('progress', 0)
     }
     
+    if 'concurrency' in status:
+        response['concurrency'] = status['concurrency']
+    
+    if 'cases_generated' in status:
+        response['cases_generated'] = status['cases_generated']
+    
     if result:
         response.update(result)
     
@@ -520,5 +627,6 @@ def download_result(job_id):
     )
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     setup_logging()
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
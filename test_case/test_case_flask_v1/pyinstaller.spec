@@ -33,7 +33,8 @@ hiddenimports = [
     'openpyxl',
     'langchain_openai', 
     'langchain_core',
-    'flask'
+    'flask',
+    'h2'
 ]
 
 # Hook路径
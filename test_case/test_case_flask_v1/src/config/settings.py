@@ -61,17 +61,18 @@ class Settings:
         except Exception as e:
             print(f"警告: 创建目录失败: {e}")
     
-    def get(self, key_path: str) -> Any:
+    def get(self, key_path: str, default: Any = None) -> Any:
         """通过点分隔的键路径获取配置值
         
         Args:
             key_path: 到配置值的点分隔路径
+            default: 键路径不存在时返回的默认值
             
         Returns:
             配置值
             
         Raises:
-            KeyError: 如果键路径不存在
+            KeyError: 如果键路径不存在且未提供默认值
         """
         keys = key_path.split('.')
         value = self._config
@@ -80,6 +81,8 @@ class Settings:
             if isinstance(value, dict) and key in value:
                 value = value[key]
             else:
+                if default is not None:
+                    return default
                 raise KeyError(f"配置键未找到: {key_path}")
         
         return value
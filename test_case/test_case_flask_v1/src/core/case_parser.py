@@ -0,0 +1,256 @@
+"""
+测试用例解析模块
+按声明的字段结构单遍扫描AI输出，解析为结构化的测试用例
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class CaseParser:
+    """单遍扫描的测试用例解析器
+    
+    字段结构以(字段名, 取值方式)序列声明，所有字段标签"字段名："预编译为一个正则，
+    一次扫描找出输出中的全部标签：起始字段的标签开始一个新的测试用例，每个字段的原始值
+    为其标签到下一个标签之间的文本，同一测试用例中重复出现的字段以第一次为准。
+    原始值再按取值方式整理，取值方式见NORMALIZERS。
+    
+    同一字段结构也用于结构化输出：record_schema生成单个测试用例的JSON Schema，
+    parse_record校验并转换模型按该结构输出的测试用例。
+    """
+    
+    # 编号列表项，如 "1. 步骤描述"
+    NUMBERED_ITEM_PATTERN = re.compile(r'^(\d+)\.\s*(.+)$')
+    
+    # 分隔线，如 ---
+    SEPARATOR_PATTERN = re.compile(r'---+\s*')
+    
+    # 列表项开头的序号，如 "1. "、"2、"
+    LEADING_NUMBER_PATTERN = re.compile(r'^\s*\d+\s*[.、．]\s*')
+    
+    # 取值方式到整理方法的映射：line 第一个非空行；text 原文；lines 逐行整理；
+    # numbered 编号列表项；no_separator 原文去除分隔线
+    NORMALIZERS = {
+        "line": "_first_line",
+        "text": "_strip",
+        "lines": "_clean_lines",
+        "numbered": "_numbered_items",
+        "no_separator": "_strip_separators",
+    }
+    
+    def __init__(self, fields: Sequence[Tuple[str, str]], case_start: str):
+        """初始化解析器
+        
+        Args:
+            fields: (字段名, 取值方式)序列，决定测试用例字典的字段及其顺序
+            case_start: 标志一个测试用例开始的字段名
+        """
+        self._names = [name for name, _ in fields]
+        self._modes = dict(fields)
+        self._normalizers: Dict[str, Callable[[str], str]] = {
+            name: getattr(self, self.NORMALIZERS[mode]) for name, mode in fields
+        }
+        self._case_start = case_start
+        
+        # 较长的标签在前，避免字段名互为前缀时匹配到较短的标签
+        labels = sorted(self._names, key=len, reverse=True)
+        self._label_pattern = re.compile('(' + '|'.join(map(re.escape, labels)) + ')：')
+    
+    def parse(self, ai_output: str) -> List[Dict[str, str]]:
+        """将AI输出解析为测试用例列表，跳过所有字段均为空的测试用例
+        
+        Args:
+            ai_output: 原始AI生成的文本
+        
+        Returns:
+            解析后的测试用例字典列表
+        """
+        cases: List[Dict[str, str]] = []
+        if not ai_output:
+            return cases
+        
+        raw: Dict[str, str] = {}
+        label, value_start = None, 0
+        for match in self._label_pattern.finditer(ai_output):
+            if label is not None and label not in raw:
+                raw[label] = ai_output[value_start:match.start()]
+            
+            label, value_start = match.group(1), match.end()
+            if label == self._case_start and raw:
+                self._append_case(cases, raw)
+                raw = {}
+        
+        if label is not None and label not in raw:
+            raw[label] = ai_output[value_start:]
+        self._append_case(cases, raw)
+        return cases
+    
+    def complete_prefix(self, ai_output: str) -> str:
+        """输出被截断时截至最后一个完整边界的前缀
+        
+        输出中已出现测试用例的字段时，最后一个测试用例可能不完整，前缀截至其起始标签之前；
+        否则（如测试点表格）前缀截至最后一个完整的行。
+        
+        Args:
+            ai_output: 被截断的AI输出
+        
+        Returns:
+            去除末尾不完整部分后的输出
+        """
+        case_starts, has_fields = [], False
+        for match in self._label_pattern.finditer(ai_output):
+            if match.group(1) == self._case_start:
+                case_starts.append(match.start())
+            else:
+                has_fields = True
+        
+        if has_fields and case_starts:
+            return ai_output[:case_starts[-1]].rstrip()
+        return ai_output[:ai_output.rfind('\n') + 1].rstrip()
+    
+    def record_schema(self) -> Dict[str, Any]:
+        """单个测试用例的JSON Schema，编号列表字段为字符串数组，其余字段为字符串"""
+        properties = {
+            name: {"type": "array", "items": {"type": "string"}} if mode == "numbered" else {"type": "string"}
+            for name, mode in self._modes.items()
+        }
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(self._names),
+            "additionalProperties": False,
+        }
+    
+    def parse_record(self, record: Any) -> Tuple[Optional[Dict[str, str]], List[str]]:
+        """校验并转换一个结构化输出的测试用例
+        
+        Args:
+            record: 模型输出的单个测试用例对象
+        
+        Returns:
+            (测试用例, 问题列表)，校验不通过时测试用例为None
+        """
+        if not isinstance(record, dict):
+            return None, ["测试用例应为对象"]
+        
+        case, problems = {}, []
+        for name in self._names:
+            value = record.get(name)
+            if value is None:
+                problems.append(f"缺少字段“{name}”")
+            elif self._modes[name] == "numbered":
+                if isinstance(value, str):
+                    value = value.split('\n')
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    problems.append(f"字段“{name}”应为字符串数组")
+                    continue
+                items = [self.LEADING_NUMBER_PATTERN.sub('', item).strip() for item in value]
+                case[name] = '\n'.join(f"{index}. {item}" for index, item in enumerate(filter(None, items), 1))
+            elif not isinstance(value, str):
+                problems.append(f"字段“{name}”应为字符串")
+            else:
+                case[name] = self._normalizers[name](value)
+            
+            if name in case and not case[name]:
+                problems.append(f"字段“{name}”为空")
+        
+        return (None, problems) if problems else (case, [])
+    
+    def _append_case(self, cases: List[Dict[str, str]], raw: Dict[str, str]) -> None:
+        """整理一个测试用例的原始字段值，有内容时追加到结果中"""
+        case = {name: self._normalizers[name](raw.get(name, "")) for name in self._names}
+        if any(case.values()):
+            cases.append(case)
+    
+    @staticmethod
+    def _first_line(value: str) -> str:
+        """取第一个非空行"""
+        return value.lstrip().partition('\n')[0].strip()
+    
+    @staticmethod
+    def _strip(value: str) -> str:
+        """去除首尾空白"""
+        return value.strip()
+    
+    @staticmethod
+    def _clean_lines(value: str) -> str:
+        """去除每行首尾空白并删除空行"""
+        return '\n'.join(line.strip() for line in value.split('\n') if line.strip())
+    
+    @staticmethod
+    def _numbered_items(value: str) -> str:
+        """提取编号列表项，没有编号列表项时保留原文"""
+        items = []
+        for line in value.split('\n'):
+            match = CaseParser.NUMBERED_ITEM_PATTERN.match(line.strip())
+            if match:
+                items.append(f"{match.group(1)}. {match.group(2)}")
+        
+        return '\n'.join(items) if items else value.strip()
+    
+    @staticmethod
+    def _strip_separators(value: str) -> str:
+        """去除首尾空白及---分隔线"""
+        return CaseParser.SEPARATOR_PATTERN.sub('', value.strip())
+
+
+class CompactCaseParser:
+    """紧凑输出格式的测试用例解析器
+    
+    紧凑格式每行一个测试用例，各列以制表符分隔：第一列为测试点序号，其余各列依次为模型生成的字段，
+    一个字段有多条内容时以"|"分隔且不带序号。测试点本身的字段不由模型逐个测试用例重复输出，
+    按测试点序号从调用方给出的测试点字段中取得，省去字段标签、列表缩进和重复的测试点内容。
+    解析结果的字段及其顺序与CaseParser相同。
+    """
+    
+    FIELD_SEPARATOR = '\t'
+    ITEM_SEPARATOR = '|'
+    
+    def __init__(self, fields: Sequence[Tuple[str, str]], columns: Sequence[str]):
+        """初始化解析器
+        
+        Args:
+            fields: (字段名, 取值方式)序列，与CaseParser相同
+            columns: 模型生成的字段名，按测试点序号之后的列顺序排列
+        """
+        self._names = [name for name, _ in fields]
+        self._modes = dict(fields)
+        self._columns = tuple(columns)
+    
+    def parse(self, ai_output: str, points: Dict[str, Dict[str, str]]) -> List[Dict[str, str]]:
+        """将紧凑格式的AI输出解析为测试用例列表
+        
+        Args:
+            ai_output: 紧凑格式的AI输出
+            points: 测试点序号到该测试点字段的映射
+        
+        Returns:
+            解析后的测试用例字典列表，第一列不是已知测试点序号的行（如表头、说明文字）被跳过
+        """
+        cases: List[Dict[str, str]] = []
+        for line in (ai_output or "").split('\n'):
+            key, separator, rest = line.strip().partition(self.FIELD_SEPARATOR)
+            if not separator or key.strip() not in points:
+                continue
+            
+            case = dict.fromkeys(self._names, "")
+            case.update(points[key.strip()])
+            for name, value in zip(self._columns, rest.split(self.FIELD_SEPARATOR)):
+                case[name] = self._normalize(name, value)
+            cases.append(case)
+        
+        return cases
+    
+    def _normalize(self, name: str, value: str) -> str:
+        """按字段的取值方式整理一列的内容：lines逐条成行，numbered及多条内容的字段逐条编号"""
+        mode = self._modes[name]
+        if mode == "line":
+            return value.strip()
+        
+        items = [CaseParser.LEADING_NUMBER_PATTERN.sub('', item).strip() for item in value.split(self.ITEM_SEPARATOR)]
+        items = [item for item in items if item]
+        if mode == "lines":
+            return '\n'.join(items)
+        if mode == "numbered" or len(items) > 1:
+            return '\n'.join(f"{index}. {item}" for index, item in enumerate(items, 1))
+        return items[0] if items else ""
\ No newline at end of file
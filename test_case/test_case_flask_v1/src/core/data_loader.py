@@ -3,14 +3,17 @@
 处理Excel数据的加载和验证
 """
 
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import warnings
 
 from ..util.excel_helper import ExcelHelper
 from ..util.logger import get_logger
+from ..util.workbook_cache import WorkbookCache
 
 
 logger = get_logger(__name__)
@@ -26,10 +29,14 @@ class ExcelDataLoader:
         self._data_start_row = settings.get("input_excel_processing.data_start_row")
         self._target_sheets = settings.get("input_excel_processing.target_sheets")
         self._column_range = settings.get("input_excel_processing.column_range")
+        self._parse_workers = settings.get("input_excel_processing.parse_workers", 1)
+        self._cache = self._init_cache()
     
     def load(self, file_path: Path) -> Dict[str, List[Dict[str, Any]]]:
         """从Excel文件加载数据
         
+        启用工作簿缓存时，内容和读取配置都相同的工作簿直接返回缓存的数据记录，不再解析Excel。
+        
         Args:
             file_path: Excel文件路径
             
@@ -45,7 +52,57 @@ class ExcelDataLoader:
         
         logger.info(f"加载数据: {file_path}")
         
+        cache_key, data_records = self._lookup_cache(file_path)
+        if data_records is not None:
+            return data_records
+        
         data_frames = ExcelHelper.read_excel(
+            str(file_path),
+            self._target_sheets,
+            self._header_rows,
+            self._data_start_row,
+            self._column_range,
+            self._parse_workers
+        )
+        
+        data_records = self._process_data_frames(data_frames)
+        if cache_key:
+            self._cache.set(cache_key, data_records)
+        return data_records
+    
+    def iter_records(self, file_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """从Excel文件逐行加载数据，按表依次产出(表名, 数据记录)
+        
+        与load的读取规则相同，但不构建DataFrame，读取一行即产出一行，
+        调用方可以在工作簿读取完毕之前开始处理。没有数据行的表不产出。命中工作簿缓存时
+        直接产出缓存的数据记录；未命中时不写入缓存，以免为写入缓存保留整个工作簿的记录。
+        
+        其他表可能已经开始处理，因此没有有效数据的表不像load那样中止加载，而是记录警告后跳过：
+        每个表在出现第一条有效记录之前暂存读到的记录，表读取完毕仍没有有效记录时丢弃。
+        
+        Args:
+            file_path: Excel文件路径
+        
+        Yields:
+            (表名, 数据记录)
+        
+        Raises:
+            FileNotFoundError: 如果文件不存在
+            ValueError: 如果表格未找到
+        """
+        if not file_path.exists():
+            raise FileNotFoundError(f"输入文件不存在: {file_path}")
+        
+        logger.info(f"流式加载数据: {file_path}")
+        
+        _, data_records = self._lookup_cache(file_path)
+        if data_records is not None:
+            for sheet_name, records in data_records.items():
+                for record in records:
+                    yield sheet_name, record
+            return
+        
+        rows = ExcelHelper.iter_rows(
             str(file_path),
             self._target_sheets,
             self._header_rows,
@@ -53,7 +110,63 @@ class ExcelDataLoader:
             self._column_range
         )
         
-        return self._process_data_frames(data_frames)
+        for sheet_name, sheet_rows in groupby(rows, key=itemgetter(0)):
+            record_count = 0
+            pending = []
+            for _, record in sheet_rows:
+                record_count += 1
+                if pending is not None:
+                    pending.append(record)
+                    if not any(value is not None and str(value).strip() for value in record.values()):
+                        continue
+                    for pending_record in pending:
+                        yield sheet_name, pending_record
+                    pending = None
+                else:
+                    yield sheet_name, record
+            
+            if pending is not None:
+                logger.warning(f"表格 {sheet_name} 未找到有效数据，已跳过")
+                continue
+            logger.info(f"[表格 {sheet_name}] 加载了 {record_count} 条记录")
+    
+    def sheet_names(self, file_path: Path) -> List[str]:
+        """返回iter_records将要读取的表名，用于在读取数据之前确定表的数量
+        
+        Raises:
+            ValueError: 如果表格未找到
+        """
+        return ExcelHelper.select_sheets(str(file_path), self._target_sheets)
+    
+    def _init_cache(self) -> Optional[WorkbookCache]:
+        """根据配置初始化工作簿缓存"""
+        cache_config = self._settings.get("input_excel_processing.workbook_cache", {})
+        if not cache_config.get('enabled', False):
+            return None
+        
+        return WorkbookCache(
+            Path(cache_config.get('path', 'cache/workbooks')),
+            max_entries=cache_config.get('max_entries', 0)
+        )
+    
+    def _lookup_cache(self, file_path: Path) -> Tuple[Optional[str], Optional[Dict[str, List[Dict[str, Any]]]]]:
+        """查找工作簿缓存
+        
+        Returns:
+            (缓存键, 缓存的数据记录)，未启用缓存时缓存键为None，未命中时数据记录为None
+        """
+        if not self._cache:
+            return None, None
+        
+        cache_key = WorkbookCache.make_key(
+            file_path, self._header_rows, self._data_start_row, self._target_sheets, self._column_range
+        )
+        data_records = self._cache.get(cache_key)
+        if data_records is not None:
+            logger.info(f"工作簿缓存命中，跳过Excel解析: {file_path}")
+            for sheet_name, records in data_records.items():
+                logger.info(f"[表格 {sheet_name}] 加载了 {len(records)} 条记录")
+        return cache_key, data_records
     
     def _process_data_frames(self, data_frames: Dict[str, pd.DataFrame]) -> Dict[str, List[Dict[str, Any]]]:
         """将DataFrame转换为字典记录并进行验证"""
@@ -0,0 +1,40 @@
+"""
+修复预算模块
+限制一个任务中定向修复请求的总数
+"""
+
+import threading
+from typing import Dict
+
+
+class RepairBudget:
+    """一个任务的修复请求预算（线程安全）
+    
+    修复请求只在输出不完整时发出，模型持续输出异常格式时预算用完即不再修复，
+    避免修复请求数量失控。
+    """
+    
+    def __init__(self, limit: int):
+        """初始化预算
+        
+        Args:
+            limit: 一个任务最多发出的修复请求数，0表示不发出修复请求
+        """
+        self._limit = max(0, limit)
+        self._used = 0
+        self._denied = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, count: int = 1) -> bool:
+        """申请count个修复请求的额度，剩余额度不足时不扣减并返回False"""
+        with self._lock:
+            if self._used + count > self._limit:
+                self._denied += count
+                return False
+            self._used += count
+            return True
+    
+    def snapshot(self) -> Dict[str, int]:
+        """当前预算的使用情况"""
+        with self._lock:
+            return {"limit": self._limit, "used": self._used, "denied": self._denied}
\ No newline at end of file
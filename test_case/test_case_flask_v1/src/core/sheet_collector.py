@@ -0,0 +1,120 @@
+"""
+结果收集模块
+按表收集请求组的结果，表内所有请求组完成后组装该表的测试用例
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..util.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class SheetCollector:
+    """按表收集测试用例（线程安全）
+    
+    一张表的行可以边读取边提交，表读取完毕（close）且已提交的请求组全部完成后才组装该表：
+    将代表行的测试用例复制给与其内容相同的其余行，按原始行号排序后交给on_sheet。
+    重复行可能在代表行的测试用例回调之后才被读取到，此时补发代表行已回调的测试用例。
+    由on_sheet写出结果时可不保留测试用例，内存中只有尚未完成的表。
+    """
+    
+    def __init__(self, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 on_sheet: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None, start_time: Optional[float] = None,
+                 keep_results: bool = True):
+        """初始化收集器
+        
+        Args:
+            on_case: 每产出一个测试用例时调用的回调，参数为带原始行号的测试用例
+            on_sheet: 一张表组装完成时调用的回调，参数为表名和按原始行号排序的测试用例
+            start_time: 处理开始时间，用于记录每张表的耗时
+            keep_results: 是否在results中保留各表的测试用例；为False时一张表交给on_sheet后即释放，
+                results为空，各表的测试用例数见case_counts
+        """
+        self._on_case = on_case
+        self._on_sheet = on_sheet
+        self._keep_results = keep_results
+        self._start_time = start_time or time.time()
+        self._sheets: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self.results: Dict[str, List[Dict[str, Any]]] = {}
+        self.case_counts: Dict[str, int] = {}
+    
+    def open(self, sheet_name: str) -> Optional[Callable[[Dict[str, Any]], None]]:
+        """开始收集一张表，重复调用时沿用已有的状态
+        
+        Returns:
+            该表的测试用例回调，未设置on_case时为None
+        """
+        with self._lock:
+            if sheet_name not in self._sheets:
+                self._sheets[sheet_name] = {
+                    "results": [], "duplicates": {}, "emitted": {}, "pending": 0, "closed": False
+                }
+                self.case_counts[sheet_name] = 0
+                if self._keep_results:
+                    self.results[sheet_name] = []
+        
+        if not self._on_case:
+            return None
+        
+        def on_case(case: Dict[str, Any]) -> None:
+            with self._lock:
+                state = self._sheets[sheet_name]
+                state["emitted"].setdefault(case["原始行号"], []).append(case)
+                self._on_case(case)
+                for row_idx in state["duplicates"].get(case["原始行号"], []):
+                    self._on_case({**case, "原始行号": row_idx})
+        
+        return on_case
+    
+    def add_duplicate(self, sheet_name: str, representative: int, row_idx: int) -> None:
+        """记录与代表行内容相同的一行，该行不单独处理，结果复制自代表行"""
+        with self._lock:
+            state = self._sheets[sheet_name]
+            state["duplicates"].setdefault(representative, []).append(row_idx)
+            for case in state["emitted"].get(representative, []):
+                self._on_case({**case, "原始行号": row_idx})
+    
+    def add_unit(self, sheet_name: str) -> None:
+        """记录一个已提交的请求组"""
+        with self._lock:
+            self._sheets[sheet_name]["pending"] += 1
+    
+    def add_results(self, sheet_name: str, results: List[Dict[str, Any]]) -> None:
+        """收集一个请求组的结果，表已读取完毕且所有请求组完成时组装该表"""
+        with self._lock:
+            state = self._sheets[sheet_name]
+            state["results"].extend(results)
+            state["pending"] -= 1
+        self._finish_if_done(sheet_name)
+    
+    def close(self, sheet_name: str) -> None:
+        """一张表的行已全部提交，其请求组均已完成时立即组装该表"""
+        with self._lock:
+            self._sheets[sheet_name]["closed"] = True
+        self._finish_if_done(sheet_name)
+    
+    def _finish_if_done(self, sheet_name: str) -> None:
+        """组装已完成的表：复制重复行的测试用例并按原始行号排序"""
+        with self._lock:
+            state = self._sheets[sheet_name]
+            if not state["closed"] or state["pending"] or state["results"] is None:
+                return
+            
+            results = list(state["results"])
+            for result in state["results"]:
+                for row_idx in state["duplicates"].get(result.get("原始行号"), []):
+                    results.append({**result, "原始行号": row_idx})
+            results.sort(key=lambda x: x.get("原始行号", 0))
+            self.case_counts[sheet_name] = len(results)
+            if self._keep_results:
+                self.results[sheet_name] = results
+            state.update(results=None, emitted={})
+        
+        logger.info(f"[表格 {sheet_name}] 在 {time.time() - self._start_time:.2f}秒内处理了 {len(results)} 个测试用例")
+        if self._on_sheet:
+            self._on_sheet(sheet_name, results)
@@ -0,0 +1,165 @@
+"""
+流式请求模块
+描述以流式方式发出的LLM请求，由数据处理引擎逐块驱动
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Union
+
+
+class StreamRequest:
+    """以流式方式发出的提示词
+    
+    处理流程yield该对象代替提示词字符串时，引擎流式调用LLM，把收到的文本块逐个交给feed，
+    feed返回False时中止请求；feed期间登记的追加提示词由引擎立即并行发出。
+    输出因长度限制被截断时，引擎调用discard_partial丢弃末尾不完整的部分，再把续写的文本交给feed。
+    响应结束后引擎调用finish，再将该对象send回处理流程：text为已收到的完整响应，
+    responses为追加提示词的响应，失败的调用以异常对象占位。
+    """
+    
+    def __init__(self, prompt: str):
+        """初始化流式请求
+        
+        Args:
+            prompt: 提示词
+        """
+        self.prompt = prompt
+        self.responses: List[Union[str, Exception]] = []
+        self.aborted = False
+        self._chunks: List[str] = []
+        self._pending: List[str] = []
+    
+    @property
+    def text(self) -> str:
+        """已收到的响应文本"""
+        return "".join(self._chunks)
+    
+    def feed(self, chunk: str) -> bool:
+        """接收一个响应文本块
+        
+        Args:
+            chunk: 响应文本块
+        
+        Returns:
+            是否继续接收，False表示应中止请求
+        """
+        self._chunks.append(chunk)
+        return True
+    
+    def finish(self) -> None:
+        """响应结束（包括中止）时由引擎调用"""
+    
+    def discard_partial(self) -> str:
+        """丢弃已收到文本末尾尚未完整的部分
+        
+        Returns:
+            保留的文本，续写从这里接着输出
+        """
+        text = self.text
+        kept = text[:len(text) - self._drop_partial()]
+        self._chunks = [kept]
+        return kept
+    
+    def _drop_partial(self) -> int:
+        """丢弃尚未处理的不完整部分，返回丢弃的字符数"""
+        return 0
+    
+    def take_prompts(self) -> List[str]:
+        """取出登记后尚未发出的追加提示词"""
+        prompts, self._pending = self._pending, []
+        return prompts
+
+
+class CaseStreamRequest(StreamRequest):
+    """流式生成测试用例的请求，每个测试用例块完整后立即解析并交给回调"""
+    
+    def __init__(self, prompt: str, parser, on_case: Optional[Callable[[Dict[str, str]], Any]] = None):
+        """初始化请求
+        
+        Args:
+            prompt: 提示词
+            parser: 增量解析器，提供feed、close、malformed和cases
+            on_case: 每解析出一个测试用例时调用的回调
+        """
+        super().__init__(prompt)
+        self._parser = parser
+        self._on_case = on_case
+    
+    @property
+    def cases(self) -> List[Dict[str, str]]:
+        """已解析出的测试用例"""
+        return self._parser.cases
+    
+    def feed(self, chunk: str) -> bool:
+        """解析文本块中已完整的测试用例，输出格式异常时要求中止"""
+        super().feed(chunk)
+        self._emit(self._parser.feed(chunk))
+        if self._parser.malformed:
+            self.aborted = True
+        return not self.aborted
+    
+    def finish(self) -> None:
+        """解析最后一个测试用例块"""
+        self._emit(self._parser.close())
+    
+    def _drop_partial(self) -> int:
+        """丢弃尚未完整的测试用例块"""
+        return self._parser.discard_partial()
+    
+    def _emit(self, cases: List[Dict[str, str]]) -> None:
+        """将新解析出的测试用例交给回调"""
+        if self._on_case:
+            for case in cases:
+                self._on_case(case)
+
+
+class PointStreamRequest(StreamRequest):
+    """流式生成测试点的请求，每条测试点所在的表格行完整后立即登记其测试用例提示词"""
+    
+    def __init__(self, prompt: str, is_point_line: Callable[[str], bool], build_prompt: Callable[[str, str], str]):
+        """初始化请求
+        
+        Args:
+            prompt: 测试点提示词
+            is_point_line: 判断一行文本是否为测试点表格行
+            build_prompt: 根据(表格之前的内容及表头, 测试点行)生成测试用例提示词
+        """
+        super().__init__(prompt)
+        self._is_point_line = is_point_line
+        self._build_prompt = build_prompt
+        self._line_buffer = ""
+        self._header_lines: List[str] = []
+        self.points: List[str] = []
+    
+    @property
+    def header(self) -> str:
+        """测试点表格之前的内容及表头"""
+        return '\n'.join(self._header_lines).strip()
+    
+    def feed(self, chunk: str) -> bool:
+        """逐行检查已完整的文本"""
+        super().feed(chunk)
+        self._line_buffer += chunk
+        *lines, self._line_buffer = self._line_buffer.split('\n')
+        for line in lines:
+            self._accept_line(line)
+        return True
+    
+    def finish(self) -> None:
+        """处理最后一行"""
+        if self._line_buffer:
+            self._accept_line(self._line_buffer)
+            self._line_buffer = ""
+    
+    def _drop_partial(self) -> int:
+        """丢弃尚未完整的最后一行"""
+        dropped, self._line_buffer = len(self._line_buffer), ""
+        return dropped
+    
+    def _accept_line(self, line: str) -> None:
+        """测试点行登记测试用例提示词，第一条测试点之前的内容作为表头"""
+        stripped = line.strip()
+        if self._is_point_line(stripped):
+            self.points.append(stripped)
+            self._pending.append(self._build_prompt(self.header, stripped))
+        elif not self.points:
+            self._header_lines.append(line)
\ No newline at end of file
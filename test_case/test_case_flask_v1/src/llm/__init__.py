@@ -2,7 +2,10 @@
 LLM模块
 """
 
+from .adaptive_limiter import AdaptiveLimiter
 from .client import LLMClientFactory
 from .prompt_manager import PromptManager
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
 
-__all__ = ['LLMClientFactory', 'PromptManager']
\ No newline at end of file
+__all__ = ['AdaptiveLimiter', 'LLMClientFactory', 'PromptManager', 'ResponseCache', 'SingleFlight']
\ No newline at end of file
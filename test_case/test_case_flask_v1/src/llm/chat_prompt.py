@@ -0,0 +1,61 @@
+"""
+对话提示词模块
+拆分为系统消息和用户消息的提示词
+"""
+
+from typing import Tuple
+
+
+# 提示词模板中单独一行的分隔标记，之前为系统消息，之后为用户消息
+USER_MESSAGE_MARKER = "<!-- user -->"
+
+
+def split_template(template: str) -> Tuple[str, str]:
+    """按分隔标记拆分提示词模板
+    
+    Args:
+        template: 提示词模板
+    
+    Returns:
+        (系统消息, 用户消息模板)，模板中没有分隔标记时系统消息为空，整个模板作为用户消息
+    """
+    system, marker, user = template.partition(f"\n{USER_MESSAGE_MARKER}\n")
+    if not marker:
+        return "", template
+    return system.strip(), user.strip()
+
+
+class ChatPrompt(str):
+    """拆分为系统消息和用户消息的提示词
+    
+    字符串值为系统消息加用户消息的完整文本，估算token、计算缓存键时与普通提示词相同；
+    LLM客户端识别到系统消息时分为两条消息发出。系统消息不含变量，各行的请求逐字节相同，
+    可以命中服务端的提示词前缀缓存。在末尾追加内容得到的提示词保留同一系统消息。
+    """
+    
+    def __new__(cls, text: str, system: str = ""):
+        """创建提示词
+        
+        Args:
+            text: 完整的提示词文本，有系统消息时以系统消息开头
+            system: 系统消息，为空时整个提示词作为一条用户消息发出
+        """
+        instance = super().__new__(cls, text)
+        instance.system = system
+        return instance
+    
+    def __add__(self, other: str) -> "ChatPrompt":
+        """在末尾追加内容，保留系统消息"""
+        return ChatPrompt(str.__add__(self, other), self.system)
+    
+    def extend_system(self, text: str) -> "ChatPrompt":
+        """在系统消息末尾追加不含变量的说明，没有系统消息时追加在整个提示词末尾"""
+        if not self.system:
+            return self + text
+        system = self.system + text
+        return ChatPrompt(f"{system}\n\n{self.user}", system)
+    
+    @property
+    def user(self) -> str:
+        """用户消息：完整文本去掉开头的系统消息"""
+        return self[len(self.system):].lstrip() if self.system else str(self)
\ No newline at end of file
@@ -7,6 +7,7 @@ import re
 from pathlib import Path
 from typing import Dict
 
+from .chat_prompt import ChatPrompt, split_template
 from ..util.logger import get_logger
 
 
@@ -14,13 +15,20 @@ logger = get_logger(__name__)
 
 
 class PromptManager:
-    """具有变量替换功能的AI提示词管理器"""
+    """具有变量替换功能的AI提示词管理器
+    
+    提示词模板中有单独一行的分隔标记“<!-- user -->”时，标记之前的静态说明作为系统消息原样发出，
+    不做变量替换；标记之后为用户消息模板，每行数据的变量放在这一部分。系统消息在各行之间逐字节相同，
+    可以命中服务端的提示词前缀缓存。没有分隔标记的模板整体作为一条用户消息。
+    """
     
     def __init__(self, settings):
         """使用提示词文件路径初始化管理器"""
         self._settings = settings
         self._test_point_file = Path(settings.get("file.test_point_prompt_file"))
         self._test_case_file = Path(settings.get("file.test_case_prompt_file"))
+        self._fused_file = Path(settings.get("file.fused_prompt_file", "prompt/fused.md"))
+        self._generation_mode = settings.get("generation.mode", "two_stage")
         self._prompts = self._load_prompts()
     
     def _load_prompts(self) -> Dict[str, str]:
@@ -39,9 +47,17 @@ class PromptManager:
             prompts["test_case"] = test_case_content
             logger.info(f"已加载测试用例提示词: {self._test_case_file}")
         
+        # 单次生成提示词，仅在单次生成模式下需要
+        if self._generation_mode == "fused":
+            prompts["fused"] = self._load_prompt_file(self._fused_file)
+            logger.info(f"已加载单次生成提示词: {self._fused_file}")
+        
         if not prompts:
             raise RuntimeError("未加载任何提示词")
         
+        for prompt_name, content in prompts.items():
+            self._validate_system(prompt_name, content)
+        
         logger.info(f"成功加载 {len(prompts)} 个提示词")
         return prompts
     
@@ -69,7 +85,7 @@ class PromptManager:
             variables: 用于替换的变量字典
             
         Returns:
-            格式化的提示词文本
+            格式化的提示词文本（ChatPrompt），模板有系统消息部分时携带系统消息
             
         Raises:
             ValueError: 如果提示词不存在或变量缺失
@@ -77,13 +93,13 @@ class PromptManager:
         if prompt_name not in self._prompts:
             raise ValueError(f"提示词未找到: {prompt_name}")
         
-        prompt = self._prompts[prompt_name]
+        system, prompt = split_template(self._prompts[prompt_name])
         
         if variables:
             self._validate_variables(prompt_name, prompt, variables)
             prompt = prompt.format(**variables)
         
-        return prompt
+        return ChatPrompt(f"{system}\n\n{prompt}", system) if system else ChatPrompt(prompt)
     
     def _validate_variables(self, prompt_name: str, prompt: str, variables: Dict[str, str]) -> None:
         """验证是否提供了所有必需的变量"""
@@ -92,4 +108,11 @@ class PromptManager:
         missing_vars = required_vars - provided_vars
         
         if missing_vars:
-            raise ValueError(f"提示词 '{prompt_name}' 缺少变量: {missing_vars}")
\ No newline at end of file
+            raise ValueError(f"提示词 '{prompt_name}' 缺少变量: {missing_vars}")
+    
+    def _validate_system(self, prompt_name: str, prompt: str) -> None:
+        """验证系统消息部分不含变量，系统消息原样发出，其中的变量不会被替换"""
+        system, _ = split_template(prompt)
+        system_vars = set(re.findall(r'\{(\w+)\}', system))
+        if system_vars:
+            raise ValueError(f"提示词 '{prompt_name}' 的系统消息部分不能包含变量: {system_vars}")
\ No newline at end of file
@@ -4,5 +4,7 @@
 
 from .logger import setup_logging, get_logger
 from .excel_helper import ExcelHelper
+from .async_helper import get_event_loop, run_coroutine
+from .workbook_cache import WorkbookCache
 
-__all__ = ['setup_logging', 'get_logger', 'ExcelHelper']
\ No newline at end of file
+__all__ = ['setup_logging', 'get_logger', 'ExcelHelper', 'get_event_loop', 'run_coroutine', 'WorkbookCache']
\ No newline at end of file
@@ -3,8 +3,13 @@ Excel工具模块
 提供Excel文件读取和处理功能
 """
 
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
 import pandas as pd
-from typing import Dict, List, Optional
+from pandas.io.parsers.readers import STR_NA_VALUES
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from .logger import get_logger
 
@@ -21,16 +26,23 @@ class ExcelHelper:
         sheet_names: List[str],
         header_rows: int,
         data_start_row: int,
-        column_range: Optional[List[int]] = None
+        column_range: Optional[List[int]] = None,
+        parse_workers: int = 1
     ) -> Dict[str, pd.DataFrame]:
         """从Excel文件读取指定表格并进行处理
         
+        工作簿只打开一次，各表格只解析column_range内的列；已安装python-calamine时
+        使用calamine引擎解析，否则使用openpyxl引擎。parse_workers大于1且要读取多个表格时，
+        各表格分发到进程池并行解析，每个工作进程自行打开工作簿，处理后的DataFrame按列返回，
+        总耗时接近最大的表格的解析耗时，解析也不再占用调用方进程的GIL。
+        
         Args:
             file_path: Excel文件路径
             sheet_names: 要读取的表格名称列表
             header_rows: 表头行数
             data_start_row: 数据起始行
             column_range: 可选的列范围 [开始, 结束]
+            parse_workers: 并行解析表格的进程数，1表示在当前进程中依次解析
             
         Returns:
             映射表名到DataFrame的字典
@@ -39,16 +51,32 @@ class ExcelHelper:
             ValueError: 如果文件无法读取或表格未找到
         """
         try:
-            excel_file = pd.ExcelFile(file_path, engine='openpyxl')
-            available_sheets = excel_file.sheet_names
+            engine = ExcelHelper._reader_engine()
+            with pd.ExcelFile(file_path, engine=engine) as excel_file:
+                available_sheets = excel_file.sheet_names
+                
+                valid_sheets = [name for name in sheet_names if name in available_sheets]
+                if not valid_sheets:
+                    raise ValueError(f"未找到有效表格。请求的: {sheet_names}, 可用的: {available_sheets}")
+                
+                workers = min(parse_workers or 1, len(valid_sheets))
+                if workers <= 1:
+                    frames = [
+                        ExcelHelper._process_sheet(excel_file, sheet_name, header_rows, data_start_row, column_range)
+                        for sheet_name in valid_sheets
+                    ]
             
-            valid_sheets = [name for name in sheet_names if name in available_sheets]
-            if not valid_sheets:
-                raise ValueError(f"未找到有效表格。请求的: {sheet_names}, 可用的: {available_sheets}")
+            if workers > 1:
+                logger.info(f"使用 {workers} 个进程并行解析 {len(valid_sheets)} 个表格")
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        pool.submit(ExcelHelper._read_sheet, file_path, engine, sheet_name, header_rows, data_start_row, column_range)
+                        for sheet_name in valid_sheets
+                    ]
+                    frames = [future.result() for future in futures]
             
             all_data = {}
-            for sheet_name in valid_sheets:
-                df = ExcelHelper._process_sheet(file_path, sheet_name, header_rows, data_start_row, column_range)
+            for sheet_name, df in zip(valid_sheets, frames):
                 all_data[sheet_name] = df
                 logger.info(f"已处理表格 '{sheet_name}': {len(df)} 行")
             
@@ -59,22 +87,169 @@ class ExcelHelper:
             raise
     
     @staticmethod
-    def _process_sheet(
+    def _reader_engine() -> str:
+        """选择read_excel使用的解析引擎，python-calamine未安装时回退到openpyxl"""
+        if importlib.util.find_spec("python_calamine") is None:
+            return "openpyxl"
+        return "calamine"
+    
+    @staticmethod
+    def select_sheets(file_path: str, sheet_names: List[str]) -> List[str]:
+        """返回iter_rows将要读取的表格名称，只读取工作簿的表格目录，不解析单元格
+        
+        Args:
+            file_path: Excel文件路径
+            sheet_names: 要读取的表格名称列表
+        
+        Returns:
+            工作簿中存在的表格名称，按请求的顺序
+        
+        Raises:
+            ValueError: 如果表格未找到
+        """
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return ExcelHelper._valid_sheets(workbook.sheetnames, sheet_names)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _valid_sheets(available_sheets: List[str], sheet_names: List[str]) -> List[str]:
+        """筛选工作簿中存在的表格，一个都不存在时抛出ValueError"""
+        valid_sheets = [name for name in sheet_names if name in available_sheets]
+        if not valid_sheets:
+            raise ValueError(f"未找到有效表格。请求的: {sheet_names}, 可用的: {available_sheets}")
+        return valid_sheets
+    
+    @staticmethod
+    def iter_rows(
+        file_path: str,
+        sheet_names: List[str],
+        header_rows: int,
+        data_start_row: int,
+        column_range: Optional[List[int]] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """逐行读取指定表格，按表依次产出(表名, 数据行)
+        
+        与read_excel的处理规则相同，但以只读模式流式读取工作簿，不构建DataFrame：
+        缺失值沿列向下填充，填充状态在行之间延续；表末尾的空行与read_excel一样被忽略。
+        每个表格只读一遍，读取一行即产出一行，内存占用与表的行数无关。单元格保留openpyxl读出的类型，
+        只按pandas的规则处理缺失值字符串和整数值的浮点数，不按整列推断类型，因此含有缺失值的数值列中的
+        整数仍为整数；只在之后的行中才出现值的列不出现在之前产出的行中。
+        
+        Args:
+            file_path: Excel文件路径
+            sheet_names: 要读取的表格名称列表
+            header_rows: 表头行数
+            data_start_row: 数据起始行
+            column_range: 可选的列范围 [开始, 结束]
+        
+        Yields:
+            (表名, 列名到单元格值的字典)，仍为空的单元格值为NaN
+        
+        Raises:
+            ValueError: 如果表格未找到
+        """
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name in ExcelHelper._valid_sheets(workbook.sheetnames, sheet_names):
+                row_count = 0
+                for row in ExcelHelper._iter_sheet_rows(workbook[sheet_name], data_start_row, column_range):
+                    row_count += 1
+                    yield sheet_name, row
+                logger.info(f"已处理表格 '{sheet_name}': {row_count} 行")
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _iter_sheet_rows(worksheet, data_start_row: int, column_range: Optional[List[int]]) -> Iterator[Dict[str, Any]]:
+        """逐行产出单个表格的数据行，第1行作为表头"""
+        start_col, end_col = 0, None
+        if column_range and len(column_range) == 2:
+            start_col, end_col = max(0, column_range[0] - 1), column_range[1]
+        
+        calamine = ExcelHelper._reader_engine() == "calamine"
+        headers: List[str] = []
+        filled: List[Any] = []
+        blank_rows = 0
+        for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            present = [col for col, value in enumerate(values) if not ExcelHelper._is_empty(value, calamine)]
+            # 整行为空时暂不产出，位于表末尾时忽略
+            if not present:
+                blank_rows += 1
+                continue
+            
+            # 夹在非空行之间的空行向下填充后与上一行相同
+            if any(value is not None for value in filled):
+                for _ in range(max(0, min(blank_rows, row_number - data_start_row))):
+                    yield ExcelHelper._make_row(headers, filled)
+            blank_rows = 0
+            
+            # 列数随读到的最右侧有值的单元格增加，与read_excel一样不包含右侧全空的列
+            width = present[-1] + 1 if end_col is None else min(present[-1] + 1, end_col)
+            filled.extend([None] * (width - start_col - len(filled)))
+            for col, value in enumerate(values[start_col:start_col + len(filled)]):
+                value = ExcelHelper._cell_value(value, calamine)
+                if value is not None:
+                    filled[col] = value
+            headers.extend(
+                str(filled[col]).strip() if row_number == 1 and filled[col] is not None else f"列_{col+1}"
+                for col in range(len(headers), len(filled))
+            )
+            
+            if row_number >= data_start_row and any(value is not None for value in filled):
+                yield ExcelHelper._make_row(headers, filled)
+    
+    @staticmethod
+    def _make_row(headers: List[str], filled: List[Any]) -> Dict[str, Any]:
+        """组装数据行，仍为空的单元格值为NaN"""
+        return {header: float("nan") if value is None else value for header, value in zip(headers, filled)}
+    
+    @staticmethod
+    def _is_empty(value: Any, calamine: bool) -> bool:
+        """单元格是否不计入read_excel读取的区域：calamine引擎计入空字符串单元格，openpyxl引擎不计入"""
+        return value is None or (value == "" and not calamine)
+    
+    @staticmethod
+    def _cell_value(value: Any, calamine: bool) -> Any:
+        """按pandas读取Excel的规则转换原始单元格值
+        
+        缺失值字符串为None，calamine引擎下只含空白的字符串也为None；整数值的浮点数转为整数。
+        """
+        if isinstance(value, str) and (value in STR_NA_VALUES or (calamine and not value.strip())):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    
+    @staticmethod
+    def _read_sheet(
         file_path: str,
+        engine: str,
+        sheet_name: str,
+        header_rows: int,
+        data_start_row: int,
+        column_range: Optional[List[int]]
+    ) -> pd.DataFrame:
+        """在工作进程中打开工作簿并处理单个表格"""
+        with pd.ExcelFile(file_path, engine=engine) as excel_file:
+            return ExcelHelper._process_sheet(excel_file, sheet_name, header_rows, data_start_row, column_range)
+    
+    @staticmethod
+    def _process_sheet(
+        excel_file: pd.ExcelFile,
         sheet_name: str,
         header_rows: int,
         data_start_row: int,
         column_range: Optional[List[int]]
     ) -> pd.DataFrame:
         """使用格式化和筛选处理单个表格"""
-        # 读取原始数据
-        df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=None, engine='openpyxl')
-        
-        # 应用列范围筛选器
+        # 读取原始数据，只解析列范围内的列
+        usecols = None
         if column_range and len(column_range) == 2:
-            start_col = max(0, column_range[0] - 1)
-            end_col = min(df_raw.shape[1], column_range[1])
-            df_raw = df_raw.iloc[:, start_col:end_col]
+            start_col, end_col = max(0, column_range[0] - 1), column_range[1]
+            usecols = lambda col: start_col <= col < end_col
+        df_raw = excel_file.parse(sheet_name, header=None, usecols=usecols)
         
         # 填充缺失值并提取表头
         df_filled = df_raw.ffill(axis=0)
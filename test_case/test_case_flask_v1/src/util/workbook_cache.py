@@ -0,0 +1,103 @@
+"""
+工作簿缓存模块
+按文件内容和读取配置缓存加载后的数据记录，内容相同的工作簿再次加载时不必重新解析Excel
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class WorkbookCache:
+    """持久化的工作簿解析结果缓存
+    
+    以工作簿内容和读取配置的哈希作为键，每个条目以pickle格式保存为缓存目录下的一个文件，
+    写入时先写临时文件再替换，多个进程可以共用同一个缓存目录。条目的修改时间即最近访问时间，
+    超过最大条数时淘汰最久未访问的条目。
+    """
+    
+    # 缓存格式版本，数据记录的结构变化时递增使旧条目失效
+    _FORMAT_VERSION = 1
+    
+    # 计算文件哈希时每次读取的字节数
+    _CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, cache_dir: Path, max_entries: int = 0):
+        """初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            max_entries: 最大缓存条数，0表示不限制
+        """
+        self._cache_dir = Path(cache_dir)
+        self._max_entries = max_entries or 0
+    
+    @classmethod
+    def make_key(cls, file_path: Path, header_rows: Any, data_start_row: Any, target_sheets: Any, column_range: Any) -> str:
+        """根据工作簿内容和读取配置生成缓存键，文件名和上传时间不影响缓存键"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(cls._CHUNK_SIZE), b''):
+                digest.update(chunk)
+        
+        payload = json.dumps(
+            [cls._FORMAT_VERSION, digest.hexdigest(), header_rows, data_start_row, target_sheets, column_range],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """读取缓存的数据记录，未命中或条目损坏时返回None"""
+        entry_path = self._entry_path(key)
+        if not entry_path.exists():
+            return None
+        
+        try:
+            with open(entry_path, 'rb') as f:
+                data_records = pickle.load(f)
+            os.utime(entry_path)
+            return data_records
+        except Exception as e:
+            logger.warning(f"读取工作簿缓存失败: {e}")
+            return None
+    
+    def set(self, key: str, data_records: Dict[str, List[Dict[str, Any]]]) -> None:
+        """写入数据记录并按最大条数淘汰旧条目，写入失败时删除临时文件，缓存保持不变"""
+        entry_path = self._entry_path(key)
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(data_records, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"写入工作簿缓存失败: {e}")
+            temp_path.unlink(missing_ok=True)
+            return
+        
+        self.evict()
+    
+    def evict(self) -> None:
+        """将缓存控制在最大条数以内（按最近访问时间淘汰）"""
+        if not self._max_entries:
+            return
+        
+        try:
+            entries = sorted(self._cache_dir.glob("*.pkl"), key=lambda path: path.stat().st_mtime, reverse=True)
+            for entry_path in entries[self._max_entries:]:
+                entry_path.unlink()
+        except OSError as e:
+            logger.warning(f"清理工作簿缓存失败: {e}")
+    
+    def _entry_path(self, key: str) -> Path:
+        """缓存条目的文件路径"""
+        return self._cache_dir / f"{key}.pkl"
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+测试配置
+将应用根目录加入模块搜索路径，测试按应用运行时的方式导入src包；
+提供经由httpx.MockTransport的模拟LLM接口和连接到该接口的数据处理器
+"""
+
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_ROOT))
+
+from src.config.settings import Settings
+from src.core.data_processor import DataProcessor
+from src.llm import connection_pool
+from src.llm.client import LLMClient
+from src.llm.prompt_manager import PromptManager
+
+
+# 测试用提示词，STAGE标记供模拟接口区分生成阶段，用户消息中只有每行的输入
+TEST_PROMPTS = {
+    "test_point": "STAGE:test_point\n<!-- user -->\n# 输入\n{test_point_input}",
+    "test_case": "STAGE:test_case\n<!-- user -->\n# 输入\n{test_case_input}",
+    "fused": "STAGE:fused\n单次输出【测试点】和【测试用例】两部分\n<!-- user -->\n# 输入\n{test_point_input}",
+}
+
+# 数据行的标识，如ROW3，模拟接口按标识为每行生成内容
+ROW_KEY_PATTERN = re.compile(r"ROW\d+")
+
+# 测试点编号，如ROW3_TP_001
+POINT_ID_PATTERN = re.compile(r"ROW\d+_TP_\d+")
+
+
+def make_rows(count: int, start: int = 1):
+    """生成count行数据，第n行的功能点为ROWn"""
+    return [{"模块": "车机", "功能点": f"功能ROW{index}"} for index in range(start, start + count)]
+
+
+class FakeLLM:
+    """模拟的OpenAI兼容聊天补全接口
+    
+    按请求中的行标识为该行生成两个测试点和两个测试用例，输出超过max_tokens个字符时截断并以length结束。
+    打包请求按<<<BEGIN n>>>分段逐行回答，dropped_rows中的行在打包输出中省略；
+    delays为行标识或测试点编号到响应延迟（秒）的映射（测试点编号用于只含一个测试点的请求），之后的failures个请求返回500，max_in_flight为同时在处理的请求数的最大值。
+    结构化输出请求以JSON（或工具调用参数）回答，invalid_rows中的行第二个测试用例的测试步骤为空，修复请求返回修正后的该测试用例。
+    """
+    
+    def __init__(self):
+        self.requests = []
+        self.dropped_rows = set()
+        self.delays = {}
+        self.failures = 0
+        self.invalid_rows = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+    
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """同步客户端的请求处理函数"""
+        body = json.loads(request.content)
+        self._track(1)
+        try:
+            time.sleep(self._delay(body))
+            return self._response(body)
+        finally:
+            self._track(-1)
+    
+    async def ahandle(self, request: httpx.Request) -> httpx.Response:
+        """异步客户端的请求处理函数"""
+        body = json.loads(request.content)
+        self._track(1)
+        try:
+            await asyncio.sleep(self._delay(body))
+            return self._response(body)
+        finally:
+            self._track(-1)
+    
+    def _track(self, delta: int) -> None:
+        """记录同时在处理的请求数及其最大值"""
+        with self._lock:
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    
+    def prompts(self):
+        """已收到的各请求的提示词文本"""
+        with self._lock:
+            return [self._text(body) for body in self.requests]
+    
+    @staticmethod
+    def _text(body) -> str:
+        return "\n".join(message["content"] for message in body["messages"] if isinstance(message.get("content"), str))
+    
+    def _delay(self, body) -> float:
+        point_ids = set(POINT_ID_PATTERN.findall(self._text(body)))
+        if len(point_ids) == 1 and point_ids <= self.delays.keys():
+            return self.delays[point_ids.pop()]
+        match = ROW_KEY_PATTERN.search(self._text(body))
+        return self.delays.get(match.group(), 0) if match else 0
+    
+    def reply(self, text: str) -> str:
+        """按提示词生成响应文本"""
+        if "# 已输出内容" in text:
+            prompt, _, rest = text.partition("\n\n# 已输出内容\n")
+            kept = rest.split("\n", 1)[1].rsplit("\n\n# 继续输出\n", 1)[0]
+            full = self.reply(prompt)
+            return full[len(kept):].lstrip("\n") if full.startswith(kept) else full
+        
+        if "# 批量输入" in text:
+            head, _, batch = text.partition("# 批量输入")
+            sections = re.findall(r"<<<BEGIN (\d+)>>>\n(.*?)\n<<<END \1>>>", batch, re.DOTALL)
+            return "\n\n".join(
+                f"<<<BEGIN {index}>>>\n{self._answer(head, content)}\n<<<END {index}>>>"
+                for index, content in sections if int(index) not in self.dropped_rows
+            )
+        
+        return self._answer(text, text)
+    
+    @staticmethod
+    def _answer(prompt: str, source: str) -> str:
+        key = ROW_KEY_PATTERN.search(source).group()
+        test_points = f"测试点：{key}\n\n测试点编号 | 测试点描述\n---|---\n{key}_TP_001 | {key}描述1\n{key}_TP_002 | {key}描述2"
+        if "# 紧凑输出" in prompt:
+            test_cases = "1\t车辆上电\t步骤一 | 步骤二\t结果一 | 结果二\n2\t车辆下电\t步骤A\t结果A"
+        else:
+            # 只回答提示词中列出的测试点，按测试点拆分的请求只得到该测试点的测试用例
+            points = [index for index in (1, 2) if f"{key}_TP_00{index}" in source] or [1, 2]
+            test_cases = "\n\n".join(
+                f"测试点：{key}\n测试点编号：{key}_TP_00{index}\n测试点描述：{key}描述{index}\n前置条件：车辆上电\n"
+                f"测试步骤：\n    1. 步骤{index}\n预期结果：\n    1. 结果{index}"
+                for index in points
+            )
+        
+        if "STAGE:fused" in prompt:
+            return f"【测试点】\n{test_points}\n\n【测试用例】\n{test_cases}"
+        if "STAGE:test_case" in prompt:
+            return test_cases
+        return test_points
+    
+    def structured_reply(self, text: str) -> str:
+        """按结构化提示词生成JSON响应文本"""
+        key = ROW_KEY_PATTERN.search(text).group()
+        if "# 待修正内容" in text:
+            return json.dumps({"test_cases": [self._record(key, 2)]}, ensure_ascii=False)
+        
+        records = [self._record(key, 1), self._record(key, 2)]
+        if key in self.invalid_rows:
+            records[1]["测试步骤"] = ""
+        payload = {"test_cases": records}
+        if "STAGE:fused" in text:
+            payload["test_points"] = self._answer("", text)
+        return json.dumps(payload, ensure_ascii=False)
+    
+    @staticmethod
+    def _record(key: str, index: int) -> dict:
+        return {"测试点": key, "测试点编号": f"{key}_TP_00{index}", "测试点描述": f"{key}描述{index}",
+                "前置条件": "车辆上电", "测试步骤": [f"步骤{index}"], "预期结果": [f"结果{index}"]}
+    
+    def _response(self, body) -> httpx.Response:
+        with self._lock:
+            self.requests.append(body)
+            failed = self.failures > 0
+            self.failures -= failed
+        
+        if failed:
+            return httpx.Response(500, json={"error": {"message": "服务暂不可用", "type": "server_error"}})
+        
+        if body.get("tools"):
+            arguments = self.structured_reply(self._text(body))
+            tool_call = {"id": "call_fake", "type": "function", "function": {"name": body["tools"][0]["function"]["name"], "arguments": arguments}}
+            message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+            usage = {"prompt_tokens": 100, "completion_tokens": len(arguments), "total_tokens": 100 + len(arguments)}
+            return self._completion(body, message, "tool_calls", usage)
+        
+        content = self.structured_reply(self._text(body)) if body.get("response_format") else self.reply(self._text(body))
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        if max_tokens and len(content) > max_tokens:
+            content, finish_reason = content[:max_tokens], "length"
+        usage = {"prompt_tokens": 100, "completion_tokens": len(content), "total_tokens": 100 + len(content)}
+        
+        if body.get("stream"):
+            chunks = [
+                {"choices": [{"index": 0, "delta": {"content": content[i:i + 20]}, "finish_reason": None}]}
+                for i in range(0, len(content), 20)
+            ]
+            chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+            chunks.append({"choices": [], "usage": usage})
+            events = "".join(
+                f"data: {json.dumps({'id': 'fake', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model'], **chunk}, ensure_ascii=False)}\n\n"
+                for chunk in chunks
+            )
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=(events + "data: [DONE]\n\n").encode())
+        
+        return self._completion(body, {"role": "assistant", "content": content}, finish_reason, usage)
+    
+    @staticmethod
+    def _completion(body, message, finish_reason, usage) -> httpx.Response:
+        return httpx.Response(200, json={
+            "id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """模拟的LLM接口，LLM客户端共享的HTTP客户端和调用链替换为经由MockTransport的新实例"""
+    llm = FakeLLM()
+    
+    def create_http_clients(pool_config):
+        return (
+            httpx.Client(transport=httpx.MockTransport(llm.handle)),
+            httpx.AsyncClient(transport=httpx.MockTransport(llm.ahandle))
+        )
+    
+    monkeypatch.setattr(connection_pool, "_create_http_clients", create_http_clients)
+    monkeypatch.setattr(connection_pool, "_http_clients", {})
+    monkeypatch.setattr(connection_pool, "_runnables", {})
+    return llm
+
+
+def merge_config(config, patch):
+    """将patch按层级合并到config中"""
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            merge_config(config[key], value)
+        else:
+            config[key] = value
+    return config
+
+
+@pytest.fixture
+def make_processor(fake_llm, tmp_path, monkeypatch):
+    """按应用配置加上patch创建连接到模拟接口的DataProcessor"""
+    monkeypatch.chdir(tmp_path)
+    prompt_files = {}
+    for name, content in TEST_PROMPTS.items():
+        prompt_files[name] = tmp_path / f"{name}.md"
+        prompt_files[name].write_text(content, encoding="utf-8")
+    
+    def make(patch=None):
+        config = json.loads((APP_ROOT / "config.json").read_text(encoding="utf-8"))
+        merge_config(config, {
+            "model": {"base_url": "http://llm.test/v1", "api_key": "sk-test", "max_retries": 0},
+            "file": {
+                "output_file": str(tmp_path / "output.xlsx"),
+                "test_point_prompt_file": str(prompt_files["test_point"]),
+                "test_case_prompt_file": str(prompt_files["test_case"]),
+                "fused_prompt_file": str(prompt_files["fused"])
+            }
+        })
+        merge_config(config, patch or {})
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        settings = Settings(config_path)
+        return DataProcessor(LLMClient(settings), PromptManager(settings), settings)
+    
+    return make
@@ -0,0 +1,70 @@
+"""
+对话提示词测试
+验证提示词模板按分隔标记拆分为系统消息和用户消息、没有标记时的回退，以及系统消息部分的变量校验
+"""
+
+import pytest
+
+from conftest import make_rows
+from src.llm.chat_prompt import ChatPrompt, split_template
+
+
+def test_template_is_split_at_the_marker_line():
+    template = "系统说明\n第二行\n<!-- user -->\n# 输入\n{test_point_input}"
+    
+    assert split_template(template) == ("系统说明\n第二行", "# 输入\n{test_point_input}")
+
+
+@pytest.mark.parametrize("template", ["# 输入\n{test_point_input}", "系统说明 <!-- user --> # 输入\n{test_point_input}"])
+def test_template_without_a_marker_line_is_all_user_message(template):
+    assert split_template(template) == ("", template)
+
+
+def test_chat_prompt_keeps_its_system_message_when_extended():
+    prompt = ChatPrompt("系统说明\n\n# 输入\n功能ROW1", "系统说明")
+    
+    assert prompt == "系统说明\n\n# 输入\n功能ROW1"
+    assert (prompt.system, prompt.user) == ("系统说明", "# 输入\n功能ROW1")
+    
+    appended = prompt + "\n# 补充"
+    assert (appended.system, appended.user) == ("系统说明", "# 输入\n功能ROW1\n# 补充")
+    
+    extended = prompt.extend_system("\n# 输出格式")
+    assert extended == "系统说明\n# 输出格式\n\n# 输入\n功能ROW1"
+    assert (extended.system, extended.user) == ("系统说明\n# 输出格式", "# 输入\n功能ROW1")
+
+
+def test_chat_prompt_without_system_message_is_all_user_message():
+    prompt = ChatPrompt("# 输入\n功能ROW1")
+    
+    assert (prompt.system, prompt.user) == ("", "# 输入\n功能ROW1")
+    assert prompt.extend_system("\n# 输出格式") == "# 输入\n功能ROW1\n# 输出格式"
+
+
+def test_prompt_manager_fills_variables_in_the_user_message_only(make_processor):
+    prompt_manager = make_processor()._prompt_manager
+    
+    prompt = prompt_manager.get_prompt("test_point", {"test_point_input": "功能ROW1"})
+    
+    assert isinstance(prompt, ChatPrompt)
+    assert (prompt.system, prompt.user) == ("STAGE:test_point", "# 输入\n功能ROW1")
+
+
+def test_prompt_manager_rejects_variables_in_the_system_message(make_processor, tmp_path):
+    (tmp_path / "test_case.md").write_text("STAGE:test_case\n{test_point_input}\n<!-- user -->\n{test_case_input}", encoding="utf-8")
+    
+    with pytest.raises(ValueError, match="test_case.*系统消息部分不能包含变量"):
+        make_processor()
+
+
+def test_client_sends_system_and_user_messages(fake_llm, make_processor, tmp_path):
+    make_processor().process_sheets({"功能": make_rows(1)})
+    # 没有分隔标记的模板整体作为一条用户消息
+    (tmp_path / "test_point.md").write_text("STAGE:test_point\n# 输入\n{test_point_input}", encoding="utf-8")
+    make_processor().process_sheets({"功能": make_rows(1)})
+    
+    point_requests = [body["messages"] for body in fake_llm.requests if "STAGE:test_point" in fake_llm._text(body)]
+    assert point_requests == [
+        [{"role": "system", "content": "STAGE:test_point"}, {"role": "user", "content": "# 输入\n功能ROW1"}],
+        [{"role": "user", "content": "STAGE:test_point\n# 输入\n功能ROW1"}]
+    ]
@@ -0,0 +1,100 @@
+"""
+数据加载测试
+流式加载跳过没有有效数据的表格，表格数量在读取数据之前按工作簿确定
+"""
+
+import openpyxl
+import pytest
+
+from src.core.data_loader import ExcelDataLoader
+from src.util.excel_helper import ExcelHelper
+
+
+class DictSettings:
+    """按点分路径读取字典的配置"""
+    
+    def __init__(self, config):
+        self._config = config
+    
+    def get(self, key_path, default=None):
+        value = self._config
+        for key in key_path.split("."):
+            if not isinstance(value, dict) or key not in value:
+                return default
+            value = value[key]
+        return value
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """第一个表格有数据，第二个表格只有空白单元格，第三个表格有数据"""
+    workbook = openpyxl.Workbook()
+    first = workbook.active
+    first.title = "功能"
+    first.append(["模块", "功能点"])
+    first.append(["车机", "蓝牙"])
+    blank = workbook.create_sheet("空白")
+    blank.append(["模块", "功能点"])
+    blank.append([" ", "  "])
+    last = workbook.create_sheet("性能")
+    last.append(["模块", "功能点"])
+    last.append([" ", "  "])
+    last.append(["手机", "启动"])
+    path = tmp_path / "sheets.xlsx"
+    workbook.save(path)
+    return path
+
+
+def _loader(target_sheets, workbook_cache=None):
+    return ExcelDataLoader(DictSettings({
+        "input_excel_processing": {
+            "header_rows": 1,
+            "data_start_row": 2,
+            "target_sheets": target_sheets,
+            "column_range": [1, 2],
+            "workbook_cache": workbook_cache or {}
+        }
+    }))
+
+
+def test_iter_records_skips_sheet_without_valid_rows(workbook_path, monkeypatch):
+    # 只有openpyxl引擎保留只含空白的单元格，calamine引擎将其视为缺失值并向下填充表头
+    monkeypatch.setattr(ExcelHelper, "_reader_engine", staticmethod(lambda: "openpyxl"))
+    records = list(_loader(["功能", "空白", "性能"]).iter_records(workbook_path))
+    
+    assert [(sheet_name, record["功能点"]) for sheet_name, record in records] == [
+        ("功能", "蓝牙"), ("性能", "  "), ("性能", "启动")
+    ]
+
+
+def test_sheet_names_counts_sheets_in_workbook(workbook_path):
+    assert _loader(["性能", "不存在", "功能"]).sheet_names(workbook_path) == ["性能", "功能"]
+    
+    with pytest.raises(ValueError):
+        _loader(["不存在"]).sheet_names(workbook_path)
+
+
+def test_load_reuses_cached_records_and_survives_corruption(workbook_path, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    loader = _loader(["功能"], {"enabled": True, "path": str(cache_dir), "max_entries": 5})
+    read_excel = ExcelHelper.read_excel
+    reads = []
+    
+    def counting_read_excel(*args, **kwargs):
+        reads.append(args[0])
+        return read_excel(*args, **kwargs)
+    
+    monkeypatch.setattr(ExcelHelper, "read_excel", staticmethod(counting_read_excel))
+    records = loader.load(workbook_path)
+    
+    assert loader.load(workbook_path) == records
+    assert len(reads) == 1
+    
+    # 损坏的条目视为未命中，重新解析后覆盖
+    entry_path, = cache_dir.glob("*.pkl")
+    entry_path.write_bytes(b"corrupted")
+    assert loader.load(workbook_path) == records
+    assert len(reads) == 2
+    assert loader.load(workbook_path) == records
+    assert len(reads) == 2
+
@@ -0,0 +1,307 @@
+"""
+数据处理测试
+通过模拟的LLM接口验证各引擎、去重、打包和续写下生成的测试用例
+"""
+
+import logging
+
+import httpx
+import pytest
+
+from conftest import POINT_ID_PATTERN, make_rows, merge_config
+from src.core.data_processor import OutputParser
+
+
+def expected_cases(keys):
+    """按原始行号排列的(原始行号, 测试点描述)，keys为各行的行标识"""
+    return [(row_index, f"{key}描述{point}") for row_index, key in enumerate(keys, 1) for point in (1, 2)]
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_results_follow_original_row_order(fake_llm, make_processor, engine):
+    # 前面的行响应更慢，请求完成的顺序与行序相反
+    fake_llm.delays = {f"ROW{index}": (7 - index) * 0.02 for index in range(1, 7)}
+    processor = make_processor({"input_excel_processing": {"engine": engine, "default_threads": 4, "async_concurrency": 4}})
+    
+    results = processor.process_sheets({"功能": make_rows(6), "性能": make_rows(2, start=7)})
+    
+    assert len(fake_llm.requests) == 16
+    assert list(results) == ["功能", "性能"]
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases([f"ROW{index}" for index in range(1, 7)])
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["性能"]] == expected_cases(["ROW7", "ROW8"])
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_submission_window_limits_in_flight_units(fake_llm, make_processor, engine):
+    fake_llm.delays = {f"ROW{index}": 0.02 for index in range(1, 9)}
+    processor = make_processor({"input_excel_processing": {
+        "engine": engine, "default_threads": 4, "async_concurrency": 4, "submission_window": 2
+    }})
+    
+    results = processor.process_sheets({"功能": make_rows(8)})
+    
+    # 每个请求组依次发出测试点和测试用例请求，同时在处理的请求数即在途的请求组数
+    assert fake_llm.max_in_flight == 2
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases([f"ROW{index}" for index in range(1, 9)])
+
+
+def test_finished_sheets_are_released_when_results_are_not_kept(fake_llm, make_processor):
+    processor = make_processor()
+    finished = {}
+    
+    results = processor.process_sheets(
+        {"功能": make_rows(2), "性能": make_rows(1, start=3)},
+        on_sheet=lambda sheet_name, cases: finished.update({sheet_name: [case["测试点描述"] for case in cases]}),
+        keep_results=False
+    )
+    
+    assert results == {}
+    assert finished == {"功能": ["ROW1描述1", "ROW1描述2", "ROW2描述1", "ROW2描述2"], "性能": ["ROW3描述1", "ROW3描述2"]}
+
+
+def test_sheet_order_logs_predicted_time_once_durations_are_known(fake_llm, make_processor, caplog):
+    caplog.set_level(logging.INFO)
+    processor = make_processor()
+    
+    processor.process_sheets({"功能": make_rows(2)})
+    assert "调度策略 sheet_order: 尚无耗时记录" in caplog.text
+    
+    # 上一个任务观测到的耗时用于预计本任务的总耗时
+    caplog.clear()
+    processor.process_sheets({"功能": make_rows(2)})
+    assert "调度策略 sheet_order: 预计耗时" in caplog.text
+
+
+def duplicate_rows():
+    """第3、5行与第1行相同，第4行与第2行相同"""
+    rows = make_rows(2)
+    return [rows[0], rows[1], dict(rows[0]), dict(rows[1]), dict(rows[0])]
+
+
+def llm_calls(fake_llm, processor):
+    """处理器发起的LLM调用次数，包括合并到在途相同请求的调用"""
+    return len(fake_llm.requests) + processor._llm_client.get_stats().get("coalesced_calls", 0)
+
+
+def test_duplicate_rows_share_one_request_and_fan_out(fake_llm, make_processor):
+    processor = make_processor({"input_excel_processing": {"deduplicate_rows": True}})
+    emitted = []
+    
+    results = processor.process_sheets({"功能": duplicate_rows(), "性能": make_rows(1)}, on_case=emitted.append)
+    
+    # 每张表内各自去重，功能表只处理两行，性能表中与功能表相同的行照常处理
+    assert llm_calls(fake_llm, processor) == 6
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases(["ROW1", "ROW2", "ROW1", "ROW2", "ROW1"])
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["性能"]] == expected_cases(["ROW1"])
+    assert sorted((case["原始行号"], case["测试点描述"]) for case in emitted) == sorted(
+        expected_cases(["ROW1", "ROW2", "ROW1", "ROW2", "ROW1"]) + expected_cases(["ROW1"])
+    )
+    # 复制的结果是独立的记录
+    results["功能"][0]["测试点描述"] = "已修改"
+    assert results["功能"][4]["测试点描述"] == "ROW1描述1"
+
+
+# 默认不合并内容相同的行
+@pytest.mark.parametrize("patch", [None, {"input_excel_processing": {"deduplicate_rows": False}}], ids=["default", "off"])
+def test_duplicate_rows_are_processed_when_dedup_is_off(fake_llm, make_processor, patch):
+    processor = make_processor(patch)
+    
+    results = processor.process_sheets({"功能": duplicate_rows()})
+    
+    assert llm_calls(fake_llm, processor) == 10
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases(["ROW1", "ROW2", "ROW1", "ROW2", "ROW1"])
+
+
+PACK_CONFIG = {"generation": {"pack_rows": {"enabled": True, "max_rows": 3}}}
+
+
+def is_packed(prompt):
+    """是否为多行打包请求"""
+    return "# 批量输入" in prompt
+
+
+def test_split_packed_output_keeps_marked_non_empty_sections():
+    output = (
+        "说明文字\n<<<BEGIN 3>>>\n  第三行输出 \n<<<END 3>>>\n"
+        "<<<BEGIN 5>>>\n\n<<<END 5>>>\n"
+        "<<<BEGIN 7>>>\n编号不一致\n<<<END 8>>>\n"
+        "<<<BEGIN 9>>>\n第九行\n第二段\n<<<END 9>>>"
+    )
+    
+    assert OutputParser.split_packed_output(output) == {3: "第三行输出", 9: "第九行\n第二段"}
+    assert OutputParser.split_packed_output("") == {}
+
+
+def test_packed_input_round_trips_through_markers():
+    packed = OutputParser.format_packed_input({2: "功能ROW2", 4: "功能ROW4"})
+    
+    assert packed.startswith("\n\n# 批量输入\n")
+    assert OutputParser.split_packed_output(packed) == {2: "功能ROW2", 4: "功能ROW4"}
+
+
+def test_packed_rows_are_split_back_to_their_rows(fake_llm, make_processor):
+    processor = make_processor(PACK_CONFIG)
+    
+    results = processor.process_sheets({"功能": make_rows(5)})
+    
+    # 5行按每组最多3行打包为2组，每组测试点和测试用例各一次请求
+    prompts = fake_llm.prompts()
+    assert len(prompts) == 4
+    assert all(is_packed(prompt) for prompt in prompts)
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases([f"ROW{index}" for index in range(1, 6)])
+
+
+def test_rows_missing_from_packed_output_are_retried_alone(fake_llm, make_processor):
+    fake_llm.dropped_rows = {2}
+    processor = make_processor(PACK_CONFIG)
+    
+    results = processor.process_sheets({"功能": make_rows(3)})
+    
+    single_prompts = [prompt for prompt in fake_llm.prompts() if not is_packed(prompt)]
+    assert len(single_prompts) == 2
+    assert all("ROW2" in prompt and "ROW1" not in prompt and "ROW3" not in prompt for prompt in single_prompts)
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases(["ROW1", "ROW2", "ROW3"])
+
+
+def test_failed_packed_request_falls_back_to_single_rows(fake_llm, make_processor):
+    fake_llm.failures = 1
+    processor = make_processor(PACK_CONFIG)
+    
+    results = processor.process_sheets({"功能": make_rows(3)})
+    
+    assert sum(not is_packed(prompt) for prompt in fake_llm.prompts()) == 6
+    assert [(case["原始行号"], case["测试点描述"]) for case in results["功能"]] == expected_cases(["ROW1", "ROW2", "ROW3"])
+
+
+# 每行两个测试用例的输出约170个字符，限制为110个字符时在第二个测试用例中截断
+TRUNCATING_CONFIG = {"model": {"max_tokens": 110}}
+
+
+def test_complete_prefix_drops_the_truncated_case():
+    output = "测试点：ROW1\n测试点描述：ROW1描述1\n前置条件：车辆上电\n\n测试点：ROW1\n测试点描述：ROW1描"
+    
+    assert OutputParser.complete_prefix(output) == "测试点：ROW1\n测试点描述：ROW1描述1\n前置条件：车辆上电"
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_truncated_output_is_continued_and_stitched(fake_llm, make_processor, engine, streaming):
+    processor = make_processor(merge_config({
+        "input_excel_processing": {"engine": engine},
+        "generation": {"continuation": {"enabled": True, "max_continuations": 2}, "streaming": {"enabled": streaming}}
+    }, dict(TRUNCATING_CONFIG)))
+    
+    results = processor.process_sheets({"功能": make_rows(2)})
+    
+    continuations = [prompt for prompt in fake_llm.prompts() if "# 已输出内容" in prompt]
+    assert len(continuations) == 2
+    assert all("ROW1描述1" in prompt or "ROW2描述1" in prompt for prompt in continuations)
+    assert [(case["原始行号"], case["测试点描述"], case["预期结果"]) for case in results["功能"]] == [
+        (row_index, f"ROW{row_index}描述{point}", f"1. 结果{point}") for row_index in (1, 2) for point in (1, 2)
+    ]
+
+
+def test_truncated_output_is_not_continued_when_disabled(fake_llm, make_processor):
+    processor = make_processor(merge_config({"generation": {"continuation": {"enabled": False}}}, dict(TRUNCATING_CONFIG)))
+    
+    results = processor.process_sheets({"功能": make_rows(1)})
+    
+    assert not any("# 已输出内容" in prompt for prompt in fake_llm.prompts())
+    # 第二个测试用例只保留了截断前的内容
+    assert [(case["测试点编号"], case["预期结果"]) for case in results["功能"]] == [("ROW1_TP_001", "1. 结果1"), ("ROW1_TP_0", "")]
+
+
+@pytest.mark.parametrize("mode", ["two_stage", "fused"])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_compact_output_is_expanded_to_full_cases(fake_llm, make_processor, mode, streaming):
+    processor = make_processor({"generation": {"mode": mode, "compact_output": {"enabled": True}, "streaming": {"enabled": streaming}}})
+    
+    results = processor.process_sheets({"功能": make_rows(1)})
+    
+    assert any("# 紧凑输出" in prompt for prompt in fake_llm.prompts())
+    assert results["功能"] == [
+        {
+            "原始行号": 1, "测试点": "ROW1", "测试点编号": "ROW1_TP_001", "测试点描述": "ROW1描述1",
+            "前置条件": "车辆上电", "测试步骤": "1. 步骤一\n2. 步骤二", "预期结果": "1. 结果一\n2. 结果二"
+        },
+        {
+            "原始行号": 1, "测试点": "ROW1", "测试点编号": "ROW1_TP_002", "测试点描述": "ROW1描述2",
+            "前置条件": "车辆下电", "测试步骤": "1. 步骤A", "预期结果": "1. 结果A"
+        }
+    ]
+
+
+SPLIT_CONFIG = {"generation": {"split_test_points": {"enabled": True, "max_parallel": 4}}}
+
+
+def case_prompts(fake_llm):
+    """模拟接口收到的测试用例请求的提示词"""
+    return [prompt for prompt in fake_llm.prompts() if "STAGE:test_case" in prompt]
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_split_mode_generates_each_test_point_separately(fake_llm, make_processor, engine, streaming):
+    # 每行第一个测试点的请求最慢，合并结果仍按测试点顺序
+    fake_llm.delays = {"ROW1_TP_001": 0.05, "ROW2_TP_001": 0.05}
+    processor = make_processor(merge_config({
+        "input_excel_processing": {"engine": engine},
+        "generation": {"streaming": {"enabled": streaming}}
+    }, SPLIT_CONFIG))
+    emitted = []
+    
+    results = processor.process_sheets({"功能": make_rows(2)}, on_case=emitted.append)
+    
+    # 每行一个测试点请求，每个测试点一个测试用例请求；开启流式输出时测试点请求以流式发出
+    assert len(fake_llm.requests) == 6
+    assert [body["stream"] for body in fake_llm.requests if "STAGE:test_point" in fake_llm._text(body)] == [streaming, streaming]
+    assert sorted(POINT_ID_PATTERN.findall(prompt) for prompt in case_prompts(fake_llm)) == [
+        ["ROW1_TP_001"], ["ROW1_TP_002"], ["ROW2_TP_001"], ["ROW2_TP_002"]
+    ]
+    assert [(case["原始行号"], case["测试点编号"], case["预期结果"]) for case in results["功能"]] == [
+        (row_index, f"ROW{row_index}_TP_00{point}", f"1. 结果{point}") for row_index in (1, 2) for point in (1, 2)
+    ]
+    assert sorted(case["测试点编号"] for case in emitted) == ["ROW1_TP_001", "ROW1_TP_002", "ROW2_TP_001", "ROW2_TP_002"]
+
+
+def test_split_mode_skips_a_failed_test_point(fake_llm, make_processor, monkeypatch, caplog):
+    reply = fake_llm.reply
+    
+    def reply_or_fail(text):
+        if "STAGE:test_case" in text and POINT_ID_PATTERN.findall(text) == ["ROW1_TP_002"]:
+            raise httpx.ConnectError("连接中断")
+        return reply(text)
+    
+    monkeypatch.setattr(fake_llm, "reply", reply_or_fail)
+    processor = make_processor(SPLIT_CONFIG)
+    
+    results = processor.process_sheets({"功能": make_rows(1)})
+    
+    assert [case["测试点编号"] for case in results["功能"]] == ["ROW1_TP_001"]
+    assert "测试点 ROW1_TP_002 | ROW1描述2 的测试用例生成失败" in caplog.text
+
+
+STRUCTURED_CONFIG = {"generation": {"structured_output": {"enabled": True}}}
+
+
+def test_structured_repair_does_not_need_generation_repair(fake_llm, make_processor, caplog):
+    fake_llm.invalid_rows = {"ROW1"}
+    processor = make_processor(merge_config({"generation": {"repair": {"enabled": False}}}, STRUCTURED_CONFIG))
+    
+    results = processor.process_sheets({"功能": make_rows(1)})
+    
+    assert sum("# 待修正内容" in prompt for prompt in fake_llm.prompts()) == 1
+    assert [case["测试点编号"] for case in results["功能"]] == ["ROW1_TP_001", "ROW1_TP_002"]
+    assert "修复预算已用完" not in caplog.text
+
+
+def test_invalid_structured_records_are_dropped_when_structured_repair_is_off(fake_llm, make_processor, caplog):
+    fake_llm.invalid_rows = {"ROW1"}
+    processor = make_processor({"generation": {"structured_output": {"enabled": True, "repair": False}}})
+    
+    results = processor.process_sheets({"功能": make_rows(1)})
+    
+    assert not any("# 待修正内容" in prompt for prompt in fake_llm.prompts())
+    assert [case["测试点编号"] for case in results["功能"]] == ["ROW1_TP_001"]
+    assert "未启用结构化输出修复" in caplog.text
+    assert "修复预算已用完" not in caplog.text
@@ -3,6 +3,7 @@
 仅负责初始化Flask应用、注册蓝图、加载配置、启动服务
 """
 
+import multiprocessing
 import os
 import sys
 from pathlib import Path
@@ -84,5 +85,6 @@ def register_blueprints(app):
     app.register_blueprint(result_blueprint)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
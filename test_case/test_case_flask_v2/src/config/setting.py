@@ -99,9 +99,9 @@ class ConfigService:
         
         return value
     
-    def get_file_path(self, config_key: str) -> Path:
+    def get_file_path(self, config_key: str, default: str = None) -> Path:
         """获取文件路径配置，支持打包环境"""
-        path_str = self.get(f"file.{config_key}")
+        path_str = self.get(f"file.{config_key}", default)
         path = Path(path_str)
         
         # 如果是相对路径，转换为基于基础目录的绝对路径
@@ -124,6 +124,14 @@ class ConfigService:
     def get_style_config(self) -> Dict[str, Any]:
         """获取样式配置"""
         return self.get("output_excel_style", {})
+    
+    def get_cache_config(self) -> Dict[str, Any]:
+        """获取LLM响应缓存配置"""
+        return self.get("llm_cache", {})
+    
+    def get_generation_config(self) -> Dict[str, Any]:
+        """获取生成模式配置"""
+        return self.get("generation", {})
 
 def get_config() -> ConfigService:
     """获取配置服务实例"""
@@ -3,14 +3,17 @@
 处理Excel数据的加载和验证
 """
 
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import pandas as pd
 import warnings
 
 from .interface import IDataLoader
 from .exception import FileOperationException, ValidationException
 from ..config.setting import get_config
+from ..util.cache_util import WorkbookCache
 from ..util.excel_util import ExcelHelper
 from ..util.logger_util import get_logger
 
@@ -27,6 +30,8 @@ class ExcelDataLoader(IDataLoader):
         self._data_start_row = processing_config.get("data_start_row", 3)
         self._target_sheets = processing_config.get("target_sheets", [])
         self._column_range = processing_config.get("column_range", [1, 4])
+        self._parse_workers = processing_config.get("parse_workers", 1)
+        self._cache = self._init_cache(processing_config.get("workbook_cache", {}))
     
     def load(self, file_path: Path) -> Dict[str, List[Dict[str, Any]]]:
         if not file_path.exists():
@@ -35,20 +40,113 @@ class ExcelDataLoader(IDataLoader):
         logger.info(f"加载数据: {file_path}")
         
         try:
+            cache_key, data_records = self._lookup_cache(file_path)
+            if data_records is not None:
+                return data_records
+            
             data_frames = ExcelHelper.read_excel(
                 str(file_path),
                 self._target_sheets,
                 self._header_rows,
                 self._data_start_row,
-                self._column_range
+                self._column_range,
+                self._parse_workers
             )
             
-            return self._process_data_frames(data_frames)
+            data_records = self._process_data_frames(data_frames)
+            if cache_key:
+                self._cache.set(cache_key, data_records)
+            return data_records
+            
+        except Exception as e:
+            logger.error(f"加载Excel文件失败: {e}")
+            raise FileOperationException(f"加载Excel文件失败: {e}")
+    
+    def iter_records(self, file_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按与load相同的读取和清理规则逐行加载数据，依次产出(表名, 数据记录)，调用方可以在工作簿读取完毕之前开始处理
+        
+        命中工作簿缓存时直接产出缓存的数据记录；未命中时不写入缓存，以免为写入缓存保留整个工作簿的记录。
+        其他表格可能已经开始处理，因此没有有效数据的表格记录警告后跳过，而不是像load那样中止加载：每个表格在出现第一条有效记录之前暂存读到的记录。
+        """
+        if not file_path.exists():
+            raise FileOperationException(f"输入文件不存在: {file_path}")
+        
+        logger.info(f"流式加载数据: {file_path}")
+        
+        try:
+            _, data_records = self._lookup_cache(file_path)
+            if data_records is not None:
+                for sheet_name, records in data_records.items():
+                    for record in records:
+                        yield sheet_name, record
+                return
+            
+            rows = ExcelHelper.iter_rows(
+                str(file_path),
+                self._target_sheets,
+                self._header_rows,
+                self._data_start_row,
+                self._column_range
+            )
             
+            for sheet_name, sheet_rows in groupby(rows, key=itemgetter(0)):
+                record_count = valid_count = 0
+                pending = []
+                for _, record in sheet_rows:
+                    record = {key: '' if value is None else value for key, value in record.items()}
+                    record_count += 1
+                    if any(str(value).strip() for value in record.values()):
+                        valid_count += 1
+                    if not valid_count:
+                        pending.append(record)
+                        continue
+                    for pending_record in pending:
+                        yield sheet_name, pending_record
+                    pending = []
+                    yield sheet_name, record
+                
+                if not valid_count:
+                    logger.warning(f"表格 {sheet_name} 未找到有效数据，已跳过")
+                    continue
+                logger.info(f"表格 {sheet_name} 有效记录数: {valid_count}/{record_count}")
+                logger.info(f"[表格 {sheet_name}] 加载了 {record_count} 条记录")
+        
         except Exception as e:
             logger.error(f"加载Excel文件失败: {e}")
             raise FileOperationException(f"加载Excel文件失败: {e}")
     
+    def sheet_names(self, file_path: Path) -> List[str]:
+        """返回iter_records将要读取的表名，用于在读取数据之前确定表格数量"""
+        try:
+            return ExcelHelper.select_sheets(str(file_path), self._target_sheets)
+        except Exception as e:
+            logger.error(f"读取Excel表格目录失败: {e}")
+            raise FileOperationException(f"读取Excel表格目录失败: {e}")
+    
+    def _init_cache(self, cache_config: Dict[str, Any]) -> Optional[WorkbookCache]:
+        """根据配置创建工作簿缓存，缓存条目保存在缓存目录下的workbooks目录"""
+        if not cache_config.get('enabled', False):
+            return None
+        return WorkbookCache(
+            self._config.get_file_path("cache_dir", "cache") / "workbooks",
+            max_entries=cache_config.get('max_entries', 0)
+        )
+    
+    def _lookup_cache(self, file_path: Path) -> Tuple[Optional[str], Optional[Dict[str, List[Dict[str, Any]]]]]:
+        """查找工作簿缓存，返回(缓存键, 缓存的数据记录)，未启用缓存时缓存键为None，未命中时数据记录为None"""
+        if not self._cache:
+            return None, None
+        
+        cache_key = WorkbookCache.make_key(
+            file_path, self._header_rows, self._data_start_row, self._target_sheets, self._column_range
+        )
+        data_records = self._cache.get(cache_key)
+        if data_records is not None:
+            logger.info(f"工作簿缓存命中，跳过Excel解析: {file_path}")
+            for sheet_name, records in data_records.items():
+                logger.info(f"[表格 {sheet_name}] 加载了 {len(records)} 条记录")
+        return cache_key, data_records
+    
     def _process_data_frames(self, data_frames: Dict[str, pd.DataFrame]) -> Dict[str, List[Dict[str, Any]]]:
         data_records = {}
         
@@ -3,14 +3,31 @@
 处理AI驱动的测试用例生成和解析
 """
 
+import asyncio
+import hashlib
+import json
 import re
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from .interface import IDataProcessor
+from .case_parser import CaseParser, CompactCaseParser
 from .exception import DataProcessingException
+from .repair_budget import RepairBudget
+from .scheduler import MakespanEstimate, RowScheduler
+from .sheet_collector import SheetCollector
+from .streaming import CaseStreamRequest, PointStreamRequest, StreamRequest
 from ..config.setting import get_config
+from ..llm.adaptive_limiter import AdaptiveLimiter, track_acquire_wait
+from ..llm.chat_prompt import ChatPrompt
+from ..llm.llm_response import LLMResponse
+from ..llm.output_budget import OutputBudget, StagedPrompt
+from ..llm.rate_limiter import estimate_tokens
+from ..llm.structured_output import StructuredPrompt
+from ..util.async_util import run_coroutine
 from ..util.logger_util import get_logger
 
 logger = get_logger(__name__)
@@ -18,73 +35,360 @@ logger = get_logger(__name__)
 class OutputParser:
     """AI生成的测试用例输出解析器"""
     
+    # 单次生成模式下测试点和测试用例两部分的起始标记
+    TEST_POINT_MARKER = "【测试点】"
+    TEST_CASE_MARKER = "【测试用例】"
+    
+    # 多行打包时每条输入及其输出的首尾标记，编号为原始行号
+    PACK_SECTION_PATTERN = re.compile(r'<<<BEGIN (\d+)>>>\s*(.*?)\s*<<<END \1>>>', re.DOTALL)
+    
+    # 测试点表格的分隔行，如 ---|---
+    TABLE_SEPARATOR_PATTERN = re.compile(r'^[\s|:\-]+$')
+    
+    # 测试用例的字段结构：(字段名, 取值方式)，每个测试用例以"测试点："开始
+    CASE_FIELDS = (
+        ("测试点", "line"),
+        ("测试点编号", "line"),
+        ("测试点描述", "line"),
+        ("前置条件", "lines"),
+        ("测试步骤", "numbered"),
+        ("预期结果", "numbered"),
+    )
+    CASE_PARSER = CaseParser(CASE_FIELDS, case_start="测试点")
+    
+    # 紧凑输出格式中由模型生成的字段，测试点、测试点编号、测试点描述按测试点序号从测试点表格中取得
+    COMPACT_COLUMNS = ("前置条件", "测试步骤", "预期结果")
+    COMPACT_PARSER = CompactCaseParser(CASE_FIELDS, COMPACT_COLUMNS)
+    
+    # 结构化输出被包裹在代码块中时的首尾标记
+    CODE_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$')
+    
     @staticmethod
-    def _clean_text(text: str) -> str:
-        """通过删除多余空白来清理和格式化文本"""
-        if not text:
-            return ""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        return '\n'.join(lines)
+    def split_fused_output(ai_output: str) -> Tuple[str, str]:
+        """将单次生成模式的输出拆分为(测试点, 测试用例)，缺少测试用例标记时整个输出视为测试用例"""
+        if not ai_output:
+            return "", ""
+        test_points, marker, test_cases = ai_output.partition(OutputParser.TEST_CASE_MARKER)
+        if not marker:
+            return "", ai_output.strip()
+        test_points = test_points.replace(OutputParser.TEST_POINT_MARKER, "", 1)
+        return test_points.strip(), test_cases.strip()
     
     @staticmethod
-    def _extract_numbered_items(text: str) -> str:
-        """从文本中提取编号列表项"""
-        if not text:
-            return ""
-        items = []
-        for line in text.split('\n'):
-            match = re.match(r'^\s*(\d+)\.\s*(.+)$', line.strip())
-            if match:
-                items.append(f"{match.group(1)}. {match.group(2)}")
-        return '\n'.join(items) if items else text.strip()
+    def split_test_points(test_points_output: str) -> Tuple[str, List[str]]:
+        """将测试点输出拆分为(表格之前的内容及表头, 每条测试点所在的表格行列表)"""
+        header_lines, points = [], []
+        for line in (test_points_output or "").strip().split('\n'):
+            stripped = line.strip()
+            if OutputParser.is_test_point_line(stripped):
+                points.append(stripped)
+            elif not points:
+                header_lines.append(line)
+        return '\n'.join(header_lines).strip(), points
+    
+    @staticmethod
+    def is_test_point_line(line: str) -> bool:
+        """判断去除首尾空白的一行文本是否为测试点表格中的测试点行（非表头、非分隔行）"""
+        return (
+            '|' in line
+            and '测试点编号' not in line
+            and not OutputParser.TABLE_SEPARATOR_PATTERN.match(line)
+        )
+    
+    @staticmethod
+    def format_packed_input(sections: Dict[int, str]) -> str:
+        """将多行输入格式化为带首尾标记的批量输入段落，追加在提示词末尾"""
+        blocks = [f"<<<BEGIN {row_idx}>>>\n{content}\n<<<END {row_idx}>>>" for row_idx, content in sections.items()]
+        return (
+            f"\n\n# 批量输入\n"
+            f"以下共 {len(sections)} 条相互独立的输入，上文中方括号标注的\"对应\"内容均指每条输入自身的内容。"
+            f"请对每条输入分别按上述要求完整输出，不要合并或遗漏任何一条。\n"
+            f"每条输入的输出以单独一行的\"<<<BEGIN 编号>>>\"开头、以单独一行的\"<<<END 编号>>>\"结尾，编号与输入中的编号一致。\n\n"
+            + "\n\n".join(blocks)
+        )
+    
+    @staticmethod
+    def split_packed_output(ai_output: str) -> Dict[int, str]:
+        """按首尾标记拆分多行打包请求的输出，缺少标记或内容为空的行不包含在内"""
+        if not ai_output:
+            return {}
+        return {
+            int(match.group(1)): match.group(2).strip()
+            for match in OutputParser.PACK_SECTION_PATTERN.finditer(ai_output)
+            if match.group(2).strip()
+        }
+    
+    @staticmethod
+    def case_schema(with_test_points: bool = False) -> Dict[str, Any]:
+        """结构化输出的JSON Schema，测试用例位于test_cases数组中，单次生成模式在其之前输出测试点部分"""
+        properties = {}
+        if with_test_points:
+            properties["test_points"] = {"type": "string"}
+        properties["test_cases"] = {"type": "array", "items": OutputParser.CASE_PARSER.record_schema()}
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False
+        }
+    
+    @staticmethod
+    def format_structured_instruction(with_test_points: bool = False) -> str:
+        """结构化输出的格式说明，追加在提示词末尾，替代原提示词中对输出文本格式的要求"""
+        field_names = "、".join(name for name, _ in OutputParser.CASE_FIELDS)
+        list_names = "、".join(name for name, mode in OutputParser.CASE_FIELDS if mode == "numbered")
+        test_points = "test_points为测试点部分的内容，格式与上文要求一致；" if with_test_points else ""
+        return (
+            f"\n\n# 结构化输出\n"
+            f"忽略上文中对输出文本格式的要求，改为按约定的JSON结构输出：{test_points}"
+            f"test_cases数组中每个元素为一个测试用例，字段为{field_names}；"
+            f"其中{list_names}为字符串数组，每个元素为一条内容，不带序号。"
+        )
+    
+    @staticmethod
+    def parse_structured_cases(ai_output: str) -> Tuple[List[Dict[str, str]], List[Tuple[Any, List[str]]]]:
+        """解析并校验结构化输出，返回(校验通过的测试用例, 未通过校验的(原始内容, 问题列表))，输出不是有效JSON时原始内容为输出本身"""
+        text = OutputParser.CODE_FENCE_PATTERN.sub('', (ai_output or "").strip())
+        try:
+            payload = json.loads(text, strict=False)
+        except ValueError:
+            return [], [(ai_output, ["输出不是有效的JSON"])]
+        
+        records = payload.get("test_cases") if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            return [], [(ai_output, ["输出中缺少test_cases数组"])]
+        
+        cases, invalid = [], []
+        for record in records:
+            case, problems = OutputParser.CASE_PARSER.parse_record(record)
+            if problems:
+                invalid.append((record, problems))
+            else:
+                cases.append(case)
+        return cases, invalid
+    
+    @staticmethod
+    def format_repair_prompt(invalid: List[Tuple[Any, List[str]]]) -> str:
+        """生成定向修复提示词，只包含未通过校验的内容及其问题"""
+        fragments = []
+        for index, (record, problems) in enumerate(invalid, 1):
+            content = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False, indent=2)
+            fragments.append(f"第{index}条：\n{content}\n问题：{'；'.join(problems)}")
+        return (
+            "# 任务\n"
+            "以下是按JSON结构输出的测试用例中未通过校验的部分，请根据列出的问题逐条修正，"
+            "补全缺失或为空的字段，已有的内容保持不变。\n\n"
+            "# 待修正内容\n"
+            + "\n\n".join(fragments)
+            + OutputParser.format_structured_instruction()
+            + "test_cases数组中只包含修正后的以上各条。"
+        )
+    
+    @staticmethod
+    def format_field_repair_prompt(case: Dict[str, str], missing: List[str]) -> str:
+        """生成补全字段的修复提示词，只包含不完整测试用例中已有的字段和需要补全的字段名"""
+        fragment = "\n".join(f"{name}：{case[name]}" for name, _ in OutputParser.CASE_FIELDS if case.get(name))
+        list_names = [name for name, mode in OutputParser.CASE_FIELDS if mode == "numbered" and name in missing]
+        numbered = f"{'、'.join(list_names)}按“1. 内容”的格式逐条编号；" if list_names else ""
+        return (
+            "# 任务\n"
+            f"以下测试用例缺少{'、'.join(missing)}，请根据已有内容补全这些字段。\n\n"
+            "# 待补全的测试用例\n"
+            f"{fragment}\n\n"
+            "# 输出格式\n"
+            f"只输出补全的字段，每个字段以单独一行的“字段名：”开头；{numbered}不要输出其他内容。"
+        )
+    
+    @staticmethod
+    def parse_repaired_fields(ai_output: str, missing: List[str]) -> Dict[str, str]:
+        """解析补全字段的修复响应，返回补全成功的字段"""
+        cases = OutputParser.parse_test_cases(ai_output)
+        if not cases:
+            return {}
+        return {name: cases[0][name] for name in missing if cases[0].get(name)}
+    
+    @staticmethod
+    def complete_prefix(ai_output: str) -> str:
+        """输出因长度限制被截断时，去除末尾不完整的测试用例或行"""
+        return OutputParser.CASE_PARSER.complete_prefix(ai_output)
+    
+    @staticmethod
+    def format_continuation_prompt(prompt: str, kept: str) -> str:
+        """生成续写提示词：在原提示词末尾追加已输出的完整内容（保留原提示词的系统消息），kept为空时要求模型精简后重新输出"""
+        if not kept:
+            return prompt + "\n\n# 注意\n上一次输出因长度限制中断，请精简表述，确保完整输出。"
+        return prompt + (
+            "\n\n"
+            "# 已输出内容\n"
+            "以下是按上述要求已经输出的内容，输出因长度限制在此中断：\n"
+            f"{kept}\n\n"
+            "# 继续输出\n"
+            "请紧接着已输出内容继续输出剩余部分，格式保持一致，不要重复已输出的内容，也不要输出其他说明。"
+        )
     
     @staticmethod
     def parse_test_cases(ai_output: str) -> List[Dict[str, str]]:
         """将AI输出解析为结构化的测试用例"""
-        test_cases = []
-        if not ai_output or not ai_output.strip():
-            return test_cases
-            
         try:
-            case_blocks = re.split(r'(?=测试点：)', ai_output.strip())
-            
-            for block in case_blocks:
-                if not block.strip():
-                    continue
-                
-                case = OutputParser._parse_single_case(block)
-                if any(case.values()):
-                    test_cases.append(case)
-            
-            return test_cases
-            
+            return OutputParser.CASE_PARSER.parse(ai_output)
         except Exception as e:
             logger.error(f"解析测试用例失败: {e}")
             return []
     
     @staticmethod
-    def _parse_single_case(block: str) -> Dict[str, str]:
-        """解析单个测试用例块"""
+    def split_point_rows(test_points_output: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """将测试点输出拆分为(表格之前的内容（不含表头行）, 每条测试点的(测试点编号, 测试点描述)列表)"""
+        header, points = OutputParser.split_test_points(test_points_output)
+        header = '\n'.join(line for line in header.split('\n') if line.strip() and '|' not in line)
+        rows = []
+        for point in points:
+            point_id, _, description = point.strip('|').partition('|')
+            rows.append((point_id.strip(), description.strip()))
+        return header, rows
+    
+    @staticmethod
+    def compact_test_points(test_points_output: str) -> str:
+        """将测试点表格压缩为注入测试用例提示词的紧凑格式：去掉表头和分隔行，每条测试点一行"序号\t测试点描述"，未找到表格时为原文"""
+        header, rows = OutputParser.split_point_rows(test_points_output)
+        if not rows:
+            return (test_points_output or "").strip()
+        lines = [header] if header else []
+        lines.extend(f"{index}\t{description}" for index, (_, description) in enumerate(rows, 1))
+        return '\n'.join(lines)
+    
+    @staticmethod
+    def point_fields(test_points_output: str) -> Dict[str, Dict[str, str]]:
+        """紧凑输出格式中测试点序号（从1开始，与compact_test_points一致）到测试点、测试点编号、测试点描述的映射"""
+        header, rows = OutputParser.split_point_rows(test_points_output)
+        parsed = OutputParser.parse_test_cases(header)
+        name = parsed[0]["测试点"] if parsed else ""
         return {
-            "测试点": OutputParser._extract_field(block, r'测试点：\s*(.+)'),
-            "测试点编号": OutputParser._extract_field(block, r'测试点编号：\s*(.+)'),
-            "测试点描述": OutputParser._extract_field(block, r'测试点描述：\s*(.+)'),
-            "前置条件": OutputParser._clean_text(
-                OutputParser._extract_field(block, r'前置条件：\s*(.+?)(?=测试步骤：|$)', re.DOTALL)
-            ),
-            "测试步骤": OutputParser._extract_numbered_items(
-                OutputParser._extract_field(block, r'测试步骤：\s*(.+?)(?=预期结果：|$)', re.DOTALL)
-            ),
-            "预期结果": OutputParser._extract_numbered_items(
-                OutputParser._extract_field(block, r'预期结果：\s*(.+?)(?=\n\n测试点：|\n\n$|\Z)', re.DOTALL)
-            )
+            str(index): {"测试点": name, "测试点编号": point_id, "测试点描述": description}
+            for index, (point_id, description) in enumerate(rows, 1)
         }
     
     @staticmethod
-    def _extract_field(block: str, pattern: str, flags: int = 0) -> str:
-        """使用正则表达式提取字段值"""
-        match = re.search(pattern, block, flags)
-        return match.group(1).strip() if match else ""
+    def format_compact_instruction(fused: bool = False) -> str:
+        """紧凑输出的格式说明，追加在系统消息末尾，替代原提示词中对测试用例输出格式的要求；单次生成模式的测试点部分仍按原要求输出"""
+        columns = "、".join(OutputParser.COMPACT_COLUMNS)
+        list_names = "、".join(name for name, mode in OutputParser.CASE_FIELDS if mode in ("lines", "numbered"))
+        if fused:
+            source = "测试点部分的格式与上文要求一致；测试用例部分改为以下紧凑格式，测试点序号为测试点在测试点表格中的行序号（从1开始）。"
+        else:
+            source = "输入中的测试点每行一条，依次为测试点序号和测试点描述，以制表符分隔。"
+        return (
+            f"\n\n# 紧凑输出\n"
+            f"忽略上文中对测试用例输出格式的要求，{source}"
+            f"每个测试用例单独输出一行，依次为测试点序号、{columns}，各列之间以制表符分隔；"
+            f"测试点、测试点编号、测试点描述无需输出；{list_names}有多条内容时以\"|\"分隔，不带序号；"
+            f"不要输出表头、空行或其他说明。"
+        )
+    
+    @staticmethod
+    def parse_compact_cases(ai_output: str, test_points_output: str) -> List[Dict[str, str]]:
+        """将紧凑格式的AI输出解析为结构化的测试用例，测试点的字段按测试点序号取自测试点文本"""
+        try:
+            return OutputParser.COMPACT_PARSER.parse(ai_output, OutputParser.point_fields(test_points_output))
+        except Exception as e:
+            logger.error(f"解析测试用例失败: {e}")
+            return []
+
+class IncrementalCaseParser:
+    """流式输出的增量测试用例解析器
+    
+    下一个"测试点："出现时前一个测试用例块即已完整，立即解析返回，解析规则与OutputParser.parse_test_cases一致。
+    start_marker之前的内容不解析；收到abort_after_chars个字符仍未出现"测试点："时判定输出格式异常，0表示不检查。
+    """
+    
+    CASE_START_PATTERN = re.compile(r'测试点：')
+    
+    def __init__(self, start_marker: Optional[str] = None, abort_after_chars: int = 0):
+        """初始化解析器"""
+        self._start_marker = start_marker
+        self._abort_after_chars = abort_after_chars
+        self._started = start_marker is None
+        self._buffer = ""
+        self._received = 0
+        self._case_seen = False
+        self.cases: List[Dict[str, str]] = []
+    
+    @property
+    def malformed(self) -> bool:
+        """输出是否已可判定为格式异常"""
+        return bool(self._abort_after_chars) and not self._case_seen and self._received >= self._abort_after_chars
+    
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """接收一个文本块，返回因本次输入而完整的测试用例"""
+        search_from = max(0, len(self._buffer) - 8)
+        self._buffer += chunk
+        self._received += len(chunk)
+        if not self._case_seen:
+            self._case_seen = self.CASE_START_PATTERN.search(self._buffer, search_from) is not None
+        
+        if not self._started:
+            marker_index = self._buffer.find(self._start_marker, max(0, search_from - len(self._start_marker)))
+            if marker_index < 0:
+                return []
+            self._start(self._buffer[:marker_index])
+            self._buffer = self._buffer[marker_index + len(self._start_marker):]
+            self._started = True
+        
+        return self._drain(final=False)
+    
+    def close(self) -> List[Dict[str, str]]:
+        """输出结束，解析剩余内容；未出现起始标记时与split_fused_output一致，整个输出按测试用例解析"""
+        self._started = True
+        return self._drain(final=True)
+    
+    def discard_partial(self) -> int:
+        """丢弃缓冲区中尚未完整的部分（缓冲区以测试用例块开始时为整个测试用例块，否则为最后一个不完整的行），返回丢弃的字符数"""
+        keep = 0 if self.CASE_START_PATTERN.match(self._buffer) else self._buffer.rfind('\n') + 1
+        dropped = len(self._buffer) - keep
+        self._buffer = self._buffer[:keep]
+        return dropped
+    
+    def _drain(self, final: bool) -> List[Dict[str, str]]:
+        """解析缓冲区中已完整的测试用例块，未完整的部分留在缓冲区"""
+        if final:
+            complete, self._buffer = self._buffer, ""
+        else:
+            starts = [match.start() for match in self.CASE_START_PATTERN.finditer(self._buffer)]
+            if not starts or starts[-1] == 0:
+                return []
+            complete, self._buffer = self._buffer[:starts[-1]], self._buffer[starts[-1]:]
+        
+        cases = self._parse(complete)
+        self.cases.extend(cases)
+        return cases
+    
+    def _start(self, preamble: str) -> None:
+        """出现起始标记时调用，preamble为标记之前的内容"""
+    
+    def _parse(self, text: str) -> List[Dict[str, str]]:
+        """解析完整的测试用例块"""
+        return OutputParser.parse_test_cases(text)
+
+class CompactCaseStreamParser(IncrementalCaseParser):
+    """紧凑输出格式的增量测试用例解析器
+    
+    紧凑格式每行一个测试用例，下一个包含制表符的行出现时前一行即已完整。
+    测试点的字段按测试点序号从test_points中取得，单次生成模式下为测试用例起始标记之前的输出。
+    """
+    
+    CASE_START_PATTERN = re.compile(r'^(?=[^\n]*\t)', re.MULTILINE)
+    
+    def __init__(self, test_points: str = "", start_marker: Optional[str] = None, abort_after_chars: int = 0):
+        """初始化解析器"""
+        super().__init__(start_marker, abort_after_chars)
+        self._points = OutputParser.point_fields(test_points)
+    
+    def _start(self, preamble: str) -> None:
+        """单次生成模式下从测试点部分取得测试点字段"""
+        self._points = OutputParser.point_fields(preamble.replace(OutputParser.TEST_POINT_MARKER, "", 1))
+    
+    def _parse(self, text: str) -> List[Dict[str, str]]:
+        """按紧凑格式解析完整的测试用例行"""
+        return OutputParser.COMPACT_PARSER.parse(text, self._points)
 
 class DataProcessor(IDataProcessor):
     """用于生成测试用例的主要数据处理器"""
@@ -99,76 +403,372 @@ class DataProcessor(IDataProcessor):
         config = get_config()
         processing_config = config.get_processing_config()
         self._thread_count = processing_config.get("default_threads", 4)
+        self._engine = processing_config.get("engine", "thread")
+        self._async_concurrency = processing_config.get("async_concurrency", 100)
+        self._submission_window = processing_config.get("submission_window", 0)
+        self._deduplicate_rows = processing_config.get("deduplicate_rows", False)
+        generation_config = config.get_generation_config()
+        self._generation_mode = generation_config.get("mode", "two_stage")
+        self._pack_config = generation_config.get("pack_rows", {})
+        self._split_config = generation_config.get("split_test_points", {})
+        self._streaming_config = generation_config.get("streaming", {})
+        self._structured_config = generation_config.get("structured_output", {})
+        self._compact_config = generation_config.get("compact_output", {})
+        self._repair_config = generation_config.get("repair", {})
+        self._continuation_config = generation_config.get("continuation", {})
+        self._max_tokens = config.get_model_config().get("max_tokens") or 8192
+        self._limiter = self._init_limiter(processing_config.get("adaptive_concurrency", {}))
+        self._output_budget = self._init_output_budget(generation_config.get("output_budget", {}))
+        self._scheduler = self._init_scheduler(processing_config.get("scheduling", {}))
     
-    def process_batch(self, items: List[Dict[str, Any]], sheet_name: str) -> List[Dict[str, Any]]:
-        """并行处理数据项批次"""
+    @property
+    def concurrency_limiter(self) -> Optional[AdaptiveLimiter]:
+        """自适应并发限制器，未启用时为None"""
+        return self._limiter
+    
+    @property
+    def output_budget(self) -> Optional[OutputBudget]:
+        """输出长度预测器，未启用时为None"""
+        return self._output_budget
+    
+    def create_repair_budget(self) -> RepairBudget:
+        """按配置创建一个任务的修复请求预算，修复和结构化输出修复均未启用时额度为0"""
+        if not self._repair_config.get('enabled', False) and not self._structured_repair_enabled():
+            return RepairBudget(0)
+        return RepairBudget(self._repair_config.get('max_requests_per_job', 50))
+    
+    def _init_limiter(self, limiter_config: Dict[str, Any]) -> Optional[AdaptiveLimiter]:
+        """根据配置创建自适应并发限制器，所有任务共享"""
+        if not limiter_config.get('enabled', False):
+            return None
+        
+        return AdaptiveLimiter(
+            initial_limit=limiter_config.get('initial_limit', self._thread_count),
+            min_limit=limiter_config.get('min_limit', 1),
+            max_limit=limiter_config.get('max_limit', 32),
+            increase_step=limiter_config.get('increase_step', 1),
+            decrease_factor=limiter_config.get('decrease_factor', 0.5),
+            latency_tolerance=limiter_config.get('latency_tolerance', 2.0),
+            max_error_rate=limiter_config.get('max_error_rate', 0.05),
+            window_size=limiter_config.get('window_size', 20),
+            cooldown_seconds=limiter_config.get('cooldown_seconds', 5)
+        )
+    
+    def _init_output_budget(self, budget_config: Dict[str, Any]) -> Optional[OutputBudget]:
+        """根据配置创建输出长度预测器，所有任务共享统计；未启用续写时不预测，避免预测偏小时输出被截断"""
+        if not budget_config.get('enabled', False) or not self._continuation_config.get('enabled', False):
+            return None
+        return OutputBudget(
+            max_tokens=self._max_tokens,
+            safety_margin=budget_config.get('safety_margin', 0.3),
+            min_samples=budget_config.get('min_samples', 3),
+            min_tokens=budget_config.get('min_tokens', 256)
+        )
+    
+    def _init_scheduler(self, schedule_config: Dict[str, Any]) -> RowScheduler:
+        """根据配置创建请求组调度器，所有任务共享观测耗时，启用持久化时保存在缓存目录"""
+        history_path = None
+        if schedule_config.get('persist_history', False):
+            history_path = get_config().get_file_path("cache_dir", "cache") / "row_durations.json"
+        return RowScheduler(
+            policy=schedule_config.get('policy', 'sheet_order'),
+            history_path=history_path,
+            history_size=schedule_config.get('history_size', 10000)
+        )
+    
+    def _worker_count(self) -> int:
+        """线程池大小，启用自适应并发时按上限的最大值创建，实际并发由限制器控制"""
+        if self._limiter:
+            return self._limiter.snapshot()["max_limit"]
+        return self._thread_count
+    
+    def _window_size(self) -> int:
+        """同时在执行或排队的请求组数上限，未配置时线程引擎为线程数的两倍，异步引擎为并发上限"""
+        if self._engine == "async":
+            return max(1, min(self._submission_window or self._async_concurrency, self._async_concurrency))
+        return max(1, self._submission_window or 2 * self._worker_count())
+    
+    def process_batch(self, items: List[Dict[str, Any]], sheet_name: str, deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """并行处理数据项批次，deduplicate为None时按配置决定是否合并内容相同的行
+        
+        on_case在每产出一个测试用例时回调，参数为带原始行号的测试用例；
+        启用流式生成时测试用例块一完整即回调，否则在所在行处理完成时回调。
+        repair_budget为所属任务的修复请求预算，同一任务的各表共用，为None时本次调用单独按配置创建。
+        """
+        return self.process_sheets({sheet_name: items}, deduplicate, on_case, repair_budget)[sheet_name]
+    
+    def process_sheets(self, sheets: Dict[str, List[Dict[str, Any]]], deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[RepairBudget] = None, on_sheet: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """将所有表的行提交到同一个工作池处理，返回与sheets顺序相同的表名到测试用例列表的映射
+        
+        各表的请求组统一调度，一张表末尾耗时长的行不会阻塞其余表，任务耗时接近总工作量除以并发数而不是各表耗时之和；
+        去重、结果组装和排序仍按表进行，一张表的所有行完成时以表名和排序后的测试用例回调on_sheet。
+        调度策略为sheet_order时请求组边打包边提交，同时存在的请求组不超过提交窗口；longest_first需要先打包所有请求组才能排序。
+        keep_results为True时各表的测试用例都保存在返回的映射中，内存占用随输出的测试用例数增长；
+        由on_sheet写出结果时传入False，一张表完成后即释放其测试用例，返回的映射为空。
+        """
         start_time = time.time()
-        logger.info(f"[表格 {sheet_name}] 使用 {self._thread_count} 个线程处理 {len(items)} 个数据项")
+        if repair_budget is None:
+            repair_budget = self.create_repair_budget()
+        collector = SheetCollector(on_case, on_sheet, start_time, keep_results)
+        for sheet_name, items in sheets.items():
+            collector.open(sheet_name)
+            if not items:
+                logger.warning(f"[表格 {sheet_name}] 没有数据项需要处理")
         
-        if not items:
-            logger.warning(f"[表格 {sheet_name}] 没有数据项需要处理")
-            return []
+        rows = ((sheet_name, item) for sheet_name, items in sheets.items() for item in items)
+        tasks, estimate = self._schedule_units(self._iter_tasks(rows, collector, deduplicate))
+        row_count = sum(len(items) for items in sheets.values())
+        if self._engine == "async":
+            logger.info(f"使用异步引擎（并发上限 {self._window_size()}）处理 {len(sheets)} 个表格的 {row_count} 个数据项")
+        else:
+            logger.info(f"使用 {self._worker_count()} 个线程（提交窗口 {self._window_size()}）处理 {len(sheets)} 个表格的 {row_count} 个数据项")
         
-        all_results = []
         try:
-            if self._thread_count > 1:
-                all_results = self._process_concurrent(items, sheet_name)
-            else:
-                all_results = self._process_sequential(items, sheet_name)
+            for sheet_name in [name for name, items in sheets.items() if not items]:
+                collector.close(sheet_name)
             
-            # 按原始行号排序
-            sorted_results = sorted(all_results, key=lambda x: x.get("原始行号", 0))
+            self._run_tasks(tasks, collector.add_results, repair_budget)
             
             elapsed = time.time() - start_time
-            logger.info(f"[表格 {sheet_name}] 在 {elapsed:.2f}秒内处理了 {len(sorted_results)} 个测试用例")
+            if estimate.seconds is None:
+                logger.info(f"调度策略 {self._scheduler.policy}: 尚无耗时记录，未预计耗时，实际耗时 {elapsed:.2f}秒")
+            else:
+                logger.info(f"调度策略 {self._scheduler.policy}: 预计耗时 {estimate.seconds:.2f}秒，实际耗时 {elapsed:.2f}秒")
+            self._finish_job()
             
-            return sorted_results
+            return collector.results
+        
+        except Exception as e:
+            raise DataProcessingException(f"处理数据批次失败: {e}")
+    
+    def process_rows(self, rows: Iterable[Tuple[str, Dict[str, Any]]], deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[RepairBudget] = None, on_sheet: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """边读取边处理按表依次产出的(表名, 数据记录)，如ExcelDataLoader.iter_records，返回按表出现顺序的表名到测试用例列表的映射
+        
+        读到的行去重、打包后立即提交，第一个请求不必等待整个工作簿读取完毕；提交窗口已满时暂停读取，读入内存的行数与表的大小无关。
+        请求组按读取顺序提交，不按调度策略排序；其余参数与process_sheets相同。
+        """
+        start_time = time.time()
+        if repair_budget is None:
+            repair_budget = self.create_repair_budget()
+        collector = SheetCollector(on_case, on_sheet, start_time, keep_results)
+        if self._engine == "async":
+            logger.info(f"使用异步引擎（并发上限 {self._window_size()}）边读取边处理数据项")
+        else:
+            logger.info(f"使用 {self._worker_count()} 个线程（提交窗口 {self._window_size()}）边读取边处理数据项")
+        
+        try:
+            self._run_tasks(self._iter_tasks(rows, collector, deduplicate), collector.add_results, repair_budget)
+            logger.info(f"处理了 {len(collector.case_counts)} 个表格，耗时 {time.time() - start_time:.2f}秒")
+            self._finish_job()
             
+            return collector.results
+        
         except Exception as e:
             raise DataProcessingException(f"处理数据批次失败: {e}")
     
-    def _process_concurrent(self, items: List[Dict[str, Any]], sheet_name: str) -> List[Dict[str, Any]]:
-        """并发处理数据项"""
-        all_results = []
+    def _run_tasks(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable[[str, List[Dict[str, Any]]], Any], repair_budget: RepairBudget) -> None:
+        """按配置的引擎处理请求组"""
+        if self._engine == "async":
+            run_coroutine(self._process_async(tasks, on_result, repair_budget))
+        elif self._worker_count() > 1:
+            self._process_concurrent(tasks, on_result, repair_budget)
+        else:
+            self._process_sequential(tasks, on_result, repair_budget)
+    
+    def _finish_job(self) -> None:
+        """保存观测到的耗时并记录并发上限"""
+        self._scheduler.save()
+        if self._limiter:
+            logger.info(f"当前LLM并发上限 {self._limiter.limit}")
+    
+    def _iter_tasks(self, rows: Iterable[Tuple[str, Dict[str, Any]]], collector: SheetCollector, deduplicate: Optional[bool] = None) -> Iterator[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]]:
+        """按表对行编号、清理、去重和打包，产出(表名, 请求组, 测试用例回调)并登记到collector，一张表的行取完后关闭该表"""
+        for sheet_name, items in groupby(rows, key=itemgetter(0)):
+            on_case = collector.open(sheet_name)
+            # 深度清理数据，确保没有不可哈希的类型
+            sheet_rows = ((idx, self._deep_clean_data(item)) for idx, (_, item) in enumerate(items, 1))
+            if self._deduplicate_rows if deduplicate is None else deduplicate:
+                sheet_rows = self._skip_duplicate_rows(sheet_rows, sheet_name, collector)
+            
+            for unit in self._pack_rows(sheet_rows, sheet_name):
+                collector.add_unit(sheet_name)
+                yield sheet_name, unit, on_case
+            collector.close(sheet_name)
+    
+    def _skip_duplicate_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], sheet_name: str, collector: SheetCollector) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """按提示词输入对行分组，只产出每组的第一行和输入为空的行，其余行作为重复行登记到collector"""
+        representatives: Dict[str, int] = {}
+        groups: Set[int] = set()
+        merged_rows = 0
+        
+        for row_idx, item in rows:
+            key = self._prepare_input(item).strip()
+            if not key:
+                yield row_idx, item
+            elif key in representatives:
+                collector.add_duplicate(sheet_name, representatives[key], row_idx)
+                groups.add(representatives[key])
+                merged_rows += 1
+            else:
+                representatives[key] = row_idx
+                yield row_idx, item
+        
+        if merged_rows:
+            logger.info(
+                f"[表格 {sheet_name}] 行去重: {merged_rows} 行与其他行内容相同，合并为 {len(groups)} 组，"
+                f"节省约 {merged_rows * self._calls_per_row()} 次LLM调用"
+            )
+    
+    def _calls_per_row(self) -> int:
+        """每行数据需要的LLM调用次数"""
+        return 1 if self._generation_mode == "fused" else 2
+    
+    def _pack_rows(self, rows: Iterable[Tuple[int, Dict[str, Any]]], sheet_name: str) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        """按输入token预算和max_tokens可容纳的行数将行依次打包为请求组产出，未启用打包时每行单独成组"""
+        if not self._pack_config.get('enabled', False):
+            for row in rows:
+                yield [row]
+            return
+        
+        output_tokens_per_row = self._pack_config.get('output_tokens_per_row', 1024)
+        row_limit = max(1, min(self._pack_config.get('max_rows', 8), self._max_tokens // output_tokens_per_row))
+        max_input_tokens = self._pack_config.get('max_input_tokens', 4000)
+        
+        current, current_tokens = [], 0
+        packed_units = packed_rows = 0
+        for row_idx, item in rows:
+            input_text = self._prepare_input(item)
+            if not input_text.strip():
+                yield [(row_idx, item)]
+                continue
+            
+            tokens = estimate_tokens(input_text)
+            if current and (len(current) >= row_limit or current_tokens + tokens > max_input_tokens):
+                if len(current) > 1:
+                    packed_units, packed_rows = packed_units + 1, packed_rows + len(current)
+                yield current
+                current, current_tokens = [], 0
+            current.append((row_idx, item))
+            current_tokens += tokens
+        if len(current) > 1:
+            packed_units, packed_rows = packed_units + 1, packed_rows + len(current)
+        if current:
+            yield current
         
-        with ThreadPoolExecutor(max_workers=self._thread_count) as executor:
-            futures = []
-            row_indices = []
+        if packed_units:
+            logger.info(
+                f"[表格 {sheet_name}] 多行打包: {packed_rows} 行打包为 "
+                f"{packed_units} 个请求组（每组最多 {row_limit} 行）"
+            )
+    
+    def _schedule_units(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]]) -> Tuple[Iterator[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], MakespanEstimate]:
+        """按调度策略安排(表名, 请求组, 测试用例回调)的提交顺序并预计总耗时，结果仍按原始行号排序输出；sheet_order边打包边提交，任务全部产出后预计总耗时才完整"""
+        if self._engine == "async":
+            workers = min(self._window_size(), self._limiter.limit) if self._limiter else self._window_size()
+        else:
+            workers = self._limiter.limit if self._limiter else self._thread_count
+        estimate = MakespanEstimate(workers)
+        return self._scheduler.schedule(((task, *self._unit_cost(task[1])) for task in tasks), estimate), estimate
+    
+    def _unit_cost(self, unit: List[Tuple[int, Dict[str, Any]]]) -> Tuple[str, int]:
+        """请求组的输入摘要和输入估算token数，摘要用于查找同一输入之前的耗时"""
+        inputs = [self._prepare_input(item) for _, item in unit]
+        key = hashlib.sha256("\x00".join([self._generation_mode, *inputs]).encode('utf-8')).hexdigest()
+        return key, sum(estimate_tokens(text) for text in inputs)
+    
+    def _observe_unit(self, unit: List[Tuple[int, Dict[str, Any]]], elapsed: float, waited: float) -> None:
+        """记录请求组扣除等待并发名额时间后的耗时，避免排队时间计入该组的耗时"""
+        self._scheduler.observe(*self._unit_cost(unit), max(0.0, elapsed - waited))
+    
+    def _timed_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """处理一个请求组（线程引擎）并记录耗时"""
+        unit_start, waited = time.time(), track_acquire_wait()
+        results = self._process_unit(unit, sheet_name, on_case, repair_budget)
+        self._observe_unit(unit, time.time() - unit_start, waited[0])
+        return results
+    
+    def _process_concurrent(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable[[str, List[Dict[str, Any]]], Any], repair_budget: Optional[RepairBudget] = None) -> None:
+        """并发处理请求组，执行中和排队的请求组不超过提交窗口，一个完成后才从tasks中取下一个提交，完成的结果在当前线程交给on_result"""
+        tasks = iter(tasks)
+        with ThreadPoolExecutor(max_workers=self._worker_count()) as executor:
+            futures = {}
             
-            for idx, item in enumerate(items):
-                row_idx = idx + 1
-                # 深度清理数据，确保没有不可哈希的类型
-                cleaned_item = self._deep_clean_data(item)
-                future = executor.submit(self._process_single, row_idx, cleaned_item, sheet_name)
-                futures.append(future)
-                row_indices.append(row_idx)
+            def submit(count: int) -> None:
+                for sheet_name, unit, on_case in islice(tasks, count):
+                    futures[executor.submit(self._timed_unit, unit, sheet_name, on_case, repair_budget)] = (sheet_name, unit)
             
-            for i, future in enumerate(as_completed(futures)):
+            submit(self._window_size())
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sheet_name, unit = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"[表格 {sheet_name}] 处理失败: {e}")
+                        result = [self._create_empty_case(row_idx) for row_idx, _ in unit]
+                    on_result(sheet_name, result)
+                submit(len(done))
+    
+    async def _process_async(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable[[str, List[Dict[str, Any]]], Any], repair_budget: Optional[RepairBudget] = None) -> None:
+        """在单个事件循环中按提交窗口启动固定数量的协程，每个协程处理完一个请求组再从tasks中取下一个，完成的结果交给on_result"""
+        tasks = iter(tasks)
+        
+        async def worker() -> None:
+            for sheet_name, unit, on_case in tasks:
+                unit_start, waited = time.time(), track_acquire_wait()
                 try:
-                    result = future.result()
-                    all_results.extend(result)
+                    result = await self._aprocess_unit(unit, sheet_name, on_case, repair_budget)
+                    self._observe_unit(unit, time.time() - unit_start, waited[0])
                 except Exception as e:
-                    logger.error(f"处理失败: {e}")
-                    row_idx = row_indices[i]
-                    all_results.append(self._create_empty_case(row_idx))
+                    logger.error(f"[表格 {sheet_name}] 处理行 {unit[0][0]}-{unit[-1][0]} 失败: {e}")
+                    result = [self._create_empty_case(row_idx) for row_idx, _ in unit]
+                on_result(sheet_name, result)
         
-        return all_results
+        await asyncio.gather(*(worker() for _ in range(self._window_size())))
     
-    def _process_sequential(self, items: List[Dict[str, Any]], sheet_name: str) -> List[Dict[str, Any]]:
-        """顺序处理数据项"""
-        all_results = []
-        
-        for idx, item in enumerate(items):
-            row_idx = idx + 1
+    def _process_sequential(self, tasks: Iterable[Tuple[str, List[Tuple[int, Dict[str, Any]]], Optional[Callable]]], on_result: Callable[[str, List[Dict[str, Any]]], Any], repair_budget: Optional[RepairBudget] = None) -> None:
+        """顺序处理请求组，每个请求组完成时回调on_result"""
+        for sheet_name, unit, on_case in tasks:
             try:
-                cleaned_item = self._deep_clean_data(item)
-                result = self._process_single(row_idx, cleaned_item, sheet_name)
-                all_results.extend(result)
+                result = self._timed_unit(unit, sheet_name, on_case, repair_budget)
             except Exception as e:
-                logger.error(f"处理行 {row_idx} 失败: {e}")
-                all_results.append(self._create_empty_case(row_idx))
+                logger.error(f"[表格 {sheet_name}] 处理行 {unit[0][0]}-{unit[-1][0]} 失败: {e}")
+                result = [self._create_empty_case(row_idx) for row_idx, _ in unit]
+            on_result(sheet_name, result)
+    
+    def _process_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """处理一个请求组（线程引擎），打包请求中未成功解析的行逐行重试"""
+        if len(unit) == 1:
+            return self._process_single(unit[0][0], unit[0][1], sheet_name, on_case, repair_budget)
         
-        return all_results
+        try:
+            results, retry_rows = self._run_steps(self._pack_steps(unit, sheet_name, on_case, repair_budget))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}] 打包处理失败: {e}")
+            results, retry_rows = [], unit
+        
+        for row_idx, item in retry_rows:
+            results.extend(self._process_single(row_idx, item, sheet_name, on_case, repair_budget))
+        return results
+    
+    async def _aprocess_unit(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """处理一个请求组（异步引擎），打包请求中未成功解析的行逐行重试"""
+        if len(unit) == 1:
+            return await self._aprocess_single(unit[0][0], unit[0][1], sheet_name, on_case, repair_budget)
+        
+        try:
+            results, retry_rows = await self._arun_steps(self._pack_steps(unit, sheet_name, on_case, repair_budget))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}] 打包处理失败: {e}")
+            results, retry_rows = [], unit
+        
+        row_results = await asyncio.gather(
+            *(self._aprocess_single(row_idx, item, sheet_name, on_case, repair_budget) for row_idx, item in retry_rows)
+        )
+        for row_result in row_results:
+            results.extend(row_result)
+        return results
     
     def _deep_clean_data(self, data: Any) -> Any:
         """深度清理数据，确保所有值都是可哈希的基本类型"""
@@ -187,37 +787,336 @@ class DataProcessor(IDataProcessor):
         else:
             return str(data)
     
-    def _process_single(self, row_idx: int, row_data: Dict[str, Any], sheet_name: str) -> List[Dict[str, Any]]:
-        """处理单行数据"""
+    def _process_single(self, row_idx: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """处理单行数据（线程引擎）"""
         try:
-            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 开始处理")
-            
-            test_point_input = self._prepare_input(row_data)
-            
-            if not test_point_input.strip():
-                logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 数据为空，跳过")
-                return []
-            
+            return self._run_steps(self._row_steps(row_idx, row_data, sheet_name, on_case, repair_budget))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 处理失败: {e}")
+        
+        # 整行失败时在修复预算内重新生成一次，仍失败才写入空测试用例
+        if self._repair_config.get('enabled', False) and repair_budget and repair_budget.acquire(self._calls_per_row()):
+            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 重新生成该行")
+            try:
+                return self._run_steps(self._row_steps(row_idx, row_data, sheet_name, on_case, repair_budget))
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 重新生成失败: {e}")
+        return [self._create_empty_case(row_idx)]
+    
+    async def _aprocess_single(self, row_idx: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> List[Dict[str, Any]]:
+        """处理单行数据（异步引擎）"""
+        try:
+            return await self._arun_steps(self._row_steps(row_idx, row_data, sheet_name, on_case, repair_budget))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 处理失败: {e}")
+        
+        # 整行失败时在修复预算内重新生成一次，仍失败才写入空测试用例
+        if self._repair_config.get('enabled', False) and repair_budget and repair_budget.acquire(self._calls_per_row()):
+            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 重新生成该行")
+            try:
+                return await self._arun_steps(self._row_steps(row_idx, row_data, sheet_name, on_case, repair_budget))
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 重新生成失败: {e}")
+        return [self._create_empty_case(row_idx)]
+    
+    def _row_steps(self, row_idx: int, row_data: Dict[str, Any], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[str, str, List[Dict[str, Any]]]:
+        """单行处理流程：每次yield一个提示词，由引擎调用LLM后将响应send回来，调用失败时异常被throw回来
+        
+        yield提示词列表时，引擎并行调用并按顺序send回响应列表，失败的调用以异常对象占位；
+        yield StreamRequest时，引擎流式调用LLM并将该请求send回来。
+        """
+        logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 开始处理")
+        
+        test_point_input = self._prepare_input(row_data)
+        
+        if not test_point_input.strip():
+            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 数据为空，跳过")
+            return []
+        
+        # 流式生成时完整的测试用例在解析出的同时即交给回调，其余（含修复后的）在行处理完成时补齐
+        emitted: Set[int] = set()
+        
+        def notify(case: Dict[str, str]) -> None:
+            emitted.add(id(case))
+            if on_case:
+                on_case({"原始行号": row_idx, **case})
+        
+        def emit(case: Dict[str, str]) -> None:
+            if not self._missing_fields(case):
+                notify(case)
+        
+        if self._generation_mode == "fused":
+            # 单次请求同时生成测试点和测试用例
+            parsed_results = yield from self._generate_fused(test_point_input, row_idx, sheet_name, emit, repair_budget)
+        elif self._split_config.get('enabled', False) and self._streaming_config.get('enabled', False):
+            # 流式生成测试点，每条测试点一完整即开始生成它的测试用例
+            parsed_results = yield from self._generate_streamed_points(test_point_input, row_idx, sheet_name, emit, repair_budget)
+        else:
             # 生成测试点
-            test_case_input = self._generate_test_points(test_point_input, row_idx, sheet_name)
+            test_case_input = yield from self._generate_test_points(test_point_input, row_idx, sheet_name)
             
-            # 生成测试用例
-            test_case_output = self._generate_test_cases(test_case_input, test_point_input, row_idx, sheet_name)
-            
-            # 解析结果
-            parsed_results = self._parser.parse_test_cases(test_case_output)
+            # 生成测试用例，启用拆分时按测试点并行生成
+            if self._split_config.get('enabled', False):
+                parsed_results = yield from self._generate_test_cases_per_point(test_case_input, test_point_input, row_idx, sheet_name, emit, repair_budget)
+            else:
+                parsed_results = yield from self._generate_test_cases(test_case_input, test_point_input, row_idx, sheet_name, emit, repair_budget)
+        
+        valid_results = [result for result in parsed_results if any(result.values())]
+        valid_results = yield from self._repair_incomplete(valid_results, f"[表格 {sheet_name}] [行 #{row_idx}]", repair_budget)
+        for result in valid_results:
+            if id(result) not in emitted:
+                notify(result)
+        
+        if valid_results:
+            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 生成了 {len(valid_results)} 个测试用例")
+        else:
+            logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 未生成有效测试用例")
+        
+        return [{"原始行号": row_idx, **result} for result in valid_results]
+    
+    def _pack_steps(self, unit: List[Tuple[int, Dict[str, Any]]], sheet_name: str, on_case: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[str, str, Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]]]]:
+        """多行打包处理流程，返回(测试用例列表, 需要逐行重试的行)"""
+        label = f"[表格 {sheet_name}] [行 #{unit[0][0]}-#{unit[-1][0]}]"
+        logger.info(f"{label} 开始打包处理 {len(unit)} 行")
+        inputs = {row_idx: self._prepare_input(item) for row_idx, item in unit}
+        
+        # 每行的(测试点文本, 测试用例文本)
+        if self._generation_mode == "fused":
+            fused_outputs = yield from self._generate_packed("fused", {"test_point_input": "[对应需求]"}, inputs, label)
+            outputs = {row_idx: self._parser.split_fused_output(output) for row_idx, output in fused_outputs.items()}
+        else:
+            test_points = yield from self._generate_packed("test_point", {"test_point_input": "[对应需求]"}, inputs, label)
+            test_case_outputs = yield from self._generate_packed(
+                "test_case",
+                {"test_case_input": "[对应测试点]", "test_point_input": "[对应需求]"},
+                {row_idx: self._case_input(test_points[row_idx]) for row_idx in inputs if row_idx in test_points},
+                label
+            )
+            outputs = {row_idx: (test_points[row_idx], output) for row_idx, output in test_case_outputs.items()}
+        
+        results, retry_rows = [], []
+        for row_idx, item in unit:
+            test_points, test_case_output = outputs.get(row_idx, ("", ""))
+            parsed_results = self._parse_cases(test_case_output, test_points)
             valid_results = [result for result in parsed_results if any(result.values())]
-            
             if valid_results:
-                logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 生成了 {len(valid_results)} 个测试用例")
+                results.extend({"原始行号": row_idx, **result} for result in valid_results)
             else:
-                logger.info(f"[表格 {sheet_name}] [行 #{row_idx}] 未生成有效测试用例")
+                retry_rows.append((row_idx, item))
+        
+        results = yield from self._repair_incomplete(results, label, repair_budget)
+        logger.info(f"{label} 打包生成了 {len(results)} 个测试用例")
+        if on_case:
+            for result in results:
+                on_case(result)
+        if retry_rows:
+            logger.warning(
+                f"{label} {len(retry_rows)} 行的输出缺失或格式错误，逐行重试: "
+                f"{', '.join(f'#{row_idx}' for row_idx, _ in retry_rows)}"
+            )
+        return results, retry_rows
+    
+    def _generate_packed(self, prompt_name: str, placeholders: Dict[str, str], sections: Dict[int, str], label: str) -> Generator[str, str, Dict[int, str]]:
+        """发出一次多行打包请求，返回按行拆分后的输出"""
+        if not sections:
+            return {}
+        
+        try:
+            prompt = self._prompt_manager.get_prompt(prompt_name, placeholders)
+            if prompt_name != "test_point":
+                prompt = self._compact_prompt(prompt, fused=prompt_name == "fused")
+            response = yield StagedPrompt(prompt + self._parser.format_packed_input(sections), f"packed_{prompt_name}")
+            outputs = self._parser.split_packed_output(response)
+            return {row_idx: output for row_idx, output in outputs.items() if row_idx in sections}
+        except Exception as e:
+            logger.error(f"{label} 打包请求失败: {e}")
+            return {}
+    
+    def _run_steps(self, steps: Generator[str, str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """同步驱动处理流程"""
+        response, error = None, None
+        while True:
+            try:
+                prompt = steps.throw(error) if error else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
             
-            return [{"原始行号": row_idx, **result} for result in valid_results]
+            try:
+                if isinstance(prompt, StreamRequest):
+                    response, error = self._stream(prompt), None
+                elif isinstance(prompt, list):
+                    response, error = self._invoke_all(prompt), None
+                else:
+                    response, error = self._invoke(prompt), None
+            except Exception as e:
+                response, error = None, e
+    
+    async def _arun_steps(self, steps: Generator[str, str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """异步驱动处理流程"""
+        response, error = None, None
+        while True:
+            try:
+                prompt = steps.throw(error) if error else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
             
-        except Exception as e:
-            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 处理失败: {e}")
-            return [self._create_empty_case(row_idx)]
+            try:
+                if isinstance(prompt, StreamRequest):
+                    response, error = await self._astream(prompt), None
+                elif isinstance(prompt, list):
+                    response, error = await self._ainvoke_all(prompt), None
+                else:
+                    response, error = await self._ainvoke(prompt), None
+            except Exception as e:
+                response, error = None, e
+    
+    def _continuation_limit(self, prompt: str) -> int:
+        """输出被截断时最多续写的次数，结构化输出不续写，不完整的部分由修复流程补全"""
+        if isinstance(prompt, StructuredPrompt) or not self._continuation_config.get('enabled', False):
+            return 0
+        return self._continuation_config.get('max_continuations', 2)
+    
+    def _invoke(self, prompt: str) -> str:
+        """调用LLM，输出因max_tokens被截断时从最后一个完整的测试用例处续写并拼接"""
+        max_tokens = self._output_budget.predict(prompt) if self._output_budget else None
+        response = self._llm_client.invoke(prompt, limiter=self._limiter, max_tokens=max_tokens)
+        output_tokens = self._output_tokens(response)
+        for attempt in range(self._continuation_limit(prompt)):
+            if not getattr(response, 'truncated', False):
+                break
+            kept = self._parser.complete_prefix(response)
+            logger.warning(f"LLM输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+            continuation = self._llm_client.invoke(self._parser.format_continuation_prompt(prompt, kept), limiter=self._limiter)
+            output_tokens += self._output_tokens(continuation)
+            response = self._stitch(kept, continuation)
+        if self._output_budget:
+            self._output_budget.observe(prompt, output_tokens)
+        return response
+    
+    async def _ainvoke(self, prompt: str) -> str:
+        """异步调用LLM，输出因max_tokens被截断时从最后一个完整的测试用例处续写并拼接"""
+        max_tokens = self._output_budget.predict(prompt) if self._output_budget else None
+        response = await self._llm_client.ainvoke(prompt, limiter=self._limiter, max_tokens=max_tokens)
+        output_tokens = self._output_tokens(response)
+        for attempt in range(self._continuation_limit(prompt)):
+            if not getattr(response, 'truncated', False):
+                break
+            kept = self._parser.complete_prefix(response)
+            logger.warning(f"LLM输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+            continuation = await self._llm_client.ainvoke(self._parser.format_continuation_prompt(prompt, kept), limiter=self._limiter)
+            output_tokens += self._output_tokens(continuation)
+            response = self._stitch(kept, continuation)
+        if self._output_budget:
+            self._output_budget.observe(prompt, output_tokens)
+        return response
+    
+    @staticmethod
+    def _output_tokens(response: str, text: Optional[str] = None) -> int:
+        """响应的输出token数，响应未携带用量时按文本估算"""
+        usage = getattr(response, 'usage', None) or {}
+        return usage.get('output_tokens') or estimate_tokens(response if text is None else text)
+    
+    @staticmethod
+    def _stitch(kept: str, continuation: str) -> LLMResponse:
+        """拼接已输出的完整部分和续写的输出，结束原因和用量取自续写的响应"""
+        text = f"{kept}\n{continuation}" if kept else continuation
+        return LLMResponse(text, getattr(continuation, 'finish_reason', None), getattr(continuation, 'usage', None))
+    
+    def _invoke_all(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """并行调用LLM，按提示词顺序返回响应，失败的调用返回异常对象"""
+        max_workers = max(1, min(len(prompts), self._split_config.get('max_parallel', 8)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._invoke, prompt) for prompt in prompts]
+            return [future.exception() or future.result() for future in futures]
+    
+    async def _ainvoke_all(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """并发调用LLM，按提示词顺序返回响应，失败的调用返回异常对象"""
+        semaphore = asyncio.Semaphore(max(1, self._split_config.get('max_parallel', 8)))
+        
+        async def invoke(prompt: str) -> str:
+            async with semaphore:
+                return await self._ainvoke(prompt)
+        
+        return await asyncio.gather(*(invoke(prompt) for prompt in prompts), return_exceptions=True)
+    
+    def _stream(self, request: StreamRequest) -> StreamRequest:
+        """流式调用LLM，逐块交给请求处理，请求登记的追加提示词立即并行发出，输出被截断时丢弃不完整的部分后续写"""
+        with ThreadPoolExecutor(max_workers=max(1, self._split_config.get('max_parallel', 8))) as executor:
+            futures, last = [], None
+            max_tokens = self._output_budget.predict(request.prompt) if self._output_budget else None
+            stream = self._llm_client.stream(request.prompt, limiter=self._limiter, max_tokens=max_tokens)
+            try:
+                for last in stream:
+                    if not request.feed(last):
+                        last = None
+                        break
+                    futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
+            finally:
+                stream.close()
+            
+            output_tokens = self._output_tokens(last, request.text)
+            for attempt in range(self._continuation_limit(request.prompt)):
+                if not getattr(last, 'truncated', False):
+                    break
+                kept = request.discard_partial()
+                logger.warning(f"LLM流式输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+                last = self._llm_client.invoke(self._parser.format_continuation_prompt(request.prompt, kept), limiter=self._limiter)
+                output_tokens += self._output_tokens(last)
+                if not request.feed(f"\n{last}"):
+                    break
+                futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
+            
+            if self._output_budget and not request.aborted:
+                self._output_budget.observe(request.prompt, output_tokens)
+            request.finish()
+            futures.extend(executor.submit(self._invoke, prompt) for prompt in request.take_prompts())
+            request.responses = [future.exception() or future.result() for future in futures]
+        
+        return request
+    
+    async def _astream(self, request: StreamRequest) -> StreamRequest:
+        """异步流式调用LLM，逐块交给请求处理，请求登记的追加提示词立即并发发出，输出被截断时丢弃不完整的部分后续写"""
+        semaphore = asyncio.Semaphore(max(1, self._split_config.get('max_parallel', 8)))
+        
+        async def invoke(prompt: str) -> str:
+            async with semaphore:
+                return await self._ainvoke(prompt)
+        
+        tasks, last = [], None
+        max_tokens = self._output_budget.predict(request.prompt) if self._output_budget else None
+        stream = self._llm_client.astream(request.prompt, limiter=self._limiter, max_tokens=max_tokens)
+        try:
+            async for last in stream:
+                if not request.feed(last):
+                    last = None
+                    break
+                tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
+            
+            output_tokens = self._output_tokens(last, request.text)
+            for attempt in range(self._continuation_limit(request.prompt)):
+                if not getattr(last, 'truncated', False):
+                    break
+                kept = request.discard_partial()
+                logger.warning(f"LLM流式输出被截断，保留 {len(kept)} 个字符后第 {attempt + 1} 次续写")
+                last = await self._llm_client.ainvoke(self._parser.format_continuation_prompt(request.prompt, kept), limiter=self._limiter)
+                output_tokens += self._output_tokens(last)
+                if not request.feed(f"\n{last}"):
+                    break
+                tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
+            
+            if self._output_budget and not request.aborted:
+                self._output_budget.observe(request.prompt, output_tokens)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            await stream.aclose()
+        
+        request.finish()
+        tasks.extend(asyncio.ensure_future(invoke(prompt)) for prompt in request.take_prompts())
+        request.responses = list(await asyncio.gather(*tasks, return_exceptions=True))
+        return request
     
     def _prepare_input(self, item: Dict[str, Any]) -> str:
         """从数据项准备测试点输入"""
@@ -231,28 +1130,247 @@ class DataProcessor(IDataProcessor):
         
         return str(last_value).strip() if last_value is not None else ""
     
-    def _generate_test_points(self, test_point_input: str, row_idx: int, sheet_name: str) -> str:
+    def _generate_test_points(self, test_point_input: str, row_idx: int, sheet_name: str) -> Generator[str, str, str]:
         """使用AI生成测试点"""
         try:
             prompt = self._prompt_manager.get_prompt("test_point", {"test_point_input": test_point_input})
-            response = self._llm_client.invoke(prompt)
+            response = yield StagedPrompt(prompt, "test_point")
             return response
         except Exception as e:
             logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试点生成失败: {e}")
             return ""
     
-    def _generate_test_cases(self, test_case_input: str, test_point_input: str, row_idx: int, sheet_name: str) -> str:
-        """使用AI生成测试用例"""
+    def _generate_test_cases(self, test_case_input: str, test_point_input: str, row_idx: int, sheet_name: str, emit: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[str, str, List[Dict[str, str]]]:
+        """使用AI生成测试用例，返回解析后的测试用例"""
+        request = None
         try:
-            prompt = self._prompt_manager.get_prompt(
-                "test_case", 
-                {"test_case_input": test_case_input, "test_point_input": test_point_input}
-            )
-            response = self._llm_client.invoke(prompt)
-            return response
+            prompt = self._case_prompt(test_case_input, test_point_input)
+            points = len(self._parser.split_test_points(test_case_input)[1])
+            request = self._case_request(StagedPrompt(prompt, "test_case", points), emit, test_points=test_case_input)
+            response = yield request
+            return (yield from self._case_results(request, response, row_idx, sheet_name, repair_budget, test_case_input))
         except Exception as e:
             logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试用例生成失败: {e}")
-            return ""
+            return self._streamed_cases(request)
+    
+    def _generate_test_cases_per_point(self, test_case_input: str, test_point_input: str, row_idx: int, sheet_name: str, emit: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """按测试点拆分第一阶段输出，为每个测试点并行生成测试用例并按原顺序合并"""
+        header, points = self._parser.split_test_points(test_case_input)
+        if len(points) < 2:
+            return (yield from self._generate_test_cases(test_case_input, test_point_input, row_idx, sheet_name, emit, repair_budget))
+        
+        try:
+            prompts = [self._point_prompt(header, point, test_point_input) for point in points]
+            responses = yield prompts
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试用例生成失败: {e}")
+            return []
+        
+        return (yield from self._merge_point_results(header, points, responses, row_idx, sheet_name, repair_budget))
+    
+    def _generate_streamed_points(self, test_point_input: str, row_idx: int, sheet_name: str, emit: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[PointStreamRequest, PointStreamRequest, List[Dict[str, str]]]:
+        """流式生成测试点，每条测试点所在的表格行一完整即并行生成它的测试用例"""
+        try:
+            prompt = self._prompt_manager.get_prompt("test_point", {"test_point_input": test_point_input})
+            request = yield PointStreamRequest(
+                StagedPrompt(prompt, "test_point"),
+                self._parser.is_test_point_line,
+                lambda header, point: self._point_prompt(header, point, test_point_input)
+            )
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试点生成失败: {e}")
+            request = None
+        
+        if request is None or not request.points:
+            test_case_input = request.text.strip() if request else ""
+            return (yield from self._generate_test_cases(test_case_input, test_point_input, row_idx, sheet_name, emit, repair_budget))
+        
+        return (yield from self._merge_point_results(request.header, request.points, request.responses, row_idx, sheet_name, repair_budget))
+    
+    def _point_prompt(self, header: str, point: str, test_point_input: str) -> str:
+        """生成单个测试点的测试用例提示词"""
+        prompt = self._case_prompt(f"{header}\n{point}", test_point_input)
+        if self._structured_config.get('enabled', False):
+            return self._structured_prompt(prompt)
+        return StagedPrompt(prompt, "test_case", 1)
+    
+    def _merge_point_results(self, header: str, points: List[str], responses: List[Union[str, Exception]], row_idx: int, sheet_name: str, repair_budget: Optional[RepairBudget] = None) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """按测试点顺序合并各测试点的测试用例，跳过生成失败的测试点"""
+        outputs = []
+        for point, response in zip(points, responses):
+            if isinstance(response, Exception):
+                logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试点 {point} 的测试用例生成失败: {response}")
+            elif response:
+                outputs.append((point, response))
+        if self._structured_config.get('enabled', False):
+            return (yield from self._structured_results([response for _, response in outputs], row_idx, sheet_name, repair_budget))
+        if self._compact():
+            return [case for point, response in outputs for case in self._parse_cases(response, f"{header}\n{point}")]
+        return self._parser.parse_test_cases("\n\n".join(response for _, response in outputs))
+    
+    def _generate_fused(self, test_point_input: str, row_idx: int, sheet_name: str, emit: Optional[Callable] = None, repair_budget: Optional[RepairBudget] = None) -> Generator[str, str, List[Dict[str, str]]]:
+        """使用AI在一次请求中生成测试点和测试用例，返回解析后的测试用例"""
+        request = None
+        try:
+            prompt = self._compact_prompt(self._prompt_manager.get_prompt("fused", {"test_point_input": test_point_input}), fused=True)
+            request = self._case_request(StagedPrompt(prompt, "fused"), emit, fused=True)
+            response = yield request
+            if isinstance(request, StructuredPrompt):
+                return (yield from self._case_results(request, response, row_idx, sheet_name, repair_budget))
+            if isinstance(request, CaseStreamRequest):
+                response = request.text
+            if self._parser.TEST_CASE_MARKER not in response:
+                logger.warning(f"[表格 {sheet_name}] [行 #{row_idx}] 输出中未找到测试点部分，按测试用例解析全部输出")
+            test_points, test_cases = self._parser.split_fused_output(response)
+            return (yield from self._case_results(request, test_cases, row_idx, sheet_name, repair_budget, test_points))
+        except Exception as e:
+            logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 测试点和测试用例生成失败: {e}")
+            return self._streamed_cases(request)
+    
+    def _case_request(self, prompt: str, emit: Optional[Callable], fused: bool = False, test_points: str = "") -> Union[str, StructuredPrompt, CaseStreamRequest]:
+        """启用结构化输出时包装为结构化提示词，否则启用流式生成时包装为流式请求，测试用例块一完整即交给emit
+        
+        紧凑输出格式的流式请求按test_points中的测试点取得测试点字段，单次生成模式下从输出中取得。
+        """
+        if self._structured_config.get('enabled', False):
+            return self._structured_prompt(prompt, with_test_points=fused)
+        if not self._streaming_config.get('enabled', False):
+            return prompt
+        start_marker = self._parser.TEST_CASE_MARKER if fused else None
+        abort_after_chars = self._streaming_config.get('abort_after_chars', 3000)
+        if self._compact():
+            parser = CompactCaseStreamParser(test_points, start_marker, abort_after_chars)
+        else:
+            parser = IncrementalCaseParser(start_marker, abort_after_chars)
+        return CaseStreamRequest(prompt, parser, emit)
+    
+    def _compact(self) -> bool:
+        """是否使用紧凑输出格式，启用结构化输出时以结构化输出为准"""
+        return self._compact_config.get('enabled', False) and not self._structured_config.get('enabled', False)
+    
+    def _compact_prompt(self, prompt: ChatPrompt, fused: bool = False) -> ChatPrompt:
+        """启用紧凑输出时在系统消息末尾追加紧凑格式说明，说明不含变量，不影响提示词前缀缓存"""
+        if not self._compact():
+            return prompt
+        return prompt.extend_system(self._parser.format_compact_instruction(fused))
+    
+    def _case_input(self, test_points: str) -> str:
+        """注入测试用例提示词的测试点，启用紧凑输出时压缩为紧凑格式"""
+        return self._parser.compact_test_points(test_points) if self._compact() else test_points
+    
+    def _case_prompt(self, test_points: str, test_point_input: str) -> ChatPrompt:
+        """生成测试用例提示词"""
+        prompt = self._prompt_manager.get_prompt(
+            "test_case",
+            {"test_case_input": self._case_input(test_points), "test_point_input": test_point_input}
+        )
+        return self._compact_prompt(prompt)
+    
+    def _parse_cases(self, ai_output: str, test_points: str) -> List[Dict[str, str]]:
+        """按输出格式解析测试用例，紧凑格式的测试点字段按测试点序号取自test_points"""
+        if self._compact():
+            return self._parser.parse_compact_cases(ai_output, test_points)
+        return self._parser.parse_test_cases(ai_output)
+    
+    def _structured_prompt(self, prompt: str, with_test_points: bool = False) -> StructuredPrompt:
+        """在提示词末尾追加结构化输出说明，并要求模型按测试用例的JSON Schema输出"""
+        return StructuredPrompt(
+            prompt + self._parser.format_structured_instruction(with_test_points),
+            self._parser.case_schema(with_test_points),
+            method=self._structured_config.get('method', 'json_schema')
+        )
+    
+    def _case_results(self, request: Union[str, StructuredPrompt, CaseStreamRequest], response: Union[str, CaseStreamRequest], row_idx: int, sheet_name: str, repair_budget: Optional[RepairBudget] = None, test_points: str = "") -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """取出请求生成的测试用例，结构化输出经校验和修复，流式请求直接使用增量解析的结果"""
+        if isinstance(request, StructuredPrompt):
+            return (yield from self._structured_results([response], row_idx, sheet_name, repair_budget))
+        if not isinstance(request, CaseStreamRequest):
+            return self._parse_cases(response, test_points)
+        if request.aborted:
+            logger.warning(
+                f"[表格 {sheet_name}] [行 #{row_idx}] 输出 {len(request.text)} 个字符后仍未出现测试用例，"
+                f"判定格式异常并已提前中止生成"
+            )
+        return request.cases
+    
+    def _structured_results(self, responses: List[str], row_idx: int, sheet_name: str, repair_budget: Optional[RepairBudget] = None) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, str]]]:
+        """解析结构化输出，未通过校验的内容不整行重新生成，而是并行发出定向修复请求，修复后仍不通过的丢弃"""
+        results, repairs = [], []
+        for response in responses:
+            cases, invalid = self._parser.parse_structured_cases(response)
+            results.extend(cases)
+            if invalid:
+                repairs.append(invalid)
+        if not repairs:
+            return results
+        
+        invalid_count = sum(len(invalid) for invalid in repairs)
+        if not self._structured_repair_enabled():
+            logger.warning(f"[表格 {sheet_name}] [行 #{row_idx}] {invalid_count} 处输出未通过校验，未启用结构化输出修复，已丢弃")
+            return results
+        
+        granted = [invalid for invalid in repairs if repair_budget and repair_budget.acquire()]
+        logger.warning(f"[表格 {sheet_name}] [行 #{row_idx}] {invalid_count} 处输出未通过校验，发出 {len(granted)} 个修复请求")
+        if len(granted) < len(repairs):
+            logger.warning(f"[表格 {sheet_name}] [行 #{row_idx}] 修复预算已用完，{len(repairs) - len(granted)} 个修复请求未发出")
+        repairs = granted
+        if not repairs:
+            return results
+        repaired = yield [self._structured_prompt(self._parser.format_repair_prompt(invalid)) for invalid in repairs]
+        
+        for invalid, response in zip(repairs, repaired):
+            if isinstance(response, Exception):
+                logger.error(f"[表格 {sheet_name}] [行 #{row_idx}] 修复请求失败: {response}")
+                continue
+            cases, still_invalid = self._parser.parse_structured_cases(response)
+            results.extend(cases)
+            for _, problems in still_invalid:
+                logger.warning(f"[表格 {sheet_name}] [行 #{row_idx}] 修复后仍未通过校验，已丢弃: {'；'.join(problems)}")
+        return results
+    
+    def _structured_repair_enabled(self) -> bool:
+        """是否为未通过校验的结构化输出发出修复请求"""
+        return self._structured_config.get('enabled', False) and self._structured_config.get('repair', True)
+    
+    def _missing_fields(self, case: Dict[str, str]) -> List[str]:
+        """测试用例中为空的必填字段，未启用修复时不做校验"""
+        if not self._repair_config.get('enabled', False):
+            return []
+        required = self._repair_config.get('required_fields', ["测试步骤", "预期结果"])
+        return [name for name in required if not case.get(name)]
+    
+    def _repair_incomplete(self, cases: List[Dict[str, Any]], label: str, repair_budget: Optional[RepairBudget] = None) -> Generator[List[str], List[Union[str, Exception]], List[Dict[str, Any]]]:
+        """校验测试用例是否完整，缺少必填字段的在修复预算内并行发出只含已有字段和缺失字段名的修复请求，比整行重新生成便宜得多"""
+        incomplete = [(index, self._missing_fields(case)) for index, case in enumerate(cases)]
+        incomplete = [(index, missing) for index, missing in incomplete if missing]
+        if not incomplete:
+            return cases
+        
+        granted = [(index, missing) for index, missing in incomplete if repair_budget and repair_budget.acquire()]
+        logger.warning(f"{label} {len(incomplete)} 个测试用例不完整，发出 {len(granted)} 个修复请求")
+        if len(granted) < len(incomplete):
+            logger.warning(f"{label} 修复预算已用完，{len(incomplete) - len(granted)} 个测试用例保持原样")
+        if not granted:
+            return cases
+        responses = yield [self._parser.format_field_repair_prompt(cases[index], missing) for index, missing in granted]
+        
+        results, repaired = list(cases), 0
+        for (index, missing), response in zip(granted, responses):
+            if isinstance(response, Exception):
+                logger.error(f"{label} 修复请求失败: {response}")
+                continue
+            fields = self._parser.parse_repaired_fields(response, missing)
+            results[index] = {**cases[index], **fields}
+            if len(fields) == len(missing):
+                repaired += 1
+            else:
+                logger.warning(f"{label} 修复后仍缺少字段: {'、'.join(name for name in missing if name not in fields)}")
+        logger.info(f"{label} 修复了 {repaired}/{len(granted)} 个不完整的测试用例")
+        return results
+    
+    def _streamed_cases(self, request: Union[str, CaseStreamRequest, None]) -> List[Dict[str, str]]:
+        """流式请求中途失败时保留已完整解析的测试用例"""
+        return request.cases if isinstance(request, CaseStreamRequest) else []
     
     def _create_empty_case(self, row_idx: int) -> Dict[str, Any]:
         """为错误处理创建空的测试用例"""
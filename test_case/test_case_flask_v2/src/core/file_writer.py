@@ -4,11 +4,12 @@
 """
 
 import threading
+from itertools import chain
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
-import pandas as pd
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 
 from .interface import IFileWriter
@@ -39,55 +40,25 @@ class ExcelWriter(IFileWriter):
             logger.warning("没有数据可写入")
             return False
         
-        # 确保输出目录存在
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            with _write_lock:
-                self._write_excel(data_dict, str(output_path))
-            return True
-        except Exception as e:
-            logger.error(f"Excel写入失败: {e}")
-            raise FileOperationException(f"写入Excel文件失败: {e}")
+        stream = self.open(output_path)
+        for sheet_name, data in data_dict.items():
+            stream.write_sheet(sheet_name, data)
+        return stream.close()
     
-    def _write_excel(self, data_dict: Dict[str, List[Dict[str, Any]]], output_path: str) -> None:
-        """内部Excel写入实现"""
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for sheet_name, data in data_dict.items():
-                df = self._prepare_dataframe(data)
-                df.to_excel(writer, index=False, sheet_name=sheet_name)
-                
-                workbook = writer.book
-                worksheet = writer.sheets[sheet_name]
-                self._apply_styling(worksheet, df)
-        
-        logger.info(f"已生成格式化的Excel文件: {output_path}")
+    def open(self, output_path: Path, sheet_order: Optional[List[str]] = None) -> "SheetStream":
+        """开始逐表写入格式化的Excel文件，sheet_order为输出文件中各表的顺序，未列出的表按写入顺序排在其后"""
+        return SheetStream(self, output_path, sheet_order)
     
-    def _prepare_dataframe(self, data: List[Dict[str, Any]]) -> pd.DataFrame:
-        """准备具有适当列映射的DataFrame"""
-        prepared_data = []
-        
-        for idx, item in enumerate(data, 1):
-            original_row = item.get("原始行号", 0)
-            display_row = original_row + self._data_start_row - 1 if original_row > 0 else ""
-            
-            prepared_data.append({
-                #"序号": idx,
-                #"原始行号": display_row,
-                "L4项目": item.get("测试点", ""),
-                #"测试点编号": item.get("测试点编号", ""),
-                "三级项目": item.get("测试点描述", ""),
-                #"前置条件": item.get("前置条件", ""),
-                "测试方法": item.get("测试步骤", ""),
-                "预判定标准": item.get("预期结果", "")
-            })
+    def _write_sheet(self, workbook: openpyxl.Workbook, sheet_name: str, data: List[Dict[str, Any]]) -> None:
+        """在只写工作簿中逐行写入一张表并应用格式和样式"""
+        rows = self._prepare_rows(data)
+        first = next(rows, None)
+        worksheet = workbook.create_sheet(sheet_name)
+        if first is None:
+            return
         
-        return pd.DataFrame(prepared_data)
-    
-    def _apply_styling(self, worksheet, df: pd.DataFrame) -> None:
-        """对工作表应用格式和样式"""
-        # 设置列宽
-        for col_idx, col in enumerate(worksheet.columns, 1):
+        # 设置列宽，只写模式下须在写入行之前设置
+        for col_idx in range(1, len(first) + 1):
             col_letter = openpyxl.utils.get_column_letter(col_idx)
             width = self._first_col_width if col_idx == 1 else self._other_cols_width
             worksheet.column_dimensions[col_letter].width = width
@@ -100,23 +71,93 @@ class ExcelWriter(IFileWriter):
         first_col_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
         other_cols_align = Alignment(horizontal="left", vertical="center", wrap_text=True)
         
-        # 应用字体
-        for row in worksheet.iter_rows(min_row=1, max_row=len(df)+1, max_col=len(df.columns)):
-            for cell in row:
-                cell.font = font
-        
         # 表头行
-        for cell in worksheet[1]:
-            cell.font = bold_font
-            cell.alignment = header_align
-        
-        # 第一列
-        for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=1, max_col=1):
-            for cell in row:
-                cell.alignment = first_col_align
+        worksheet.append([self._styled_cell(worksheet, name, bold_font, header_align) for name in first])
         
-        # 其他列
-        for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=2, max_col=len(df.columns)+1):
-            for cell in row:
-                cell.alignment = other_cols_align
+        # 第一列居中，其他列左对齐
+        for row in chain([first], rows):
+            worksheet.append([
+                self._styled_cell(worksheet, value, font, first_col_align if col_idx == 0 else other_cols_align)
+                for col_idx, value in enumerate(row.values())
+            ])
+    
+    @staticmethod
+    def _styled_cell(worksheet, value: Any, font: Font, alignment: Alignment) -> WriteOnlyCell:
+        """带样式的只写单元格，空字符串与DataFrame写出时一样留空"""
+        cell = WriteOnlyCell(worksheet, value=None if value == "" else value)
+        cell.font = font
+        cell.alignment = alignment
+        return cell
+    
+    def _prepare_rows(self, data: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """逐个产出具有适当列映射的输出行"""
+        for idx, item in enumerate(data, 1):
+            original_row = item.get("原始行号", 0)
+            display_row = original_row + self._data_start_row - 1 if original_row > 0 else ""
+            
+            yield {
+                #"序号": idx,
+                #"原始行号": display_row,
+                "L4项目": item.get("测试点", ""),
+                #"测试点编号": item.get("测试点编号", ""),
+                "三级项目": item.get("测试点描述", ""),
+                #"前置条件": item.get("前置条件", ""),
+                "测试方法": item.get("测试步骤", ""),
+                "预判定标准": item.get("预期结果", "")
+            }
 
+class SheetStream:
+    """逐表写入的Excel文件（线程安全），write_sheet可随各表完成依次调用，close保存文件，任一表写入失败时抛出FileOperationException"""
+    
+    def __init__(self, writer: ExcelWriter, output_path: Path, sheet_order: Optional[List[str]] = None):
+        """writer提供格式和样式，工作簿以只写模式创建，已写入的行暂存在临时文件中"""
+        self._writer = writer
+        self._output_path = output_path
+        self._sheet_order = sheet_order or []
+        self._workbook = openpyxl.Workbook(write_only=True)
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+    
+    def write_sheet(self, sheet_name: str, data: List[Dict[str, Any]]) -> None:
+        """写入一张表的测试用例，写入失败时记录错误，由close抛出"""
+        with self._lock:
+            if self._error:
+                return
+            try:
+                self._writer._write_sheet(self._workbook, sheet_name, data)
+            except Exception as e:
+                logger.error(f"[表格 {sheet_name}] Excel写入失败: {e}")
+                self._error = e
+    
+    def _discard(self) -> None:
+        """不保存文件，结束已写入的工作表，临时文件在进程退出时由openpyxl删除"""
+        for worksheet in self._workbook.worksheets:
+            worksheet.close()
+    
+    def close(self) -> bool:
+        """按sheet_order排列各表并保存文件，没有写入任何表时返回False"""
+        with self._lock:
+            if self._error:
+                self._discard()
+                raise FileOperationException(f"写入Excel文件失败: {self._error}")
+            if not self._workbook.sheetnames:
+                logger.warning("没有数据可写入")
+                return False
+            
+            order = {name: idx for idx, name in enumerate(self._sheet_order)}
+            names = sorted(self._workbook.sheetnames, key=lambda name: order.get(name, len(order)))
+            for idx, name in enumerate(names):
+                self._workbook.move_sheet(name, idx - self._workbook.sheetnames.index(name))
+            
+            # 确保输出目录存在
+            self._output_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            try:
+                with _write_lock:
+                    self._workbook.save(str(self._output_path))
+            except Exception as e:
+                logger.error(f"Excel写入失败: {e}")
+                raise FileOperationException(f"写入Excel文件失败: {e}")
+        
+        logger.info(f"已生成格式化的Excel文件: {self._output_path}")
+        return True
@@ -5,7 +5,7 @@
 
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 class IDataLoader(ABC):
     """数据加载器接口"""
@@ -14,13 +14,50 @@ class IDataLoader(ABC):
     def load(self, file_path: Path) -> Dict[str, List[Dict[str, Any]]]:
         """从文件加载数据"""
         pass
+    
+    @abstractmethod
+    def iter_records(self, file_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """从文件逐行加载数据，按表依次产出(表名, 数据记录)"""
+        pass
+    
+    @abstractmethod
+    def sheet_names(self, file_path: Path) -> List[str]:
+        """返回iter_records将要读取的表名"""
+        pass
 
 class IDataProcessor(ABC):
     """数据处理器接口"""
     
     @abstractmethod
-    def process_batch(self, items: List[Dict[str, Any]], sheet_name: str) -> List[Dict[str, Any]]:
-        """批量处理数据项"""
+    def process_batch(self, items: List[Dict[str, Any]], sheet_name: str, deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """批量处理数据项，deduplicate指定是否合并内容相同的行，None表示使用配置；on_case在每产出一个测试用例时回调；repair_budget为所属任务的修复请求预算"""
+        pass
+    
+    @abstractmethod
+    def process_sheets(self, sheets: Dict[str, List[Dict[str, Any]]], deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[Any] = None, on_sheet: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """将所有表的行提交到同一个工作池处理，按表组装结果；on_sheet在一张表的所有行完成时回调，keep_results为False时不在返回的映射中保留测试用例"""
+        pass
+    
+    @abstractmethod
+    def process_rows(self, rows: Iterable[Tuple[str, Dict[str, Any]]], deduplicate: Optional[bool] = None, on_case: Optional[Callable[[Dict[str, Any]], Any]] = None, repair_budget: Optional[Any] = None, on_sheet: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None, keep_results: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """边读取边处理按表依次产出的(表名, 数据记录)，参数与process_sheets相同"""
+        pass
+    
+    @abstractmethod
+    def create_repair_budget(self) -> Any:
+        """按配置创建一个任务的修复请求预算"""
+        pass
+    
+    @property
+    @abstractmethod
+    def concurrency_limiter(self) -> Optional[Any]:
+        """自适应并发限制器，未启用时为None"""
+        pass
+    
+    @property
+    @abstractmethod
+    def output_budget(self) -> Optional[Any]:
+        """输出长度预测器，未启用时为None"""
         pass
 
 class IFileWriter(ABC):
@@ -30,13 +67,43 @@ class IFileWriter(ABC):
     def write(self, data_dict: Dict[str, List[Dict[str, Any]]], output_path: Path) -> bool:
         """将数据写入文件"""
         pass
+    
+    @abstractmethod
+    def open(self, output_path: Path, sheet_order: Optional[List[str]] = None) -> Any:
+        """开始逐表写入文件，返回带write_sheet(表名, 数据)和close()的写入器，sheet_order为输出文件中各表的顺序"""
+        pass
 
 class ILLMClient(ABC):
     """LLM客户端接口"""
     
     @abstractmethod
-    def invoke(self, prompt: str) -> str:
-        """调用LLM"""
+    def invoke(self, prompt: str, limiter: Optional[Any] = None, max_tokens: Optional[int] = None) -> str:
+        """调用LLM，实际发出请求时返回携带结束原因和用量的LLMResponse；max_tokens为None时使用模型配置的max_tokens"""
+        pass
+    
+    @abstractmethod
+    async def ainvoke(self, prompt: str, limiter: Optional[Any] = None, max_tokens: Optional[int] = None) -> str:
+        """异步调用LLM"""
+        pass
+    
+    @abstractmethod
+    def stream(self, prompt: str, limiter: Optional[Any] = None, max_tokens: Optional[int] = None) -> Iterator[str]:
+        """流式调用LLM，逐块返回响应文本"""
+        pass
+    
+    @abstractmethod
+    def astream(self, prompt: str, limiter: Optional[Any] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """异步流式调用LLM，逐块返回响应文本"""
+        pass
+    
+    @abstractmethod
+    def get_stats(self) -> Dict[str, int]:
+        """获取调用统计快照"""
+        pass
+    
+    @abstractmethod
+    def close(self) -> None:
+        """释放客户端持有的资源，客户端不再使用时调用"""
         pass
 
 class IPromptManager(ABC):
@@ -0,0 +1,147 @@
+"""
+调度模块
+按估算耗时安排请求组的提交顺序，并预测一张表的总耗时
+"""
+
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+from ..util.logger_util import get_logger
+
+logger = get_logger(__name__)
+
+SCHEDULE_POLICIES = ("sheet_order", "longest_first")
+
+class RowScheduler:
+    """请求组调度器（线程安全）
+    
+    sheet_order按表中顺序提交；longest_first按估算耗时从长到短提交，避免耗时长的行排在最后时其余工作线程空闲等待。
+    估算耗时优先使用同一输入之前观测到的耗时，否则按估算token数乘以每token耗时估计，观测耗时保存在history_path供之后的任务使用。
+    """
+    
+    def __init__(self, policy: str = "sheet_order", history_path: Optional[str] = None, history_size: int = 10000):
+        """history_path为None时观测耗时只在内存中保留，超过history_size条时淘汰最久未使用的条目"""
+        if policy not in SCHEDULE_POLICIES:
+            raise ValueError(f"不支持的调度策略: {policy}，可选值: {', '.join(SCHEDULE_POLICIES)}")
+        
+        self._policy = policy
+        self._history_path = Path(history_path) if history_path else None
+        self._history_size = max(1, history_size)
+        
+        # 输入摘要 -> 观测耗时（秒）
+        self._durations: "OrderedDict[str, float]" = OrderedDict()
+        # 每token耗时的指数移动平均，尚无观测时为0
+        self._seconds_per_token = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+    
+    @property
+    def policy(self) -> str:
+        """调度策略"""
+        return self._policy
+    
+    def schedule(self, jobs: Iterable[Tuple[Any, str, int]], estimate: "MakespanEstimate") -> Iterator[Any]:
+        """按表中顺序的(请求组, 输入摘要, 输入估算token数)安排提交顺序并逐个产出，各请求组的估算耗时按提交顺序加入estimate
+        
+        sheet_order不必先取出全部请求组，估算在提交时进行，本次任务已完成的请求组的观测也参与估算，estimate在产出完毕后才完整；
+        longest_first先取出全部请求组，估算后按耗时从长到短产出。
+        """
+        if self._policy == "sheet_order":
+            for unit, key, tokens in jobs:
+                with self._lock:
+                    estimate.add(self._estimate(key, tokens))
+                yield unit
+            return
+        
+        jobs = list(jobs)
+        with self._lock:
+            costs = [self._estimate(key, tokens) for _, key, tokens in jobs]
+        
+        # 尚无观测时估算耗时全为0，按token数排序
+        order = sorted(range(len(jobs)), key=lambda i: (costs[i] or 0.0, jobs[i][2]), reverse=True)
+        for i in order:
+            estimate.add(costs[i])
+        for i in order:
+            yield jobs[i][0]
+    
+    def observe(self, key: str, tokens: int, seconds: float) -> None:
+        """记录一个请求组的实际耗时"""
+        with self._lock:
+            self._durations[key] = seconds
+            self._durations.move_to_end(key)
+            while len(self._durations) > self._history_size:
+                self._durations.popitem(last=False)
+            
+            if tokens > 0:
+                rate = seconds / tokens
+                self._seconds_per_token = rate if not self._seconds_per_token else 0.8 * self._seconds_per_token + 0.2 * rate
+            self._dirty = True
+    
+    def save(self) -> None:
+        """将观测耗时写入history_path，没有新的观测时不写入"""
+        if self._history_path is None:
+            return
+        
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"seconds_per_token": self._seconds_per_token, "durations": dict(self._durations)}
+            self._dirty = False
+        
+        try:
+            self._history_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self._history_path.with_name(f"{self._history_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self._history_path)
+        except OSError as e:
+            logger.warning(f"保存调度耗时记录失败: {e}")
+    
+    def _load(self) -> None:
+        """读取之前运行保存的观测耗时"""
+        if self._history_path is None or not self._history_path.exists():
+            return
+        
+        try:
+            with open(self._history_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._seconds_per_token = float(data.get("seconds_per_token", 0.0))
+            durations = list(data.get("durations", {}).items())[-self._history_size:]
+            self._durations.update((key, float(seconds)) for key, seconds in durations)
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"读取调度耗时记录失败: {e}")
+    
+    def _estimate(self, key: str, tokens: int) -> Optional[float]:
+        """估算一个请求组的耗时，无法估算时为None"""
+        if key in self._durations:
+            self._durations.move_to_end(key)
+            return self._durations[key]
+        if self._seconds_per_token:
+            return tokens * self._seconds_per_token
+        return None
+
+
+class MakespanEstimate:
+    """按提交顺序累计的预计总耗时：workers个工作者依次领取请求组，每个请求组分给最先空闲的工作者，有请求组无法估算时不预计"""
+    
+    def __init__(self, workers: int):
+        self._loads = [0.0] * max(1, workers)
+        self._complete = True
+    
+    def add(self, cost: Optional[float]) -> None:
+        """按提交顺序加入一个请求组的估算耗时，无法估算时为None"""
+        if cost is None:
+            self._complete = False
+            return
+        heapq.heappush(self._loads, heapq.heappop(self._loads) + cost)
+    
+    @property
+    def seconds(self) -> Optional[float]:
+        """预计总耗时秒数，有请求组无法估算时为None"""
+        return max(self._loads) if self._complete else None
@@ -2,7 +2,10 @@
 LLM模块
 """
 
+from .adaptive_limiter import AdaptiveLimiter
 from .client import LLMClient
 from .prompt_manager import PromptManager
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
 
-__all__ = ['LLMClient', 'PromptManager']
\ No newline at end of file
+__all__ = ['AdaptiveLimiter', 'LLMClient', 'PromptManager', 'ResponseCache', 'SingleFlight']
\ No newline at end of file
@@ -3,9 +3,24 @@ LLM客户端模块
 处理与语言模型的通信
 """
 
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 
+from .adaptive_limiter import AdaptiveLimiter, is_throttle_error
+from .connection_pool import get_http_clients, get_shared_runnable, track_throttle_responses
+from .llm_response import LLMResponse
+from .rate_limiter import estimate_tokens, get_rate_limiter
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+from .structured_output import StructuredPrompt
 from ..core.interface import ILLMClient
 from ..core.exception import LLMException
 from ..config.setting import get_config
@@ -13,6 +28,9 @@ from ..util.logger_util import get_logger
 
 logger = get_logger(__name__)
 
+# 进程内共享的在途请求表，相同请求同时在途时只发出一次调用
+_single_flight = SingleFlight()
+
 class LLMClient(ILLMClient):
     """用于与语言模型交互的客户端"""
     
@@ -20,7 +38,23 @@ class LLMClient(ILLMClient):
         """使用配置服务初始化客户端"""
         self._config = get_config()
         self._model_config = self._config.get_model_config()
-        self._llm = self._init_llm()
+        self._llm = get_shared_runnable(self._llm_key(), self._init_llm)
+        self._output_parser = StrOutputParser()
+        self._rate_limiter = get_rate_limiter(
+            self._model_config.get('base_url'),
+            self._model_config.get('name'),
+            self._model_config.get('rate_limit', {})
+        )
+        self._cache = self._init_cache()
+        self._stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+    
+    def _llm_key(self) -> Tuple:
+        """共享LLM实例的标识，模型参数相同时复用同一个实例"""
+        return tuple(
+            self._model_config.get(name)
+            for name in ('name', 'base_url', 'api_key', 'temperature', 'max_tokens', 'request_timeout', 'max_retries')
+        )
     
     def _init_llm(self) -> ChatOpenAI:
         """使用配置服务初始化LLM"""
@@ -33,6 +67,10 @@ class LLMClient(ILLMClient):
         if not base_url or base_url == "xxx":
             raise LLMException("基础URL未配置")
         
+        http_client, http_async_client = get_http_clients(
+            base_url, api_key, self._model_config.get('connection_pool', {})
+        )
+        
         return ChatOpenAI(
             model=self._model_config.get('name'),
             base_url=base_url,
@@ -40,15 +78,352 @@ class LLMClient(ILLMClient):
             temperature=self._model_config.get('temperature', 0),
             max_tokens=self._model_config.get('max_tokens', 8192),
             request_timeout=self._model_config.get('request_timeout', 300),
-            max_retries=self._model_config.get('max_retries', 3)
+            max_retries=self._model_config.get('max_retries', 3),
+            stream_usage=True,
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
+    
+    def _init_cache(self) -> Optional[ResponseCache]:
+        """使用配置服务初始化响应缓存"""
+        cache_config = self._config.get_cache_config()
+        if not cache_config.get('enabled', False):
+            return None
+        
+        cache_path = self._config.get_file_path("cache_dir", "cache") / "llm_cache.db"
+        cache = ResponseCache(
+            cache_path,
+            ttl_seconds=cache_config.get('ttl_seconds', 0),
+            max_entries=cache_config.get('max_entries', 0)
+        )
+        logger.info(f"LLM响应缓存已启用: {cache_path}")
+        return cache
+    
+    def _cache_key(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """生成缓存键，包含本次请求实际生效的max_tokens，输出长度限制不同的请求不共用缓存也不合并"""
+        if isinstance(prompt, StructuredPrompt) or not max_tokens:
+            max_tokens = self._model_config.get('max_tokens', 8192)
+        return ResponseCache.make_key(
+            self._model_config.get('name'),
+            self._model_config.get('base_url'),
+            self._model_config.get('temperature', 0),
+            max_tokens,
+            prompt.cache_text() if isinstance(prompt, StructuredPrompt) else prompt
         )
     
-    def invoke(self, prompt: str) -> str:
-        """使用提示调用LLM"""
+    def _runnable(self, prompt: str, max_tokens: Optional[int] = None) -> Runnable:
+        """选择发出请求的LLM，结构化提示词按其输出方式约束输出，指定了max_tokens时按其限制输出长度"""
+        if not isinstance(prompt, StructuredPrompt):
+            return self._llm.bind(max_tokens=max_tokens) if max_tokens else self._llm
+        if prompt.method == "function_calling":
+            tool = {
+                "type": "function",
+                "function": {"name": prompt.name, "description": "提交生成结果", "parameters": prompt.schema}
+            }
+            return self._llm.bind_tools([tool], tool_choice=prompt.name)
+        return self._llm.bind(response_format={
+            "type": "json_schema",
+            "json_schema": {"name": prompt.name, "schema": prompt.schema, "strict": True}
+        })
+    
+    @staticmethod
+    def _messages(prompt: str) -> Union[str, List[BaseMessage]]:
+        """请求的消息：提示词带有系统消息时拆分为系统消息和用户消息，否则整体作为一条用户消息"""
+        if not getattr(prompt, 'system', ''):
+            return str(prompt)
+        return [SystemMessage(prompt.system), HumanMessage(prompt.user)]
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        """累加调用统计"""
+        with self._stats_lock:
+            self._stats[name] = self._stats.get(name, 0) + amount
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取调用统计快照"""
+        with self._stats_lock:
+            return dict(self._stats)
+    
+    def close(self) -> None:
+        """关闭响应缓存的数据库连接，客户端不再使用时调用"""
+        if self._cache:
+            self._cache.close()
+    
+    def _lookup_cache(self, prompt: str, max_tokens: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+        """查询响应缓存，返回(缓存键, 缓存的响应)"""
+        if not self._cache:
+            return None, None
+        
+        cache_key = self._cache_key(prompt, max_tokens)
+        cached = self._cache.get(cache_key)
+        self._count("cache_hits" if cached is not None else "cache_misses")
+        return cache_key, cached
+    
+    def _store_cache(self, cache_key: Optional[str], response: str) -> None:
+        """将非空响应写入缓存，因长度限制被截断的响应不缓存"""
+        if cache_key and response and not getattr(response, 'truncated', False):
+            self._cache.set(cache_key, response)
+    
+    def _estimate_request_tokens(self, prompt: str, max_tokens: Optional[int] = None) -> int:
+        """估算一次请求消耗的token数（提示词估算值加预计输出长度，指定了max_tokens时按max_tokens计）"""
+        rate_config = self._model_config.get('rate_limit', {})
+        return estimate_tokens(prompt) + (max_tokens or rate_config.get('estimated_completion_tokens', 1024))
+    
+    def _record_rate_wait(self, wait: float) -> None:
+        """记录限速排队情况"""
+        if wait > 0:
+            self._count("rate_limit_waits")
+            logger.debug(f"LLM限速排队 {wait:.2f}秒")
+    
+    def _finish_response(self, message: BaseMessage, prompt: str, estimated_tokens: int) -> LLMResponse:
+        """提取响应文本及结束原因和用量，并用实际用量校正限速器，工具调用的响应文本为调用参数的JSON文本"""
+        tool_calls = getattr(message, 'tool_calls', None)
+        if tool_calls:
+            text = json.dumps(tool_calls[0]['args'], ensure_ascii=False)
+        else:
+            text = self._output_parser.invoke(message).strip()
+        usage = getattr(message, 'usage_metadata', None)
+        self._reconcile_usage(usage, prompt, text, estimated_tokens)
+        return self._make_response(text, message.response_metadata.get('finish_reason'), usage)
+    
+    def _make_response(self, text: str, finish_reason: Optional[str], usage: Optional[Dict]) -> LLMResponse:
+        """创建携带结束原因和用量的响应，统计输入token中命中服务端前缀缓存的部分和因长度限制被截断的响应"""
+        if usage and usage.get('input_tokens'):
+            self._count("input_tokens", usage['input_tokens'])
+            self._count("cached_input_tokens", (usage.get('input_token_details') or {}).get('cache_read') or 0)
+        response = LLMResponse(text, finish_reason, usage)
+        if response.truncated:
+            self._count("truncated_responses")
+            logger.warning("LLM输出达到max_tokens上限被截断")
+        return response
+    
+    def _reconcile_usage(self, usage: Optional[Dict], prompt: str, response: str, estimated_tokens: int) -> None:
+        """用实际用量校正限速器，响应中没有用量时按文本估算"""
+        if self._rate_limiter:
+            actual_tokens = (usage or {}).get('total_tokens') or estimate_tokens(prompt) + estimate_tokens(response)
+            self._rate_limiter.reconcile(estimated_tokens, actual_tokens)
+    
+    def _release_limiter(self, limiter: Optional[AdaptiveLimiter], started: float, throttle_responses: List[int], error: Optional[Exception]) -> None:
+        """归还并发名额，并将本次请求的耗时和是否被限流反馈给限制器"""
+        if limiter is None:
+            return
+        
+        throttled = throttle_responses[0] > 0 or (error is not None and is_throttle_error(error))
+        limiter.release(time.perf_counter() - started, throttled)
+    
+    def invoke(self, prompt: str, limiter: Optional[AdaptiveLimiter] = None, max_tokens: Optional[int] = None) -> str:
+        """使用提示调用LLM，缓存未命中时与进行中的相同请求合并，StructuredPrompt按其输出结构返回JSON文本
+        
+        实际发出请求时返回LLMResponse，附带结束原因和用量；命中缓存时为普通字符串。
+        max_tokens为本次请求的最大输出token数，为None时使用模型配置的max_tokens。
+        """
+        cache_key, cached = self._lookup_cache(prompt, max_tokens)
+        if cached is not None:
+            return cached
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            return flight.result()
+        
+        try:
+            response = self._request(prompt, limiter, max_tokens)
+            self._store_cache(cache_key, response)
+        except BaseException as e:
+            _single_flight.resolve(flight_key, flight, error=e)
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+        return response
+    
+    async def ainvoke(self, prompt: str, limiter: Optional[AdaptiveLimiter] = None, max_tokens: Optional[int] = None) -> str:
+        """使用提示异步调用LLM"""
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, prompt, max_tokens)
+        if cached is not None:
+            return cached
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            return await asyncio.wrap_future(flight)
+        
         try:
-            chain = self._llm | StrOutputParser()
-            response = chain.invoke(prompt)
-            return response.strip()
+            response = await self._arequest(prompt, limiter, max_tokens)
+            await asyncio.to_thread(self._store_cache, cache_key, response)
+        except BaseException as e:
+            _single_flight.resolve(flight_key, flight, error=e)
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+        return response
+    
+    def stream(self, prompt: str, limiter: Optional[AdaptiveLimiter] = None, max_tokens: Optional[int] = None) -> Iterator[str]:
+        """使用提示流式调用LLM，逐块返回响应文本
+        
+        命中缓存或合并到进行中的相同请求时，完整响应作为一个文本块返回；
+        实际发出请求时，最后一个文本块为携带结束原因和用量的LLMResponse（文本可能为空）；
+        调用方提前关闭迭代器时请求随之中止，不完整的响应不写入缓存。
+        """
+        cache_key, cached = self._lookup_cache(prompt, max_tokens)
+        if cached is not None:
+            yield cached
+            return
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            yield flight.result()
+            return
+        
+        chunks, stream = [], self._stream_request(prompt, limiter, max_tokens)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+            response = self._stream_response(chunks)
+            self._store_cache(cache_key, response)
+        except BaseException as e:
+            stream.close()
+            _single_flight.resolve(flight_key, flight, error=self._stream_error(e))
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+    
+    async def astream(self, prompt: str, limiter: Optional[AdaptiveLimiter] = None, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """使用提示异步流式调用LLM，逐块返回响应文本"""
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, prompt, max_tokens)
+        if cached is not None:
+            yield cached
+            return
+        
+        flight_key = cache_key or self._cache_key(prompt, max_tokens)
+        flight, is_leader = _single_flight.join(flight_key)
+        if not is_leader:
+            self._count("coalesced_calls")
+            yield await asyncio.wrap_future(flight)
+            return
+        
+        chunks, stream = [], self._astream_request(prompt, limiter, max_tokens)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+            response = self._stream_response(chunks)
+            await asyncio.to_thread(self._store_cache, cache_key, response)
+        except BaseException as e:
+            await stream.aclose()
+            _single_flight.resolve(flight_key, flight, error=self._stream_error(e))
+            raise
+        
+        _single_flight.resolve(flight_key, flight, result=response)
+    
+    @staticmethod
+    def _stream_response(chunks: List[str]) -> LLMResponse:
+        """拼接流式响应，结束原因和用量取自最后一个文本块"""
+        last = chunks[-1] if chunks else None
+        return LLMResponse("".join(chunks).strip(), getattr(last, 'finish_reason', None), getattr(last, 'usage', None))
+    
+    @staticmethod
+    def _stream_error(error: BaseException) -> BaseException:
+        """合并到流式请求的调用方收到的异常，调用方主动中止时不传递GeneratorExit"""
+        if isinstance(error, GeneratorExit):
+            return LLMException("相同请求的流式调用已被中止")
+        return error
+    
+    def _request(self, prompt: str, limiter: Optional[AdaptiveLimiter], max_tokens: Optional[int] = None) -> str:
+        """经过限速和并发控制后向模型发出请求，仅在实际发出请求时占用并发名额"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self._rate_limiter:
+            self._record_rate_wait(self._rate_limiter.acquire(estimated_tokens))
+        
+        if limiter:
+            limiter.acquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        try:
+            message = self._runnable(prompt, max_tokens).invoke(self._messages(prompt))
         except Exception as e:
+            error = e
             logger.error(f"LLM调用失败: {e}")
-            raise LLMException(f"LLM调用失败: {e}")
\ No newline at end of file
+            raise LLMException(f"LLM调用失败: {e}")
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        return self._finish_response(message, prompt, estimated_tokens)
+    
+    async def _arequest(self, prompt: str, limiter: Optional[AdaptiveLimiter], max_tokens: Optional[int] = None) -> str:
+        """经过限速和并发控制后向模型发出异步请求"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self._rate_limiter:
+            self._record_rate_wait(await self._rate_limiter.aacquire(estimated_tokens))
+        
+        if limiter:
+            await limiter.aacquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        try:
+            message = await self._runnable(prompt, max_tokens).ainvoke(self._messages(prompt))
+        except Exception as e:
+            error = e
+            logger.error(f"LLM调用失败: {e}")
+            raise LLMException(f"LLM调用失败: {e}")
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        return self._finish_response(message, prompt, estimated_tokens)
+    
+    def _stream_request(self, prompt: str, limiter: Optional[AdaptiveLimiter], max_tokens: Optional[int] = None) -> Iterator[str]:
+        """经过限速和并发控制后向模型发出流式请求，中止时同样归还并发名额"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self._rate_limiter:
+            self._record_rate_wait(self._rate_limiter.acquire(estimated_tokens))
+        
+        if limiter:
+            limiter.acquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        chunks, usage, finish_reason = [], None, None
+        try:
+            for message in self._runnable(prompt, max_tokens).stream(self._messages(prompt)):
+                usage = message.usage_metadata or usage
+                finish_reason = message.response_metadata.get('finish_reason') or finish_reason
+                text = self._output_parser.invoke(message)
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            logger.error(f"LLM流式调用失败: {e}")
+            raise LLMException(f"LLM流式调用失败: {e}")
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        self._reconcile_usage(usage, prompt, "".join(chunks), estimated_tokens)
+        yield self._make_response("", finish_reason, usage)
+    
+    async def _astream_request(self, prompt: str, limiter: Optional[AdaptiveLimiter], max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """经过限速和并发控制后向模型发出异步流式请求"""
+        estimated_tokens = self._estimate_request_tokens(prompt, max_tokens)
+        if self._rate_limiter:
+            self._record_rate_wait(await self._rate_limiter.aacquire(estimated_tokens))
+        
+        if limiter:
+            await limiter.aacquire()
+        started, throttle_responses, error = time.perf_counter(), track_throttle_responses(), None
+        chunks, usage, finish_reason = [], None, None
+        try:
+            async for message in self._runnable(prompt, max_tokens).astream(self._messages(prompt)):
+                usage = message.usage_metadata or usage
+                finish_reason = message.response_metadata.get('finish_reason') or finish_reason
+                text = self._output_parser.invoke(message)
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            logger.error(f"LLM流式调用失败: {e}")
+            raise LLMException(f"LLM流式调用失败: {e}")
+        finally:
+            self._release_limiter(limiter, started, throttle_responses, error)
+        
+        self._reconcile_usage(usage, prompt, "".join(chunks), estimated_tokens)
+        yield self._make_response("", finish_reason, usage)
\ No newline at end of file
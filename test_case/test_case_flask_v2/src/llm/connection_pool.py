@@ -0,0 +1,129 @@
+"""
+LLM连接池模块
+按(base_url, api_key)在进程内共享长连接HTTP客户端和预构建的调用链
+"""
+
+import importlib.util
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import httpx
+
+from ..util.logger_util import get_logger
+
+logger = get_logger(__name__)
+
+_http_clients: Dict[Tuple[str, str], Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_runnables: Dict[Hashable, Any] = {}
+_clients_lock = threading.Lock()
+_runnables_lock = threading.Lock()
+
+# 当前调用收到的限流/服务端错误响应计数，线程和协程各自独立
+_throttle_responses: ContextVar[Optional[List[int]]] = ContextVar("llm_throttle_responses", default=None)
+
+# 视为建立连接的trace事件
+_CONNECT_EVENTS = ("connection.connect_tcp", "connection.start_tls")
+
+def get_http_clients(base_url: str, api_key: str, pool_config: Dict[str, Any]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """获取按(base_url, api_key)共享的同步/异步HTTP客户端"""
+    key = (base_url, api_key)
+    with _clients_lock:
+        clients = _http_clients.get(key)
+        if clients is None:
+            clients = _create_http_clients(pool_config)
+            _http_clients[key] = clients
+        return clients
+
+def get_shared_runnable(key: Hashable, builder: Callable[[], Any]) -> Any:
+    """获取共享的预构建调用链，不存在时使用builder创建"""
+    with _runnables_lock:
+        runnable = _runnables.get(key)
+        if runnable is None:
+            runnable = builder()
+            _runnables[key] = runnable
+            logger.debug(f"已创建共享LLM调用链，当前共 {len(_runnables)} 个")
+        return runnable
+
+def track_throttle_responses() -> List[int]:
+    """开始统计当前线程或协程后续请求收到的429/5xx响应数（含SDK内部重试），返回单元素计数列表"""
+    counter = [0]
+    _throttle_responses.set(counter)
+    return counter
+
+def _create_http_clients(pool_config: Dict[str, Any]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """根据连接池配置创建HTTP客户端"""
+    limits = httpx.Limits(
+        max_connections=pool_config.get('max_connections', 100),
+        max_keepalive_connections=pool_config.get('max_keepalive_connections', 20),
+        keepalive_expiry=pool_config.get('keepalive_expiry', 60)
+    )
+    
+    http2 = pool_config.get('http2', False)
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("未安装h2，HTTP/2已禁用，回退到HTTP/1.1")
+        http2 = False
+    
+    logger.info(
+        f"创建LLM连接池: 最大连接数 {limits.max_connections}, "
+        f"保持连接数 {limits.max_keepalive_connections}, "
+        f"空闲超时 {limits.keepalive_expiry}秒, HTTP/2 {'开启' if http2 else '关闭'}"
+    )
+    
+    client = httpx.Client(
+        limits=limits,
+        http2=http2,
+        event_hooks={"request": [_attach_trace], "response": [_log_connection]}
+    )
+    async_client = httpx.AsyncClient(
+        limits=limits,
+        http2=http2,
+        event_hooks={"request": [_aattach_trace], "response": [_alog_connection]}
+    )
+    return client, async_client
+
+def _attach_trace(request: httpx.Request) -> None:
+    """为请求挂载trace回调，记录各阶段耗时"""
+    timings = {"start": time.perf_counter()}
+    
+    def trace(event_name: str, info: Dict[str, Any]) -> None:
+        timings[event_name] = time.perf_counter()
+    
+    request.extensions["trace"] = trace
+    request.extensions["llm_timings"] = timings
+
+async def _aattach_trace(request: httpx.Request) -> None:
+    """为异步请求挂载trace回调"""
+    timings = {"start": time.perf_counter()}
+    
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        timings[event_name] = time.perf_counter()
+    
+    request.extensions["trace"] = trace
+    request.extensions["llm_timings"] = timings
+
+def _log_connection(response: httpx.Response) -> None:
+    """在调试日志中输出本次请求的建连耗时和首字节耗时，并统计限流响应"""
+    counter = _throttle_responses.get()
+    if counter is not None and (response.status_code == 429 or response.status_code >= 500):
+        counter[0] += 1
+    
+    timings = response.request.extensions.get("llm_timings")
+    if not timings:
+        return
+    
+    connect_ms = sum(
+        timings[f"{event}.complete"] - timings[f"{event}.started"]
+        for event in _CONNECT_EVENTS
+        if f"{event}.started" in timings and f"{event}.complete" in timings
+    ) * 1000
+    header_events = [name for name in timings if name.endswith("receive_response_headers.complete")]
+    ttfb_ms = (timings[header_events[0]] - timings["start"]) * 1000 if header_events else 0.0
+    
+    connection = f"新建连接 {connect_ms:.1f}ms" if connect_ms else "复用连接"
+    logger.debug(f"LLM请求 {response.http_version} {response.status_code}: {connection}, 首字节 {ttfb_ms:.1f}ms")
+
+async def _alog_connection(response: httpx.Response) -> None:
+    """异步请求的连接耗时日志"""
+    _log_connection(response)
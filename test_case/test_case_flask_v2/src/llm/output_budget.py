@@ -0,0 +1,87 @@
+"""
+输出长度预测模块
+按生成阶段和已完成响应的统计预测每个请求的max_tokens
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .chat_prompt import ChatPrompt
+from .rate_limiter import estimate_tokens
+
+class StagedPrompt(ChatPrompt):
+    """标注了生成阶段的提示词，作为普通提示词使用时与字符串完全相同，并保留原提示词的系统消息"""
+    
+    def __new__(cls, prompt: str, stage: str, points: int = 0):
+        """stage为生成阶段（如test_point、test_case、fused），points为提示词包含的测试点数，0表示按提示词长度估计输出长度"""
+        instance = super().__new__(cls, prompt, getattr(prompt, 'system', ''))
+        instance.stage = stage
+        instance.points = points
+        return instance
+
+class OutputBudget:
+    """按生成阶段预测输出长度的max_tokens预测器（线程安全）
+    
+    每个阶段记录已完成响应的输出token数与基数（测试点数，未标注时为提示词的估算token数）之比，
+    样本数达到min_samples后预测值为基数乘以比值的均值加两倍标准差，再留出safety_margin的余量，
+    并限制在[min_tokens, max_tokens]之间；样本不足或提示词未标注阶段时不预测。
+    预测偏小导致输出被截断时由处理器续写补齐，续写的输出同样计入统计。
+    """
+    
+    def __init__(self, max_tokens: int, safety_margin: float = 0.3, min_samples: int = 3, min_tokens: int = 256):
+        """max_tokens为模型配置的max_tokens，也是预测值的上限"""
+        self._max_tokens = max_tokens
+        self._safety_margin = safety_margin
+        self._min_samples = max(2, min_samples)
+        self._min_tokens = min(min_tokens, max_tokens)
+        # (阶段, 是否以测试点数为基数) -> [样本数, 比值均值, 比值偏差平方和]
+        self._stats: Dict[Tuple[str, bool], List[float]] = {}
+        self._predicted = 0
+        self._reserved = 0
+        self._lock = threading.Lock()
+    
+    def predict(self, prompt: str) -> Optional[int]:
+        """预测请求的max_tokens，不预测时返回None"""
+        key = self._key(prompt)
+        if key is None:
+            return None
+        with self._lock:
+            count, mean, squares = self._stats.get(key, (0, 0.0, 0.0))
+            if count < self._min_samples:
+                return None
+            ratio = mean + 2 * math.sqrt(squares / (count - 1))
+            predicted = math.ceil(self._basis(prompt) * ratio * (1 + self._safety_margin))
+            predicted = max(self._min_tokens, min(self._max_tokens, predicted))
+            self._predicted += 1
+            self._reserved += predicted
+            return predicted
+    
+    def observe(self, prompt: str, output_tokens: int) -> None:
+        """记录一次已完成响应的输出token数（包括续写的部分）"""
+        key = self._key(prompt)
+        if key is None or output_tokens <= 0:
+            return
+        ratio = output_tokens / self._basis(prompt)
+        with self._lock:
+            stats = self._stats.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            delta = ratio - stats[1]
+            stats[1] += delta / stats[0]
+            stats[2] += delta * (ratio - stats[1])
+    
+    def snapshot(self) -> Dict[str, int]:
+        """预测情况：max_tokens上限、按预测值发出的请求数及其预留的token总数"""
+        with self._lock:
+            return {"limit": self._max_tokens, "predicted": self._predicted, "reserved": self._reserved}
+    
+    @staticmethod
+    def _key(prompt: str) -> Optional[Tuple[str, bool]]:
+        """阶段相同、基数类型相同的提示词共用一组统计"""
+        stage = getattr(prompt, 'stage', None)
+        return None if stage is None else (stage, prompt.points > 0)
+    
+    @staticmethod
+    def _basis(prompt: str) -> int:
+        """输出长度的基数：测试点数，未标注时为提示词的估算token数"""
+        return prompt.points or max(1, estimate_tokens(prompt))
\ No newline at end of file
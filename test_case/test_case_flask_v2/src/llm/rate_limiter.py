@@ -0,0 +1,119 @@
+"""
+LLM限速模块
+进程内按模型共享的RPM/TPM令牌桶，所有客户端实例和任务共用同一份额度
+"""
+
+import asyncio
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..util.logger_util import get_logger
+
+logger = get_logger(__name__)
+
+_limiters: Dict[Tuple[str, str], "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+# 中日韩字符约1个token，其余字符约4个字符1个token
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数"""
+    if not text:
+        return 0
+    
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+def get_rate_limiter(base_url: str, model: str, rate_config: Dict[str, Any]) -> Optional["RateLimiter"]:
+    """获取(base_url, 模型)对应的进程级限速器，未启用或未填写额度时返回None，额度按账号在服务商处的实际RPM/TPM限额填写"""
+    if not rate_config.get('enabled', False):
+        return None
+    
+    if not rate_config.get('requests_per_minute', 0) and not rate_config.get('tokens_per_minute', 0):
+        logger.warning("LLM限速已启用但未配置requests_per_minute和tokens_per_minute，请填写账号实际的每分钟请求数和token数")
+        return None
+    
+    key = (base_url, model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(
+                requests_per_minute=rate_config.get('requests_per_minute', 0),
+                tokens_per_minute=rate_config.get('tokens_per_minute', 0)
+            )
+            _limiters[key] = limiter
+            logger.info(
+                f"LLM限速已启用: {model}，每分钟请求 {rate_config.get('requests_per_minute', 0) or '不限'}，"
+                f"每分钟token {rate_config.get('tokens_per_minute', 0) or '不限'}"
+            )
+        return limiter
+
+class RateLimiter:
+    """RPM/TPM双令牌桶限速器
+    
+    采用预约方式：调用方先扣减额度（允许透支），再按透支量和补充速率计算需要等待的时间，
+    排队的请求因此按到达顺序平滑放行，而不是同时醒来争抢。响应返回后用实际用量校正token桶。
+    """
+    
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self._request_capacity = float(requests_per_minute or 0)
+        self._token_capacity = float(tokens_per_minute or 0)
+        self._request_level = self._request_capacity
+        self._token_level = self._token_capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: int) -> float:
+        """预约一次请求的额度（tokens为提示词与预计输出之和），返回获得额度前需要等待的秒数"""
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            if self._request_capacity:
+                self._request_level -= 1
+                wait = max(wait, -self._request_level * 60 / self._request_capacity)
+            if self._token_capacity:
+                self._token_level -= min(tokens, self._token_capacity)
+                wait = max(wait, -self._token_level * 60 / self._token_capacity)
+            return wait
+    
+    def acquire(self, tokens: int) -> float:
+        """阻塞直到额度可用，返回等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def aacquire(self, tokens: int) -> float:
+        """异步等待直到额度可用，返回等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+    
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """用响应中的实际token用量校正预约时的估算值"""
+        if not self._token_capacity:
+            return
+        
+        with self._lock:
+            self._refill()
+            reserved = min(estimated_tokens, self._token_capacity)
+            self._token_level = min(self._token_level + reserved - actual_tokens, self._token_capacity)
+    
+    def _refill(self) -> None:
+        """按经过的时间补充两个令牌桶"""
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self._request_capacity:
+            self._request_level = min(
+                self._request_level + elapsed * self._request_capacity / 60, self._request_capacity
+            )
+        if self._token_capacity:
+            self._token_level = min(
+                self._token_level + elapsed * self._token_capacity / 60, self._token_capacity
+            )
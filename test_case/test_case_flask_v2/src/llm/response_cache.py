@@ -0,0 +1,152 @@
+"""
+LLM响应缓存模块
+基于SQLite的内容寻址响应缓存，支持CLI与Flask进程共享
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from ..util.logger_util import get_logger
+
+logger = get_logger(__name__)
+
+class ResponseCache:
+    """持久化的LLM响应缓存
+    
+    以模型参数和完整提示词的哈希作为键，使用WAL模式的SQLite存储，
+    多个进程可以同时读写同一个缓存文件。进程内所有线程共用一个连接，访问时持有锁，
+    不再使用时调用close()关闭连接。
+    """
+    
+    # 每写入多少次检查一次容量
+    _EVICT_INTERVAL = 100
+    
+    def __init__(self, db_path: Path, ttl_seconds: int = 0, max_entries: int = 0):
+        """初始化缓存
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            ttl_seconds: 缓存有效期（秒），0表示永不过期
+            max_entries: 最大缓存条数，0表示不限制
+        """
+        self._db_path = Path(db_path)
+        self._ttl_seconds = ttl_seconds or 0
+        self._max_entries = max_entries or 0
+        self._lock = threading.Lock()
+        self._write_count = 0
+        
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = self._connect()
+        self._init_schema()
+    
+    @staticmethod
+    def make_key(model: str, base_url: str, temperature: Any, max_tokens: Any, prompt: str) -> str:
+        """根据模型参数和提示词生成缓存键"""
+        payload = json.dumps(
+            [model, base_url, temperature, max_tokens, prompt],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回None"""
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return None
+                
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                
+                response, created_at = row
+                now = time.time()
+                if self._ttl_seconds and now - created_at > self._ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                return response
+        except sqlite3.Error as e:
+            logger.warning(f"读取LLM缓存失败: {e}")
+            return None
+    
+    def set(self, key: str, response: str) -> None:
+        """写入缓存"""
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return
+                
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                self._conn.commit()
+                self._write_count += 1
+                should_evict = self._write_count % self._EVICT_INTERVAL == 1
+        except sqlite3.Error as e:
+            logger.warning(f"写入LLM缓存失败: {e}")
+            return
+        
+        if should_evict:
+            self.evict()
+    
+    def evict(self) -> None:
+        """清理过期条目并将缓存控制在最大条数以内（按最近访问时间淘汰）"""
+        try:
+            with self._lock:
+                if self._conn is None:
+                    return
+                
+                if self._ttl_seconds:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE created_at < ?",
+                        (time.time() - self._ttl_seconds,)
+                    )
+                if self._max_entries:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self._max_entries,)
+                    )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"清理LLM缓存失败: {e}")
+    
+    def close(self) -> None:
+        """关闭数据库连接，之后的读取均未命中，写入被忽略"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库连接，连接由所有线程共用"""
+        conn = sqlite3.connect(str(self._db_path), timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _init_schema(self) -> None:
+        """创建缓存表"""
+        conn = self._conn
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        conn.commit()
\ No newline at end of file
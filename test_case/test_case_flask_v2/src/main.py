@@ -65,4 +65,6 @@ class Application:
                 logger.error("输出生成失败")
                 
         except Exception as e:
-            logger.error(f"应用程序执行失败: {e}")
\ No newline at end of file
+            logger.error(f"应用程序执行失败: {e}")
+        finally:
+            self._llm_client.close()
\ No newline at end of file
@@ -4,5 +4,7 @@
 
 from .logger_util import setup_logging, get_logger
 from .excel_util import ExcelHelper
+from .async_util import get_event_loop, run_coroutine
+from .cache_util import WorkbookCache
 
-__all__ = ['setup_logging', 'get_logger', 'ExcelHelper']
\ No newline at end of file
+__all__ = ['setup_logging', 'get_logger', 'ExcelHelper', 'get_event_loop', 'run_coroutine', 'WorkbookCache']
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+异步工具模块
+提供进程级共享的后台事件循环
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional
+
+from .logger_util import get_logger
+
+logger = get_logger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """获取共享的后台事件循环，首次调用时在守护线程中启动"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-engine", daemon=True)
+            thread.start()
+            _loop = loop
+            logger.debug("后台事件循环已启动")
+        return _loop
+
+def run_coroutine(coro: Coroutine[Any, Any, Any]) -> Any:
+    """在共享事件循环中运行协程并阻塞等待结果"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    return future.result()
@@ -3,8 +3,13 @@ Excel工具模块
 提供Excel文件读取和处理功能
 """
 
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
 import pandas as pd
-from typing import Dict, List, Optional
+from pandas.io.parsers.readers import STR_NA_VALUES
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from .logger_util import get_logger
 
@@ -19,20 +24,37 @@ class ExcelHelper:
         sheet_names: List[str],
         header_rows: int,
         data_start_row: int,
-        column_range: Optional[List[int]] = None
+        column_range: Optional[List[int]] = None,
+        parse_workers: int = 1
     ) -> Dict[str, pd.DataFrame]:
-        """从Excel文件读取指定表格并进行处理"""
+        """从Excel文件读取指定表格并进行处理，工作簿只打开一次，各表格只解析column_range内的列，已安装python-calamine时使用calamine引擎
+        
+        parse_workers大于1且要读取多个表格时，各表格分发到进程池并行解析，每个工作进程自行打开工作簿，处理后的DataFrame按列返回，
+        总耗时接近最大的表格的解析耗时，解析也不再占用调用方进程的GIL。
+        """
         try:
-            excel_file = pd.ExcelFile(file_path, engine='openpyxl')
-            available_sheets = excel_file.sheet_names
+            engine = ExcelHelper._reader_engine()
+            with pd.ExcelFile(file_path, engine=engine) as excel_file:
+                valid_sheets = ExcelHelper._valid_sheets(excel_file.sheet_names, sheet_names)
+                
+                workers = min(parse_workers or 1, len(valid_sheets))
+                if workers <= 1:
+                    frames = [
+                        ExcelHelper._process_sheet(excel_file, sheet_name, header_rows, data_start_row, column_range)
+                        for sheet_name in valid_sheets
+                    ]
             
-            valid_sheets = [name for name in sheet_names if name in available_sheets]
-            if not valid_sheets:
-                valid_sheets = available_sheets
+            if workers > 1:
+                logger.info(f"使用 {workers} 个进程并行解析 {len(valid_sheets)} 个表格")
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        pool.submit(ExcelHelper._read_sheet, file_path, engine, sheet_name, header_rows, data_start_row, column_range)
+                        for sheet_name in valid_sheets
+                    ]
+                    frames = [future.result() for future in futures]
             
             all_data = {}
-            for sheet_name in valid_sheets:
-                df = ExcelHelper._process_sheet(file_path, sheet_name, header_rows, data_start_row, column_range)
+            for sheet_name, df in zip(valid_sheets, frames):
                 if df is not None and not df.empty:
                     all_data[sheet_name] = df
                     logger.info(f"已处理表格 '{sheet_name}': {len(df)} 行, {len(df.columns)} 列")
@@ -49,8 +71,144 @@ class ExcelHelper:
             raise
     
     @staticmethod
-    def _process_sheet(
+    def _reader_engine() -> str:
+        """read_excel使用的解析引擎，python-calamine未安装时回退到openpyxl"""
+        if importlib.util.find_spec("python_calamine") is None:
+            return "openpyxl"
+        return "calamine"
+    
+    @staticmethod
+    def select_sheets(file_path: str, sheet_names: List[str]) -> List[str]:
+        """返回iter_rows将要读取的表格名称，只读取工作簿的表格目录，不解析单元格"""
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return ExcelHelper._valid_sheets(workbook.sheetnames, sheet_names)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _valid_sheets(available_sheets: List[str], sheet_names: List[str]) -> List[str]:
+        """筛选工作簿中存在的表格，一个都不存在时读取所有表格"""
+        valid_sheets = [name for name in sheet_names if name in available_sheets]
+        return valid_sheets or list(available_sheets)
+    
+    @staticmethod
+    def iter_rows(
+        file_path: str,
+        sheet_names: List[str],
+        header_rows: int,
+        data_start_row: int,
+        column_range: Optional[List[int]] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """按与read_excel相同的规则以只读模式逐行读取表格，依次产出(表名, 数据行)，不构建DataFrame，每个表格只读一遍，读到一行即产出一行，仍为空的单元格值为None"""
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            total_rows = 0
+            for sheet_name in ExcelHelper._valid_sheets(workbook.sheetnames, sheet_names):
+                row_count = 0
+                for row in ExcelHelper._iter_sheet_rows(workbook[sheet_name], header_rows, data_start_row, column_range):
+                    row_count += 1
+                    yield sheet_name, row
+                if row_count:
+                    logger.info(f"已处理表格 '{sheet_name}': {row_count} 行")
+                else:
+                    logger.warning(f"表格 '{sheet_name}' 无数据或处理失败")
+                total_rows += row_count
+            
+            if not total_rows:
+                raise ValueError("所有表格都无有效数据")
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _iter_sheet_rows(worksheet, header_rows: int, data_start_row: int, column_range: Optional[List[int]]) -> Iterator[Dict[str, Any]]:
+        """逐行产出单个表格向下填充后的数据行，填充状态在行之间延续，表末尾的空行忽略，单元格保留openpyxl读出的类型，只处理缺失值字符串和整数值的浮点数"""
+        start_col, end_col = 0, None
+        if column_range and len(column_range) == 2:
+            start_col, end_col = max(0, column_range[0] - 1), column_range[1]
+        
+        calamine = ExcelHelper._reader_engine() == "calamine"
+        header_values: List[List[Any]] = []
+        headers: List[str] = []
+        filled: List[Any] = []
+        blank_rows = 0
+        for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            # 整行为空时暂不处理，位于表末尾时忽略，夹在非空行之间时向下填充后与上一行相同
+            present = [col for col, value in enumerate(values) if not ExcelHelper._is_empty(value, calamine)]
+            if not present:
+                blank_rows += 1
+                continue
+            
+            # 列数随读到的最右侧有值的单元格增加，与read_excel一样不包含右侧全空的列
+            width = present[-1] + 1 if end_col is None else min(present[-1] + 1, end_col)
+            filled.extend([None] * (width - start_col - len(filled)))
+            values = values[start_col:start_col + len(filled)]
+            for number in range(row_number - blank_rows, row_number + 1):
+                if number == row_number:
+                    for col, value in enumerate(values):
+                        value = ExcelHelper._cell_value(value, calamine)
+                        if value is not None:
+                            filled[col] = value
+                if number <= header_rows:
+                    header_values.append(list(filled))
+                if number <= header_rows or len(headers) < len(filled):
+                    headers = ExcelHelper._row_headers(header_values, len(filled))
+                if number >= data_start_row and any(value is not None for value in filled):
+                    yield dict(zip(headers, filled))
+            blank_rows = 0
+    
+    @staticmethod
+    def _is_empty(value: Any, calamine: bool) -> bool:
+        """单元格是否不计入read_excel读取的区域，calamine引擎计入空字符串单元格，openpyxl引擎不计入"""
+        return value is None or (value == "" and not calamine)
+    
+    @staticmethod
+    def _cell_value(value: Any, calamine: bool) -> Any:
+        """按pandas读取Excel的规则转换原始单元格值，缺失值字符串（calamine引擎下还有只含空白的字符串）为None，整数值的浮点数转为整数"""
+        if isinstance(value, str) and (value in STR_NA_VALUES or (calamine and not value.strip())):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    
+    @staticmethod
+    def _row_headers(header_values: List[List[Any]], width: int) -> List[str]:
+        """按表头各行向下填充后的值生成列表头，规则与_extract_headers相同"""
+        headers = []
+        
+        for col in range(width):
+            header_parts = [
+                str(row[col]).strip() for row in header_values
+                if col < len(row) and row[col] is not None and str(row[col]).strip()
+            ]
+            header_name = ' - '.join(header_parts) if header_parts else f"列_{col+1}"
+            
+            base_name = header_name
+            counter = 1
+            while header_name in headers:
+                header_name = f"{base_name}_{counter}"
+                counter += 1
+            
+            headers.append(header_name)
+        
+        return headers
+    
+    @staticmethod
+    def _read_sheet(
         file_path: str,
+        engine: str,
+        sheet_name: str,
+        header_rows: int,
+        data_start_row: int,
+        column_range: Optional[List[int]]
+    ) -> pd.DataFrame:
+        """在工作进程中打开工作簿并处理单个表格"""
+        with pd.ExcelFile(file_path, engine=engine) as excel_file:
+            return ExcelHelper._process_sheet(excel_file, sheet_name, header_rows, data_start_row, column_range)
+    
+    @staticmethod
+    def _process_sheet(
+        excel_file: pd.ExcelFile,
         sheet_name: str,
         header_rows: int,
         data_start_row: int,
@@ -58,18 +216,12 @@ class ExcelHelper:
     ) -> pd.DataFrame:
         """使用格式化和筛选处理单个表格"""
         try:
-            df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=None, engine='openpyxl')
+            df_raw = excel_file.parse(sheet_name, header=None, usecols=ExcelHelper._column_filter(column_range))
             
             if df_raw.empty:
                 logger.warning(f"表格 '{sheet_name}' 为空")
                 return pd.DataFrame()
             
-            if column_range and len(column_range) == 2:
-                start_col = max(0, column_range[0] - 1)
-                end_col = min(df_raw.shape[1], column_range[1])
-                if start_col < end_col:
-                    df_raw = df_raw.iloc[:, start_col:end_col]
-            
             df_filled = df_raw.ffill(axis=0)
             headers = ExcelHelper._extract_headers(df_filled, header_rows)
             
@@ -93,6 +245,16 @@ class ExcelHelper:
             logger.error(f"处理表格 '{sheet_name}' 失败: {e}")
             return pd.DataFrame()
     
+    @staticmethod
+    def _column_filter(column_range: Optional[List[int]]) -> Optional[Callable[[int], bool]]:
+        """按列范围生成解析时的列筛选条件，列范围无效时解析所有列"""
+        if not column_range or len(column_range) != 2:
+            return None
+        start_col, end_col = max(0, column_range[0] - 1), column_range[1]
+        if start_col >= end_col:
+            return None
+        return lambda col: start_col <= col < end_col
+    
     @staticmethod
     def _extract_headers(df: pd.DataFrame, header_rows: int) -> List[str]:
         """从DataFrame提取列表头"""
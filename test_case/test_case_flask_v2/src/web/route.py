@@ -4,6 +4,7 @@
 
 import json
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from flask import render_template, request, redirect, url_for, flash, send_file, jsonify
@@ -19,6 +20,10 @@ processing_status = {}
 processing_results = {}
 job_logs = {}
 
+# 正在运行的任务 -> 其运行期间同时运行过的其他任务，LLM客户端等组件由各任务共用，据此标注统计的范围
+running_jobs = {}
+running_jobs_lock = threading.Lock()
+
 class WebLogger:
     """Web应用日志记录器"""
     
@@ -45,10 +50,96 @@ def allowed_file(filename, allowed_extensions=None):
         allowed_extensions = {'xlsx', 'xls', 'md', 'txt'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def _job_started(job_id):
+    """登记开始运行的任务，与正在运行的任务互相记为同时运行"""
+    with running_jobs_lock:
+        for others in running_jobs.values():
+            others.add(job_id)
+        running_jobs[job_id] = set(running_jobs)
+
+def _job_finished(job_id):
+    """注销结束的任务，返回其运行期间同时运行过的其他任务数"""
+    with running_jobs_lock:
+        return len(running_jobs.pop(job_id, ()))
+
+def _job_stats_snapshot(job_id, llm_client, data_processor):
+    """登记任务并记录开始前的LLM调用统计和输出长度预测快照，客户端和预测器在任务间共享，结束时按此求差"""
+    _job_started(job_id)
+    output_budget = data_processor.output_budget
+    return {
+        'llm': llm_client.get_stats(),
+        'output_budget': output_budget.snapshot() if output_budget else None
+    }
+
+def _log_job_stats(job_id, job_logger, llm_client, data_processor, repair_budget, stats_before):
+    """记录本次任务的LLM调用、并发调整、修复请求和输出长度预测统计，并同步最终并发状态；LLM调用和输出长度预测是任务运行期间进程内的差值，有其他任务同时运行时注明为合计"""
+    overlapping_jobs = _job_finished(job_id)
+    if overlapping_jobs:
+        job_logger.info(f"运行期间有 {overlapping_jobs} 个其他任务同时运行，以下LLM调用和输出长度预测统计为进程内所有任务的合计")
+    stats_after = llm_client.get_stats()
+    stats = {name: count - stats_before['llm'].get(name, 0) for name, count in stats_after.items()}
+    if 'cache_hits' in stats or 'cache_misses' in stats:
+        job_logger.info(f"LLM响应缓存: 命中 {stats.get('cache_hits', 0)} 次, 未命中 {stats.get('cache_misses', 0)} 次")
+    if stats.get('coalesced_calls'):
+        job_logger.info(f"LLM请求合并: {stats['coalesced_calls']} 次调用复用了进行中的相同请求")
+    if stats.get('rate_limit_waits'):
+        job_logger.info(f"LLM限速: 排队等待 {stats['rate_limit_waits']} 次")
+    if stats.get('truncated_responses'):
+        job_logger.info(f"LLM输出截断: {stats['truncated_responses']} 次达到max_tokens上限")
+    if stats.get('input_tokens'):
+        cached_tokens = stats.get('cached_input_tokens', 0)
+        job_logger.info(f"LLM提示词前缀缓存: 输入 {stats['input_tokens']} 个token，命中 {cached_tokens} 个（{cached_tokens / stats['input_tokens']:.1%}）")
+    
+    limiter = data_processor.concurrency_limiter
+    if limiter:
+        concurrency = limiter.snapshot()
+        processing_status[job_id]['concurrency'] = concurrency
+        job_logger.info(f"LLM并发上限: 当前 {concurrency['limit']}，进程内累计调整 {concurrency['adjustments']} 次")
+    
+    repairs = repair_budget.snapshot()
+    if repairs['used'] or repairs['denied']:
+        job_logger.info(f"修复请求: 发出 {repairs['used']}/{repairs['limit']} 个，因预算不足放弃 {repairs['denied']} 个")
+    
+    output_budget = data_processor.output_budget
+    if output_budget and stats_before['output_budget']:
+        budget_before, budget_after = stats_before['output_budget'], output_budget.snapshot()
+        predicted = budget_after['predicted'] - budget_before['predicted']
+        if predicted > 0:
+            reserved = budget_after['reserved'] - budget_before['reserved']
+            job_logger.info(f"输出长度预测: {predicted} 个请求平均预留 {reserved // predicted} 个token（上限 {budget_after['limit']}）")
+
+def _watch_concurrency(job_id, job_logger, limiter):
+    """将自适应并发上限的调整同步到任务日志和处理状态，返回注册的回调"""
+    def on_change(event):
+        job_logger.info(f"LLM并发上限调整: {event['previous_limit']} -> {event['limit']}（{event['reason']}），"
+                        f"p95延迟 {event['p95_latency']}秒，错误率 {event['error_rate']:.1%}")
+        processing_status[job_id]['concurrency'] = limiter.snapshot()
+    
+    limiter.add_listener(on_change)
+    concurrency = limiter.snapshot()
+    processing_status[job_id]['concurrency'] = concurrency
+    job_logger.info(f"自适应并发: 当前上限 {concurrency['limit']}，范围 {concurrency['min_limit']}-{concurrency['max_limit']}")
+    return on_change
+
+def _watch_cases(job_id, job_logger):
+    """创建测试用例回调，将逐个产出的测试用例计入处理状态，并记录首个测试用例的耗时"""
+    started, lock = time.time(), threading.Lock()
+    
+    def on_case(case):
+        with lock:
+            generated = processing_status[job_id].get('cases_generated', 0) + 1
+            processing_status[job_id]['cases_generated'] = generated
+        if generated == 1:
+            job_logger.info(f"首个测试用例已生成（行 #{case['原始行号']}），用时 {time.time() - started:.2f}秒")
+    
+    return on_case
+
 def process_excel_task(job_id, excel_path, prompt_files, config_data):
     """后台处理任务"""
     container = get_container()
     logger = WebLogger(job_id)
+    limiter = None
+    on_concurrency_change = None
     
     try:
         processing_status[job_id] = {'status': 'processing', 'message': '开始处理...', 'progress': 10}
@@ -60,45 +151,70 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
         processing_status[job_id].update({'message': '加载Excel数据...', 'progress': 30})
         logger.info(f"加载Excel数据: {excel_path}")
         
+        # 开启stream_rows时边读取边处理，不预先加载整个工作簿
         data_loader = container.data_loader
-        raw_data = data_loader.load(excel_path)
+        processing_config = config_data.get('input_excel_processing', {})
+        stream_rows = processing_config.get('stream_rows', False)
+        if stream_rows:
+            sheet_names = data_loader.sheet_names(excel_path)
+        else:
+            raw_data = data_loader.load(excel_path)
+            
+            if not raw_data:
+                raise ValueError("没有找到有效数据")
+            
+            sheet_names = list(raw_data)
+            logger.info(f"成功加载数据，共 {len(raw_data)} 个sheet")
+        sheet_count = len(sheet_names)
         
-        if not raw_data:
-            raise ValueError("没有找到有效数据")
+        processing_status[job_id].update({'message': '生成测试用例...', 'progress': 50})
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_template = container.config.get("file.output_file")
+        output_path_template = Path(output_template)
+        output_filename = f"{output_path_template.stem}_{timestamp}{output_path_template.suffix}"
         
-        logger.info(f"成功加载数据，共 {len(raw_data)} 个sheet")
+        output_dir = container.config.get_file_path("output_dir")
+        output_path = output_dir / output_filename
         
-        processing_status[job_id].update({'message': '生成测试用例...', 'progress': 50})
+        # 完成一个sheet即写入输出文件，不在内存中保留其测试用例
+        output_stream = container.file_writer.open(output_path, sheet_names)
         
         data_processor = container.data_processor
-        processed_data = {}
-        total_cases = 0
+        stats_before = _job_stats_snapshot(job_id, container.llm_client, data_processor)
+        limiter = data_processor.concurrency_limiter
+        if limiter:
+            on_concurrency_change = _watch_concurrency(job_id, logger, limiter)
+        deduplicate = processing_config.get('deduplicate_rows')
+        on_case = _watch_cases(job_id, logger)
+        repair_budget = data_processor.create_repair_budget()
+        finished_sheets = {}
         
-        for sheet_name, sheet_data in raw_data.items():
-            logger.info(f"处理Sheet: {sheet_name}，共 {len(sheet_data)} 行数据")
-            processed_sheet = data_processor.process_batch(sheet_data, sheet_name)
-            processed_data[sheet_name] = processed_sheet
-            total_cases += len(processed_sheet)
-            
-            progress = 50 + (len(processed_data) / len(raw_data)) * 40
+        def on_sheet(sheet_name, processed_sheet):
+            output_stream.write_sheet(sheet_name, processed_sheet)
+            finished_sheets[sheet_name] = len(processed_sheet)
+            progress = 50 + (len(finished_sheets) / max(1, sheet_count)) * 40
             processing_status[job_id].update({
-                'message': f'已处理 {len(processed_data)}/{len(raw_data)} 个sheet',
+                'message': f'已处理 {len(finished_sheets)}/{sheet_count} 个sheet',
                 'progress': min(90, progress)
             })
         
-        processing_status[job_id].update({'message': '生成输出文件...', 'progress': 90})
-        logger.info("生成输出Excel文件...")
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_template = container.config.get("file.output_file")
-        output_path_template = Path(output_template)
-        output_filename = f"{output_path_template.stem}_{timestamp}{output_path_template.suffix}"
+        # 所有sheet的行提交到同一个工作池
+        if stream_rows:
+            data_processor.process_rows(data_loader.iter_records(excel_path), deduplicate, on_case, repair_budget, on_sheet, keep_results=False)
+            if not finished_sheets:
+                raise ValueError("没有找到有效数据")
+        else:
+            for sheet_name, sheet_data in raw_data.items():
+                logger.info(f"处理Sheet: {sheet_name}，共 {len(sheet_data)} 行数据")
+            data_processor.process_sheets(raw_data, deduplicate, on_case, repair_budget, on_sheet, keep_results=False)
+        total_cases = sum(finished_sheets.values())
         
-        output_dir = container.config.get_file_path("output_dir")
-        output_path = output_dir / output_filename
+        _log_job_stats(job_id, logger, container.llm_client, data_processor, repair_budget, stats_before)
         
-        excel_writer = container.file_writer
-        success = excel_writer.write(processed_data, output_path)
+        processing_status[job_id].update({'message': '生成输出文件...', 'progress': 90})
+        logger.info("生成输出Excel文件...")
+        success = output_stream.close()
         
         if success:
             logger.info(f"处理完成！生成 {total_cases} 个测试用例")
@@ -128,6 +244,10 @@ def process_excel_task(job_id, excel_path, prompt_files, config_data):
             'status': 'error',
             'message': error_msg
         }
+    finally:
+        _job_finished(job_id)
+        if on_concurrency_change:
+            limiter.remove_listener(on_concurrency_change)
 
 # 配置管理路由
 @config_blueprint.route('/config', methods=['GET', 'POST'])
@@ -153,6 +273,9 @@ def config_management():
             config_data['file']['upload_dir'] = request.form.get('upload_dir', 'upload')
             config_data['file']['output_dir'] = request.form.get('output_dir', 'output')
             
+            config_data.setdefault('input_excel_processing', {})
+            config_data['input_excel_processing']['deduplicate_rows'] = request.form.get('deduplicate_rows', 'false') == 'true'
+            
             with open(container.config._config_path, 'w', encoding='utf-8') as f:
                 json.dump(config_data, f, ensure_ascii=False, indent=4)
             
@@ -182,6 +305,13 @@ def upload_file():
             flash('请上传有效的Excel文件 (.xlsx, .xls)', 'error')
             return redirect(request.url)
         
+        # 提示词只从配置读取，上传的提示词文件不会使用，拒绝上传以免误以为已生效
+        generation_mode = container.config.get_generation_config().get('mode', 'two_stage')
+        if any(request.files.get(name) and request.files[name].filename for name in ('test_point_file', 'test_case_file', 'fused_file')):
+            prompt_keys = 'fused_prompt_file' if generation_mode == 'fused' else 'test_point_prompt_file和test_case_prompt_file'
+            flash(f'不支持上传提示词文件，当前生成模式 {generation_mode} 使用配置中{prompt_keys}指定的提示词', 'error')
+            return redirect(request.url)
+        
         try:
             upload_dir = container.config.get_file_path("upload_dir")
             input_dir = upload_dir / "input"
@@ -210,7 +340,8 @@ def upload_file():
             flash(f'文件上传失败: {str(e)}', 'error')
             return redirect(request.url)
     
-    return render_template('upload.html')
+    generation_mode = get_container().config.get_generation_config().get('mode', 'two_stage')
+    return render_template('upload.html', generation_mode=generation_mode)
 
 # 结果查看路由
 @result_blueprint.route('/result/<job_id>')
@@ -233,6 +364,12 @@ def api_status(job_id):
         'progress': status.get('progress', 0)
     }
     
+    if 'concurrency' in status:
+        response['concurrency'] = status['concurrency']
+    
+    if 'cases_generated' in status:
+        response['cases_generated'] = status['cases_generated']
+    
     if result:
         response.update(result)
     
@@ -87,7 +87,11 @@ class JobMonitor {
             const data = await response.json();
             
             this.updateProgressBar(data.progress);
-            this.updateStatusMessage(data.message);
+            this.updateStatusMessage(
+                data.status === 'processing' && data.cases_generated
+                    ? `${data.message}（已生成 ${data.cases_generated} 个测试用例）`
+                    : data.message
+            );
             
             if (data.status === 'completed' || data.status === 'error') {
                 this.handleCompletion(data);
@@ -0,0 +1,128 @@
+"""
+自适应并发控制测试
+AIMD：每轮健康的成功请求后加性增加上限，遇到限流时乘性减少，冷却期内只下调一次
+"""
+
+import asyncio
+import threading
+
+from src.llm.adaptive_limiter import AdaptiveLimiter, is_throttle_error
+
+def complete(limiter, count, latency=0.1, failed=False):
+    """依次完成count个请求"""
+    for _ in range(count):
+        limiter.acquire()
+        limiter.release(latency, failed)
+
+def test_limit_grows_by_step_after_each_healthy_round():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=4, increase_step=1)
+    
+    complete(limiter, 1)
+    assert limiter.limit == 2
+    complete(limiter, 1)
+    assert limiter.limit == 3
+    # 上限为3时需要再完成3个成功请求才进入下一轮
+    complete(limiter, 2)
+    assert limiter.limit == 3
+    complete(limiter, 1)
+    assert limiter.limit == 4
+    complete(limiter, 8)
+    assert limiter.limit == 4
+
+def test_limit_holds_while_latency_exceeds_baseline_tolerance():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=8, latency_tolerance=2.0, window_size=2)
+    complete(limiter, 1, latency=0.1)
+    assert limiter.limit == 2
+    
+    # 窗口内p95延迟为基线的3倍，不再增加
+    complete(limiter, 4, latency=0.3)
+    
+    assert limiter.limit == 2
+    assert limiter.snapshot()["p95_latency"] == 0.3
+
+def test_limit_holds_while_error_rate_exceeds_threshold():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=4, max_limit=8, max_error_rate=0.05, cooldown_seconds=0)
+    complete(limiter, 1, failed=True)
+    
+    complete(limiter, 4)
+    
+    assert limiter.limit == 4
+    assert limiter.snapshot()["error_rate"] == 0.2
+
+def test_failure_cuts_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=3, max_limit=8, decrease_factor=0.5, cooldown_seconds=60)
+    
+    complete(limiter, 3, failed=True)
+    
+    assert limiter.limit == 4
+    assert limiter.snapshot()["adjustments"] == 1
+
+def test_failure_never_cuts_below_min_limit():
+    limiter = AdaptiveLimiter(initial_limit=8, min_limit=3, max_limit=8, decrease_factor=0.5, cooldown_seconds=0)
+    
+    complete(limiter, 3, failed=True)
+    
+    assert limiter.limit == 3
+    assert limiter.snapshot()["adjustments"] == 2
+
+def test_listeners_receive_each_adjustment():
+    events = []
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=4, cooldown_seconds=0)
+    limiter.add_listener(events.append)
+    
+    complete(limiter, 2)
+    complete(limiter, 1, failed=True)
+    limiter.remove_listener(events.append)
+    complete(limiter, 1, failed=True)
+    
+    assert [(event["previous_limit"], event["limit"], event["reason"]) for event in events] == [
+        (2, 3, "延迟与错误率正常"),
+        (3, 1, "遇到限流或服务端错误")
+    ]
+
+def test_acquire_blocks_at_limit_until_release():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    
+    def worker():
+        limiter.acquire()
+        acquired.set()
+    
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.1)
+    
+    limiter.release(0.1)
+    
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.snapshot()["in_flight"] == 1
+
+def test_aacquire_waits_at_limit_until_release():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    
+    async def run():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        limiter.release(0.1)
+        await asyncio.wait_for(waiter, 1)
+    
+    asyncio.run(run())
+    assert limiter.snapshot()["in_flight"] == 1
+
+def test_throttle_errors_include_wrapped_causes():
+    class StatusError(Exception):
+        def __init__(self, status_code):
+            super().__init__(status_code)
+            self.status_code = status_code
+    
+    wrapped = RuntimeError("调用失败")
+    wrapped.__cause__ = StatusError(429)
+    
+    assert is_throttle_error(wrapped)
+    assert is_throttle_error(StatusError(503))
+    assert is_throttle_error(TimeoutError())
+    assert not is_throttle_error(StatusError(400))
@@ -0,0 +1,91 @@
+"""
+紧凑输出解析测试
+每行一个测试用例，按测试点序号补全测试点字段，多条内容以"|"分隔，逐块输入时与整体解析的结果一致
+"""
+
+import pytest
+
+from src.core.case_parser import CompactCaseParser
+from src.core.data_processor import CompactCaseStreamParser, OutputParser
+
+FIELDS = (
+    ("名称", "line"),
+    ("编号", "line"),
+    ("条件", "lines"),
+    ("步骤", "numbered"),
+    ("备注", "text"),
+)
+
+POINTS = {
+    "1": {"名称": "蓝牙", "编号": "TP_001"},
+    "2": {"名称": "蓝牙", "编号": "TP_002"},
+}
+
+@pytest.fixture
+def parser():
+    return CompactCaseParser(FIELDS, ("条件", "步骤", "备注"))
+
+def test_rows_take_point_fields_by_index(parser):
+    cases = parser.parse("2\t上电\t打开\t无\n1\t下电\t关闭\t有", POINTS)
+    
+    assert cases == [
+        {"名称": "蓝牙", "编号": "TP_002", "条件": "上电", "步骤": "1. 打开", "备注": "无"},
+        {"名称": "蓝牙", "编号": "TP_001", "条件": "下电", "步骤": "1. 关闭", "备注": "有"},
+    ]
+    assert all(list(case) == [name for name, _ in FIELDS] for case in cases)
+
+def test_multiple_items_are_split_and_renumbered(parser):
+    case, = parser.parse("1\t上电 | 连接手机\t1. 打开蓝牙|2、搜索设备| \t甲 | 乙", POINTS)
+    
+    assert case["条件"] == "上电\n连接手机"
+    assert case["步骤"] == "1. 打开蓝牙\n2. 搜索设备"
+    assert case["备注"] == "1. 甲\n2. 乙"
+
+def test_header_notes_and_unknown_indexes_are_skipped(parser):
+    output = "序号\t条件\t步骤\t备注\n以下为测试用例：\n3\t上电\t打开\t无\n\n  1\t上电\t打开\t无  "
+    
+    assert [case["编号"] for case in parser.parse(output, POINTS)] == ["TP_001"]
+    assert parser.parse("", POINTS) == []
+    assert parser.parse(None, POINTS) == []
+
+def test_missing_columns_stay_empty_and_extra_columns_are_ignored(parser):
+    short, long = parser.parse("1\t上电\n2\t上电\t打开\t无\t多余", POINTS)
+    
+    assert (short["步骤"], short["备注"]) == ("", "")
+    assert long["备注"] == "无"
+
+def test_compact_points_and_fields_share_indexes():
+    test_points = "测试点：蓝牙\n\n测试点编号 | 测试点描述\n---|---\nTP_001 | 连接\nTP_002 | 断开"
+    
+    assert OutputParser.compact_test_points(test_points) == "测试点：蓝牙\n1\t连接\n2\t断开"
+    assert OutputParser.parse_compact_cases("2\t已配对\t断开连接\t提示已断开", test_points) == [{
+        "测试点": "蓝牙", "测试点编号": "TP_002", "测试点描述": "断开",
+        "前置条件": "已配对", "测试步骤": "1. 断开连接", "预期结果": "1. 提示已断开"
+    }]
+
+def feed_in_chunks(stream_parser, text, size):
+    """按固定长度逐块输入，返回逐块解析出的测试用例"""
+    cases = []
+    for start in range(0, len(text), size):
+        cases.extend(stream_parser.feed(text[start:start + size]))
+    return cases + stream_parser.close()
+
+@pytest.mark.parametrize("size", [1, 7, 1000])
+def test_stream_parser_matches_whole_output(size):
+    test_points = "测试点：蓝牙\n\n测试点编号 | 测试点描述\n---|---\nTP_001 | 连接\nTP_002 | 断开"
+    output = "1\t上电\t打开 | 搜索\t可见\n2\t已配对\t断开\t提示已断开\n"
+    
+    cases = feed_in_chunks(CompactCaseStreamParser(test_points), output, size)
+    
+    assert cases == OutputParser.parse_compact_cases(output, test_points)
+    assert len(cases) == 2
+
+def test_stream_parser_reads_points_before_the_case_marker():
+    output = (
+        "【测试点】\n测试点：蓝牙\n\n测试点编号 | 测试点描述\n---|---\nTP_001 | 连接\n\n"
+        "【测试用例】\n1\t上电\t打开\t可见"
+    )
+    
+    cases = feed_in_chunks(CompactCaseStreamParser(start_marker=OutputParser.TEST_CASE_MARKER), output, 5)
+    
+    assert [(case["测试点"], case["测试点编号"], case["测试点描述"], case["预期结果"]) for case in cases] == [("蓝牙", "TP_001", "连接", "1. 可见")]
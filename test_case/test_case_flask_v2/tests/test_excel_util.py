@@ -0,0 +1,130 @@
+"""
+Excel读取测试
+流式读取与read_excel对同一工作簿产出的数据记录应一致（流式读取保留单元格本身的数值类型），且读到一行即产出一行；多进程并行解析的结果与单进程解析相同
+"""
+
+import datetime
+import importlib.util
+import logging
+import math
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from src.util.excel_util import ExcelHelper
+
+ENGINES = ["openpyxl"] + (["calamine"] if importlib.util.find_spec("python_calamine") else [])
+
+def _canonical(value):
+    """缺失值统一为None，数值统一为浮点数（read_excel按整列推断类型，流式读取不做推断），其余取文本"""
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, bool):
+        return str(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def _canonical_header(header):
+    """多行表头按各行分别统一"""
+    return " - ".join(str(_canonical(part)) for part in header.split(" - "))
+
+def _records(rows):
+    return [[(_canonical_header(key), _canonical(value)) for key, value in row.items()] for row in rows]
+
+@pytest.fixture
+def numeric_workbook(tmp_path):
+    """含数值单元格的工作簿：有空单元格的整数列、小数列、缺失值字符串、数值表头和布尔值"""
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = "数值"
+    worksheet.append(["模块", "编号", None, 5, "开关", "日期"])
+    worksheet.append(["说明", None, None, None, None, None])
+    worksheet.append(["车机", 1, 10, 0.5, True, datetime.datetime(2024, 1, 2)])
+    worksheet.append([None, 2, "NA", 1, False, None])
+    worksheet.append([None, 3, None, 1.25, None, datetime.datetime(2024, 1, 3)])
+    worksheet.append(["手机", "4a", 7, None, True, datetime.datetime(2024, 1, 4)])
+    worksheet.append(["手机", " ", "", "N/A", False, datetime.datetime(2024, 1, 5)])
+    path = tmp_path / "numeric.xlsx"
+    workbook.save(path)
+    return str(path)
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("header_rows, data_start_row", [(1, 2), (2, 3)])
+@pytest.mark.parametrize("column_range", [None, [2, 4]])
+def test_iter_rows_matches_read_excel(numeric_workbook, monkeypatch, engine, header_rows, data_start_row, column_range):
+    monkeypatch.setattr(ExcelHelper, "_reader_engine", staticmethod(lambda: engine))
+    
+    frames = ExcelHelper.read_excel(numeric_workbook, ["数值"], header_rows, data_start_row, column_range)
+    streamed = [row for _, row in ExcelHelper.iter_rows(numeric_workbook, ["数值"], header_rows, data_start_row, column_range)]
+    
+    assert _records(streamed) == _records(frames["数值"].to_dict("records"))
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_iter_rows_keeps_cell_types(numeric_workbook, monkeypatch, engine):
+    monkeypatch.setattr(ExcelHelper, "_reader_engine", staticmethod(lambda: engine))
+    
+    rows = [row for _, row in ExcelHelper.iter_rows(numeric_workbook, ["数值"], 2, 3)]
+    
+    # 不按整列推断类型，含空单元格的数值列中的整数和数值表头仍为整数
+    assert [row["列_3"] for row in rows] == [10, 10, 10, 7, 7]
+    assert all(type(row["列_3"]) is int for row in rows)
+    assert [row["5 - 5"] for row in rows] == [0.5, 1, 1.25, 1.25, 1.25]
+    assert [row["编号 - 编号"] for row in rows[:4]] == [1, 2, 3, "4a"]
+
+class CountingWorksheet:
+    """按行读取时记录已读行数的工作表"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.read = 0
+    
+    def iter_rows(self, values_only=True):
+        for row in self.rows:
+            self.read += 1
+            yield row
+
+def test_iter_sheet_rows_yields_before_reading_the_whole_sheet():
+    worksheet = CountingWorksheet([("模块", "编号")] + [("车机", number) for number in range(1, 101)])
+    
+    rows = ExcelHelper._iter_sheet_rows(worksheet, 1, 2, None)
+    
+    assert next(rows) == {"模块": "车机", "编号": 1}
+    assert worksheet.read == 2
+    assert len(list(rows)) == 99
+    assert worksheet.read == 101
+
+@pytest.fixture
+def multi_sheet_workbook(tmp_path):
+    """三个结构不同的表格：有需要向下填充的列、数值列和多出的列"""
+    workbook = openpyxl.Workbook()
+    sheets = {
+        "功能": [["模块", "功能点"], ["车机", "导航"], [None, "音乐"], ["手机", None]],
+        "性能": [["模块", "指标", "阈值"], ["车机", "启动耗时", 3], [None, "内存", 0.5]],
+        "兼容": [["模块", "系统", "版本", "备注"], ["手机", "安卓", 14, None], ["手机", "iOS", "17.1", "NA"]],
+    }
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        worksheet = workbook.create_sheet(title)
+        for row in rows:
+            worksheet.append(row)
+    path = tmp_path / "sheets.xlsx"
+    workbook.save(path)
+    return str(path)
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parallel_parsing_matches_single_process(multi_sheet_workbook, monkeypatch, caplog, engine):
+    monkeypatch.setattr(ExcelHelper, "_reader_engine", staticmethod(lambda: engine))
+    caplog.set_level(logging.INFO)
+    # 请求顺序与工作簿中的顺序不同，且包含不存在的表格
+    sheet_names = ["兼容", "功能", "缺失", "性能"]
+    
+    expected = ExcelHelper.read_excel(multi_sheet_workbook, sheet_names, 1, 2)
+    parallel = ExcelHelper.read_excel(multi_sheet_workbook, sheet_names, 1, 2, parse_workers=2)
+    
+    assert "使用 2 个进程并行解析 3 个表格" in caplog.text
+    assert list(parallel) == list(expected) == ["兼容", "功能", "性能"]
+    for sheet_name, frame in expected.items():
+        pd.testing.assert_frame_equal(parallel[sheet_name], frame)
@@ -0,0 +1,53 @@
+"""
+文件写入测试
+逐表写入的Excel文件应与一次写入的文件相同，并按指定顺序排列各表
+"""
+
+import openpyxl
+import pytest
+
+from conftest import APP_ROOT
+from src.config.setting import ConfigService
+from src.core.exception import FileOperationException
+from src.core.file_writer import ExcelWriter
+
+CASES = [{"测试点": "登录", "测试点描述": "正确密码登录", "测试步骤": "1. 输入密码", "预期结果": "", "原始行号": 1}]
+
+@pytest.fixture
+def writer(monkeypatch):
+    """按应用配置初始化配置服务后创建的Excel写入器"""
+    monkeypatch.setattr(ConfigService, "_instance", None)
+    ConfigService.initialize(APP_ROOT / "config.json")
+    return ExcelWriter()
+
+def cell_values(worksheet):
+    return [[cell.value for cell in row] for row in worksheet.iter_rows()]
+
+def test_sheet_stream_orders_sheets_and_matches_write(writer, tmp_path):
+    # 各表按完成的顺序写入
+    stream = writer.open(tmp_path / "stream.xlsx", ["功能", "性能"])
+    stream.write_sheet("性能", [])
+    stream.write_sheet("功能", CASES)
+    assert stream.close()
+    assert writer.write({"功能": CASES, "性能": []}, tmp_path / "write.xlsx")
+    
+    streamed = openpyxl.load_workbook(tmp_path / "stream.xlsx")
+    written = openpyxl.load_workbook(tmp_path / "write.xlsx")
+    assert streamed.sheetnames == written.sheetnames == ["功能", "性能"]
+    assert cell_values(streamed["功能"]) == cell_values(written["功能"]) == [
+        ["L4项目", "三级项目", "测试方法", "预判定标准"],
+        ["登录", "正确密码登录", "1. 输入密码", None]
+    ]
+    assert cell_values(streamed["性能"]) == []
+    header, row = streamed["功能"][1], streamed["功能"][2]
+    assert header[0].font.b and not row[0].font.b
+    assert [cell.alignment.horizontal for cell in row] == ["center", "left", "left", "left"]
+
+def test_sheet_stream_reports_a_failed_sheet(writer, tmp_path):
+    stream = writer.open(tmp_path / "stream.xlsx")
+    stream.write_sheet("功能", CASES)
+    stream.write_sheet("无效/表名", CASES)
+    
+    with pytest.raises(FileOperationException):
+        stream.close()
+    assert not (tmp_path / "stream.xlsx").exists()
@@ -0,0 +1,131 @@
+"""
+LLM限速测试
+令牌桶允许透支，排队的请求按透支量依次等待，响应返回后按实际用量校正token桶
+"""
+
+import asyncio
+
+import pytest
+
+from src.llm import rate_limiter
+from src.llm.rate_limiter import RateLimiter, estimate_tokens, get_rate_limiter
+
+class FakeClock:
+    """替换限速模块中time的可控时钟，sleep只推进时间"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake_clock)
+    return fake_clock
+
+def test_requests_over_rpm_wait_in_arrival_order(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    
+    waits = [limiter.reserve(0) for _ in range(63)]
+    
+    assert waits[:60] == [0.0] * 60
+    assert waits[60:] == pytest.approx([1.0, 2.0, 3.0])
+
+def test_debt_is_paid_back_as_time_passes(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    for _ in range(62):
+        limiter.reserve(0)
+    
+    clock.now += 1.5
+    
+    assert limiter.reserve(0) == pytest.approx(1.5)
+
+def test_tokens_over_tpm_wait_for_the_overdraft(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    
+    assert limiter.reserve(800) == 0.0
+    assert limiter.reserve(400) == pytest.approx(12.0)
+
+def test_single_request_larger_than_tpm_only_drains_the_bucket(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    
+    assert limiter.reserve(5000) == 0.0
+    assert limiter.reserve(100) == pytest.approx(6.0)
+
+def test_reconcile_returns_overestimated_tokens(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    limiter.reserve(800)
+    
+    limiter.reconcile(800, 200)
+    
+    assert limiter.reserve(400) == 0.0
+    assert limiter.reserve(400) == pytest.approx(0.0)
+    assert limiter.reserve(1) == pytest.approx(0.06)
+
+def test_reconcile_charges_underestimated_tokens(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    limiter.reserve(500)
+    
+    limiter.reconcile(500, 1200)
+    
+    assert limiter.reserve(0) == pytest.approx(12.0)
+
+def test_reconcile_never_fills_past_capacity(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    limiter.reserve(100)
+    clock.now += 60
+    
+    limiter.reconcile(100, 0)
+    
+    assert limiter.reserve(1000) == 0.0
+    assert limiter.reserve(100) == pytest.approx(6.0)
+
+def test_acquire_sleeps_for_the_reserved_wait(clock):
+    limiter = RateLimiter(requests_per_minute=30)
+    for _ in range(30):
+        limiter.acquire(0)
+    
+    assert limiter.acquire(0) == pytest.approx(2.0)
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+def test_aacquire_waits_for_the_reserved_time(clock, monkeypatch):
+    slept = []
+    
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+    
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(requests_per_minute=60)
+    for _ in range(60):
+        limiter.reserve(0)
+    
+    assert asyncio.run(limiter.aacquire(0)) == pytest.approx(1.0)
+    assert slept == [pytest.approx(1.0)]
+
+def test_rate_limiter_is_shared_per_base_url_and_model(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    rate_config = {"enabled": True, "requests_per_minute": 60, "tokens_per_minute": 0}
+    
+    first = get_rate_limiter("http://llm.test/v1", "qwen", rate_config)
+    
+    assert get_rate_limiter("http://llm.test/v1", "qwen", rate_config) is first
+    assert get_rate_limiter("http://llm.test/v1", "other", rate_config) is not first
+
+def test_rate_limiter_is_off_unless_enabled_with_quotas(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    
+    assert get_rate_limiter("http://llm.test/v1", "qwen", {"enabled": False, "requests_per_minute": 60}) is None
+    assert get_rate_limiter("http://llm.test/v1", "qwen", {"enabled": True, "requests_per_minute": 0, "tokens_per_minute": 0}) is None
+
+def test_estimate_tokens_counts_cjk_characters_individually():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("测试用例") == 4
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("测试abcde") == 4
@@ -0,0 +1,83 @@
+"""
+调度测试
+验证longest_first的提交顺序、sheet_order边提交边预计总耗时，以及观测耗时的保存和读取
+"""
+
+import pytest
+
+from src.core.scheduler import MakespanEstimate, RowScheduler
+
+JOBS = [("a", "key_a", 10), ("b", "key_b", 30), ("c", "key_c", 20)]
+
+def observe_all(scheduler):
+    """a耗时最长、b最短，与token数的大小顺序不同"""
+    scheduler.observe("key_a", 10, 3.0)
+    scheduler.observe("key_b", 30, 1.0)
+    scheduler.observe("key_c", 20, 2.0)
+
+def test_longest_first_orders_by_tokens_without_history():
+    estimate = MakespanEstimate(2)
+    
+    units = list(RowScheduler("longest_first").schedule(JOBS, estimate))
+    
+    assert units == ["b", "c", "a"]
+    assert estimate.seconds is None
+
+def test_longest_first_orders_by_observed_seconds():
+    scheduler = RowScheduler("longest_first")
+    observe_all(scheduler)
+    estimate = MakespanEstimate(2)
+    
+    # 没有观测的d按每token耗时估算，token数多，排在最前
+    units = list(scheduler.schedule(JOBS + [("d", "key_d", 100)], estimate))
+    
+    assert units == ["d", "a", "c", "b"]
+    assert estimate.seconds == pytest.approx(100 * scheduler._seconds_per_token)
+
+def test_sheet_order_estimates_while_submitting():
+    scheduler = RowScheduler("sheet_order")
+    observe_all(scheduler)
+    estimate = MakespanEstimate(2)
+    pulled = []
+    
+    def jobs():
+        for job in JOBS:
+            pulled.append(job[0])
+            yield job
+    
+    units = scheduler.schedule(jobs(), estimate)
+    
+    # 请求组逐个取出，不必先读取全部
+    assert next(units) == "a" and pulled == ["a"]
+    assert list(units) == ["b", "c"]
+    # a、b分给两个工作者，c分给先空闲的b所在的工作者
+    assert estimate.seconds == 3.0
+
+def test_sheet_order_does_not_estimate_without_history():
+    estimate = MakespanEstimate(2)
+    
+    assert list(RowScheduler("sheet_order").schedule(JOBS, estimate)) == ["a", "b", "c"]
+    assert estimate.seconds is None
+
+def test_history_is_saved_and_loaded(tmp_path):
+    history_path = tmp_path / "history" / "schedule.json"
+    scheduler = RowScheduler("longest_first", str(history_path))
+    scheduler.save()
+    assert not history_path.exists()
+    
+    observe_all(scheduler)
+    scheduler.save()
+    
+    reloaded = RowScheduler("longest_first", str(history_path))
+    estimate = MakespanEstimate(1)
+    assert list(reloaded.schedule(JOBS, estimate)) == ["a", "c", "b"]
+    assert estimate.seconds == 6.0
+    assert reloaded._seconds_per_token == pytest.approx(scheduler._seconds_per_token)
+    
+    # 超过history_size时只读取最近的观测
+    limited = RowScheduler("longest_first", str(history_path), history_size=2)
+    assert list(limited._durations) == ["key_b", "key_c"]
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        RowScheduler("shortest_first")
@@ -0,0 +1,128 @@
+"""
+请求合并测试
+相同请求同时在途时只发出一次调用，执行者的结果和异常都传给等待的调用方
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.core.exception import LLMException
+from src.llm import client as client_module
+from src.llm.single_flight import SingleFlight
+
+PROMPT = "STAGE:test_point\n# 输入\n功能ROW1"
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight()
+    future, is_leader = flight.join("key")
+    follower, follower_is_leader = flight.join("key")
+    
+    flight.resolve("key", future, result="响应")
+    
+    assert (is_leader, follower_is_leader) == (True, False)
+    assert follower is future
+    assert follower.result() == "响应"
+
+def test_followers_receive_the_leader_error():
+    flight = SingleFlight()
+    future, _ = flight.join("key")
+    follower, _ = flight.join("key")
+    error = RuntimeError("调用失败")
+    
+    flight.resolve("key", future, error=error)
+    
+    with pytest.raises(RuntimeError) as raised:
+        follower.result()
+    assert raised.value is error
+
+def test_failed_key_is_released_for_the_next_caller():
+    flight = SingleFlight()
+    future, _ = flight.join("key")
+    flight.resolve("key", future, error=RuntimeError("调用失败"))
+    
+    retry, is_leader = flight.join("key")
+    
+    assert is_leader
+    assert retry is not future
+
+def test_different_keys_fly_separately():
+    flight = SingleFlight()
+    first, first_is_leader = flight.join("first")
+    second, second_is_leader = flight.join("second")
+    
+    flight.resolve("first", first, error=RuntimeError("调用失败"))
+    flight.resolve("second", second, result="响应")
+    
+    assert first_is_leader and second_is_leader
+    assert second.result() == "响应"
+
+def wait_for_flight(timeout=1.0):
+    """等待直到有请求在途"""
+    deadline = time.monotonic() + timeout
+    while not client_module._single_flight._in_flight:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_client_error_reaches_every_coalesced_thread(fake_llm, make_processor):
+    client = make_processor()._llm_client
+    fake_llm.delays = {"ROW1": 0.2}
+    fake_llm.failures = 1
+    errors = []
+    
+    def call():
+        try:
+            client.invoke(PROMPT)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    wait_for_flight()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(fake_llm.requests) == 1
+    assert len(errors) == 3
+    assert all(isinstance(error, LLMException) for error in errors)
+    assert client.get_stats()["coalesced_calls"] == 2
+    
+    # 失败的请求不留在在途表中，之后的调用重新发出请求
+    assert "ROW1描述1" in client.invoke(PROMPT)
+    assert len(fake_llm.requests) == 2
+
+def test_client_error_reaches_every_coalesced_coroutine(fake_llm, make_processor):
+    client = make_processor({"input_excel_processing": {"engine": "async"}})._llm_client
+    fake_llm.delays = {"ROW1": 0.2}
+    fake_llm.failures = 1
+    
+    async def run():
+        return await asyncio.gather(*(client.ainvoke(PROMPT) for _ in range(3)), return_exceptions=True)
+    
+    results = asyncio.run(run())
+    
+    assert len(fake_llm.requests) == 1
+    assert all(isinstance(result, LLMException) for result in results)
+    assert "ROW1描述1" in asyncio.run(client.ainvoke(PROMPT))
+
+def test_client_keeps_requests_with_different_max_tokens_apart(fake_llm, make_processor):
+    client = make_processor()._llm_client
+    fake_llm.delays = {"ROW1": 0.1}
+    results = {}
+    
+    def call(max_tokens):
+        results[max_tokens] = client.invoke(PROMPT, max_tokens=max_tokens)
+    
+    threads = [threading.Thread(target=call, args=(max_tokens,)) for max_tokens in (20, 4000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(fake_llm.requests) == 2
+    assert len(results[20]) == 20
+    assert results[4000].endswith("ROW1描述2")
@@ -0,0 +1,110 @@
+"""
+共享模块一致性检查
+三个应用各自带有一份相同的引擎模块（解析、流式、限流、并发、缓存等），修改其中一份时其余两份需同步修改。
+本脚本比较各应用中的副本，代码不一致时输出差异并以非零状态退出。
+
+各应用的文档字符串、注释、空行和包内导入路径遵循各自的风格，比较时忽略这些差异，只比较代码本身。
+
+用法：
+    python tools/check_shared_modules.py
+    python tools/check_shared_modules.py --module llm/rate_limiter.py
+"""
+
+import argparse
+import ast
+import difflib
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+APPS = ("test_case_flask_v1", "test_case_flask_v2", "test_case_cmd_v1")
+
+# 共享模块 -> 各应用中的路径（相对于应用的src目录），未列出的应用使用相同路径
+SHARED_MODULES: Dict[str, Dict[str, str]] = {
+    "core/case_parser.py": {},
+    "core/repair_budget.py": {},
+    "core/scheduler.py": {},
+    "core/sheet_collector.py": {},
+    "core/streaming.py": {},
+    "llm/adaptive_limiter.py": {},
+    "llm/chat_prompt.py": {},
+    "llm/connection_pool.py": {},
+    "llm/llm_response.py": {},
+    "llm/output_budget.py": {},
+    "llm/rate_limiter.py": {},
+    "llm/response_cache.py": {},
+    "llm/single_flight.py": {},
+    "llm/structured_output.py": {},
+    "util/async_util.py": {"test_case_flask_v1": "util/async_helper.py"},
+    "util/cache_util.py": {"test_case_flask_v1": "util/workbook_cache.py"},
+}
+
+# 包内导入的统一写法，各应用分别使用相对导入和以src开头的绝对导入
+LOCAL_IMPORT = "<app>"
+
+
+def module_path(app: str, module: str) -> Path:
+    """共享模块在应用中的文件路径"""
+    return ROOT / app / "src" / SHARED_MODULES[module].get(app, module)
+
+
+def normalize(source: str) -> str:
+    """去掉文档字符串、统一包内导入路径后的代码，注释和空行在解析时即被忽略"""
+    tree = ast.parse(source)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+        elif isinstance(node, ast.ImportFrom) and (node.level or (node.module or "").split(".")[0] in ("src", "config")):
+            node.module, node.level = LOCAL_IMPORT, 0
+    return ast.unparse(tree)
+
+
+def check(modules: List[str]) -> List[str]:
+    """比较各应用中的副本，返回不一致的差异说明"""
+    problems = []
+    reference_app = APPS[0]
+    
+    for module in modules:
+        reference_path = module_path(reference_app, module)
+        reference = normalize(reference_path.read_text(encoding="utf-8")).splitlines()
+        for app in APPS[1:]:
+            path = module_path(app, module)
+            if not path.exists():
+                problems.append(f"{path.relative_to(ROOT)} 不存在")
+                continue
+            copy = normalize(path.read_text(encoding="utf-8")).splitlines()
+            if copy != reference:
+                diff = difflib.unified_diff(
+                    reference, copy, str(reference_path.relative_to(ROOT)), str(path.relative_to(ROOT)), lineterm=""
+                )
+                problems.append("\n".join(diff))
+    
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查各应用中共享模块的副本是否一致")
+    parser.add_argument("--module", action="append", choices=sorted(SHARED_MODULES),
+                        help="只检查指定的共享模块，可重复指定")
+    args = parser.parse_args()
+    
+    modules = args.module or sorted(SHARED_MODULES)
+    problems = check(modules)
+    for problem in problems:
+        print(problem)
+        print()
+    
+    if problems:
+        print(f"共享模块不一致: {len(problems)} 处，请将修改同步到所有应用")
+        sys.exit(1)
+    print(f"共享模块一致: 已检查 {len(modules)} 个模块")
+
+
+if __name__ == "__main__":
+    main()